@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+
+import gzip
+import os
+import struct
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module reads the header of a .bam file and its .bai index file without
+'    any external dependencies.  The linear index in the .bai file has the virtual file
+'    offset of the first read that overlaps each 16kb window of a reference.  The upper
+'    48 bits of a virtual file offset are the offset of the compressed BGZF block, so the
+'    difference between the offsets of two windows is roughly the number of compressed
+'    bytes of reads in the window.  This is used as a cheap estimate of the coverage.  The
+'    binning index in the .bai file is used to find the windows without any reads.
+'''
+
+# the linear index of a .bai file has one offset per 16kb window
+i_linearIndexWindowSize = 16384
+
+# the pseudo-bin that holds the start and end offsets and the number of reads for a reference
+i_pseudoBin = 37450
+
+# the first bin and the bin size (as a shift) of each level of the binning index, from the largest to the smallest bins
+i_binLevels = [(0, 29), (1, 26), (9, 23), (73, 20), (585, 17), (4681, 14)]
+
+# the coverage mask is cached next to the .bam file with this suffix
+i_coverageMaskSuffix = ".coverageMask"
+
+
+def get_bam_references(aBamFilename):
+    '''
+    ' This function reads the header of a .bam file and returns a list of (name, length)
+    ' tuples for the references in the order that they are listed in the header.  The
+    ' index of a reference in this list is the reference Id that is used in the .bai file.
+    '
+    ' aBamFilename:    The .bam file
+    '''
+
+    # the BGZF blocks of a .bam file can be read as a multi-member gzip file
+    bamFileHandler = gzip.open(aBamFilename, "rb")
+    try:
+        magic = bamFileHandler.read(4)
+        if (magic != "BAM\1"):
+            raise ValueError("The file " + aBamFilename + " is not a BAM file.")
+
+        # skip the text of the header
+        (headerTextLength,) = struct.unpack("<i", bamFileHandler.read(4))
+        bamFileHandler.read(headerTextLength)
+
+        references = []
+        (numReferences,) = struct.unpack("<i", bamFileHandler.read(4))
+        for index in xrange(numReferences):
+            (nameLength,) = struct.unpack("<i", bamFileHandler.read(4))
+            name = bamFileHandler.read(nameLength).rstrip("\0")
+            (length,) = struct.unpack("<i", bamFileHandler.read(4))
+            references.append((name, length))
+    finally:
+        bamFileHandler.close()
+
+    return references
+
+
+def get_bam_header_text(aBamFilename):
+    '''
+    ' This function returns the text of the header of a .bam file (the @HD, @SQ, @RG, and @PG lines).
+    '
+    ' aBamFilename:    The .bam file
+    '''
+
+    bamFileHandler = gzip.open(aBamFilename, "rb")
+    try:
+        magic = bamFileHandler.read(4)
+        if (magic != "BAM\1"):
+            raise ValueError("The file " + aBamFilename + " is not a BAM file.")
+
+        (headerTextLength,) = struct.unpack("<i", bamFileHandler.read(4))
+        headerText = bamFileHandler.read(headerTextLength)
+    finally:
+        bamFileHandler.close()
+
+    return headerText
+
+
+def get_reference_index(aBamFilename, aChrom):
+    '''
+    ' This function returns the reference Id of a chrom in a .bam file and the length
+    ' of the chrom, or (-1, 0) if the chrom is not in the .bam file.  Sometimes the chroms
+    ' have the "chr" prefix, sometimes they don't, so both are checked.
+    '
+    ' aBamFilename:    The .bam file
+    ' aChrom:          The chrom
+    '''
+    for (index, (name, length)) in enumerate(get_bam_references(aBamFilename)):
+        if (name == aChrom or name == "chr" + aChrom):
+            return (index, length)
+    return (-1, 0)
+
+
+def read_linear_index(aBaiFilename, aReferenceIndex):
+    '''
+    ' This function reads a .bai file and returns the linear index for one reference and the
+    ' end offset of the reads for the reference (or 0 if it isn't in the index).  The linear
+    ' index is a list with the virtual file offset of the first read overlapping each 16kb window.
+    '
+    ' aBaiFilename:        The .bai file
+    ' aReferenceIndex:     The reference Id from the .bam header
+    '''
+
+    baiFileHandler = open(aBaiFilename, "rb")
+    try:
+        magic = baiFileHandler.read(4)
+        if (magic != "BAI\1"):
+            raise ValueError("The file " + aBaiFilename + " is not a BAI file.")
+
+        (numReferences,) = struct.unpack("<i", baiFileHandler.read(4))
+        for referenceIndex in xrange(numReferences):
+            endOffset = 0
+
+            # the binning index is only needed for the pseudo-bin
+            (numBins,) = struct.unpack("<i", baiFileHandler.read(4))
+            for binIndex in xrange(numBins):
+                (binNumber, numChunks) = struct.unpack("<Ii", baiFileHandler.read(8))
+                chunks = baiFileHandler.read(16 * numChunks)
+                if (binNumber == i_pseudoBin and referenceIndex == aReferenceIndex):
+                    (startOffset, endOffset) = struct.unpack("<QQ", chunks[0:16])
+
+            # the linear index
+            (numWindows,) = struct.unpack("<i", baiFileHandler.read(4))
+            windows = baiFileHandler.read(8 * numWindows)
+            if (referenceIndex == aReferenceIndex):
+                return (list(struct.unpack("<%dQ" % numWindows, windows)), endOffset)
+    finally:
+        baiFileHandler.close()
+
+    return ([], 0)
+
+
+def get_coverage_weights(aBamFilenameList, aChromList):
+    '''
+    ' This function estimates the coverage of each 16kb window of a chrom by adding up the
+    ' number of compressed bytes of reads in the window across all of the .bam files.  It
+    ' returns a list with one weight per window.  The .bam files can name the chrom differently
+    ' (e.g. "M" and "MT"), so the name of the chrom is given for each .bam file.  It returns
+    ' None if the chrom isn't in any of the .bam files.
+    '
+    ' aBamFilenameList:    A list of .bam files that have been indexed
+    ' aChromList:          The name of the chrom in each .bam file
+    '''
+
+    weights = None
+    for (bamFilename, chrom) in zip(aBamFilenameList, aChromList):
+        (referenceIndex, length) = get_reference_index(bamFilename, chrom)
+        if (referenceIndex == -1):
+            continue
+        if (weights == None):
+            weights = []
+
+        (linearIndex, endOffset) = read_linear_index(bamFilename + ".bai", referenceIndex)
+
+        # the compressed block offsets are the upper 48 bits of the virtual offsets
+        # the last window ends at the end of the reads for this reference
+        blockOffsets = [(offset >> 16) for offset in linearIndex] + [(endOffset >> 16)]
+
+        for windowIndex in xrange(len(linearIndex)):
+            # windows without reads can have a 0 offset or the offset of a neighboring window
+            weight = max(0, blockOffsets[windowIndex+1] - blockOffsets[windowIndex])
+            if (windowIndex < len(weights)):
+                weights[windowIndex] += weight
+            else:
+                weights.append(weight)
+
+    return weights
+
+
+def get_balanced_shards(aStartCoordinate, aStopCoordinate, aNumShards, aWeightsList):
+    '''
+    ' This function splits the coordinates from aStartCoordinate to aStopCoordinate (1-based, inclusive)
+    ' into at most aNumShards shards.  The shards are balanced according to the weights of the 16kb windows
+    ' (e.g. from get_coverage_weights()), so the shard boundaries fall on window boundaries.  If there
+    ' are no weights in the range, then the shards have the same length.  It returns a list of (start, stop)
+    ' tuples in coordinate order that covers the whole range.
+    '
+    ' aStartCoordinate:    The start coordinate
+    ' aStopCoordinate:     The stop coordinate
+    ' aNumShards:          The number of shards
+    ' aWeightsList:        A list with the weight of each 16kb window
+    '''
+
+    numShards = max(1, min(aNumShards, aStopCoordinate - aStartCoordinate + 1))
+
+    # get the weights of the windows that overlap the range
+    firstWindow = (aStartCoordinate - 1) / i_linearIndexWindowSize
+    lastWindow = (aStopCoordinate - 1) / i_linearIndexWindowSize
+    rangeWeights = [aWeightsList[windowIndex] if (windowIndex < len(aWeightsList)) else 0 for windowIndex in xrange(firstWindow, lastWindow+1)]
+    totalWeight = sum(rangeWeights)
+
+    stops = []
+    if (totalWeight > 0):
+        # end a shard at the window where the cumulative weight reaches the next fraction of the total weight
+        cumulativeWeight = 0
+        for (offset, weight) in enumerate(rangeWeights):
+            cumulativeWeight += weight
+            if (len(stops) < numShards - 1 and cumulativeWeight * numShards >= totalWeight * (len(stops) + 1)):
+                stop = min((firstWindow + offset + 1) * i_linearIndexWindowSize, aStopCoordinate)
+                if (len(stops) == 0 or stop > stops[-1]):
+                    stops.append(stop)
+    else:
+        # split the range into shards of the same length
+        shardLength = (aStopCoordinate - aStartCoordinate + 1) / numShards
+        for shardIndex in xrange(1, numShards):
+            stops.append(aStartCoordinate + (shardIndex * shardLength) - 1)
+
+    # the last shard always ends at the stop coordinate
+    stops = [stop for stop in stops if stop < aStopCoordinate] + [aStopCoordinate]
+
+    shards = []
+    start = aStartCoordinate
+    for stop in stops:
+        shards.append((start, stop))
+        start = stop + 1
+    return shards
+
+
+def read_bins(aBaiFilename):
+    '''
+    ' This function reads a .bai file and returns a list with one list per reference.  The list for a reference
+    ' has the numbers of the bins in the binning index that have at least one chunk of reads.
+    '
+    ' aBaiFilename:    The .bai file
+    '''
+
+    baiFileHandler = open(aBaiFilename, "rb")
+    try:
+        magic = baiFileHandler.read(4)
+        if (magic != "BAI\1"):
+            raise ValueError("The file " + aBaiFilename + " is not a BAI file.")
+
+        references = []
+        (numReferences,) = struct.unpack("<i", baiFileHandler.read(4))
+        for referenceIndex in xrange(numReferences):
+            bins = []
+            (numBins,) = struct.unpack("<i", baiFileHandler.read(4))
+            for binIndex in xrange(numBins):
+                (binNumber, numChunks) = struct.unpack("<Ii", baiFileHandler.read(8))
+                baiFileHandler.read(16 * numChunks)
+                if (binNumber != i_pseudoBin and numChunks > 0):
+                    bins.append(binNumber)
+            references.append(bins)
+
+            # skip the linear index
+            (numWindows,) = struct.unpack("<i", baiFileHandler.read(4))
+            baiFileHandler.read(8 * numWindows)
+    finally:
+        baiFileHandler.close()
+
+    return references
+
+
+def get_bin_windows(aBinNumber):
+    '''
+    ' This function returns the first and last 16kb windows (0-based) that are covered by a bin.
+    '
+    ' aBinNumber:    The bin number
+    '''
+    for (firstBin, shift) in reversed(i_binLevels):
+        if (aBinNumber >= firstBin):
+            start = (aBinNumber - firstBin) << shift
+            stop = start + (1 << shift)
+            return (start / i_linearIndexWindowSize, (stop / i_linearIndexWindowSize) - 1)
+
+
+def compute_coverage_mask(aBamFilename):
+    '''
+    ' This function builds the coverage mask of a .bam file from its .bai file.  A read is put in the smallest
+    ' bin that holds the whole read, so the 16kb windows that aren't covered by any bin with reads have no reads
+    ' at all.  Reads that span many windows (e.g. spliced RNA reads) are put in larger bins, so the mask can
+    ' include some windows without reads, but it never excludes a window with reads.  It returns a dictionary
+    ' with the reference names as the keys and sorted lists of (start, stop) tuples (1-based, inclusive) as
+    ' the values.  The references without any reads are not in the dictionary.
+    '
+    ' aBamFilename:    The .bam file that has been indexed
+    '''
+
+    coverageMask = {}
+    references = get_bam_references(aBamFilename)
+    for ((name, length), bins) in zip(references, read_bins(aBamFilename + ".bai")):
+        if (len(bins) == 0):
+            continue
+
+        # merge the windows of all of the bins
+        lastWindow = (length - 1) / i_linearIndexWindowSize
+        windows = []
+        for (start, stop) in sorted(get_bin_windows(binNumber) for binNumber in bins):
+            if (start > lastWindow):
+                continue
+            stop = min(stop, lastWindow)
+            if (len(windows) > 0 and start <= windows[-1][1] + 1):
+                windows[-1][1] = max(windows[-1][1], stop)
+            else:
+                windows.append([start, stop])
+
+        coverageMask[name] = [((start * i_linearIndexWindowSize) + 1, min((stop + 1) * i_linearIndexWindowSize, length)) for (start, stop) in windows]
+
+    return coverageMask
+
+
+def get_coverage_mask(aBamFilename):
+    '''
+    ' This function returns the coverage mask of a .bam file (see compute_coverage_mask()).  The mask is cached
+    ' in a tab-delimited file (chrom, start, stop) next to the .bam file, and the cache is re-built when the .bai
+    ' file is newer than it.  If the cache can't be written (e.g. the directory is read-only), then the mask is
+    ' just returned.
+    '
+    ' aBamFilename:    The .bam file that has been indexed
+    '''
+
+    cacheFilename = aBamFilename + i_coverageMaskSuffix
+    if (os.path.isfile(cacheFilename) and os.path.getmtime(cacheFilename) >= os.path.getmtime(aBamFilename + ".bai")):
+        coverageMask = {}
+        cacheFileHandler = open(cacheFilename, "r")
+        for line in cacheFileHandler:
+            splitLine = line.rstrip("\r\n").split("\t")
+            coverageMask.setdefault(splitLine[0], []).append((int(splitLine[1]), int(splitLine[2])))
+        cacheFileHandler.close()
+        return coverageMask
+
+    coverageMask = compute_coverage_mask(aBamFilename)
+
+    # write the cache to a temp file and then rename it, so that other processes never read a partial cache
+    tempFilename = cacheFilename + "." + str(os.getpid())
+    try:
+        cacheFileHandler = open(tempFilename, "w")
+        for (name, length) in get_bam_references(aBamFilename):
+            for (start, stop) in coverageMask.get(name, []):
+                cacheFileHandler.write(name + "\t" + str(start) + "\t" + str(stop) + "\n")
+        cacheFileHandler.close()
+        os.rename(tempFilename, cacheFilename)
+    except (IOError, OSError):
+        if (os.path.isfile(tempFilename)):
+            os.remove(tempFilename)
+
+    return coverageMask
+
+
+def get_covered_intervals(aCoverageMaskList, aChromList):
+    '''
+    ' This function returns the windows of a chrom that could have reads in at least one of the .bam files
+    ' as a sorted list of (start, stop) tuples (1-based, inclusive) that don't overlap.  The .bam files can 
+    ' name the chrom differently (e.g. "M" and "MT"), so the name of the chrom is given for each coverage mask.
+    ' Sometimes the chroms have the "chr" prefix, sometimes they don't, so both are checked.  It returns None
+    ' if the chrom isn't in any of the coverage masks (e.g. the chrom is named differently in the .bam files).
+    '
+    ' aCoverageMaskList:    A list of coverage masks from get_coverage_mask(), one per .bam file
+    ' aChromList:           The name of the chrom in each .bam file
+    '''
+
+    intervals = None
+    for (coverageMask, chrom) in zip(aCoverageMaskList, aChromList):
+        if (chrom in coverageMask):
+            intervals = (intervals or []) + coverageMask[chrom]
+        elif ("chr" + chrom in coverageMask):
+            intervals = (intervals or []) + coverageMask["chr" + chrom]
+
+    if (intervals == None):
+        return None
+
+    coveredIntervals = []
+    for (start, stop) in sorted(intervals):
+        if (len(coveredIntervals) > 0 and start <= coveredIntervals[-1][1] + 1):
+            coveredIntervals[-1] = (coveredIntervals[-1][0], max(coveredIntervals[-1][1], stop))
+        else:
+            coveredIntervals.append((start, stop))
+    return coveredIntervals
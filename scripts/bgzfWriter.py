@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+
+import bisect
+import collections
+import multiprocessing
+import struct
+import zlib
+from multiprocessing.pool import ThreadPool
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module writes the .gz output files of radia.py and the filter scripts in the BGZF format,
+'    the same blocked gzip format that is used by bgzip and the .bam files.  Any gzip reader can read
+'    the files, but they can also be indexed.  The blocks are compressed in parallel by a pool of
+'    threads (zlib releases the GIL while it compresses), and they are written in order.  When the
+'    output is a VCF file, a tabix index (.tbi) is written next to it, so that the later stages and
+'    the tabix command can seek straight to a region.
+'''
+
+# the max number of uncompressed bytes in a block, the same as bgzip
+i_blockSize = 65280
+
+# the empty block at the end of every BGZF file
+i_eofBlock = "\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00\x42\x43\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+
+# the number of threads that compress the blocks of each file
+i_numThreads = min(4, multiprocessing.cpu_count())
+
+# the columns of the VCF files in the tabix index:  the format (2 is VCF), the chrom, start, and end columns,
+# the meta character, and the number of lines to skip
+i_vcfIndexConf = (2, 1, 2, 0, "#", 0)
+
+# the tabix bins and the linear index use 16kb windows
+i_minShift = 14
+
+
+def compress_block(aData):
+    '''
+    ' This function compresses one block of data and returns the BGZF block.  Each block is a complete gzip
+    ' member with the size of the block in the "BC" extra field.
+    '
+    ' aData:    At most i_blockSize bytes of uncompressed data
+    '''
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    compressedData = compressor.compress(aData) + compressor.flush()
+    header = struct.pack("<4BI2BH2BHH", 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord("B"), ord("C"), 2, len(compressedData) + 25)
+    return header + compressedData + struct.pack("<iI", zlib.crc32(aData), len(aData) & 0xffffffff)
+
+
+def reg2bin(aStart, anEnd):
+    '''
+    ' This function returns the smallest tabix bin that contains a 0-based, half-open region (see the SAM spec).
+    '
+    ' aStart:    The 0-based start of the region
+    ' anEnd:     The 0-based end of the region (exclusive)
+    '''
+
+    anEnd -= 1
+    if (aStart >> 14 == anEnd >> 14):
+        return ((1 << 15) - 1) / 7 + (aStart >> 14)
+    if (aStart >> 17 == anEnd >> 17):
+        return ((1 << 12) - 1) / 7 + (aStart >> 17)
+    if (aStart >> 20 == anEnd >> 20):
+        return ((1 << 9) - 1) / 7 + (aStart >> 20)
+    if (aStart >> 23 == anEnd >> 23):
+        return ((1 << 6) - 1) / 7 + (aStart >> 23)
+    if (aStart >> 26 == anEnd >> 26):
+        return ((1 << 3) - 1) / 7 + (aStart >> 26)
+    return 0
+
+
+class TabixIndexer(object):
+    '''
+    ' This class builds a tabix index from the records of a sorted file.  Each record is added with its chrom,
+    ' its 0-based, half-open region, and the virtual offsets of its first byte and of the byte after it.  When
+    ' the records aren't sorted, the file can't be indexed, so isSorted is set to False.
+    '''
+
+    def __init__(self, aConf):
+        '''
+        ' aConf:    The (format, chromColumn, startColumn, endColumn, metaChar, skipLines) of the file
+        '''
+        self.conf = aConf
+        self.chroms = []
+        self.bins = []
+        self.linearIndexes = []
+        self.stats = []
+        self.lastChrom = None
+        self.lastStart = -1
+        self.isSorted = True
+
+    def add(self, aChrom, aStart, anEnd, aStartOffset, anEndOffset):
+        if (aChrom != self.lastChrom):
+            # all of the records on a chrom must be next to each other
+            if (aChrom in self.chroms):
+                self.isSorted = False
+                return
+            self.chroms.append(aChrom)
+            self.bins.append(collections.OrderedDict())
+            self.linearIndexes.append([])
+            self.stats.append([aStartOffset, anEndOffset, 0])
+            self.lastChrom = aChrom
+            self.lastStart = -1
+        if (aStart < self.lastStart):
+            self.isSorted = False
+            return
+        self.lastStart = aStart
+
+        # the chunks of a bin are merged when they are in the same block
+        chunks = self.bins[-1].setdefault(reg2bin(aStart, max(anEnd, aStart + 1)), [])
+        if (len(chunks) > 0 and (chunks[-1][1] >> 16) == (aStartOffset >> 16)):
+            chunks[-1][1] = anEndOffset
+        else:
+            chunks.append([aStartOffset, anEndOffset])
+
+        # the linear index has the offset of the first record that overlaps each window
+        linearIndex = self.linearIndexes[-1]
+        for window in xrange(aStart >> i_minShift, (max(anEnd, aStart + 1) - 1 >> i_minShift) + 1):
+            while (len(linearIndex) <= window):
+                linearIndex.append(None)
+            if (linearIndex[window] == None):
+                linearIndex[window] = aStartOffset
+
+        self.stats[-1][1] = anEndOffset
+        self.stats[-1][2] += 1
+
+    def get_index(self):
+        '''
+        ' This function returns the uncompressed .tbi file.
+        '''
+        (fileFormat, chromColumn, startColumn, endColumn, metaChar, skipLines) = self.conf
+        names = "".join([chrom + "\0" for chrom in self.chroms])
+        index = ["TBI\1", struct.pack("<8i", len(self.chroms), fileFormat, chromColumn, startColumn, endColumn, ord(metaChar), skipLines, len(names)), names]
+        for (bins, linearIndex, (firstOffset, lastOffset, numRecords)) in zip(self.bins, self.linearIndexes, self.stats):
+            # the pseudo-bin has the offsets of the chrom and the number of records
+            index.append(struct.pack("<i", len(bins) + 1))
+            for (binNumber, chunks) in bins.iteritems():
+                index.append(struct.pack("<Ii", binNumber, len(chunks)))
+                index += [struct.pack("<QQ", start, end) for (start, end) in chunks]
+            index.append(struct.pack("<IiQQQQ", 37450, 2, firstOffset, lastOffset, numRecords, 0))
+
+            # the empty windows get the offset of the previous window with a record
+            offsets = []
+            previousOffset = firstOffset
+            for offset in linearIndex:
+                if (offset != None):
+                    previousOffset = offset
+                offsets.append(previousOffset)
+            index.append(struct.pack("<i", len(offsets)))
+            index += [struct.pack("<Q", offset) for offset in offsets]
+        return "".join(index)
+
+
+class BgzfWriter(object):
+    '''
+    ' This class writes a BGZF file.  It has the same write(), flush(), and close() methods as the file handlers
+    ' from gzip.open(), so it can be used in their place (e.g. with print >>).  The data is cut into blocks of
+    ' i_blockSize bytes, the blocks are compressed by a pool of threads, and they are written in order.  If the
+    ' file is indexed, then each line is added to a tabix index, and the index is written when the file is closed.
+    '''
+
+    def __init__(self, aFilename, aNumThreads=i_numThreads, anIndexConf=None):
+        '''
+        ' aFilename:      The name of the output file
+        ' aNumThreads:    The number of threads that compress the blocks, 1 compresses them on the calling thread
+        ' anIndexConf:    The tabix columns of the file (e.g. i_vcfIndexConf) or None if the file shouldn't be indexed
+        '''
+        self.name = aFilename
+        self.fileHandler = open(aFilename, "wb")
+        self.softspace = 0
+        self.buffer = []
+        self.bufferSize = 0
+        self.numBlocks = 0
+        self.pool = ThreadPool(aNumThreads) if (aNumThreads > 1) else None
+        self.maxPendingBlocks = 4 * aNumThreads
+        self.pendingBlocks = collections.deque()
+        # the compressed offset of each block that has been written, and the uncompressed offset where each
+        # block that has been submitted starts (the last one is where the next block will start), since the
+        # blocks that are cut by flush() are shorter than i_blockSize
+        self.blockOffsets = []
+        self.blockStarts = [0]
+        self.compressedOffset = 0
+
+        # the lines are indexed once the blocks that they are in have been written
+        self.indexer = TabixIndexer(anIndexConf) if (anIndexConf != None) else None
+        self.uncompressedOffset = 0
+        self.partialLine = ""
+        self.pendingRecords = collections.deque()
+
+    def write(self, aString):
+        if (len(aString) == 0):
+            return
+        if (self.indexer != None):
+            self.add_lines(aString)
+
+        self.buffer.append(aString)
+        self.bufferSize += len(aString)
+        if (self.bufferSize >= i_blockSize):
+            data = "".join(self.buffer)
+            numFullBlocks = len(data) // i_blockSize
+            for blockIndex in xrange(numFullBlocks):
+                self.submit_block(data[blockIndex * i_blockSize:(blockIndex + 1) * i_blockSize])
+            rest = data[numFullBlocks * i_blockSize:]
+            self.buffer = [rest] if (len(rest) > 0) else []
+            self.bufferSize = len(rest)
+
+    def add_lines(self, aString):
+        '''
+        ' This function finds the chrom and region of each complete line and remembers where the line starts and
+        ' stops in the uncompressed data.  The lines are added to the index once their blocks have been written.
+        '''
+        lineOffset = self.uncompressedOffset - len(self.partialLine)
+        lines = (self.partialLine + aString).split("\n")
+        self.partialLine = lines.pop()
+        (fileFormat, chromColumn, startColumn, endColumn, metaChar, skipLines) = self.indexer.conf
+        for line in lines:
+            lineEnd = lineOffset + len(line) + 1
+            if (len(line) > 0 and not line.startswith(metaChar)):
+                columns = line.split("\t", max(chromColumn, startColumn, endColumn, 4))
+                start = int(columns[startColumn - 1]) - 1
+                if (endColumn > 0):
+                    end = int(columns[endColumn - 1])
+                elif (fileFormat == 2):
+                    # the end of a VCF record is from the length of the ref
+                    end = start + len(columns[3])
+                else:
+                    end = start + 1
+                self.pendingRecords.append((columns[chromColumn - 1], start, end, lineOffset, lineEnd))
+            lineOffset = lineEnd
+        self.uncompressedOffset += len(aString)
+
+    def get_virtual_offset(self, anUncompressedOffset):
+        blockIndex = bisect.bisect_right(self.blockStarts, anUncompressedOffset, 0, len(self.blockOffsets)) - 1
+        return (self.blockOffsets[blockIndex] << 16) | (anUncompressedOffset - self.blockStarts[blockIndex])
+
+    def submit_block(self, aData):
+        if (self.pool != None):
+            self.pendingBlocks.append(self.pool.apply_async(compress_block, (aData,)))
+        else:
+            self.pendingBlocks.append(aData)
+        self.numBlocks += 1
+        self.blockStarts.append(self.blockStarts[-1] + len(aData))
+
+        # the blocks are written in order, and the queue is kept short so the memory doesn't grow
+        while (len(self.pendingBlocks) > self.maxPendingBlocks):
+            self.write_block()
+
+    def write_block(self):
+        pendingBlock = self.pendingBlocks.popleft()
+        block = pendingBlock.get() if (self.pool != None) else compress_block(pendingBlock)
+        self.blockOffsets.append(self.compressedOffset)
+        self.fileHandler.write(block)
+        self.compressedOffset += len(block)
+
+        # the lines that end before the next block can be indexed
+        if (self.indexer != None):
+            self.blockOffsets.append(self.compressedOffset)
+            while (len(self.pendingRecords) > 0 and self.pendingRecords[0][4] <= self.blockStarts[len(self.blockOffsets) - 1]):
+                (chrom, start, end, lineStart, lineEnd) = self.pendingRecords.popleft()
+                self.indexer.add(chrom, start, end, self.get_virtual_offset(lineStart), self.get_virtual_offset(lineEnd))
+            self.blockOffsets.pop()
+
+    def flush(self):
+        '''
+        ' Write everything that has been written so far to the file, like the flush() of a file handler.  The
+        ' partial block in the buffer is compressed as a shorter block, and all of the pending blocks are written.
+        '''
+        if (len(self.buffer) > 0):
+            self.submit_block("".join(self.buffer))
+            self.buffer = []
+            self.bufferSize = 0
+        while (len(self.pendingBlocks) > 0):
+            self.write_block()
+        self.fileHandler.flush()
+
+    def close(self):
+        self.flush()
+        if (self.pool != None):
+            self.pool.close()
+            self.pool.join()
+        self.fileHandler.write(i_eofBlock)
+        self.fileHandler.close()
+
+        # the last line doesn't need a newline
+        if (self.indexer != None):
+            if (len(self.partialLine) > 0):
+                self.add_lines("\n")
+                self.uncompressedOffset -= 1
+            self.blockOffsets.append(self.compressedOffset)
+            while (len(self.pendingRecords) > 0):
+                (chrom, start, end, lineStart, lineEnd) = self.pendingRecords.popleft()
+                self.indexer.add(chrom, start, end, self.get_virtual_offset(lineStart), self.get_virtual_offset(min(lineEnd, self.uncompressedOffset)))
+            if (self.indexer.isSorted):
+                indexWriter = BgzfWriter(self.name + ".tbi", 1)
+                indexWriter.write(self.indexer.get_index())
+                indexWriter.close()
+
+
+def get_write_fileHandler(aFilename, aNumThreads=i_numThreads):
+    '''
+    ' This function opens a .gz file for writing in the BGZF format and returns the file handler.  The VCF
+    ' files (.vcf.gz) are indexed with a tabix index when they are closed, as long as they are sorted.
+    '
+    ' aFilename:      The name of the output file
+    ' aNumThreads:    The number of threads that compress the blocks
+    '''
+
+    if (aFilename.endswith(".vcf.gz")):
+        return BgzfWriter(aFilename, aNumThreads, i_vcfIndexConf)
+    return BgzfWriter(aFilename, aNumThreads)
@@ -11,6 +11,8 @@ import logging
 from itertools import izip
 import os
 import gzip
+import bgzfWriter
+import lineReader
 
 i_reverseCompDict = {"A": "T", "C": "G", "G": "C", "T": "A", "N": "N"}
 
@@ -35,26 +37,15 @@ i_reverseCompDict = {"A": "T", "C": "G", "G": "C", "T": "A", "N": "N"}
 i_cigarRegEx = re.compile("[0-9]+[MIDNSHPX=]")
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
     else:
         return open(aFilename,'w')
     
@@ -98,7 +89,7 @@ def get_vcf_data(aVcfFile, aHeaderFile, aPassOnlyFlag, anIsDebug):
     '''
     
     # open the header file
-    fileHandler = get_read_fileHandler(aHeaderFile)
+    fileHandler = lineReader.get_read_fileHandler(aHeaderFile)
      
     for line in fileHandler:
           
@@ -149,7 +140,7 @@ def get_vcf_data(aVcfFile, aHeaderFile, aPassOnlyFlag, anIsDebug):
     fileHandler.close()
     
     # open the VCF file
-    fileHandler = get_read_fileHandler(aVcfFile)
+    fileHandler = lineReader.get_read_fileHandler(aVcfFile)
      
     for line in fileHandler:
           
@@ -239,7 +230,7 @@ def get_read_data(aReadFile, anIsDebug):
     '''
     
     # open the file
-    fileHandler = get_read_fileHandler(aReadFile)
+    fileHandler = lineReader.get_read_fileHandler(aReadFile)
     reads = fileHandler.readlines()
     fileHandler.close()
     
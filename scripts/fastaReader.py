@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+import mmap
+import re
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module reads the reference bases from a FASTA file that has been indexed with the
+'    samtools faidx command.  The FASTA file is memory-mapped, and the offsets in the .fai file
+'    are used to go straight to the bases of a chrom, so only the pages that are needed are read.
+'''
+
+# a run of N's in the reference (the bases are upper case)
+i_nRunPattern = re.compile("N+")
+
+# the number of bases that are scanned at once when looking for the runs of N's
+i_scanSize = 1048576
+
+# the FASTA files that have been mapped by this process
+i_mappedFastas = {}
+
+
+def read_fasta_index(aFaiFilename):
+    '''
+    ' This function reads a FASTA index file and returns a dictionary with the chrom names as the keys
+    ' and (length, offset, lineBases, lineWidth) tuples as the values (see radia.get_chrom_size()).
+    '
+    ' aFaiFilename:    The .fai file
+    '''
+
+    fastaIndex = {}
+    faiFileHandler = open(aFaiFilename, "r")
+    for line in faiFileHandler:
+        # if it is an empty line, then just continue
+        if (line.isspace() or line.startswith("#")):
+            continue
+
+        splitLine = line.rstrip("\r\n").split("\t")
+        fastaIndex[splitLine[0]] = (int(splitLine[1]), int(splitLine[2]), int(splitLine[3]), int(splitLine[4]))
+    faiFileHandler.close()
+
+    return fastaIndex
+
+
+class MappedFasta(object):
+    '''
+    ' This class reads the reference bases from a memory-mapped FASTA file.  All of the coordinates are 1-based and
+    ' the stop coordinates are inclusive.  Sometimes the chroms have the "chr" prefix, sometimes they don't, so both
+    ' are checked.  The bases are returned in upper case like the references in the pileups.
+    '''
+
+    __slots__ = ("fastaFilename", "fastaFileHandler", "fastaMap", "fastaIndex")
+
+    def __init__(self, aFastaFilename):
+        self.fastaFilename = aFastaFilename
+        self.fastaIndex = read_fasta_index(aFastaFilename + ".fai")
+        self.fastaFileHandler = open(aFastaFilename, "rb")
+        self.fastaMap = mmap.mmap(self.fastaFileHandler.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_name(self, aChrom):
+        '''
+        ' This function returns the name of the chrom in the FASTA file or None if the chrom isn't in the file.
+        '
+        ' aChrom:    The chrom
+        '''
+        if (aChrom in self.fastaIndex):
+            return aChrom
+        elif ("chr" + aChrom in self.fastaIndex):
+            return "chr" + aChrom
+        elif (aChrom.startswith("chr") and aChrom[3:] in self.fastaIndex):
+            return aChrom[3:]
+        return None
+
+    def fetch(self, aChrom, aStartCoordinate, aStopCoordinate):
+        '''
+        ' This function returns the reference bases from aStartCoordinate to aStopCoordinate.  The bases past the end
+        ' of the chrom are not returned, and an empty string is returned if the chrom isn't in the FASTA file.
+        '
+        ' aChrom:              The chrom
+        ' aStartCoordinate:    The start coordinate
+        ' aStopCoordinate:     The stop coordinate
+        '''
+        name = self.get_name(aChrom)
+        if (name == None):
+            return ""
+
+        (length, offset, lineBases, lineWidth) = self.fastaIndex[name]
+        start = max(aStartCoordinate, 1) - 1
+        stop = min(aStopCoordinate, length)
+        if (start >= stop):
+            return ""
+
+        # each line has lineBases bases followed by the newline characters
+        startByte = offset + ((start / lineBases) * lineWidth) + (start % lineBases)
+        stopByte = offset + (((stop - 1) / lineBases) * lineWidth) + ((stop - 1) % lineBases) + 1
+        return self.fastaMap[startByte:stopByte].replace("\n", "").replace("\r", "").upper()
+
+    def get_n_runs(self, aChrom, aStartCoordinate, aStopCoordinate):
+        '''
+        ' This function returns the runs of N's from aStartCoordinate to aStopCoordinate as a sorted list of
+        ' (start, stop) tuples.  The bases are scanned in chunks, so the whole chrom is never loaded at once.
+        '
+        ' aChrom:              The chrom
+        ' aStartCoordinate:    The start coordinate
+        ' aStopCoordinate:     The stop coordinate
+        '''
+        nRuns = []
+        chunkStart = aStartCoordinate
+        while (chunkStart <= aStopCoordinate):
+            chunkStop = min(chunkStart + i_scanSize - 1, aStopCoordinate)
+            bases = self.fetch(aChrom, chunkStart, chunkStop)
+            for match in i_nRunPattern.finditer(bases):
+                start = chunkStart + match.start()
+                stop = chunkStart + match.end() - 1
+                # a run can continue from the previous chunk
+                if (len(nRuns) > 0 and nRuns[-1][1] == start - 1):
+                    nRuns[-1] = (nRuns[-1][0], stop)
+                else:
+                    nRuns.append((start, stop))
+
+            # the rest of the coordinates are past the end of the chrom
+            if (len(bases) < chunkStop - chunkStart + 1):
+                break
+            chunkStart = chunkStop + 1
+        return nRuns
+
+    def close(self):
+        self.fastaMap.close()
+        self.fastaFileHandler.close()
+
+
+def get_mapped_fasta(aFastaFilename):
+    '''
+    ' This function returns the MappedFasta for a FASTA file.  Each FASTA file is only mapped once per process,
+    ' so all of the samples and regions that use the same FASTA file share the same map.
+    '
+    ' aFastaFilename:    The FASTA file that has been indexed
+    '''
+    if (aFastaFilename not in i_mappedFastas):
+        i_mappedFastas[aFastaFilename] = MappedFasta(aFastaFilename)
+    return i_mappedFastas[aFastaFilename]
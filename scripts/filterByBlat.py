@@ -7,7 +7,9 @@ from itertools import izip
 import radiaUtil
 import collections
 import logging
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 
 '''
 '    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
@@ -28,26 +30,19 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
 
@@ -64,7 +59,7 @@ def get_vcf_data(aVcfFile, aPassOnlyFlag, anIsDebug):
     ''' 
     
     # open the VCF file
-    fileHandler = get_read_fileHandler(aVcfFile)
+    fileHandler = lineReader.get_read_fileHandler(aVcfFile)
      
     for line in fileHandler:
           
@@ -132,7 +127,7 @@ def parse_blat_output(aBlatFile, anOutputFormat, anIsDebug):
     '''
     
     # open the file
-    fileHandler = get_read_fileHandler(aBlatFile)
+    fileHandler = lineReader.get_read_fileHandler(aBlatFile)
     blatHitsDict = collections.defaultdict(dict)
      
     for line in fileHandler:
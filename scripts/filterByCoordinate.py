@@ -6,7 +6,8 @@ import radiaUtil                    # utility functions for rna editing
 import logging
 import time
 import collections
-import gzip
+import lineReader
+import filterPipeline
 
 '''
 '    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
@@ -27,30 +28,6 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
-def get_write_fileHandler(aFilename):
-    '''
-    ' Open aFilename for writing and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
-    else:
-        return open(aFilename,'w')
-
-
 def get_bed_data(anInputStream, anIsDebug):
     '''
     ' The bed files must have at least 3 fields:  chromosome, 
@@ -96,71 +73,6 @@ def get_bed_data(anInputStream, anIsDebug):
     return(dbSnpDict)
 
 
-def get_vcf_data(anInputFileHandler, anOutputFileHandler, aHeaderLine, anIsDebug):
-    '''
-    ' The .vcf files must have at least 10 fields:  chromosome, coordinate, id
-    ' references, alts, quality score, filters, infos, format, and summary info
-    ' for at least one .bam file.
-    '
-    ' anInputFileHandler: The input stream for the file
-    ' anOutputFileHandler: The output stream for the file
-    ' aHeaderLine: The header line that should be added to the output file
-    ' anIsDebug: A flag for outputting debug messages to STDERR
-    '''
-
-    hasAddedHeader = False
-         
-    for line in anInputFileHandler:
-        # strip the carriage return and newline characters
-        line = line.rstrip("\r\n")
-        
-        if (anIsDebug):
-            logging.debug("VCF Line: %s", line)
-            
-        # if it is an empty line, then just continue
-        if (line.isspace()):
-            continue;
-        # if we find the INFO or FILTER section, then add the filters from here
-        elif (((aHeaderLine != None) and (not hasAddedHeader)) and
-              ((aHeaderLine.startswith("##INFO") and line.startswith("##INFO")) or
-              (aHeaderLine.startswith("##FILTER") and line.startswith("##FILTER")))):
-            hasAddedHeader = True
-            if (anOutputFileHandler != None):        
-                anOutputFileHandler.write(aHeaderLine + "\n")
-                anOutputFileHandler.write(line + "\n")
-            else:
-                print >> sys.stdout, aHeaderLine
-                print >> sys.stdout, line
-                
-        # these lines are from previous scripts in the pipeline, so output them    
-        elif (line.startswith("#")):
-            if (anOutputFileHandler != None):
-                anOutputFileHandler.write(line + "\n")
-            else:
-                print >> sys.stdout, line
-        # now we are to the data
-        else:    
-            
-            # split the line on the tab
-            splitLine = line.split("\t")
-            
-            # get the fields to yield
-            #columnHeaders = ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT"]
-            chrom = splitLine[0]
-            stopCoordinate = int(splitLine[1])
-            ids = splitLine[2]
-            ref = splitLine[3]
-            alt = splitLine[4]
-            qual = splitLine[5]
-            filters = splitLine[6]
-            info = splitLine[7]
-            restLine = splitLine[8:len(splitLine)]
-            
-            yield chrom, (stopCoordinate-1), stopCoordinate, ids, ref, alt, qual, filters, info, restLine, line
-        
-    return
-
-
 def add_filter(aVCFFilter, aVCFInfo, aFilterName, aFilterField):
     '''
     ' Add the filter name to the filter or info column.
@@ -209,8 +121,73 @@ def add_id(aVCFId, aNamesList):
         vcfIdList = aVCFId.split(";")
         vcfIdList += aNamesList        
         return ";".join(vcfIdList)
-        
-        
+
+
+class CoordinateFilter(object):
+    '''
+    ' This class applies the filter of filter_events() to a stream of VCF lines, so that it can also be chained
+    ' with the other filters in one process by filterPipeline.  The header lines in the stream are strings, and
+    ' the records are lists that were split by lineReader.split_fields(line, 8).
+    '
+    ' (the params are the same as for filter_events())
+    '''
+
+    def __init__(self, aTCGAId, aChrom, aBedFilename, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, aFilterHeaderLine):
+        self.tcgaId = aTCGAId
+        self.chrom = aChrom
+        self.filterName = aFilterName
+        self.filterField = aFilterField
+        self.includeOverlapInfo = anIncludeOverlapInfo
+        self.includeFilterName = anIncludeFilterName
+        self.includeIdName = anIncludeIdName
+        self.filterHeaderLine = aFilterHeaderLine
+
+        filterFileHandler = lineReader.get_read_fileHandler(aBedFilename)
+        self.dbSnpDict = get_bed_data(filterFileHandler, False)
+        filterFileHandler.close()
+
+    def filter_stream(self, aStream):
+        hasAddedHeader = False
+        overlappingEvents = 0
+        totalEvents = 0
+        startTime = time.time()
+
+        for item in aStream:
+            # skip the empty lines, and add the filter header line before the first INFO or FILTER line
+            if (isinstance(item, str)):
+                if (item.isspace()):
+                    continue
+                elif (((self.filterHeaderLine != None) and (not hasAddedHeader)) and
+                      ((self.filterHeaderLine.startswith("##INFO") and item.startswith("##INFO")) or
+                      (self.filterHeaderLine.startswith("##FILTER") and item.startswith("##FILTER")))):
+                    hasAddedHeader = True
+                    yield self.filterHeaderLine
+                yield item
+                continue
+
+            totalEvents += 1
+
+            stopCoordinate = int(item[1])
+            filterNamesList = self.dbSnpDict.get(str(stopCoordinate-1) + "_" + str(stopCoordinate))
+            if (filterNamesList != None):
+                overlappingEvents += 1
+
+            # the overlaps are altered when we want to add info about overlaps, otherwise the non-overlaps are
+            if ((filterNamesList != None) == self.includeOverlapInfo):
+                if (self.includeFilterName):
+                    (item[6], item[7]) = add_filter(item[6], item[7], self.filterName, self.filterField)
+                if (self.includeIdName):
+                    item[2] = add_id(item[2], filterNamesList)
+                item[1] = str(stopCoordinate)
+
+            yield item
+
+        stopTime = time.time()
+        logging.info("Chrom %s and Id %s: Total time=%s hrs, %s mins, %s secs", self.chrom, self.tcgaId, ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime))
+        logging.info("For chrom %s and Id %s: %s (overlapping events) + %s (non-overlapping events) = %s", self.chrom, self.tcgaId, overlappingEvents, totalEvents - overlappingEvents, totalEvents)
+        return
+
+
 def filter_events(aTCGAId, aChrom, aBedFilename, aVCFFilename, anOutputFilename, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, aFilterHeaderLine, anIsDebug):
     '''
     ' The function reads from a .bed file and a .vcf file line by line and looks for variants that should be
@@ -234,105 +211,20 @@ def filter_events(aTCGAId, aChrom, aBedFilename, aVCFFilename, anOutputFilename,
     ' anIsDebug: A flag for outputting debug messages to STDERR
     '''
     
+    # the filter is the same one that filterRadia.py chains with the other filters in one process
+    vcfFilter = CoordinateFilter(aTCGAId, aChrom, aBedFilename, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, aFilterHeaderLine)
+    
     # get the files
-    i_vcfFileHandler = get_read_fileHandler(aVCFFilename)
-    i_filterFileHandler = get_read_fileHandler(aBedFilename)
+    i_vcfFileHandler = lineReader.get_read_fileHandler(aVCFFilename)
     
-    i_outputFileHandler = None
     if (anOutputFilename != None):
-        i_outputFileHandler = get_write_fileHandler(anOutputFilename)  
-    
-    # create the generators for the filter and vcf files
-    (i_dbSnpDict) = get_bed_data(i_filterFileHandler, anIsDebug)
-    vcfGenerator = get_vcf_data(i_vcfFileHandler, i_outputFileHandler, aFilterHeaderLine, anIsDebug)
-    
-    # initialize some variables
-    overlappingEvents = 0
-    nonOverlappingEvents = 0
-    totalEvents = 0
-    startTime = time.time()
-    
-    # for each vcf line
-    for (vcf_chr, vcf_startCoordinate, vcf_stopCoordinate, vcf_id, vcf_ref, vcf_alt, vcf_qual, vcf_filter, vcf_info, vcf_restLine, vcf_line) in (vcfGenerator):
-    
-        isOverlapping = False
-        totalEvents += 1
-        
-        if (anIsDebug):
-            logging.debug("VCF: %s", vcf_line)
-            
-        vcf_coordinateKey = str(vcf_startCoordinate) + "_" + str(vcf_stopCoordinate)
-        if (vcf_coordinateKey in i_dbSnpDict):
-            isOverlapping = True
-            filterNamesList = i_dbSnpDict[vcf_coordinateKey]
-            
-        # if an event overlaps with the filters
-        if (isOverlapping):
-            # count the overlap
-            overlappingEvents += 1
-            
-            # if we want to add info about overlaps
-            if (anIncludeOverlapInfo):
-            
-                # alter the filter and id name if appropriate
-                if (anIncludeFilterName):
-                    (vcf_filter, vcf_info) = add_filter(vcf_filter, vcf_info, aFilterName, aFilterField)
-                        
-                if (anIncludeIdName):
-                    vcf_id = add_id(vcf_id, filterNamesList)
-                
-                # output the event
-                outputList = (vcf_chr, str(vcf_stopCoordinate), vcf_id, vcf_ref, vcf_alt, vcf_qual, vcf_filter, vcf_info)
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write("\t".join(outputList) + "\t" + "\t".join(vcf_restLine) + "\n")
-                else:
-                    print >> sys.stdout, "\t".join(outputList) + "\t" + "\t".join(vcf_restLine)
-            # we don't want to add info about overlaps, just output them
-            else:
-                # output the editing event
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write(vcf_line + "\n")
-                else:
-                    print >> sys.stdout, vcf_line
-        # these events don't overlap with the filters
-        else:
-            # count the non overlap
-            nonOverlappingEvents += 1
-                        
-            # if we don't want to add info about overlaps, then we do want to add info about non-overlaps
-            if (not anIncludeOverlapInfo):
-            
-                # alter the filter and id name if appropriate
-                if (anIncludeFilterName):
-                    (vcf_filter, vcf_info) = add_filter(vcf_filter, vcf_info, aFilterName, aFilterField)
-                        
-                if (anIncludeIdName):
-                    vcf_id = add_id(vcf_id, filterNamesList)
-                
-                # output the event
-                outputList = (vcf_chr, str(vcf_stopCoordinate), vcf_id, vcf_ref, vcf_alt, vcf_qual, vcf_filter, vcf_info)
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write("\t".join(outputList) + "\t" + "\t".join(vcf_restLine) + "\n")
-                else:
-                    print >> sys.stdout, "\t".join(outputList) + "\t" + "\t".join(vcf_restLine)
-            # we do want to add info about overlaps, so just output non-overlaps
-            else:
-                # output the editing event
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write(vcf_line + "\n")
-                else:
-                    print >> sys.stdout, vcf_line
-                    
-    stopTime = time.time()
-    logging.info("Chrom %s and Id %s: Total time=%s hrs, %s mins, %s secs", aChrom, aTCGAId, ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime)) 
-           
-    if (overlappingEvents + nonOverlappingEvents == totalEvents):
-        logging.info("For chrom %s and Id %s: %s (overlapping events) + %s (non-overlapping events) = %s", aChrom, aTCGAId, overlappingEvents, nonOverlappingEvents, totalEvents) 
+        i_outputFileHandler = filterPipeline.get_write_fileHandler(anOutputFilename)
     else:
-        logging.info("FilterByCoordinate Warning: For chrom %s and Id %s: %s (overlapping events) + %s (non-overlapping events) = %s", aChrom, aTCGAId, overlappingEvents, nonOverlappingEvents, totalEvents)
+        i_outputFileHandler = sys.stdout
+    
+    filterPipeline.write_stream(vcfFilter.filter_stream(filterPipeline.read_stream(i_vcfFileHandler)), i_outputFileHandler)
         
     # close the files 
-    i_filterFileHandler.close()
     i_vcfFileHandler.close()   
     if (anOutputFilename != None):
         i_outputFileHandler.close() 
@@ -439,5 +331,6 @@ def main():
        
     return
 
-main()
-sys.exit(0)
+if __name__ == '__main__':
+    main()
+    sys.exit(0)
@@ -10,7 +10,9 @@ import time
 import subprocess
 import re
 from math import floor
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 
 '''
 '    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
@@ -44,26 +46,19 @@ i_headerIDRegEx = re.compile("ID=(\\w)*,")
 i_headerTypeRegEx = re.compile("Type=(\\w)*,")
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
 
@@ -832,7 +827,7 @@ def filterByMaxError(aRefPlusAltList, aParamsDict, aSampleDict, aSourceIndex, aT
 def get_sample_columns(aFilename, aHeaderDict, anIsDebug):
     
     # get the file
-    i_fileHandler = get_read_fileHandler(aFilename)
+    i_fileHandler = lineReader.get_read_fileHandler(aFilename)
     
     for line in i_fileHandler:
         # strip the carriage return and newline characters
@@ -984,7 +979,7 @@ def get_mpileup_header(anAddOriginFlag):
 def get_vcf_header(aHeaderDict, aFilename, aCmdLineParams, aColumnsList, anIsDebug):
     
     # open the file
-    vcfFileHandler = get_read_fileHandler(aFilename)
+    vcfFileHandler = lineReader.get_read_fileHandler(aFilename)
     
     for line in vcfFileHandler:
         
@@ -1143,7 +1138,7 @@ def filter_by_mpileup_support(anId, aChrom, aVCFFilename, aHeaderFilename, anOut
     i_outputFileHandler.write(headerDict["chrom"])
     
     # get the file
-    i_vcfFileHandler = get_read_fileHandler(aVCFFilename)
+    i_vcfFileHandler = lineReader.get_read_fileHandler(aVCFFilename)
         
     # for each event in the vcf file 
     for line in i_vcfFileHandler:
@@ -4,7 +4,9 @@ import sys
 from optparse import OptionParser
 import radiaUtil
 import logging
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 import collections
 from itertools import izip
 
@@ -28,26 +30,19 @@ from itertools import izip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
 
@@ -55,7 +50,7 @@ def get_write_fileHandler(aFilename):
 def get_vcf_data(aVcfFile, anIsDebug):
     
     # open the VCF file
-    fileHandler = get_read_fileHandler(aVcfFile)
+    fileHandler = lineReader.get_read_fileHandler(aVcfFile)
      
     for line in fileHandler:
           
@@ -120,7 +115,7 @@ def parse_blat_input(aBlatFile, anIsDebug):
     '''
     
     # open the file
-    fileHandler = get_read_fileHandler(aBlatFile)
+    fileHandler = lineReader.get_read_fileHandler(aBlatFile)
     blatDict = dict()
      
     for line in fileHandler:
@@ -6,7 +6,9 @@ import radiaUtil                    # utility functions for rna editing
 import logging
 import time
 from pybed import pybed
-import gzip
+import lineReader
+import recordStream
+import filterPipeline
 
 
 '''
@@ -28,101 +30,6 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
-def get_write_fileHandler(aFilename):
-    '''
-    ' Open aFilename for writing and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
-    else:
-        return open(aFilename,'w')
-
-
-def get_vcf_data(anInputFileHandler, anOutputFileHandler, aHeaderLine, anIsDebug):
-    '''
-    ' The .vcf files must have at least 10 fields:  chromosome, coordinate, id
-    ' references, alts, quality score, filters, infos, format, and summary info
-    ' for at least one .bam file.
-    '
-    ' Note: vcf files are 1-based, so create a fake startCoordinate to compare to 0-based beds
-    '
-    ' anInputFileHandler: The input stream for the file
-    ' anOutputFileHandler: The output stream for the file
-    ' aHeaderLine: The header line that should be added to the output file
-    ' anIsDebug: A flag for outputting debug messages to STDERR
-    '''
-
-    hasAddedHeader = False
-         
-    for line in anInputFileHandler:
-        # strip the carriage return and newline characters
-        line = line.rstrip("\r\n")
-        
-        if (anIsDebug):
-            logging.debug("VCF Line: %s", line)
-            
-        # if it is an empty line, then just continue
-        if (line.isspace()):
-            continue;
-        # if we find the INFO or FILTER section, then add the filters from here
-        elif (((aHeaderLine != None) and (not hasAddedHeader)) and
-              ((aHeaderLine.startswith("##INFO") and line.startswith("##INFO")) or
-              (aHeaderLine.startswith("##FILTER") and line.startswith("##FILTER")))):
-            hasAddedHeader = True
-            if (anOutputFileHandler != None):        
-                anOutputFileHandler.write(aHeaderLine + "\n")
-                anOutputFileHandler.write(line + "\n")
-            else:
-                print >> sys.stdout, aHeaderLine
-                print >> sys.stdout, line
-                
-        # these lines are from previous scripts in the pipeline, so output them    
-        elif (line.startswith("#")):
-            if (anOutputFileHandler != None):
-                anOutputFileHandler.write(line + "\n")
-            else:
-                print >> sys.stdout, line
-        # now we are to the data
-        else:    
-            
-            # split the line on the tab
-            splitLine = line.split("\t")
-            
-            # get the fields to yield
-            #columnHeaders = ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT"]
-            chrom = splitLine[0]
-            stopCoordinate = int(splitLine[1])
-            # since vcf files are 1-based and bed files are 0-based,
-            # make a fake starting coordinate so that we can compare 
-            # on the 0-based level
-            startCoordinate = (stopCoordinate-1)
-            ids = splitLine[2]
-            ref = splitLine[3]
-            alt = splitLine[4]
-            qual = splitLine[5]
-            filters = splitLine[6]
-            info = splitLine[7]
-            restLine = splitLine[8:len(splitLine)]
-            
-            yield chrom, startCoordinate, stopCoordinate, ids, ref, alt, qual, filters, info, restLine, line
-        
-    return
-
-
 def add_filter(aVCFFilter, aVCFInfo, aFilterName, aFilterField, anIncludeCount, aCount):
     '''
     ' Add the filter name to the filter or info column.
@@ -179,6 +86,146 @@ def add_id(aVCFId, anIdName):
         return ";".join(vcfIdList)
         
         
+def filter_record_chunks(aFilterPybed, aRecordReader, aRecordWriter, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, anIncludeCount, aFilterHeaderLine):
+    '''
+    ' This function filters the chunks of a record file and writes them to another record file.  Only the CHROM,
+    ' POS, ID, FILTER, and INFO columns are decoded, and the format and sample columns are written as they were read.
+    ' It returns the number of overlapping, non-overlapping, and total events.
+    '
+    ' aFilterPybed: The pybed with the filtering regions
+    ' aRecordReader: The recordStream.RecordReader of the input file
+    ' aRecordWriter: The recordStream.RecordWriter of the output file
+    ' (the other params are the same as for filter_events())
+    '''
+    
+    hasAddedHeader = False
+    overlappingEvents = 0
+    totalEvents = 0
+    
+    for chunk in aRecordReader.get_chunks():
+        # the header lines are handled the same way as in PybedFilter.filter_stream()
+        lines = []
+        for line in chunk.lines:
+            line = line.rstrip("\r")
+            if (line.isspace()):
+                continue
+            elif (((aFilterHeaderLine != None) and (not hasAddedHeader)) and
+                  ((aFilterHeaderLine.startswith("##INFO") and line.startswith("##INFO")) or
+                  (aFilterHeaderLine.startswith("##FILTER") and line.startswith("##FILTER")))):
+                hasAddedHeader = True
+                lines.append(aFilterHeaderLine)
+            lines.append(line)
+        chunk.lines = lines
+        
+        if (chunk.numRecords == 0):
+            aRecordWriter.write_chunk(chunk)
+            continue
+        
+        chroms = chunk.get_column(0)
+        coordinates = chunk.get_column(1)
+        ids = chunk.get_column(2)
+        filters = chunk.get_column(6)
+        infos = chunk.get_column(7)
+        isChanged = False
+        
+        for index in xrange(chunk.numRecords):
+            # since vcf files are 1-based and bed files are 0-based, make a fake starting coordinate
+            stopCoordinate = int(coordinates[index])
+            (isOverlapping, filter_id, count) = aFilterPybed.overlapswith((chroms[index], stopCoordinate - 1, stopCoordinate), anIncludeCount)
+            if (isOverlapping):
+                overlappingEvents += 1
+            
+            # the overlaps are altered when we want to add info about overlaps, otherwise the non-overlaps are
+            if (bool(isOverlapping) == anIncludeOverlapInfo):
+                if (anIncludeFilterName):
+                    (filters[index], infos[index]) = add_filter(filters[index], infos[index], aFilterName, aFilterField, anIncludeCount, count)
+                if (anIncludeIdName):
+                    ids[index] = add_id(ids[index], filter_id)
+                isChanged = True
+        
+        totalEvents += chunk.numRecords
+        
+        # only the columns that were changed are encoded again
+        if (isChanged):
+            if (anIncludeIdName):
+                chunk.set_column(2, ids)
+            if (anIncludeFilterName):
+                if (aFilterField == "FILTER"):
+                    chunk.set_column(6, filters)
+                else:
+                    chunk.set_column(7, infos)
+        aRecordWriter.write_chunk(chunk)
+    
+    return (overlappingEvents, totalEvents - overlappingEvents, totalEvents)
+
+
+class PybedFilter(object):
+    '''
+    ' This class applies the filter of filter_events() to a stream of VCF lines, so that it can also be chained
+    ' with the other filters in one process by filterPipeline.  The header lines in the stream are strings, and
+    ' the records are lists that were split by lineReader.split_fields(line, 8).
+    '
+    ' (the params are the same as for filter_events())
+    '''
+
+    def __init__(self, aTCGAId, aChrom, aBedFilename, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, anIncludeCount, aFilterHeaderLine, aBinSize=10000):
+        self.tcgaId = aTCGAId
+        self.chrom = aChrom
+        self.filterName = aFilterName
+        self.filterField = aFilterField
+        self.includeOverlapInfo = anIncludeOverlapInfo
+        self.includeFilterName = anIncludeFilterName
+        self.includeIdName = anIncludeIdName
+        self.includeCount = anIncludeCount
+        self.filterHeaderLine = aFilterHeaderLine
+
+        # initialize pybed with the filtering file
+        self.filterPybed = pybed(binsize=aBinSize)
+        self.filterPybed.loadfromfile(aBedFilename)
+
+    def filter_stream(self, aStream):
+        hasAddedHeader = False
+        overlappingEvents = 0
+        totalEvents = 0
+        startTime = time.time()
+
+        for item in aStream:
+            # skip the empty lines, and add the filter header line before the first INFO or FILTER line
+            if (isinstance(item, str)):
+                if (item.isspace()):
+                    continue
+                elif (((self.filterHeaderLine != None) and (not hasAddedHeader)) and
+                      ((self.filterHeaderLine.startswith("##INFO") and item.startswith("##INFO")) or
+                      (self.filterHeaderLine.startswith("##FILTER") and item.startswith("##FILTER")))):
+                    hasAddedHeader = True
+                    yield self.filterHeaderLine
+                yield item
+                continue
+
+            totalEvents += 1
+
+            # since vcf files are 1-based and bed files are 0-based, make a fake starting coordinate
+            stopCoordinate = int(item[1])
+            (isOverlapping, filter_id, count) = self.filterPybed.overlapswith((item[0], stopCoordinate - 1, stopCoordinate), self.includeCount)
+            if (isOverlapping):
+                overlappingEvents += 1
+
+            # the overlaps are altered when we want to add info about overlaps, otherwise the non-overlaps are
+            if (bool(isOverlapping) == self.includeOverlapInfo):
+                if (self.includeFilterName):
+                    (item[6], item[7]) = add_filter(item[6], item[7], self.filterName, self.filterField, self.includeCount, count)
+                if (self.includeIdName):
+                    item[2] = add_id(item[2], filter_id)
+                item[1] = str(stopCoordinate)
+
+            yield item
+
+        stopTime = time.time()
+        logging.info("Chrom %s and Id %s: Total time=%s hrs, %s mins, %s secs", self.chrom, self.tcgaId, ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime))
+        logging.info("For chrom %s and Id %s: %s (overlapping events) + %s (non-overlapping events) = %s", self.chrom, self.tcgaId, overlappingEvents, totalEvents - overlappingEvents, totalEvents)
+        return
+
+
 def filter_events(aTCGAId, aChrom, aBedFilename, aVCFFilename, anOutputFilename, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, anIncludeCount, aFilterHeaderLine, aBinSize, anIsDebug):
     '''
     ' The function reads from a .bed file and a .vcf file line by line and looks for variants that should be
@@ -203,103 +250,27 @@ def filter_events(aTCGAId, aChrom, aBedFilename, aVCFFilename, anOutputFilename,
     ' anIsDebug: A flag for outputting debug messages to STDERR
     '''
     
-    # initialize pybed with the filtering file
-    filterPybed = pybed(binsize=aBinSize)
-    filterPybed.loadfromfile(aBedFilename)
+    # the filter is the same one that filterRadia.py chains with the other filters in one process
+    vcfFilter = PybedFilter(aTCGAId, aChrom, aBedFilename, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, anIncludeCount, aFilterHeaderLine, aBinSize)
     
     # get the vcf file
-    i_vcfFileHandler = get_read_fileHandler(aVCFFilename)
+    i_vcfFileHandler = lineReader.get_read_fileHandler(aVCFFilename)
     
     # get the output file
-    i_outputFileHandler = None
     if (anOutputFilename != None):
-        i_outputFileHandler = get_write_fileHandler(anOutputFilename)  
-    
-    # create the generator for the vcf file
-    vcfGenerator = get_vcf_data(i_vcfFileHandler, i_outputFileHandler, aFilterHeaderLine, anIsDebug)
-    
-    # initialize some variables
-    overlappingEvents = 0
-    nonOverlappingEvents = 0
-    totalEvents = 0
-    startTime = time.time()
-    
-    # for each vcf line
-    for (vcf_chr, vcf_startCoordinate, vcf_stopCoordinate, vcf_id, vcf_ref, vcf_alt, vcf_qual, vcf_filter, vcf_info, vcf_restLine, vcf_line) in (vcfGenerator):
+        i_outputFileHandler = filterPipeline.get_write_fileHandler(anOutputFilename)
+    else:
+        i_outputFileHandler = sys.stdout
     
-        totalEvents += 1
-        
-        if (anIsDebug):
-            logging.debug("VCF: %s", vcf_line)
-        
-        # check if this vcf coordinate overlaps with the filter coordinates    
-        (isOverlapping, filter_id, count) = filterPybed.overlapswith((vcf_chr, vcf_startCoordinate, vcf_stopCoordinate), anIncludeCount)
-        #print vcf_chr, vcf_startCoordinate, vcf_stopCoordinate, isOverlapping, filter_id
-
-        # if an event overlaps with the filters
-        if (isOverlapping):
-            # count the overlap
-            overlappingEvents += 1
-            
-            # if we want to add info about overlaps
-            if (anIncludeOverlapInfo):
-            
-                # alter the filter and id name if appropriate
-                if (anIncludeFilterName):
-                    (vcf_filter, vcf_info) = add_filter(vcf_filter, vcf_info, aFilterName, aFilterField, anIncludeCount, count)
-                        
-                if (anIncludeIdName):
-                    vcf_id = add_id(vcf_id, filter_id)
-                
-                # output the event
-                outputList = (vcf_chr, str(vcf_stopCoordinate), vcf_id, vcf_ref, vcf_alt, vcf_qual, vcf_filter, vcf_info)
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write("\t".join(outputList) + "\t" + "\t".join(vcf_restLine) + "\n")
-                else:
-                    print >> sys.stdout, "\t".join(outputList) + "\t" + "\t".join(vcf_restLine)
-            # we don't want to add info about overlaps, just output them
-            else:
-                # output the event
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write(vcf_line + "\n")
-                else:
-                    print >> sys.stdout, vcf_line
-        # these events don't overlap with the filters
-        else:
-            # count the non overlap
-            nonOverlappingEvents += 1
-                        
-            # if we don't want to add info about overlaps, then we do want to add info about non-overlaps
-            if (not anIncludeOverlapInfo):
-            
-                # alter the filter and id name if appropriate
-                if (anIncludeFilterName):
-                    (vcf_filter, vcf_info) = add_filter(vcf_filter, vcf_info, aFilterName, aFilterField, anIncludeCount, count)
-                        
-                if (anIncludeIdName):
-                    vcf_id = add_id(vcf_id, filter_id)
-                
-                # output the event
-                outputList = (vcf_chr, str(vcf_stopCoordinate), vcf_id, vcf_ref, vcf_alt, vcf_qual, vcf_filter, vcf_info)
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write("\t".join(outputList) + "\t" + "\t".join(vcf_restLine) + "\n")
-                else:
-                    print >> sys.stdout, "\t".join(outputList) + "\t" + "\t".join(vcf_restLine)
-            # we do want to add info about overlaps, so just output non-overlaps
-            else:
-                # output the event
-                if (anOutputFilename != None):
-                    i_outputFileHandler.write(vcf_line + "\n")
-                else:
-                    print >> sys.stdout, vcf_line
-                    
-    stopTime = time.time()
-    logging.info("Chrom %s and Id %s: Total time=%s hrs, %s mins, %s secs", aChrom, aTCGAId, ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime)) 
-           
-    if (overlappingEvents + nonOverlappingEvents == totalEvents):
+    # the record files can be filtered a chunk at a time without turning the records into lines
+    if (aVCFFilename.endswith(recordStream.i_recordSuffix) and anOutputFilename != None and anOutputFilename.endswith(recordStream.i_recordSuffix)):
+        startTime = time.time()
+        (overlappingEvents, nonOverlappingEvents, totalEvents) = filter_record_chunks(vcfFilter.filterPybed, i_vcfFileHandler, i_outputFileHandler, aFilterName, aFilterField, anIncludeOverlapInfo, anIncludeFilterName, anIncludeIdName, anIncludeCount, aFilterHeaderLine)
+        stopTime = time.time()
+        logging.info("Chrom %s and Id %s: Total time=%s hrs, %s mins, %s secs", aChrom, aTCGAId, ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime)) 
         logging.info("For chrom %s and Id %s: %s (overlapping events) + %s (non-overlapping events) = %s", aChrom, aTCGAId, overlappingEvents, nonOverlappingEvents, totalEvents) 
     else:
-        logging.info("FilterByCoordinateBruteForce Warning: For chrom %s and Id %s: %s (overlapping events) + %s (non-overlapping events) = %s", aChrom, aTCGAId, overlappingEvents, nonOverlappingEvents, totalEvents)
+        filterPipeline.write_stream(vcfFilter.filter_stream(filterPipeline.read_stream(i_vcfFileHandler)), i_outputFileHandler)
         
     # close the files
     i_vcfFileHandler.close()   
@@ -413,5 +384,6 @@ def main():
        
     return
 
-main()
-sys.exit(0)
+if __name__ == '__main__':
+    main()
+    sys.exit(0)
@@ -6,7 +6,9 @@ import sys
 import os
 from optparse import OptionParser
 import myvcf
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 import radiaUtil
 import logging
 from itertools import izip
@@ -63,26 +65,19 @@ cigardict[8] = "seqmismatch"
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
 
@@ -116,7 +111,7 @@ def getPassingGermlineAlts(aCurrData):
 
     
 def parsevcf(filename, aTranscriptNameTag, aTranscriptCoordinateTag, anIsDebug):
-    vcf = get_read_fileHandler(filename)
+    vcf = lineReader.get_read_fileHandler(filename)
     currVCF = myvcf.VCF()
 
     dnaNormalBam = None
@@ -1119,7 +1114,7 @@ if __name__ == '__main__':
     if (not radiaUtil.check_for_argv_errors(i_dirList, i_readFilenameList, i_writeFilenameList)):
         sys.exit(1)
     
-    vcf = get_read_fileHandler(vcfFilename)
+    vcf = lineReader.get_read_fileHandler(vcfFilename)
     currVCF = myvcf.VCF()
     
     club = Club(vcfFilename, i_transcriptNameTag, i_transcriptCoordinateTag, i_debug)
@@ -1218,3 +1213,8 @@ if __name__ == '__main__':
             sys.exit(1)
     
 
+    
+    # close the files, the BGZF writer only writes the last block and the index when it is closed
+    vcf.close()
+    if i_outputFilename is not sys.stdout:
+        i_outputFileHandler.close()
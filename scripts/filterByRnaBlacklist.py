@@ -6,7 +6,9 @@ import radiaUtil
 import logging
 import collections
 import re
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 
 
 '''
@@ -28,26 +30,19 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
 
@@ -62,8 +57,8 @@ def get_rna_genes(anRnaGeneFile, anRnaGeneFamilyFile, anIsDebug):
     '''
     
     # open the file
-    geneFileHandler = get_read_fileHandler(anRnaGeneFile)
-    geneFamilyFileHandler = get_read_fileHandler(anRnaGeneFamilyFile)
+    geneFileHandler = lineReader.get_read_fileHandler(anRnaGeneFile)
+    geneFamilyFileHandler = lineReader.get_read_fileHandler(anRnaGeneFamilyFile)
     rnaGeneList = list()
     rnaGeneFamilyList = list()
     
@@ -186,7 +181,7 @@ def main():
     (i_rnaGeneList, i_rnaGeneFamilyList) = get_rna_genes(i_rnaGeneFilename, i_rnaGeneFamilyFilename, i_debug)
     
     hasAddedHeader = False
-    i_vcfFileHandler = get_read_fileHandler(i_vcfFilename)
+    i_vcfFileHandler = lineReader.get_read_fileHandler(i_vcfFilename)
     vcfHeader = "##FILTER=<ID=rgene,Description=\"This gene is on the RNA gene blacklist\">\n"
     vcfHeader += "##FILTER=<ID=rgfam,Description=\"This gene family is on the RNA gene family blacklist\">\n"
     
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+import logging
+import time
+import bgzfWriter
+import lineReader
+import recordStream
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module runs a chain of filters (e.g. filterByPybed.PybedFilter and
+'    filterByCoordinate.CoordinateFilter) in one process.  The input VCF is read
+'    and parsed once, and each filter is a generator over the stream of the
+'    previous one, so no file is written between the filters unless the
+'    intermediate files are kept.  The header lines in the stream are strings,
+'    and the records are lists that were split by lineReader.split_fields(line, 8).
+'    A filter only has to implement filter_stream(aStream).
+'''
+
+
+def get_write_fileHandler(aFilename):
+    '''
+    ' Open aFilename for writing and return
+    ' the file handler.  The file can be
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
+    '''
+    if aFilename.endswith('.gz'):
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
+    else:
+        return open(aFilename,'w')
+
+
+def read_stream(anInputFileHandler):
+    '''
+    ' Yield the header lines of a VCF as strings and the records as lists with the
+    ' first 8 columns split off.  The format and sample columns stay joined in the
+    ' last field, since none of the chained filters look at them.
+    '
+    ' anInputFileHandler: The input stream for the file
+    '''
+
+    for line in anInputFileHandler:
+        # strip the carriage return and newline characters
+        line = line.rstrip("\r\n")
+
+        if (line.startswith("#") or line.isspace()):
+            yield line
+        else:
+            yield lineReader.split_fields(line, 8)
+
+    return
+
+
+def write_item(anItem, anOutputFileHandler):
+    '''
+    ' Write a header line or a record of a stream to an output file.
+    '
+    ' anItem: A header line or a record
+    ' anOutputFileHandler: The output stream for the file
+    '''
+
+    if (isinstance(anItem, str)):
+        anOutputFileHandler.write(anItem + "\n")
+    else:
+        anOutputFileHandler.write("\t".join(anItem) + "\n")
+
+    return
+
+
+def write_stream(aStream, anOutputFileHandler):
+    '''
+    ' Write the header lines and records of a stream to an output file.
+    '
+    ' aStream: The stream of header lines and records
+    ' anOutputFileHandler: The output stream for the file
+    '''
+
+    for item in aStream:
+        write_item(item, anOutputFileHandler)
+
+    return
+
+
+def tee_stream(aStream, anOutputFileHandler):
+    '''
+    ' Write each header line and record of a stream to an output file before it is passed on
+    ' to the next filter.  This is used to keep the intermediate files of the filters.
+    '
+    ' aStream: The stream of header lines and records
+    ' anOutputFileHandler: The output stream for the file
+    '''
+
+    for item in aStream:
+        write_item(item, anOutputFileHandler)
+        yield item
+
+    return
+
+
+def run_filters(anInputFilename, aFilterList, anOutputFilenameList, aKeepIntermediatesFlag):
+    '''
+    ' Chain the filters over one parsed stream of the input file and write the output of the last
+    ' filter to the last output filename.  The output of each other filter is only written to its
+    ' output filename when the intermediate files should be kept.  It returns the last output filename.
+    '
+    ' anInputFilename: The VCF that is read by the first filter
+    ' aFilterList: The filters in the order that they should be applied
+    ' anOutputFilenameList: The output filename of each filter
+    ' aKeepIntermediatesFlag: A flag for whether the output of each filter should be written or not
+    '''
+
+    startTime = time.time()
+
+    inputFileHandler = lineReader.get_read_fileHandler(anInputFilename)
+    stream = read_stream(inputFileHandler)
+
+    intermediateFileHandlerList = []
+    for (vcfFilter, outputFilename) in zip(aFilterList[:-1], anOutputFilenameList[:-1]):
+        stream = vcfFilter.filter_stream(stream)
+        if (aKeepIntermediatesFlag):
+            outputFileHandler = get_write_fileHandler(outputFilename)
+            intermediateFileHandlerList.append(outputFileHandler)
+            stream = tee_stream(stream, outputFileHandler)
+    stream = aFilterList[-1].filter_stream(stream)
+
+    outputFileHandler = get_write_fileHandler(anOutputFilenameList[-1])
+    write_stream(stream, outputFileHandler)
+
+    # close the files, the BGZF and record writers only write their last blocks when they are closed
+    inputFileHandler.close()
+    for intermediateFileHandler in intermediateFileHandlerList:
+        intermediateFileHandler.close()
+    outputFileHandler.close()
+
+    stopTime = time.time()
+    logging.info("Chained %s filters: Total time=%s hrs, %s mins, %s secs", len(aFilterList), ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime))
+
+    return anOutputFilenameList[-1]
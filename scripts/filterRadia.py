@@ -5,8 +5,13 @@ from optparse import OptionParser   # used for parsing command line arguments
 import radiaUtil                    # utility functions for rna editing
 import logging
 import os
-import subprocess
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
+import filterByPybed
+import filterByCoordinate
+import filterPipeline
+import jobGraph
 
 
 '''
@@ -28,43 +33,30 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
     else:
         return open(aFilename,'w')
 
 
-def filter_blacklist(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aBlacklistDir, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_blacklist(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aBlacklistDir, aScriptsDir, aJobGraph, aFilterChain, aVcfSuffix, anIsDebug):
 
     filterFilename = os.path.join(aBlacklistDir, "chr" + aChromId + ".bed.gz")
     if (not os.path.isfile(filterFilename)):
         filterFilename = os.path.join(aBlacklistDir, "chr" + aChromId + ".bed")
 
-    if (aGzipFlag):        
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_blacklist_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_blacklist_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_blacklist_chr" + aChromId + aVcfSuffix)
 
     script = os.path.join(aScriptsDir, "filterByPybed.py")        
-    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " blck --includeFilterName -f \"##FILTER=<ID=blck,Description=\\\"Position overlaps 1000 Genomes Project blacklist\\\">\" -o " + outputFilename
+    filterHeader = "##FILTER=<ID=blck,Description=\"Position overlaps 1000 Genomes Project blacklist\">"
+    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " blck --includeFilterName -f \"" + filterHeader.replace("\"", "\\\"") + "\" -o " + outputFilename
     
     if (anIsDebug):
         logging.debug("Script: %s", script)
@@ -73,38 +65,35 @@ def filter_blacklist(aPythonExecutable, anId, aChromId, anInputFilename, anOutpu
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [script, anInputFilename, filterFilename]
+    readFilenameList = [script, filterFilename]
+    # a chained filter reads the stream of the previous filter instead of its input file
+    if (aFilterChain == None):
+        readFilenameList.append(anInputFilename)
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    # the filter is run in this process with the rest of the chain by filterPipeline
+    if (aFilterChain != None):
+        aFilterChain.append((filterByPybed.PybedFilter(anId, aChromId, filterFilename, "blck", "FILTER", False, True, False, False, filterHeader), outputFilename))
+    else:
+        aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def flag_dbSnp(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aDbSnpDir, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def flag_dbSnp(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aDbSnpDir, aScriptsDir, aJobGraph, aFilterChain, aVcfSuffix, anIsDebug):
     
     filterFilename = os.path.join(aDbSnpDir, "chr" + aChromId + ".bed.gz")
     if (not os.path.isfile(filterFilename)):
         filterFilename = os.path.join(aDbSnpDir, "chr" + aChromId + ".bed")
         
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_dbsnp_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_dbsnp_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_dbsnp_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "filterByCoordinate.py")
     
-    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " DB --includeOverlaps --includeFilterName --includeIdName -d INFO -f \"##INFO=<ID=DB,Number=0,Type=Flag,Description=\\\"dbSNP common SNP membership\\\">\" -o " + outputFilename
+    filterHeader = "##INFO=<ID=DB,Number=0,Type=Flag,Description=\"dbSNP common SNP membership\">"
+    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " DB --includeOverlaps --includeFilterName --includeIdName -d INFO -f \"" + filterHeader.replace("\"", "\\\"") + "\" -o " + outputFilename
     
     if (anIsDebug):
         logging.debug("Script: %s", script)
@@ -113,37 +102,34 @@ def flag_dbSnp(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir,
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [script, anInputFilename, filterFilename]
+    readFilenameList = [script, filterFilename]
+    # a chained filter reads the stream of the previous filter instead of its input file
+    if (aFilterChain == None):
+        readFilenameList.append(anInputFilename)
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    # the filter is run in this process with the rest of the chain by filterPipeline
+    if (aFilterChain != None):
+        aFilterChain.append((filterByCoordinate.CoordinateFilter(anId, aChromId, filterFilename, "DB", "INFO", True, True, True, filterHeader), outputFilename))
+    else:
+        aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def flag_retroGenes(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aRetroGeneDir, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def flag_retroGenes(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aRetroGeneDir, aScriptsDir, aJobGraph, aFilterChain, aVcfSuffix, anIsDebug):
 
     filterFilename = os.path.join(aRetroGeneDir, "chr" + aChromId + ".bed.gz")
     if (not os.path.isfile(filterFilename)):
         filterFilename = os.path.join(aRetroGeneDir, "chr" + aChromId + ".bed")
         
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_retroGene_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_retroGene_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_retroGene_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "filterByPybed.py")
-    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " RTPS --includeOverlaps --includeFilterName -d INFO -f \"##INFO=<ID=RTPS,Number=0,Type=Flag,Description=\\\"Overlaps with retrotransposon or pseudogene\\\">\" -o " + outputFilename
+    filterHeader = "##INFO=<ID=RTPS,Number=0,Type=Flag,Description=\"Overlaps with retrotransposon or pseudogene\">"
+    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " RTPS --includeOverlaps --includeFilterName -d INFO -f \"" + filterHeader.replace("\"", "\\\"") + "\" -o " + outputFilename
     
     if (anIsDebug):
         logging.debug("Script: %s", script)
@@ -152,37 +138,34 @@ def flag_retroGenes(aPythonExecutable, anId, aChromId, anInputFilename, anOutput
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [script, anInputFilename, filterFilename]
+    readFilenameList = [script, filterFilename]
+    # a chained filter reads the stream of the previous filter instead of its input file
+    if (aFilterChain == None):
+        readFilenameList.append(anInputFilename)
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)  
-            sys.exit(1) 
+    # the filter is run in this process with the rest of the chain by filterPipeline
+    if (aFilterChain != None):
+        aFilterChain.append((filterByPybed.PybedFilter(anId, aChromId, filterFilename, "RTPS", "INFO", True, True, False, False, filterHeader), outputFilename))
+    else:
+        aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def flag_pseudoGenes(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aPseudoGeneDir, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def flag_pseudoGenes(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aPseudoGeneDir, aScriptsDir, aJobGraph, aFilterChain, aVcfSuffix, anIsDebug):
 
     filterFilename = os.path.join(aPseudoGeneDir, "chr" + aChromId + ".bed.gz")
     if (not os.path.isfile(filterFilename)):
         filterFilename = os.path.join(aPseudoGeneDir, "chr" + aChromId + ".bed")
     
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_pseudoGene_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_pseudoGene_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_pseudoGene_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "filterByPybed.py")
-    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " EGPS --includeOverlaps --includeFilterName -d INFO -f \"##INFO=<ID=EGPS,Number=0,Type=Flag,Description=\\\"Overlaps with ENCODE/GENCODE pseudogenes\\\">\" -o " + outputFilename
+    filterHeader = "##INFO=<ID=EGPS,Number=0,Type=Flag,Description=\"Overlaps with ENCODE/GENCODE pseudogenes\">"
+    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " EGPS --includeOverlaps --includeFilterName -d INFO -f \"" + filterHeader.replace("\"", "\\\"") + "\" -o " + outputFilename
     
     if (anIsDebug):
         logging.debug("Script: %s", script)
@@ -191,37 +174,34 @@ def flag_pseudoGenes(aPythonExecutable, anId, aChromId, anInputFilename, anOutpu
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [script, anInputFilename, filterFilename]
+    readFilenameList = [script, filterFilename]
+    # a chained filter reads the stream of the previous filter instead of its input file
+    if (aFilterChain == None):
+        readFilenameList.append(anInputFilename)
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    # the filter is run in this process with the rest of the chain by filterPipeline
+    if (aFilterChain != None):
+        aFilterChain.append((filterByPybed.PybedFilter(anId, aChromId, filterFilename, "EGPS", "INFO", True, True, False, False, filterHeader), outputFilename))
+    else:
+        aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def flag_cosmic(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aCosmicDir, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def flag_cosmic(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aCosmicDir, aScriptsDir, aJobGraph, aFilterChain, aVcfSuffix, anIsDebug):
 
     filterFilename = os.path.join(aCosmicDir, "chr" + aChromId + ".bed.gz")
     if (not os.path.isfile(filterFilename)):
         filterFilename = os.path.join(aCosmicDir, "chr" + aChromId + ".bed")
     
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_cosmic_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_cosmic_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_cosmic_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "filterByPybed.py")
-    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " COSMIC --includeOverlaps --includeFilterName -d INFO -f \"##INFO=<ID=COSMIC,Number=0,Type=Flag,Description=\\\"Overlaps with Catalogue Of Somatic Mutations In Cancer (COSMIC)\\\">\" -o " + outputFilename
+    filterHeader = "##INFO=<ID=COSMIC,Number=0,Type=Flag,Description=\"Overlaps with Catalogue Of Somatic Mutations In Cancer (COSMIC)\">"
+    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " COSMIC --includeOverlaps --includeFilterName -d INFO -f \"" + filterHeader.replace("\"", "\\\"") + "\" -o " + outputFilename
     
     if (anIsDebug):
         logging.debug("Script: %s", script)
@@ -230,37 +210,34 @@ def flag_cosmic(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir,
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [script, anInputFilename, filterFilename]
+    readFilenameList = [script, filterFilename]
+    # a chained filter reads the stream of the previous filter instead of its input file
+    if (aFilterChain == None):
+        readFilenameList.append(anInputFilename)
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    # the filter is run in this process with the rest of the chain by filterPipeline
+    if (aFilterChain != None):
+        aFilterChain.append((filterByPybed.PybedFilter(anId, aChromId, filterFilename, "COSMIC", "INFO", True, True, False, False, filterHeader), outputFilename))
+    else:
+        aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def filter_targets(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aTargetDir, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_targets(aPythonExecutable, anId, aChromId, anInputFilename, anOutputDir, aPrefix, aTargetDir, aScriptsDir, aJobGraph, aFilterChain, aVcfSuffix, anIsDebug):
 
     filterFilename = os.path.join(aTargetDir, "chr" + aChromId + ".bed.gz")
     if (not os.path.isfile(filterFilename)):
         filterFilename = os.path.join(aTargetDir, "chr" + aChromId + ".bed")
         
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_targets_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_targets_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_targets_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "filterByPybed.py")
-    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " ntr --includeFilterName -f \"##FILTER=<ID=ntr,Description=\\\"Position does not overlap with a TCGA target region\\\">\" -o " + outputFilename
+    filterHeader = "##FILTER=<ID=ntr,Description=\"Position does not overlap with a TCGA target region\">"
+    command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + filterFilename + " " + anInputFilename + " ntr --includeFilterName -f \"" + filterHeader.replace("\"", "\\\"") + "\" -o " + outputFilename
     
     if (anIsDebug):
         logging.debug("Script: %s", script)
@@ -269,25 +246,24 @@ def filter_targets(aPythonExecutable, anId, aChromId, anInputFilename, anOutputD
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [script, anInputFilename, filterFilename]
+    readFilenameList = [script, filterFilename]
+    # a chained filter reads the stream of the previous filter instead of its input file
+    if (aFilterChain == None):
+        readFilenameList.append(anInputFilename)
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    # the filter is run in this process with the rest of the chain by filterPipeline
+    if (aFilterChain != None):
+        aFilterChain.append((filterByPybed.PybedFilter(anId, aChromId, filterFilename, "ntr", "FILTER", False, True, False, False, filterHeader), outputFilename))
+    else:
+        aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def filter_mpileupSupport_dna(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilename, anOriginFlag, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_mpileupSupport_dna(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilename, anOriginFlag, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
   
     script = os.path.join(aScriptsDir, "filterByMpileupSupport.py")
     dnaParameterList = ["--genotypeMinPct=0.10", "--modMinDepth=4", "--modMinPct=0.10"]
@@ -295,20 +271,14 @@ def filter_mpileupSupport_dna(aPythonExecutable, anId, aChromId, anInputFilename
     dnaParameterList += ["--dnaTumorMinTotalBases=10", "--dnaTumorMinAltBases=4", "--dnaTumorMinAltPct=0.10", "--dnaTumorMaxErrPct=0.01"]
     dnaParameterString = " ".join(dnaParameterList)
     if (anOriginFlag):
-        if (aGzipFlag):
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_dna_origin_chr" + aChromId + ".vcf.gz")
-        else:
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_dna_origin_chr" + aChromId + ".vcf")
+        outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_dna_origin_chr" + aChromId + aVcfSuffix)
             
         if (aHeaderFilename != None):
             command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + anInputFilename + " --addOrigin -o " + outputFilename + " -n " + aHeaderFilename + " " + dnaParameterString
         else:
             command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + anInputFilename + " --addOrigin -o " + outputFilename + " " + dnaParameterString
     else:
-        if (aGzipFlag):
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_dna_chr" + aChromId + ".vcf.gz")
-        else:
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_dna_chr" + aChromId + ".vcf")
+        outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_dna_chr" + aChromId + aVcfSuffix)
             
         if (aHeaderFilename != None):
             command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + anInputFilename + " -o " + outputFilename + " -n " + aHeaderFilename + " " + dnaParameterString
@@ -322,24 +292,18 @@ def filter_mpileupSupport_dna(aPythonExecutable, anId, aChromId, anInputFilename
         logging.debug("Filter: %s", command)
     
     readFilenameList = [script, anInputFilename]
+    if (aHeaderFilename != None):
+        readFilenameList.append(aHeaderFilename)
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def filter_mpileupSupport_rna(aPythonExecutable, anId, aChromId, anInputFilename, anOriginFlag, anRnaMinMapQual, anRnaMinAvgMapQual, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_mpileupSupport_rna(aPythonExecutable, anId, aChromId, anInputFilename, anOriginFlag, anRnaMinMapQual, anRnaMinAvgMapQual, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
   
     script = os.path.join(aScriptsDir, "filterByMpileupSupport.py")
     rnaParameterList = ["--genotypeMinPct=0.0", "--modMinDepth=1", "--modMinPct=0.01"]
@@ -352,16 +316,10 @@ def filter_mpileupSupport_rna(aPythonExecutable, anId, aChromId, anInputFilename
 
     rnaParameterString = " ".join(rnaParameterList)
     if (anOriginFlag):
-        if (aGzipFlag):
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_rna_origin_chr" + aChromId + ".vcf.gz")
-        else:
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_rna_origin_chr" + aChromId + ".vcf")
+        outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_rna_origin_chr" + aChromId + aVcfSuffix)
         command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + anInputFilename + " --addOrigin --filterUsingRNA -o " + outputFilename + " " + rnaParameterString
     else:
-        if (aGzipFlag):
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_rna_chr" + aChromId + ".vcf.gz")
-        else:
-            outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_rna_chr" + aChromId + ".vcf")
+        outputFilename = os.path.join(anOutputDir, aPrefix + "_mpileup_rna_chr" + aChromId + aVcfSuffix)
         command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + anInputFilename + " --filterUsingRNA -o " + outputFilename + " " + rnaParameterString
     
     if (anIsDebug):
@@ -372,33 +330,19 @@ def filter_mpileupSupport_rna(aPythonExecutable, anId, aChromId, anInputFilename
     
     readFilenameList = [script, anInputFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def radia_compare(aPythonExecutable, anId, aChromId, anRnaFilename, aDnaFilename, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def radia_compare(aPythonExecutable, anId, aChromId, anRnaFilename, aDnaFilename, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
     
-    if (aGzipFlag):
-        overlapFilename = os.path.join(anOutputDir, aPrefix + "_overlap_chr" + aChromId + ".vcf.gz")
-    else:
-        overlapFilename = os.path.join(anOutputDir, aPrefix + "_overlap_chr" + aChromId + ".vcf")
+    overlapFilename = os.path.join(anOutputDir, aPrefix + "_overlap_chr" + aChromId + aVcfSuffix)
     
-    if (aGzipFlag):
-        nonOverlapFilename = os.path.join(anOutputDir, aPrefix + "_nonoverlap_chr" + aChromId + ".vcf.gz")
-    else:
-        nonOverlapFilename = os.path.join(anOutputDir, aPrefix + "_nonoverlap_chr" + aChromId + ".vcf")
+    nonOverlapFilename = os.path.join(anOutputDir, aPrefix + "_nonoverlap_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "radiaCompare.py")
     command = aPythonExecutable + " " + script + " " + anId + " " + aChromId + " " + anRnaFilename + " " + aDnaFilename + " -c \"SOM=SOM,NOR_EDIT=NOR_EDIT,TUM_EDIT=TUM_EDIT\" -o " + overlapFilename + " -n " + nonOverlapFilename 
@@ -411,23 +355,15 @@ def radia_compare(aPythonExecutable, anId, aChromId, anRnaFilename, aDnaFilename
     
     readFilenameList = [script, anRnaFilename, aDnaFilename]
     writeFilenameList = [overlapFilename, nonOverlapFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return overlapFilename, nonOverlapFilename
 
 
-def filter_rnaOnly(anId, aChromId, anInputFilename, anOutputDir, aPrefix, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_rnaOnly(anId, aChromId, anInputFilename, anOutputDir, aPrefix, aJobGraph, aGzipFlag, anIsDebug):
 
     if (aGzipFlag):
         outputFilename = os.path.join(anOutputDir, aPrefix + "_dnaFiltered_chr" + aChromId + ".vcf.gz")
@@ -445,27 +381,17 @@ def filter_rnaOnly(anId, aChromId, anInputFilename, anOutputDir, aPrefix, aJobLi
     
     readFilenameList = [anInputFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        
-        # grep returns 0 if selected lines are found and 1 otherwise. But the exit status is 2 if an error occurred, 
-        # unless the -q or --quiet or --silent option is used and a selected line is found. 
-        
-        
-        #if (subprocessCall.returncode != 0):
-        #    logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-        #    logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
+    # grep returns 0 if selected lines are found and 1 otherwise. But the exit status is 2 if an error occurred, 
+    # so the return code is ignored.
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList, jobGraph.i_errorIgnore)
                     
     return outputFilename
 
 
-def extract_passing(anId, aChromId, anInputFilename, anOutputDir, aPrefix, aJobListFileHandler, aGzipFlag, anIsDebug):
+def extract_passing(anId, aChromId, anInputFilename, anOutputDir, aPrefix, aJobGraph, aGzipFlag, anIsDebug):
 
     if (aGzipFlag):
         outputFilename = os.path.join(anOutputDir, aPrefix + "_passing_chr" + aChromId + ".vcf.gz")
@@ -481,27 +407,17 @@ def extract_passing(anId, aChromId, anInputFilename, anOutputDir, aPrefix, aJobL
     
     readFilenameList = [anInputFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        
-        # grep returns 0 if selected lines are found and 1 otherwise. But the exit status is 2 if an error occurred, 
-        # unless the -q or --quiet or --silent option is used and a selected line is found. 
-        
-        
-        #if (subprocessCall.returncode != 0):
-        #    logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-        #    logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
+    # grep returns 0 if selected lines are found and 1 otherwise. But the exit status is 2 if an error occurred, 
+    # so the return code is ignored.
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList, jobGraph.i_errorIgnore)
                     
     return outputFilename
 
 
-def filter_runSnpEff(anId, aChromId, anInputFilename, aSnpEffDir, aSnpEffGenome, aSnpEffCanonical, anOutputDir, aPrefix, aJobListFileHandler, anIsDebug):
+def filter_runSnpEff(anId, aChromId, anInputFilename, aSnpEffDir, aSnpEffGenome, aSnpEffCanonical, anOutputDir, aPrefix, aJobGraph, anIsDebug):
 
     snpEffJar = os.path.join(aSnpEffDir, "snpEff.jar")
     snpEffConfig = os.path.join(aSnpEffDir, "snpEff.config")
@@ -526,24 +442,15 @@ def filter_runSnpEff(anId, aChromId, anInputFilename, aSnpEffDir, aSnpEffGenome,
     
     readFilenameList = [anInputFilename, snpEffJar, snpEffConfig]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)  
-            sys.exit(1) 
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
                     
     return outputFilename
 
 
-def filter_createBlatInput(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilename, aTranscriptNameTag, aTranscriptCoordinateTag, aTranscriptStrandTag, anRnaIncludeSecondaryAlignmentsFlag, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, anIsDebug):
+def filter_createBlatInput(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilename, aTranscriptNameTag, aTranscriptCoordinateTag, aTranscriptStrandTag, anRnaIncludeSecondaryAlignmentsFlag, anOutputDir, aPrefix, aScriptsDir, aJobGraph, anIsDebug):
 
     # we can't gzip the blat input file
     outputFilename = os.path.join(anOutputDir, aPrefix + "_blatInput_chr" + aChromId + ".fa")
@@ -567,23 +474,23 @@ def filter_createBlatInput(aPythonExecutable, anId, aChromId, anInputFilename, a
     
     readFilenameList = [script, anInputFilename, aHeaderFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
         
     return outputFilename
 
 
-def filter_runBlat(anId, aChromId, aBlatInputFilename, aFastaFile, anOutputDir, aPrefix, aJobListFileHandler, anIsDebug):
+def get_copy_command(anInputFilename, anOutputFilename):
+    '''
+    ' Return the command that copies the input of a filter to its output (and the tabix index of a .gz file).
+    ' A job list runs it instead of the filter when there is nothing to filter, so the later filters can read the output.
+    '''
+    return "cp " + anInputFilename + " " + anOutputFilename + "; if [ -f " + anInputFilename + ".tbi ]; then cp " + anInputFilename + ".tbi " + anOutputFilename + ".tbi; fi"
+
+
+def filter_runBlat(anId, aChromId, aBlatInputFilename, aFastaFile, anOutputDir, aPrefix, aJobGraph, anIsDebug):
 
     blatOutputFilename = anOutputDir + aPrefix + "_blatOutput_chr" + aChromId + ".blast"    
     #command = "blat -stepSize=5 -repMatch=2253 -minScore=0 -minIdentity=0 -t=dna -q=rna " + aFastaFile + " " + aBlatInputFilename + " -out=blast8 " + blatOutputFilename
@@ -596,27 +503,19 @@ def filter_runBlat(anId, aChromId, aBlatInputFilename, aFastaFile, anOutputDir,
     
     readFilenameList = [aBlatInputFilename, aFastaFile]
     writeFilenameList = [blatOutputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)  
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return blatOutputFilename
 
 
-def filter_blat(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilename, aBlatInputFilename, aFastaFile, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_blat(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilename, aBlatInputFilename, aFastaFile, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
     
     # if no fasta file was specified, try to get it from the header file
     if (aFastaFile == None):
-        fileHandler = get_read_fileHandler(aHeaderFilename)
+        fileHandler = lineReader.get_read_fileHandler(aHeaderFilename)
          
         for line in fileHandler:
               
@@ -648,12 +547,9 @@ def filter_blat(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilen
                 logging.critical("The FASTA file specified in the header does not exist: %s", aFastaFile, ". Specify a FASTA file for the RNA using the -f option.")
                 sys.exit(1) 
         
-    blatOutputFilename = filter_runBlat(anId, aChromId, aBlatInputFilename, aFastaFile, anOutputDir, aPrefix, aJobListFileHandler, anIsDebug)
+    blatOutputFilename = filter_runBlat(anId, aChromId, aBlatInputFilename, aFastaFile, anOutputDir, aPrefix, aJobGraph, anIsDebug)
         
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_blatFiltered_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_blatFiltered_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_blatFiltered_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "filterByBlat.py")
     command = aPythonExecutable + " " + script + " " + anId + " " + anInputFilename + " " + aBlatInputFilename + " " + blatOutputFilename + " -o " + outputFilename + " --allVCFCalls --blatRnaNormalReads --blatRnaTumorReads"
@@ -663,30 +559,19 @@ def filter_blat(aPythonExecutable, anId, aChromId, anInputFilename, aHeaderFilen
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [anInputFilename]
+    readFilenameList = [script, anInputFilename, aBlatInputFilename, blatOutputFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList, aSkipCommand=get_copy_command(anInputFilename, outputFilename))
             
     return (blatOutputFilename, outputFilename)
 
 
-def filter_positionalBias(aPythonExecutable, anId, aChromId, anInputFilename, aBlatInputFilename, aKeepPreviousFiltersFlag, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_positionalBias(aPythonExecutable, anId, aChromId, anInputFilename, aBlatInputFilename, aKeepPreviousFiltersFlag, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
 
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_pbias_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_pbias_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_pbias_chr" + aChromId + aVcfSuffix)
         
     script = os.path.join(aScriptsDir, "filterByPositionalBias.py")
     if (aKeepPreviousFiltersFlag):
@@ -703,28 +588,17 @@ def filter_positionalBias(aPythonExecutable, anId, aChromId, anInputFilename, aB
     
     readFilenameList = [script, anInputFilename, aBlatInputFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)  
-            sys.exit(1) 
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList, aSkipCommand=get_copy_command(anInputFilename, outputFilename))
             
     return outputFilename
 
 
-def filter_rnaBlacklist(aPythonExecutable, anId, aChromId, anInputFilename, aGeneBlckFilename, aGeneFamilyBlckFilename, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_rnaBlacklist(aPythonExecutable, anId, aChromId, anInputFilename, aGeneBlckFilename, aGeneFamilyBlckFilename, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
 
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_rna_genes_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_rna_genes_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_rna_genes_chr" + aChromId + aVcfSuffix)
         
     script = os.path.join(aScriptsDir, "filterByRnaBlacklist.py")
     command = aPythonExecutable + " " + script + " " + anInputFilename + " " + aGeneBlckFilename + " " + aGeneFamilyBlckFilename + " -o " + outputFilename
@@ -739,28 +613,17 @@ def filter_rnaBlacklist(aPythonExecutable, anId, aChromId, anInputFilename, aGen
     
     readFilenameList = [script, anInputFilename, aGeneBlckFilename, aGeneFamilyBlckFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)  
-            sys.exit(1) 
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def merge_rnaAndDna(aPythonExecutable, anId, aChromId, aDnaFilename, anRnaFilename, anOverlapsFilname, aNonoverlapsFilename, aDnaHeaderOnlyFlag, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def merge_rnaAndDna(aPythonExecutable, anId, aChromId, aDnaFilename, anRnaFilename, anOverlapsFilname, aNonoverlapsFilename, aDnaHeaderOnlyFlag, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
   
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_merged_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_merged_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_merged_chr" + aChromId + aVcfSuffix)
     
     script = os.path.join(aScriptsDir, "mergeRnaAndDnaFiles.py")
     if (aDnaHeaderOnlyFlag):
@@ -774,30 +637,19 @@ def merge_rnaAndDna(aPythonExecutable, anId, aChromId, aDnaFilename, anRnaFilena
         logging.debug("Output: %s", outputFilename)
         logging.debug("Filter: %s", command)
     
-    readFilenameList = [script, aDnaFilename, anOverlapsFilname]
+    readFilenameList = [script, aDnaFilename, anRnaFilename, anOverlapsFilname, aNonoverlapsFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def merge_passingAndOriginals(aPythonExecutable, anId, aChromId, aPassingCallsFilename, anOriginalFilname, anOutputDir, aPrefix, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def merge_passingAndOriginals(aPythonExecutable, anId, aChromId, aPassingCallsFilename, anOriginalFilname, anOutputDir, aPrefix, aScriptsDir, aJobGraph, aVcfSuffix, anIsDebug):
   
-    if (aGzipFlag):
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_mergedFinal_chr" + aChromId + ".vcf.gz")
-    else:
-        outputFilename = os.path.join(anOutputDir, aPrefix + "_mergedFinal_chr" + aChromId + ".vcf")
+    outputFilename = os.path.join(anOutputDir, aPrefix + "_mergedFinal_chr" + aChromId + aVcfSuffix)
     script = os.path.join(aScriptsDir, "mergePassingAndOriginals.py")
     command = aPythonExecutable + " " + script + " " + aPassingCallsFilename + " " + anOriginalFilname + " " + outputFilename
         
@@ -809,23 +661,15 @@ def merge_passingAndOriginals(aPythonExecutable, anId, aChromId, aPassingCallsFi
     
     readFilenameList = [script, aPassingCallsFilename, anOriginalFilname]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
-            sys.exit(1)
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def filter_readSupport(aPythonExecutable, anId, aChromId, anInputFilename, aTranscriptNameTag, aTranscriptCoordinateTag, aTranscriptStrandTag, anRnaIncludeSecondaryAlignmentsFlag, aMinMapQual, anOutputDir, aPrefix, anOutputFilename, aScriptsDir, aJobListFileHandler, aGzipFlag, anIsDebug):
+def filter_readSupport(aPythonExecutable, anId, aChromId, anInputFilename, aTranscriptNameTag, aTranscriptCoordinateTag, aTranscriptStrandTag, anRnaIncludeSecondaryAlignmentsFlag, aMinMapQual, anOutputDir, aPrefix, anOutputFilename, aScriptsDir, aJobGraph, aGzipFlag, anIsDebug):
 
     script = os.path.join(aScriptsDir, "filterByReadSupport.py")
     
@@ -855,42 +699,49 @@ def filter_readSupport(aPythonExecutable, anId, aChromId, anInputFilename, aTran
     
     readFilenameList = [script, anInputFilename]
     writeFilenameList = [outputFilename]
-    if (not radiaUtil.check_for_argv_errors(None, readFilenameList, writeFilenameList)):
+    if (not aJobGraph.check_filenames(readFilenameList, writeFilenameList)):
         sys.exit(1)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr) 
-            sys.exit(1)  
+    aJobGraph.add_job(command, readFilenameList, writeFilenameList)
             
     return outputFilename
 
 
-def remove_tmpFiles(aRmTmpFilesList, aJobListFileHandler, anIsDebug):
+def run_filterChain(anInputFilename, aFilterChain, aKeepIntermediatesFlag, anIsDebug):
+    '''
+    ' Run the filters that were chained by the filter functions above in this process.  The chain holds
+    ' a (filter, outputFilename) tuple for each filter, and only the output of the last filter is written
+    ' unless the intermediate files should be kept.
+    '''
+    
+    (filterList, outputFilenameList) = zip(*aFilterChain)
+    
+    if (anIsDebug):
+        logging.debug("Input: %s", anInputFilename)
+        logging.debug("Chained outputs: %s", outputFilenameList)
+    
+    return filterPipeline.run_filters(anInputFilename, filterList, outputFilenameList, aKeepIntermediatesFlag)
+
+
+def remove_tmpFiles(aRmTmpFilesList, aJobGraph, anIsDebug):
+    
+    # the tmp files can only be removed once all of the commands that read them are done
+    aJobGraph.wait_all()
     
+    # the files of a job list don't exist yet, and some of them are only written when there is something
+    # to filter, so they are removed with "rm -f" instead of being checked here
+    # the .gz files are written with a tabix index
     finalList = list()
     for tmpFile in aRmTmpFilesList:
-        if (os.path.exists(tmpFile)):
-            finalList.append("rm " + tmpFile)
+        finalList.append("rm -f " + tmpFile + " " + tmpFile + ".tbi")
             
     command = ";".join(finalList)
     
     if (anIsDebug):
         logging.debug("Command: %s", command)
     
-    if (aJobListFileHandler != None):
-        aJobListFileHandler.write(command + "\n")    
-    else:    
-        subprocessCall = subprocess.Popen(command, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-        (samtoolsStdOut, samtoolsStdErr) = subprocessCall.communicate()
-        if (subprocessCall.returncode != 0):
-            logging.error("The return code of '%s' from the following filter command indicates an error.", subprocessCall.returncode)
-            logging.error("Error from %s:\n%s", command, samtoolsStdErr)   
+    if (len(finalList) > 0):
+        aJobGraph.add_job(command, [], [], jobGraph.i_errorLog)
             
     return
 
@@ -912,8 +763,9 @@ def main():
     i_cmdLineParser.add_option("-s", "--snpEffDir", dest="snpEffDir", metavar="SNP_EFF_DIR", help="the path to the snpEff directory")
     i_cmdLineParser.add_option("-e", "--snpEffGenome", dest="snpEffGenome", default="GRCh37.75", metavar="SNP_EFF_GENOME", help="the snpEff Genome, %default by default")
     i_cmdLineParser.add_option("", "--canonical", action="store_true", default=False, dest="canonical", metavar="CANONICAL", help="include this argument if only the canonical transcripts from snpEff should be used, %default by default")
-    #i_cmdLineParser.add_option("-j", "--joblistDir", dest="joblistDir", metavar="JOBLIST_DIR", help="the joblist directory")
-    #i_cmdLineParser.add_option("-s", "--shebang", dest="shebang", metavar="SHEBANG", help="the shebang that should be added to the beginning of the joblist filename")
+    i_cmdLineParser.add_option("", "--jobListDir", dest="joblistDir", metavar="JOBLIST_DIR", help="the joblist directory, the commands are written to a shell script in this directory instead of being run")
+    i_cmdLineParser.add_option("", "--shebang", dest="shebang", metavar="SHEBANG", help="the shebang that should be added to the beginning of the joblist filename")
+    i_cmdLineParser.add_option("", "--numWorkers", type="int", default=jobGraph.i_numWorkers, dest="numWorkers", metavar="NUM_WORKERS", help="the number of filter commands that can be run at the same time when their inputs are ready, %default by default")
     i_cmdLineParser.add_option("-f", "--blatFastaFilename", dest="blatFastaFilename", metavar="FASTA_FILE", help="the fasta file that can be used during the BLAT filtering, default is the one specified in the VCF header")
     i_cmdLineParser.add_option("-o", "--outputFilename", dest="outputFilename", metavar="OUTPUT_FILE", help="the name of the output file, otherwise a file will be automatically created in the outputDir with the following format:  patientId + '_chr' + chrom + '.vcf')")
     
@@ -936,6 +788,8 @@ def main():
     i_cmdLineParser.add_option("", "--dnaOnly", action="store_true", default=False, dest="dnaOnly", help="include this argument if you only have DNA or filtering should only be done on the DNA")
     i_cmdLineParser.add_option("", "--rnaOnly", action="store_true", default=False, dest="rnaOnly", help="include this argument if the filtering should only be done on the RNA")
     i_cmdLineParser.add_option("", "--gzip", action="store_true", default=False, dest="gzip", help="include this argument if the final VCF should be compressed with gzip")
+    i_cmdLineParser.add_option("", "--keepIntermediates", action="store_true", default=False, dest="keepIntermediates", help="include this argument if the temp files should be kept, the annotation filters are chained in one process and their temp files are only written with this argument")
+    i_cmdLineParser.add_option("", "--recordIntermediates", action="store_true", default=False, dest="recordIntermediates", help="include this argument if the temp files between the python filters should be written as record files (.vcfr) instead of VCF text, the final VCF is still written as VCF text")
     i_cmdLineParser.add_option("", "--transcriptNameTag", dest="transcriptNameTag", help="the INFO key where the original transcript name can be found")
     i_cmdLineParser.add_option("", "--transcriptCoordinateTag", dest="transcriptCoordinateTag", help="the INFO key where the original transcript coordinate can be found")
     i_cmdLineParser.add_option("", "--transcriptStrandTag", dest="transcriptStrandTag", help="the INFO key where the original transcript strand can be found")
@@ -985,6 +839,9 @@ def main():
     i_rnaOnlyFlag = i_cmdLineOptions.rnaOnly
     i_logLevel = i_cmdLineOptions.logLevel
     i_gzip = i_cmdLineOptions.gzip
+    i_keepIntermediates = i_cmdLineOptions.keepIntermediates
+    i_numWorkers = i_cmdLineOptions.numWorkers
+    i_recordIntermediates = i_cmdLineOptions.recordIntermediates
     i_snpEffGenome = i_cmdLineOptions.snpEffGenome
     i_snpEffCanonical = i_cmdLineOptions.canonical
     i_rnaIncludeSecondaryAlignments = i_cmdLineOptions.rnaIncludeSecondaryAlignments
@@ -1032,14 +889,14 @@ def main():
     if (i_cmdLineOptions.cosmicDir != None):
         i_cosmicDir = str(i_cmdLineOptions.cosmicDir)
         dirList += [i_cosmicDir]
-    #if (i_cmdLineOptions.joblistDir != None):
-    #    i_joblistDir = str(i_cmdLineOptions.joblistDir)
-    #    dirList += [i_joblistDir]
+    if (i_cmdLineOptions.joblistDir != None):
+        i_joblistDir = str(i_cmdLineOptions.joblistDir)
+        dirList += [i_joblistDir]
     if (i_cmdLineOptions.snpEffDir != None):
         i_snpEffDir = str(i_cmdLineOptions.snpEffDir)
         dirList += [i_snpEffDir]
-    #if (i_cmdLineOptions.shebang != None):
-    #    i_shebang = str(i_cmdLineOptions.shebang)
+    if (i_cmdLineOptions.shebang != None):
+        i_shebang = str(i_cmdLineOptions.shebang)
     if (i_cmdLineOptions.outputFilename != None):
         i_outputFilename = str(i_cmdLineOptions.outputFilename)
         writeFilenameList += [i_outputFilename]
@@ -1090,6 +947,9 @@ def main():
         logging.debug("scriptsDir=%s", i_scriptsDir)
         logging.debug("logLevel=%s", i_logLevel)
         logging.debug("gzip=%s", i_gzip)
+        logging.debug("keepIntermediates=%s", i_keepIntermediates)
+        logging.debug("numWorkers=%s", i_numWorkers)
+        logging.debug("recordIntermediates=%s", i_recordIntermediates)
         logging.debug("logFile=%s", i_logFilename)
         logging.debug("prefix=%s", i_prefix)
         logging.debug("blatfastaFile=%s", i_blatFastaFilename)
@@ -1171,147 +1031,184 @@ def main():
             logging.critical("No RNA gene family blacklist has been specified.")
             sys.exit(1)
     
+    if (i_recordIntermediates and recordStream.numpy == None):
+        logging.critical("The record files need numpy.  Please install numpy or remove the --recordIntermediates option.")
+        sys.exit(1)
+    
     # check to see if the files exist
     if (not radiaUtil.check_for_argv_errors(dirList, readFilenameList, writeFilenameList)):
         sys.exit(1)           
     
+    # the shell commands and snpEff need VCF text, so the files that they read are never record files
+    if (i_gzip):
+        i_textSuffix = ".vcf.gz"
+    else:
+        i_textSuffix = ".vcf"
+    if (i_recordIntermediates):
+        i_vcfSuffix = recordStream.i_recordSuffix
+    else:
+        i_vcfSuffix = i_textSuffix
+    if (i_snpEffFlag):
+        i_preSnpEffSuffix = i_textSuffix
+    else:
+        i_preSnpEffSuffix = i_vcfSuffix
+    
     i_joblistFileHandler = None
     if (i_joblistDir != None):
         i_joblistFileHandler = get_write_fileHandler(os.path.join(i_joblistDir, i_id + "_chr" + i_chr + ".sh"))
         if (i_shebang != None):
             i_joblistFileHandler.write(i_shebang + "\n")
     
+    # the commands are run (or written to the job list) as a graph, so the ones that don't depend on each other run at the same time
+    i_jobGraph = jobGraph.JobGraph(i_numWorkers, i_joblistFileHandler)
+    
+    # unless a job list is written, the annotation filters are chained in this process
+    i_filterChain = None
+    if (i_joblistFileHandler == None):
+        i_filterChain = list()
+    
     previousFilename = i_inputFilename
     rmTmpFilesList = list()
     
     if (i_dnaOnlyFlag):
         # filter by blacklist
         if (i_blacklistFlag):
-            previousFilename = filter_blacklist(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_blacklistDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = filter_blacklist(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_blacklistDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
            
         # flag snp
         if (i_dbSnpFlag):
-            previousFilename = flag_dbSnp(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_dbSnpDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_dbSnp(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_dbSnpDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
         
         # flag retro genes
         if (i_retroGenesFlag):                
-            previousFilename = flag_retroGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_retroGenesDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_retroGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_retroGenesDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
     
         # flag pseudo genes
         if (i_pseudoGenesFlag):
-            previousFilename = flag_pseudoGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_pseudoGenesDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_pseudoGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_pseudoGenesDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
     
         # flag cosmic
         if (i_cosmicFlag):                
-            previousFilename = flag_cosmic(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_cosmicDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_cosmic(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_cosmicDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
         
         # filter targets
         if (i_targetsFlag):            
-            previousFilename = filter_targets(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_targetDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = filter_targets(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_targetDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
         
+        # run the chained annotation filters
+        if (i_filterChain):
+            previousFilename = run_filterChain(i_inputFilename, i_filterChain, i_keepIntermediates, i_debug)
+        
         # filter mpileup
-        previousFilename = filter_mpileupSupport_dna(i_pythonExecutable, i_id, i_chr, previousFilename, None, True, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+        previousFilename = filter_mpileupSupport_dna(i_pythonExecutable, i_id, i_chr, previousFilename, None, True, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_preSnpEffSuffix, i_debug)
         rmTmpFilesList.append(previousFilename)
         
     else:        
         # filter by blacklist
         if (i_blacklistFlag):    
-            previousFilename = filter_blacklist(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_blacklistDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = filter_blacklist(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_blacklistDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
             
         # filter by dbsnp
         if (i_dbSnpFlag):
-            previousFilename = flag_dbSnp(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_dbSnpDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_dbSnp(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_dbSnpDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
 
         # flag retro genes
         if (i_retroGenesFlag):
-            previousFilename = flag_retroGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_retroGenesDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_retroGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_retroGenesDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
     
         # flag pseudo genes
         if (i_pseudoGenesFlag):
-            previousFilename = flag_pseudoGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_pseudoGenesDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_pseudoGenes(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_pseudoGenesDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
         
         # flag cosmic
         if (i_cosmicFlag):
-            previousFilename = flag_cosmic(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_cosmicDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = flag_cosmic(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_cosmicDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
         
         # filter targets
         if (i_targetsFlag):
-            previousFilename = filter_targets(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_targetDir, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = filter_targets(i_pythonExecutable, i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_targetDir, i_scriptsDir, i_jobGraph, i_filterChain, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
     
+        # run the chained annotation filters
+        if (i_filterChain):
+            previousFilename = run_filterChain(i_inputFilename, i_filterChain, i_keepIntermediates, i_debug)
+    
         # filter RNA mpileup
         # the output file contains all filters for all possible mod types and no final mod type is chosen
-        rnaFilename = filter_mpileupSupport_rna(i_pythonExecutable, i_id, i_chr, previousFilename, True, i_rnaMpileupMinMapQual, i_rnaMpileupMinAvgMapQual, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+        rnaFilename = filter_mpileupSupport_rna(i_pythonExecutable, i_id, i_chr, previousFilename, True, i_rnaMpileupMinMapQual, i_rnaMpileupMinAvgMapQual, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
         rmTmpFilesList.append(rnaFilename)
         
         # filter DNA mpileup
         # the output file contains all filters for all possible mod types and no final mod type is chosen
-        dnaFilename = filter_mpileupSupport_dna(i_pythonExecutable, i_id, i_chr, previousFilename, None, True, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+        dnaFilename = filter_mpileupSupport_dna(i_pythonExecutable, i_id, i_chr, previousFilename, None, True, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
         rmTmpFilesList.append(dnaFilename)
         
         # compare the rna and dna
         # calls that pass in both the DNA and RNA will be in the overlaps file
         # calls that don't pass in the DNA but pass in the RNA are in the non-overlaps file - these are the RNA Rescue and RNA Editing calls
-        (overlapFilename, nonoverlapFilename) = radia_compare(i_pythonExecutable, i_id, i_chr, rnaFilename, dnaFilename, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+        (overlapFilename, nonoverlapFilename) = radia_compare(i_pythonExecutable, i_id, i_chr, rnaFilename, dnaFilename, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
         rmTmpFilesList.append(overlapFilename)
         rmTmpFilesList.append(nonoverlapFilename)
         
         # filter DNA mpileup
         # filter the RNA Rescue and RNA Editing calls based on the DNA to get rid of any possible germline calls
-        previousFilename = filter_mpileupSupport_dna(i_pythonExecutable, i_id, i_chr, nonoverlapFilename, dnaFilename, False, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+        previousFilename = filter_mpileupSupport_dna(i_pythonExecutable, i_id, i_chr, nonoverlapFilename, dnaFilename, False, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_textSuffix, i_debug)
         rmTmpFilesList.append(previousFilename)
         
         # filter out possible germline calls
-        previousFilename = filter_rnaOnly(i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_joblistFileHandler, i_gzip, i_debug)
+        previousFilename = filter_rnaOnly(i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_jobGraph, i_gzip, i_debug)
         rmTmpFilesList.append(previousFilename)
         
         # if we have something to blat
-        if (os.path.isfile(previousFilename) and os.stat(previousFilename).st_size > 20):
+        if (i_jobGraph.is_larger_than(previousFilename, 20)):
             
             # the blat input is needed for the blat and pbias filters
             if (i_blatFlag or i_pbiasFlag):
                 # create blat input
-                blatInputFilename = filter_createBlatInput(i_pythonExecutable, i_id, i_chr, previousFilename, rnaFilename, i_transcriptNameTag, i_transcriptCoordinateTag, i_transcriptStrandTag, i_rnaIncludeSecondaryAlignments, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_debug)
+                blatInputFilename = filter_createBlatInput(i_pythonExecutable, i_id, i_chr, previousFilename, rnaFilename, i_transcriptNameTag, i_transcriptCoordinateTag, i_transcriptStrandTag, i_rnaIncludeSecondaryAlignments, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_debug)
                 rmTmpFilesList.append(blatInputFilename)
             
             # filter by BLAT
+            # the vcfGenerator line is passed on by all of the filters, so it is read from the input file, which already exists when a job list is written
             if (i_blatFlag):    
-                (blatOutputFilename, previousFilename) = filter_blat(i_pythonExecutable, i_id, i_chr, previousFilename, rnaFilename, blatInputFilename, i_blatFastaFilename, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+                (blatOutputFilename, previousFilename) = filter_blat(i_pythonExecutable, i_id, i_chr, previousFilename, i_inputFilename, blatInputFilename, i_blatFastaFilename, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
                 rmTmpFilesList.append(blatOutputFilename)
                 rmTmpFilesList.append(previousFilename)
             
             # the blat input is needed
-            if (i_pbiasFlag and os.path.isfile(previousFilename) and os.stat(previousFilename).st_size > 20):
+            if (i_pbiasFlag and i_jobGraph.is_larger_than(previousFilename, 20)):
                 # if we filtered via blat, then keep the previous filters so that the blat filter gets passed on
                 if (i_blatFlag):
                     # filter by positional bias
-                    previousFilename = filter_positionalBias(i_pythonExecutable, i_id, i_chr, previousFilename, blatInputFilename, True, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+                    previousFilename = filter_positionalBias(i_pythonExecutable, i_id, i_chr, previousFilename, blatInputFilename, True, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
                 # if we didn't filter via blat, then don't keep the previous filters
                 else:
                     # filter by positional bias
-                    previousFilename = filter_positionalBias(i_pythonExecutable, i_id, i_chr, previousFilename, blatInputFilename, False, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+                    previousFilename = filter_positionalBias(i_pythonExecutable, i_id, i_chr, previousFilename, blatInputFilename, False, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
                 rmTmpFilesList.append(previousFilename)
+                i_jobGraph.end_condition()
+            i_jobGraph.end_condition()
                 
         # if RNA only, just merge the RNA Confirmation and RNA Rescue calls
         if (i_rnaOnlyFlag):
             # the dnaFilename and --dnaHeaderOnly=True means that we only extract the header from the dnaFilename and ignore the rest
-            previousFilename = merge_rnaAndDna(i_pythonExecutable, i_id, i_chr, dnaFilename, rnaFilename, overlapFilename, previousFilename, True, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = merge_rnaAndDna(i_pythonExecutable, i_id, i_chr, dnaFilename, rnaFilename, overlapFilename, previousFilename, True, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_preSnpEffSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
         else:
             # merge RNA and DNA
             # the dnaFilename and --dnaHeaderOnly=False means that we merge the header and the results in the dnaFilename
-            previousFilename = merge_rnaAndDna(i_pythonExecutable, i_id, i_chr, dnaFilename, rnaFilename, overlapFilename, previousFilename, False, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = merge_rnaAndDna(i_pythonExecutable, i_id, i_chr, dnaFilename, rnaFilename, overlapFilename, previousFilename, False, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_preSnpEffSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
         
     if (i_snpEffFlag):
@@ -1319,28 +1216,31 @@ def main():
         preSnpEffFilename = previousFilename
         
         # extracting passing calls
-        previousFilename = extract_passing(i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_joblistFileHandler, i_gzip, i_debug)
+        previousFilename = extract_passing(i_id, i_chr, previousFilename, i_outputDir, i_prefix, i_jobGraph, i_gzip, i_debug)
         rmTmpFilesList.append(previousFilename)
       
-        previousFilename = filter_runSnpEff(i_id, i_chr, previousFilename, i_snpEffDir, i_snpEffGenome, i_snpEffCanonical, i_outputDir, i_prefix, i_joblistFileHandler, i_gzip, i_debug)
+        previousFilename = filter_runSnpEff(i_id, i_chr, previousFilename, i_snpEffDir, i_snpEffGenome, i_snpEffCanonical, i_outputDir, i_prefix, i_jobGraph, i_gzip, i_debug)
         rmTmpFilesList.append(previousFilename)
     
         if (not i_dnaOnlyFlag and i_rnaBlacklistFlag):
             # filter RNA by geneNames/Families
-            previousFilename = filter_rnaBlacklist(i_pythonExecutable, i_id, i_chr, previousFilename, i_rnaGeneBlckFilename, i_rnaGeneFamilyBlckFilename, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+            previousFilename = filter_rnaBlacklist(i_pythonExecutable, i_id, i_chr, previousFilename, i_rnaGeneBlckFilename, i_rnaGeneFamilyBlckFilename, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
             rmTmpFilesList.append(previousFilename)
     
         # merge passing with snpEff back with originals 
-        previousFilename = merge_passingAndOriginals(i_pythonExecutable, i_id, i_chr, previousFilename, preSnpEffFilename, i_outputDir, i_prefix, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+        previousFilename = merge_passingAndOriginals(i_pythonExecutable, i_id, i_chr, previousFilename, preSnpEffFilename, i_outputDir, i_prefix, i_scriptsDir, i_jobGraph, i_vcfSuffix, i_debug)
         rmTmpFilesList.append(previousFilename)
                     
     # everything gets run through the read support filter
-    previousFilename = filter_readSupport(i_pythonExecutable, i_id, i_chr, previousFilename, i_transcriptNameTag, i_transcriptCoordinateTag, i_transcriptStrandTag, i_rnaIncludeSecondaryAlignments, i_readSupportMinMapQual, i_outputDir, i_prefix, i_outputFilename, i_scriptsDir, i_joblistFileHandler, i_gzip, i_debug)
+    previousFilename = filter_readSupport(i_pythonExecutable, i_id, i_chr, previousFilename, i_transcriptNameTag, i_transcriptCoordinateTag, i_transcriptStrandTag, i_rnaIncludeSecondaryAlignments, i_readSupportMinMapQual, i_outputDir, i_prefix, i_outputFilename, i_scriptsDir, i_jobGraph, i_gzip, i_debug)
     
-    # if we aren't debugging, then remove all the tmp files
-    if (not i_debug):
+    # if we aren't debugging or keeping them, then remove all the tmp files
+    if (not i_debug and not i_keepIntermediates):
         # remove all the temp files
-        remove_tmpFiles(rmTmpFilesList, i_joblistFileHandler, i_debug)
+        remove_tmpFiles(rmTmpFilesList, i_jobGraph, i_debug)
+    
+    # wait for the last commands
+    i_jobGraph.close()
         
     if (i_joblistDir != None):
         i_joblistFileHandler.close()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import logging
+import multiprocessing
+import subprocess
+import Queue
+from multiprocessing.pool import ThreadPool
+import radiaUtil
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module runs the commands of filterRadia.py as a dependency graph.  A command depends on
+'    the commands that write the files that it reads, and the graph is built from the read and write
+'    filenames that each filter function already checks.  The commands whose dependencies are done
+'    are run at the same time by a pool of worker threads (each thread only waits on its subprocess),
+'    so e.g. the RNA and DNA mpileup filters run side by side.  When a job list is written instead,
+'    every command is started in the background of the shell script, and the script waits on the
+'    commands that it depends on before it is started, so the script follows the same graph.  The files
+'    don't exist yet when the job list is written, so the size checks are written to the script as well.
+'''
+
+# the number of commands that are run at the same time
+i_numWorkers = min(4, multiprocessing.cpu_count())
+
+# what happens when a command returns a non-zero return code
+i_errorExit = "exit"
+i_errorLog = "log"
+i_errorIgnore = "ignore"
+
+
+def run_command(aJobId, aCommand, aDoneQueue):
+    '''
+    ' Run a command in a shell and put its return code and error messages on the done queue.
+    '
+    ' aJobId: The id of the command in the graph
+    ' aCommand: The command that should be run
+    ' aDoneQueue: The queue that the main thread is waiting on
+    '''
+    try:
+        subprocessCall = subprocess.Popen(aCommand, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+        (stdOut, stdErr) = subprocessCall.communicate()
+        aDoneQueue.put((aJobId, subprocessCall.returncode, stdErr))
+    except OSError, error:
+        aDoneQueue.put((aJobId, -1, str(error)))
+    return
+
+
+class JobGraph(object):
+    '''
+    ' The commands are added in the order of the pipeline, so the commands that write
+    ' the files that a command reads have always been added before it.
+    '
+    ' aNumWorkers: The number of commands that are run at the same time
+    ' aJobListFileHandler: The job list that the commands are written to instead of being run
+    '''
+
+    def __init__(self, aNumWorkers, aJobListFileHandler):
+        self.jobListFileHandler = aJobListFileHandler
+        self.commands = []
+        self.errorModes = []
+        self.dependencies = []
+        # the id of the last command that writes each file
+        self.writers = {}
+        # the ids of the commands that were started, that are done, and that a job list has waited on
+        self.started = set()
+        self.done = set()
+        self.waited = set()
+        # the size checks that the commands of a job list are only run under
+        self.conditions = []
+        self.doneQueue = Queue.Queue()
+        self.pool = None
+        if (aJobListFileHandler == None):
+            self.pool = ThreadPool(aNumWorkers)
+
+    def check_filenames(self, aReadFilenameList, aWriteFilenameList):
+        '''
+        ' Check the read and write filenames of a command the same way as radiaUtil.check_for_argv_errors(),
+        ' except for the files that are written by the commands in the graph, since they might not exist yet.
+        '''
+        readFilenameList = [filename for filename in aReadFilenameList if (filename not in self.writers)]
+        return radiaUtil.check_for_argv_errors(None, readFilenameList, aWriteFilenameList)
+
+    def add_job(self, aCommand, aReadFilenameList, aWriteFilenameList, anErrorMode=i_errorExit, aSkipCommand=None):
+        '''
+        ' Add a command to the graph and start it if the commands that it depends on are done.
+        '
+        ' aCommand: The command that should be run
+        ' aReadFilenameList: The files that the command reads
+        ' aWriteFilenameList: The files that the command writes
+        ' anErrorMode: Whether a non-zero return code should exit, only be logged, or be ignored
+        ' aSkipCommand: The command that a job list runs instead when a size check fails (see is_larger_than())
+        '''
+        jobId = len(self.commands)
+        dependencies = set()
+        for filename in aReadFilenameList + aWriteFilenameList:
+            if (filename in self.writers):
+                dependencies.add(self.writers[filename])
+        for filename in aWriteFilenameList:
+            self.writers[filename] = jobId
+
+        self.commands.append(aCommand)
+        self.errorModes.append(anErrorMode)
+        self.dependencies.append(sorted(dependencies))
+
+        if (self.jobListFileHandler != None):
+            # only run the command if the files are large enough (the same file can be checked more than once)
+            conditions = [condition for (index, condition) in enumerate(self.conditions) if (condition not in self.conditions[:index])]
+            if (len(conditions) > 0):
+                if (aSkipCommand != None):
+                    aCommand = "if " + " && ".join(conditions) + "; then " + aCommand + "; else " + aSkipCommand + "; fi"
+                else:
+                    aCommand = "if " + " && ".join(conditions) + "; then " + aCommand + "; fi"
+
+            # wait on the background commands that this one depends on, then start it in the background
+            self.write_waits(self.dependencies[jobId])
+            self.jobListFileHandler.write("(" + aCommand + ") &\n")
+            self.jobListFileHandler.write("job" + str(jobId) + "=$!\n")
+        else:
+            self.start_ready()
+        return jobId
+
+    def write_waits(self, aJobIdList):
+        for jobId in aJobIdList:
+            if (jobId in self.waited):
+                continue
+            self.waited.add(jobId)
+            if (self.errorModes[jobId] == i_errorExit):
+                self.jobListFileHandler.write("wait $job" + str(jobId) + " || exit 1\n")
+            else:
+                self.jobListFileHandler.write("wait $job" + str(jobId) + "\n")
+        return
+
+    def start_ready(self):
+        for jobId in xrange(len(self.commands)):
+            if (jobId in self.started):
+                continue
+            if (all(dependency in self.done for dependency in self.dependencies[jobId])):
+                self.started.add(jobId)
+                self.pool.apply_async(run_command, (jobId, self.commands[jobId], self.doneQueue))
+        return
+
+    def wait_for_jobs(self, aJobIdList):
+        '''
+        ' Wait until the commands are done.  The commands that become ready in the meantime are started.
+        ' If a command fails, then the error is logged, and the program exits unless the error is ignored.
+        '''
+        if (self.jobListFileHandler != None):
+            self.write_waits(aJobIdList)
+            return
+
+        while (not all(jobId in self.done for jobId in aJobIdList)):
+            (jobId, returnCode, stdErr) = self.doneQueue.get()
+            self.done.add(jobId)
+            if (returnCode != 0 and self.errorModes[jobId] != i_errorIgnore):
+                logging.error("The return code of '%s' from the following filter command indicates an error.", returnCode)
+                logging.error("Error from %s:\n%s", self.commands[jobId], stdErr)
+                if (self.errorModes[jobId] == i_errorExit):
+                    sys.exit(1)
+            self.start_ready()
+        return
+
+    def wait_for_file(self, aFilename):
+        '''
+        ' Wait until the command that writes aFilename is done, e.g. before the size of the file is checked.
+        '''
+        if (aFilename in self.writers):
+            self.wait_for_jobs([self.writers[aFilename]])
+        return
+
+    def is_larger_than(self, aFilename, aSize):
+        '''
+        ' Check if a file is larger than aSize bytes once the command that writes it is done, e.g. to only run
+        ' the commands that need something to filter.  When a job list is written, the file doesn't exist yet,
+        ' so the check is written to the script instead:  this returns True, and the commands that are added
+        ' until end_condition() is called are only run by the script if the file is large enough.
+        '
+        ' aFilename: The file that should be checked
+        ' aSize: The number of bytes that the file should be larger than
+        '''
+        if (self.jobListFileHandler != None):
+            self.conditions.append("[ -f " + aFilename + " ] && [ $(wc -c < " + aFilename + ") -gt " + str(aSize) + " ]")
+            return True
+
+        self.wait_for_file(aFilename)
+        return (os.path.isfile(aFilename) and os.stat(aFilename).st_size > aSize)
+
+    def end_condition(self):
+        '''
+        ' Stop adding the commands of a job list under the last size check from is_larger_than().
+        '''
+        if (self.jobListFileHandler != None):
+            self.conditions.pop()
+        return
+
+    def wait_all(self):
+        '''
+        ' Wait until all of the commands are done.
+        '''
+        self.wait_for_jobs(range(len(self.commands)))
+        return
+
+    def close(self):
+        self.wait_all()
+        if (self.pool != None):
+            self.pool.close()
+            self.pool.join()
+        return
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+import collections
+import cStringIO
+import itertools
+import multiprocessing
+import struct
+import zlib
+from multiprocessing.pool import ThreadPool
+import recordStream
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module reads the input files of radia.py and the filter scripts (e.g. the VCF files, the
+'    dbSNP, COSMIC, and blacklist .bed files) line by line.  The gzipped files are decompressed in
+'    large buffers instead of one line at a time, and each buffer is cut into lines in C.  The BGZF
+'    files (e.g. the files from bgzip and bgzfWriter) are cut into their blocks, and the blocks are
+'    decompressed in parallel by a pool of threads (zlib releases the GIL while it decompresses).
+'    Any other gzip file is decompressed as a stream.  The uncompressed files are read with a large
+'    buffer by the python file handler, which already cuts the lines in C.
+'''
+
+# the number of bytes that are read from a file at once
+i_bufferSize = 1 << 22
+
+# the number of BGZF blocks that are decompressed by one task in the pool
+i_blocksPerTask = 16
+
+# the number of threads that decompress the blocks of each file
+i_numThreads = min(4, multiprocessing.cpu_count())
+
+
+def is_bgzf(aHeader):
+    '''
+    ' This function returns True if the first bytes of a file are the header of a BGZF block.
+    '
+    ' aHeader:    At least the first 18 bytes of the file
+    '''
+
+    return (len(aHeader) >= 18 and aHeader[0:4] == "\x1f\x8b\x08\x04" and get_block_size(aHeader, 0) != None)
+
+
+def get_block_size(aBuffer, anOffset):
+    '''
+    ' This function returns the size of the BGZF block that starts at anOffset in aBuffer from the "BC" extra
+    ' field of its header, or None if the header doesn't have the field.
+    '
+    ' aBuffer:     The compressed data
+    ' anOffset:    The offset of the block in aBuffer
+    '''
+
+    (extraLength,) = struct.unpack("<H", aBuffer[anOffset + 10:anOffset + 12])
+    fieldOffset = anOffset + 12
+    while (fieldOffset + 4 <= anOffset + 12 + extraLength):
+        (fieldId, fieldLength) = struct.unpack("<2sH", aBuffer[fieldOffset:fieldOffset + 4])
+        if (fieldId == "BC" and fieldLength == 2):
+            return struct.unpack("<H", aBuffer[fieldOffset + 4:fieldOffset + 6])[0] + 1
+        fieldOffset += 4 + fieldLength
+    return None
+
+
+def decompress_blocks(aBlockList):
+    '''
+    ' This function decompresses a list of BGZF blocks and returns the uncompressed data.
+    '
+    ' aBlockList:    A list of complete BGZF blocks
+    '''
+
+    dataList = []
+    for block in aBlockList:
+        (extraLength,) = struct.unpack("<H", block[10:12])
+        data = zlib.decompress(block[12 + extraLength:-8], -15)
+        (crc, size) = struct.unpack("<iI", block[-8:])
+        if (len(data) != size or zlib.crc32(data) != crc):
+            raise IOError("CRC check failed on a BGZF block")
+        dataList.append(data)
+    return "".join(dataList)
+
+
+def read_bgzf_data(aFileHandler, aPool, aNumThreads):
+    '''
+    ' This function uses the python generator to yield the uncompressed data of a BGZF file.  The compressed data
+    ' is read in large buffers and cut into blocks, and the blocks are decompressed in order by a pool of threads.
+    '
+    ' aFileHandler:    The file handler of the BGZF file
+    ' aPool:           A pool of threads or None to decompress the blocks on the calling thread
+    ' aNumThreads:     The number of threads in the pool
+    '''
+
+    pendingTasks = collections.deque()
+    buffer = ""
+    while (True):
+        data = aFileHandler.read(i_bufferSize)
+        buffer += data
+
+        # cut off the complete blocks
+        blocks = []
+        offset = 0
+        while (offset + 18 <= len(buffer)):
+            blockSize = get_block_size(buffer, offset)
+            if (blockSize == None):
+                raise IOError("The file " + aFileHandler.name + " has a block that isn't a BGZF block")
+            if (offset + blockSize > len(buffer)):
+                break
+            blocks.append(buffer[offset:offset + blockSize])
+            offset += blockSize
+        buffer = buffer[offset:]
+
+        for blockIndex in xrange(0, len(blocks), i_blocksPerTask):
+            if (aPool != None):
+                pendingTasks.append(aPool.apply_async(decompress_blocks, (blocks[blockIndex:blockIndex + i_blocksPerTask],)))
+            else:
+                yield decompress_blocks(blocks[blockIndex:blockIndex + i_blocksPerTask])
+
+        # the data is yielded in order, and the queue is kept short so the memory doesn't grow
+        while (len(pendingTasks) > (2 * aNumThreads if (len(data) > 0) else 0)):
+            yield pendingTasks.popleft().get()
+
+        if (len(data) == 0):
+            break
+
+    if (len(buffer) > 0):
+        raise IOError("The file " + aFileHandler.name + " ends with a truncated BGZF block")
+    return
+
+
+def read_gzip_data(aFileHandler):
+    '''
+    ' This function uses the python generator to yield the uncompressed data of a gzip file that isn't a BGZF file.
+    ' The file can have more than one gzip member.
+    '
+    ' aFileHandler:    The file handler of the gzip file
+    '''
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while (True):
+        data = aFileHandler.read(i_bufferSize)
+        if (len(data) == 0):
+            break
+        while (len(data) > 0):
+            yield decompressor.decompress(data)
+            data = decompressor.unused_data
+            # some gzip files are padded with zeros after the last member, which isn't another member
+            if (len(data) > 0 and data.strip("\x00") == ""):
+                data = ""
+            if (len(data) > 0):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.flush()
+    return
+
+
+def get_line_buffers(aDataGenerator):
+    '''
+    ' This function uses the python generator to yield the data in buffers of complete lines.  The partial line at
+    ' the end of the data is kept for the next buffer.  Each buffer is yielded as a cStringIO object, so that the
+    ' buffer is cut into lines in C the same way that a file is.
+    '
+    ' aDataGenerator:    A generator of the uncompressed data
+    '''
+
+    partialLine = ""
+    for data in aDataGenerator:
+        lastNewline = data.rfind("\n")
+        if (lastNewline == -1):
+            partialLine += data
+            continue
+        yield cStringIO.StringIO(partialLine + data[0:lastNewline + 1])
+        partialLine = data[lastNewline + 1:]
+    if (len(partialLine) > 0):
+        yield cStringIO.StringIO(partialLine)
+    return
+
+
+def split_fields(aLine, aNumFields):
+    '''
+    ' This function splits the first aNumFields tab-separated fields off of a line.  The rest of the line isn't split
+    ' and is returned as one last field, so the columns that aren't needed (e.g. the sample columns of a VCF line)
+    ' are only split when the caller asks for them.
+    '
+    ' aLine:         A line without the newline
+    ' aNumFields:    The number of fields that are needed
+    '''
+
+    return aLine.split("\t", aNumFields)
+
+
+class GzipLineReader(object):
+    '''
+    ' This class reads the lines of a gzipped file.  It can be used in place of the file handlers from gzip.open()
+    ' by the scripts that loop through the lines of a file.  The lines keep their newlines.
+    '''
+
+    def __init__(self, aFilename, aNumThreads=i_numThreads):
+        '''
+        ' aFilename:      The name of the gzipped file
+        ' aNumThreads:    The number of threads that decompress the blocks of a BGZF file, 1 decompresses them on
+        '                 the calling thread
+        '''
+        self.name = aFilename
+        self.fileHandler = open(aFilename, "rb")
+        self.pool = None
+
+        header = self.fileHandler.read(18)
+        self.fileHandler.seek(0)
+        if (is_bgzf(header)):
+            if (aNumThreads > 1):
+                self.pool = ThreadPool(aNumThreads)
+            self.dataGenerator = read_bgzf_data(self.fileHandler, self.pool, aNumThreads)
+        else:
+            self.dataGenerator = read_gzip_data(self.fileHandler)
+
+        # the same iterator is used by every loop, so a loop can stop and a later loop will continue from there
+        self.lines = itertools.chain.from_iterable(get_line_buffers(self.dataGenerator))
+
+    def __iter__(self):
+        return self.lines
+
+    def next(self):
+        return self.lines.next()
+
+    def readline(self):
+        return next(self.lines, "")
+
+    def readlines(self):
+        return list(self.lines)
+
+    def read(self):
+        return "".join(self.lines)
+
+    def close(self):
+        self.dataGenerator.close()
+        if (self.pool != None):
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        self.fileHandler.close()
+
+
+def get_read_fileHandler(aFilename, aNumThreads=i_numThreads):
+    '''
+    ' Open aFilename for reading and return
+    ' the file handler.  The file can be
+    ' gzipped or not.  The uncompressed
+    ' files are read with a large buffer,
+    ' and the .vcfr files are read as
+    ' record files by recordStream.
+    '''
+
+    if aFilename.endswith('.gz'):
+        return GzipLineReader(aFilename, aNumThreads)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordReader(aFilename)
+    else:
+        return open(aFilename, 'r', i_bufferSize)
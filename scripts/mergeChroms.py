@@ -7,7 +7,9 @@ import radiaUtil
 import os
 import glob
 import logging
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 
 
 '''
@@ -29,26 +31,19 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
     
@@ -79,7 +74,7 @@ def get_vcf_data(anId, anInputDir, anIsDebug):
     # they might be gzipped, they might not    
     for vcfFile in (glob.glob(anInputDir + anId + "_chr*.vcf*")):
         # open the file
-        vcfFileHandler = get_read_fileHandler(vcfFile)
+        vcfFileHandler = lineReader.get_read_fileHandler(vcfFile)
         
         for line in vcfFileHandler:
             
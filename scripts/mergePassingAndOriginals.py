@@ -5,7 +5,9 @@ import time
 from optparse import OptionParser
 import radiaUtil
 import logging
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 
 
 '''
@@ -27,26 +29,19 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
 
@@ -59,7 +54,7 @@ def get_vcf_data(aVCFFile, anIsDebug):
     filterList = list() 
     coordinateDict = dict()
     
-    vcfFileHandler = get_read_fileHandler(aVCFFile)
+    vcfFileHandler = lineReader.get_read_fileHandler(aVCFFile)
     
     for line in vcfFileHandler:
         
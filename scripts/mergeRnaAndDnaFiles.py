@@ -6,7 +6,9 @@ from optparse import OptionParser
 import radiaUtil
 import os
 import logging
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 import collections
 
 
@@ -29,26 +31,19 @@ import collections
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
     
@@ -137,11 +132,11 @@ def set_sst_field(anInfoField):
 def merge_vcf_data(aDnaFile, anRnaFile, anOverlapsFile, aNonOverlapsFile, aDnaHeaderOnlyFlag, anIsDebug):
     
     # open the header file
-    dnaFileHandler = get_read_fileHandler(aDnaFile)
-    rnaFileHandler = get_read_fileHandler(anRnaFile)
-    overlapsFileHandler = get_read_fileHandler(anOverlapsFile)
+    dnaFileHandler = lineReader.get_read_fileHandler(aDnaFile)
+    rnaFileHandler = lineReader.get_read_fileHandler(anRnaFile)
+    overlapsFileHandler = lineReader.get_read_fileHandler(anOverlapsFile)
     if (os.path.isfile(aNonOverlapsFile)):
-        nonOverlapsFileHandler = get_read_fileHandler(aNonOverlapsFile)
+        nonOverlapsFileHandler = lineReader.get_read_fileHandler(aNonOverlapsFile)
     
     headerList = list()
     coordinateDict = dict()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import sys
-import gzip
+import bgzfWriter
+import lineReader
 
 
 '''
@@ -22,26 +23,15 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
     else:
         return open(aFilename,'w')
     
@@ -199,10 +189,12 @@ class pybed:
 
     def loadfromfile(self, fname, ci=0, sti=1, spi=2, vi=3):
             
-        inFile = get_read_fileHandler(fname)
+        inFile = lineReader.get_read_fileHandler(fname)
+        # the columns after the last one that is used aren't split
+        numFields = max(ci, sti, spi, vi) + 1
 
         for line in inFile:
-            data = line[:-1].split('\t')
+            data = lineReader.split_fields(line[:-1], numFields)
 
             c  = data[ci]
             st = int(data[sti])
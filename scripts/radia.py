@@ -8,10 +8,35 @@ import subprocess
 import datetime
 import logging
 from optparse import OptionParser
-from itertools import izip
+from itertools import izip, islice, chain
 import radiaUtil
 import collections
-import gzip
+import bgzfWriter
+import lineReader
+import recordStream
+import heapq
+import threading
+import traceback
+import Queue
+import tempfile
+import shutil
+from multiprocessing.pool import ThreadPool
+import bamIndex
+import regionPlan
+import fastaReader
+import siteCache
+
+# pysam is only needed when the pysam pileup engine is selected or the pileups files are indexed
+try:
+    import pysam
+except ImportError:
+    pysam = None
+
+# numpy is only needed to decode deep pileups with the vectorized decoder
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 '''
@@ -55,30 +80,49 @@ i_numOfIndelsRegEx = re.compile("[+-]{1}(\\d+)")
 # this regular expression will match any number of valid cDNA strings
 i_cDNARegEx = re.compile("[ACGTNacgtn]+")
 
-# this regular expression will match full TCGA sample Ids, e.g. TCGA-AG-A016-01A-01R or TCGA-37-4133-10A-01D
-i_tcgaNameRegEx = re.compile("TCGA-(\\w){2}-(\\w){4}-(\\w){3}-(\\w){3}")
+# this regular expression matches the marks between the bases of the reads:  the start of a read with its
+# mapping quality, the end of a read, and the sign and size of an insertion or deletion (without its bases)
+i_readMarksRegEx = re.compile("\\^.|\\$|[+-](\\d+)", re.DOTALL)
 
+# the number of pileups that are put on a queue at one time when the pileups are fetched concurrently
+i_pileupsChunkSize = 1000
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
+# the samtools commands that are built into pysam (e.g. pysam.merge) share global state, so only one thread runs them at a time
+i_pysamCommandLock = threading.Lock()
+
+# pileups with at least this many characters are decoded with the vectorized decoder when numpy is available
+i_vectorizedDecoderMinLength = 500
+
+# the alleles in the order of the columns of the arrays returned by decode_pileup_block()
+i_alleles = "ACGTN"
+i_alleleIndexes = dict((allele, index) for (index, allele) in enumerate(i_alleles))
+
+# the columns of a row in the site cache:  the coordinate, the ref, the number of reads and base qualities, the starts, the stops, 
+# the indels, and the order that the alleles were found in, followed by the base counts, the sums of the base qualities, the sums
+# of the mapping qualities, the mapping qualities of zero, the max mapping qualities, and the plus strand counts of each allele
+# the last allele is the ref when it isn't one of the i_alleles (see AlleleAccumulator)
+i_siteCacheNumSlots = len(i_alleles) + 1
+i_siteCacheNumQualsColumn = 3
+i_siteCacheStatsColumn = 8
+i_siteCacheDtypes = ["<i4", "<u1", "<i4", "<i4", "<i4", "<i4", "<i4", "<i4"] + (["<i4"] * (4 * i_siteCacheNumSlots)) + (["<u1"] * i_siteCacheNumSlots) + (["<i4"] * i_siteCacheNumSlots)
+
+# this regular expression will match full TCGA sample Ids, e.g. TCGA-AG-A016-01A-01R or TCGA-37-4133-10A-01D
+i_tcgaNameRegEx = re.compile("TCGA-(\\w){2}-(\\w){4}-(\\w){3}-(\\w){3}")
 
 
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
     
@@ -131,43 +175,185 @@ def get_chrom_size(aChrom, anInputStream, anIsDebug):
     return -1
 
 
-def get_batch_end_coordinate(aStartCoordinate, anEndCoordinate, aBatchSize):
+def get_chrom_sizes(anInputStream, anIsDebug):
     '''
-    ' This function takes a start coordinate, an end coordinate, and a batch size and
-    ' returns the next appropriate batch end coordinate which is either the start coordinate
-    ' plus the batch size if this is less than the final end coordinate otherwise the end
-    ' coordinate.
+    ' This function reads from a FASTA index file and returns a list of (chrom, size) tuples
+    ' for all of the chroms in the order that they are listed in the file.  The "chr" prefix
+    ' is removed from the chroms, since it is added by the useChr params when needed.
     '
-    ' aStartCoordinate:  A start coordinate
-    ' anEndCoordinate:  A stop coordinate
-    ' aBatchSize:  A batch size
+    ' anInputStream: The input stream for the FASTA index file
     '''
-    if ((aStartCoordinate + aBatchSize) <= anEndCoordinate):
-        # we don't want to have the end coordinate be the same as the next batch's start coordinate
-        # so make sure to do a minus one here
-        return (aStartCoordinate + aBatchSize - 1)
-    else:
-        return (anEndCoordinate)
     
+    chromSizes = []
+    for line in anInputStream:
+        
+        # if it is an empty line, then just continue
+        if (line.isspace() or line.startswith("#")):
+            continue;
+        
+        # strip the carriage return and newline characters
+        line = line.rstrip("\r\n")
+        
+        # split the line on the tab
+        splitLine = line.split("\t")
+        chrom = splitLine[0]
+        size = int(splitLine[1])
+        
+        if (chrom.startswith("chr")):
+            chrom = chrom[3:]
+        
+        if (anIsDebug):
+            logging.debug("get_chrom_sizes(): found size of chrom %s, size=%s", chrom, size)
+        chromSizes.append((chrom, size))
+        
+    return chromSizes
+
 
-def get_sam_data(aSamFile, aChrom, aStartCoordinate, aStopCoordinate, aSourcePrefix, anIsDebug):
+def get_tumors(anInputStream, anIsDebug):
+    '''
+    ' This function reads from a tumors file and returns a list of (tumorId, dnaTumorFilename, rnaTumorFilename) tuples
+    ' in the order that they are listed in the file.  Each line has the tumor id, the tumor DNA .bam file, and the tumor
+    ' RNA .bam file separated by tabs.  A "." or a missing column is returned as None.
+    '
+    ' anInputStream: The input stream for the tumors file
+    '''
+    
+    tumors = []
+    for line in anInputStream:
+        
+        # if it is an empty line, then just continue
+        if (line.isspace() or line.startswith("#")):
+            continue;
+        
+        # strip the carriage return and newline characters
+        line = line.rstrip("\r\n")
+        
+        # split the line on the tab
+        splitLine = line.split("\t") + [".", "."]
+        tumorId = splitLine[0]
+        dnaTumorFilename = splitLine[1] if (splitLine[1] not in ("", ".")) else None
+        rnaTumorFilename = splitLine[2] if (splitLine[2] not in ("", ".")) else None
+        
+        if (anIsDebug):
+            logging.debug("get_tumors(): found tumor %s, dnaTumor=%s, rnaTumor=%s", tumorId, dnaTumorFilename, rnaTumorFilename)
+        tumors.append((tumorId, dnaTumorFilename, rnaTumorFilename))
+        
+    return tumors
+
+
+def get_n_runs(aFastaFilenameList, aPlannedRegionList):
+    '''
+    ' This function finds the runs of N's in the reference for the planned regions (from regionPlan.plan_regions()).
+    ' A coordinate is only ignored by the main loop if the reference is "N" for all of the samples with data, so when 
+    ' the samples use different FASTA files, only the runs of N's that are in all of the FASTA files are returned.  It 
+    ' returns a dictionary with the chroms as the keys and sorted lists of (start, stop) tuples as the values.
+    '
+    ' aFastaFilenameList:    A list of FASTA files that have been indexed
+    ' aPlannedRegionList:    A list of (chrom, start, stop, intervals) tuples
+    '''
+    
+    nRunsDict = {}
+    for (index, fastaFilename) in enumerate(aFastaFilenameList):
+        mappedFasta = fastaReader.get_mapped_fasta(fastaFilename)
+        fastaRunsDict = {}
+        for (chrom, start, stop, intervals) in aPlannedRegionList:
+            for (intervalStart, intervalStop) in intervals:
+                fastaRunsDict.setdefault(chrom, []).extend(mappedFasta.get_n_runs(chrom, intervalStart, intervalStop))
+        
+        if (index == 0):
+            nRunsDict = fastaRunsDict
+        else:
+            for chrom in nRunsDict.keys():
+                nRunsDict[chrom] = regionPlan.intersect_intervals(nRunsDict[chrom], fastaRunsDict.get(chrom, []))
+    
+    return nRunsDict
+
+
+def get_bed_intervals(aBedPath, aChromList, anIsDebug):
+    '''
+    ' This function reads the regions of each chrom from a .bed file or a directory with one .bed file per chrom
+    ' (see regionPlan.get_bed_filename()).  It returns a dictionary with the chroms as the keys and sorted lists of 
+    ' (start, stop) tuples as the values.  The chroms without a .bed file in the directory are not in the dictionary.
+    '
+    ' aBedPath:      A .bed file or a directory of .bed files
+    ' aChromList:    A list of chroms
+    '''
+    
+    bedIntervalsDict = {}
+    for chrom in aChromList:
+        bedFilename = regionPlan.get_bed_filename(aBedPath, chrom)
+        if (bedFilename == None):
+            logging.warning("There is no .bed file for chrom %s in the directory %s.", chrom, aBedPath)
+            continue
+        
+        bedIntervalsDict[chrom] = regionPlan.read_bed_intervals(bedFilename, chrom)
+        if (anIsDebug):
+            logging.debug("get_bed_intervals(): found %s regions for chrom %s in %s", len(bedIntervalsDict[chrom]), chrom, bedFilename)
+    
+    return bedIntervalsDict
+
+
+def get_bam_chrom(aChrom, aMitochon, aUseChrPrefix):
+    '''
+    ' This function returns the name of a chrom in the .bam file of a sample the same way that the chrom is
+    ' selected for the pileups:  some bams/references use "M", some use "MT", and some use the 'chr' prefix.
+    '
+    ' aChrom:            The chrom
+    ' aMitochon:         The short name for the mitochondrial DNA of the sample (e.g. 'M' or 'MT')
+    ' aUseChrPrefix:     Whether the 'chr' prefix is used for the chroms of the sample
+    '''
+    
+    if ((aChrom == "M" or aChrom == "MT") and aMitochon != None):
+        aChrom = aMitochon
+    
+    if (aUseChrPrefix):
+        return "chr" + aChrom
+    return aChrom
+
+
+def is_indexed_pileups_file(aFilename):
+    '''
+    ' This function checks if a pileups file has been compressed with bgzip and indexed with tabix 
+    ' (e.g. "tabix -s 1 -b 2 -e 2 pileups.gz"), so that the pileups in a region can be read without 
+    ' reading the file from the top.
+    '
+    ' aFilename:    A .sam file or .mpileups file
+    '''
+    return (aFilename.endswith(".gz") and (os.path.isfile(aFilename + ".tbi") or os.path.isfile(aFilename + ".csi")))
+
+
+def get_sam_data(aSamFile, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aSourcePrefix, anIsDebug):
     '''
     ' This function uses the python generator to yield the information for one coordinate at a time. 
     ' This function is used during testing to read data from a .sam input file and can also
     ' be used when the user specifies an mpileup file instead of a bam file as input.  This function 
     ' yields the chromosome, coordinate, reference base, number of reads, raw reads, and quality scores.
+    ' If the file has been indexed with tabix, then the pysam API is used to seek straight to each region.
     '
     ' aSamFile:              A .sam file or .mpileups file
     ' aChrom:                The chromosome
     ' aStartCoordinate:      The initial start coordinate (typically zero)
     ' aStopCoordinate:       The initial stop coordinate (typically the size of the chromosome)
+    ' aRegionList:           The sorted list of (start, stop) regions that should be read or None for all of the coordinates
     ' aSourcePrefix:         A label used when debugging to determine the input file
     '''
     
     # open the sam file
-    samFileHandler = get_read_fileHandler(aSamFile)
+    if (pysam != None and is_indexed_pileups_file(aSamFile)):
+        samFileHandler = pysam.TabixFile(aSamFile)
+        # tabix uses 0-based, half-open coordinates
+        if (aChrom in samFileHandler.contigs):
+            lines = chain.from_iterable(samFileHandler.fetch(aChrom, max(0, start - 1), stop) for (start, stop) in (aRegionList or [(aStartCoordinate, aStopCoordinate)]))
+        else:
+            lines = []
+        
+        if (anIsDebug):
+            logging.debug("get_sam_data(): reading the indexed pileups in %s:%s-%s from %s", aChrom, aStartCoordinate, aStopCoordinate, aSamFile)
+    else:
+        samFileHandler = lineReader.get_read_fileHandler(aSamFile)
+        lines = samFileHandler
      
-    for line in samFileHandler:
+    for line in lines:
           
         # if the samtools select statement returns no reads which can happen when the batch size is
         # small and the selection is done in an area with no reads, then a warning message will be
@@ -213,7 +399,7 @@ def get_sam_data(aSamFile, aChrom, aStartCoordinate, aStopCoordinate, aSourcePre
     return
 
 
-def get_bam_data(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aChrom, aStartCoordinate, aStopCoordinate, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
+def get_bam_data(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
     '''
     ' This function uses the python generator to yield the information for one coordinate at a time.
     ' In order to reduce the time and memory overhead of loading the entire .bam file into memory at
@@ -228,31 +414,35 @@ def get_bam_data(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aChrom, aStart
     ' are processed, the start and end coordinates will be incremented, and the next selection will be made from the
     ' .bam file.  This process continues until the end of the chromosome has been reached.
     '
+    ' When the regions from a coordinates file are piled up, the batches are only made over the coordinates in the 
+    ' regions (see regionPlan.get_batches()), so all of the regions on a chrom are piled up by this one generator.
+    '
     ' This function yields the chromosome, coordinate, reference base, number of reads, raw reads, and the quality scores.
     '
     ' aBamFile:                              A .bam file to be read from
     ' aFastaFile:                            The FASTA file that should be used in the samtools command which is needed for the reference base.
     ' aMinBaseQual:                          The base quality score that should be used in the samtools command
     ' aMinMapQual:                           The mapping quality score that should be used in the samtools command
+    ' aPileupMaxDepth:                       The max number of reads per .bam file that are piled up at a coordinate (the samtools mpileup -d argument)
     ' aChrom:                                The chromosome that should be used in the samtools command
     ' aStartCoordinate:                      The initial start coordinate (typically zero)
     ' aStopCoordinate:                       The initial stop coordinate (typically the size of the chromosome)
+    ' aRegionList:                           The sorted list of (start, stop) regions that should be piled up or None for all of the coordinates
     ' aBatchSize:                            The number of coordinates to load into memory at one time
     ' aUseChrPrefix:                         Whether the 'chr' should be used in the region parameter of the samtools command
     ' aSourcePrefix:                         A label used when debugging to determine the input file
     ' anRnaIncludeSecondayAlignmentsFlag:    If you align the RNA to transcript isoforms, then you may want to include RNA secondary alignments in the samtools mpileups
     '''
     
-    # initialize the first start and stop coordinates
-    # the stop coordinate is calculated according to the "aBatchSize" param
-    currentStartCoordinate = aStartCoordinate
-    currentStopCoordinate = get_batch_end_coordinate(currentStartCoordinate, aStopCoordinate, aBatchSize)
+    # the batches are made over the regions, the stop coordinate of a batch is calculated according to the "aBatchSize" param
+    if (aRegionList == None):
+        aRegionList = [(aStartCoordinate, aStopCoordinate)]
 
     # while we still have coordinates to select from the .bam file
-    while (currentStartCoordinate <= aStopCoordinate):
+    for (currentStartCoordinate, currentStopCoordinate, batchRegionList) in regionPlan.get_batches(aRegionList, aBatchSize):
         
         # execute the samtools command
-        pileups = execute_samtools_cmd(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aChrom, aUseChrPrefix, currentStartCoordinate, currentStopCoordinate, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug)
+        pileups = execute_samtools_cmd(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aUseChrPrefix, currentStartCoordinate, currentStopCoordinate, batchRegionList, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug)
         
         numPileups = 0
         
@@ -293,15 +483,155 @@ def get_bam_data(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aChrom, aStart
 
         if (anIsDebug):        
             logging.debug("samtools number of lines selected from %s to %s = %s", currentStartCoordinate, currentStopCoordinate, numPileups)
+    
+    return
+
+
+def filter_base_quals(aReads, aBaseQualScores, aMapQualScores, aMinBaseQual):
+    '''
+    ' This function removes the reads with a base quality below aMinBaseQual from a pileup the same way as the
+    ' "samtools mpileup -Q" param does.  The reads are made up of the start of the read and its mapping quality,
+    ' the base, the insertion or deletion after the base, and the end of the read, and each read has one base quality
+    ' and one mapping quality.  It returns the number of reads that are left, the reads, the base qualities, and the
+    ' mapping qualities.  If all of the reads are removed, then the pileup is empty like the samtools pileup.
+    '
+    ' aReads:              The reads of the pileup
+    ' aBaseQualScores:     The base quality scores of the pileup
+    ' aMapQualScores:      The mapping quality scores of the pileup
+    ' aMinBaseQual:        The minimum base quality
+    '''
+    
+    minBaseQualScore = chr(aMinBaseQual + 33)
+    
+    # most of the time, none of the reads are filtered
+    if (min(aBaseQualScores) >= minBaseQualScore):
+        return (len(aBaseQualScores), aReads, aBaseQualScores, aMapQualScores)
+    
+    keptReads = []
+    keptBaseQualScores = []
+    keptMapQualScores = []
+    readIndex = 0
+    for (baseQualScore, mapQualScore) in zip(aBaseQualScores, aMapQualScores):
+        readStart = readIndex
+        
+        # the start of the read is followed by the mapping quality
+        if (aReads[readIndex] == "^"):
+            readIndex += 2
+        readIndex += 1
+        
+        # the insertion or deletion after the base is the size followed by the bases
+        if (readIndex < len(aReads) and aReads[readIndex] in "+-"):
+            sizeStart = readIndex + 1
+            readIndex = sizeStart
+            while (aReads[readIndex].isdigit()):
+                readIndex += 1
+            readIndex += int(aReads[sizeStart:readIndex])
         
-        # calculate a new start and stop coordinate for the next select statement
-        currentStartCoordinate = currentStartCoordinate + aBatchSize
-        currentStopCoordinate = get_batch_end_coordinate(currentStartCoordinate, aStopCoordinate, aBatchSize)
+        # the end of the read
+        if (readIndex < len(aReads) and aReads[readIndex] == "$"):
+            readIndex += 1
+        
+        if (baseQualScore >= minBaseQualScore):
+            keptReads.append(aReads[readStart:readIndex])
+            keptBaseQualScores.append(baseQualScore)
+            keptMapQualScores.append(mapQualScore)
+    
+    if (len(keptBaseQualScores) == 0):
+        return (0, "*", "*", "*")
+    
+    return (len(keptBaseQualScores), "".join(keptReads), "".join(keptBaseQualScores), "".join(keptMapQualScores))
+
+
+def get_joint_bam_data(aBamFileList, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aBatchSize, aUseChrPrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the information for one coordinate at a time.  Instead of 
+    ' running one samtools mpileup command per .bam file like get_bam_data(), this function runs one joint 
+    ' samtools mpileup command on all of the .bam files.  The joint pileup has the chrom, coordinate, and reference 
+    ' base followed by 4 columns per .bam file (number of reads, raw reads, base quality scores, and mapping quality 
+    ' scores).  The pileups are selected in batches like get_bam_data(), and since all of the samples are already 
+    ' lined up by coordinate, this function yields the same output as merge_pileups():  the coordinate and a list 
+    ' with one pileup per .bam file.  The pileup is None if the .bam file is None or if the sample doesn't have any 
+    ' reads at the coordinate, and it is an empty pileup with 0 reads if all of the reads are filtered by their base 
+    ' quality, just like the pileup of the samtools command on one .bam file.
+    '
+    ' All of the .bam files share one samtools command, so they must use the same FASTA file, quality scores, and chrom name.
+    '
+    ' aBamFileList:                          A list of .bam files to be read from, a .bam file can be None
+    ' aFastaFile:                            The FASTA file that should be used in the samtools command which is needed for the reference base.
+    ' aMinBaseQual:                          The base quality score that should be used in the samtools command
+    ' aMinMapQual:                           The mapping quality score that should be used in the samtools command
+    ' aPileupMaxDepth:                       The max number of reads per .bam file that are piled up at a coordinate (the samtools mpileup -d argument)
+    ' aChrom:                                The chromosome that should be used in the samtools command
+    ' aStartCoordinate:                      The initial start coordinate (typically zero)
+    ' aStopCoordinate:                       The initial stop coordinate (typically the size of the chromosome)
+    ' aRegionList:                           The sorted list of (start, stop) regions that should be piled up or None for all of the coordinates
+    ' aBatchSize:                            The number of coordinates to load into memory at one time
+    ' aUseChrPrefix:                         Whether the 'chr' should be used in the region parameter of the samtools command
+    ' anRnaIncludeSecondayAlignmentsFlag:    If you align the RNA to transcript isoforms, then you may want to include RNA secondary alignments in the samtools mpileups
+    '''
+    
+    # keep track of which samples are in the joint pileup
+    sampleIndexes = [index for (index, bamFile) in enumerate(aBamFileList) if bamFile != None]
+    bamFiles = " ".join([aBamFileList[index] for index in sampleIndexes])
+    
+    # the batches are made over the regions, the stop coordinate of a batch is calculated according to the "aBatchSize" param
+    if (aRegionList == None):
+        aRegionList = [(aStartCoordinate, aStopCoordinate)]
+
+    # while we still have coordinates to select from the .bam files
+    for (currentStartCoordinate, currentStopCoordinate, batchRegionList) in regionPlan.get_batches(aRegionList, aBatchSize):
+        
+        # execute the samtools command on all of the .bam files
+        pileups = execute_samtools_cmd(bamFiles, aFastaFile, 0, aMinMapQual, aPileupMaxDepth, aChrom, aUseChrPrefix, currentStartCoordinate, currentStopCoordinate, batchRegionList, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug)
+        
+        numPileups = 0
+        
+        # for each line representing one coordinate for all samples
+        for line in pileups:
+                
+            # ignore the warning messages from samtools
+            if (line.isspace() or line.startswith("[mpileup]") or line.startswith("<mpileup>")):
+                continue;
+
+            # strip the carriage return and newline characters
+            line = line.rstrip("\r\n")
+
+            # split the line on the tab
+            splitLine = line.split("\t")
+            
+            if (anIsDebug):    
+                logging.debug("Original joint BAM pileup: %s", line)
+
+            if (len(splitLine) < 3 + (4 * len(sampleIndexes))):
+                continue
+            
+            chrom = splitLine[0]
+            coordinate = int(splitLine[1])
+            reference = splitLine[2].upper()
+            
+            # get the pileup for each sample
+            # the joint samtools command doesn't filter the base qualities, so 0 reads means that the sample doesn't
+            # have any reads at this coordinate, and it is treated like the samples that don't have any data in merge_pileups()
+            # the base qualities are filtered here, and if all of the reads are filtered, then the sample gets the same
+            # empty pileup that the samtools command on its own .bam file would output
+            pileupList = [None] * len(aBamFileList)
+            for (columnIndex, sampleIndex) in enumerate(sampleIndexes):
+                firstColumn = 3 + (4 * columnIndex)
+                if (int(splitLine[firstColumn]) > 0):
+                    (numOfReads, reads, baseQualScores, mapQualScores) = filter_base_quals(splitLine[firstColumn+1], splitLine[firstColumn+2], splitLine[firstColumn+3], aMinBaseQual)
+                    pileupList[sampleIndex] = (chrom, coordinate, reference, numOfReads, reads, baseQualScores, mapQualScores)
+            
+            # yield the coordinate and the pileups for all samples
+            yield (coordinate, pileupList)
+            numPileups += 1
+
+        if (anIsDebug):        
+            logging.debug("samtools number of joint lines selected from %s to %s = %s", currentStartCoordinate, currentStopCoordinate, numPileups)
     
     return
 
 
-def execute_samtools_cmd(aBamFile, aFastaFile, aMinBaseQuality, aMinMapQuality, aChrom, aUseChrPrefix, aStartCoordinate, aStopCoordinate, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
+def execute_samtools_cmd(aBamFile, aFastaFile, aMinBaseQuality, aMinMapQuality, aPileupMaxDepth, aChrom, aUseChrPrefix, aStartCoordinate, aStopCoordinate, aRegionList, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
     '''
     ' This function executes an external command.  The command is the "samtools mpileup" command which returns all 
     ' the information about the sequencing reads for specific coordinates.  There are two things to be careful about
@@ -313,27 +643,42 @@ def execute_samtools_cmd(aBamFile, aFastaFile, aMinBaseQuality, aMinMapQuality,
     ' samtools mpileup -f /path/to/fasta/hg19.fa -Q 20 -q 10 -r chr1:855155-1009900 /path/to/bams/myBam.bam
     ' samtools mpileup -f /path/to/fasta/hg19.fa -Q 20 -q 10 -r 1:855155-1009900 /path/to/bams/myBam.bam
     '
-    ' aBamFile:                              A .bam file to be read from
+    ' If there is more than one region in the selection, then the regions are written to a temporary .bed file that
+    ' is passed with the -l argument, so that one samtools command only piles up the coordinates in the regions.
+    '
+    ' aBamFile:                              A .bam file to be read from (or a space separated list of .bam files for a joint pileup)
     ' aFastaFile:                            The FASTA file which is needed for the reference base.
     ' aMinBaseQuality:                       The base quality score for the samtools command
     ' aMinMapQuality:                        The mapping quality score for the samtools command
+    ' aPileupMaxDepth:                       The max number of reads per .bam file that are piled up at a coordinate (the samtools mpileup -d argument)
     ' aChrom:                                The chromosome that we are selecting from
     ' aUseChrPrefix:                         Whether the 'chr' should be used in the samtools command
     ' aStartCoordinate:                      The start coordinate of the selection
     ' aStopCoordinate:                       The stop coordinate of the selection
+    ' aRegionList:                           The list of (start, stop) regions within the selection or None for all of the coordinates
     ' anRnaIncludeSecondayAlignmentsFlag:    If you align the RNA to transcript isoforms, then you may want to include RNA secondary alignments in the samtools mpileups
     '''
     # create the samtools command
     if (aUseChrPrefix):
-        samtoolsSelectStatement = "samtools mpileup -E -s -f " + aFastaFile + " -Q " + str(aMinBaseQuality) + " -q " + str(aMinMapQuality) + " -r chr" + aChrom + ":" + str(aStartCoordinate) + "-" + str(aStopCoordinate) + " " + aBamFile
+        samtoolsSelectStatement = "samtools mpileup -E -s -f " + aFastaFile + " -Q " + str(aMinBaseQuality) + " -q " + str(aMinMapQuality) + " -d " + str(aPileupMaxDepth) + " -r chr" + aChrom + ":" + str(aStartCoordinate) + "-" + str(aStopCoordinate) + " " + aBamFile
     else:
-        samtoolsSelectStatement = "samtools mpileup -E -s -f " + aFastaFile + " -Q " + str(aMinBaseQuality) + " -q " + str(aMinMapQuality) + " -r " + aChrom + ":" + str(aStartCoordinate) + "-" + str(aStopCoordinate) + " " + aBamFile
+        samtoolsSelectStatement = "samtools mpileup -E -s -f " + aFastaFile + " -Q " + str(aMinBaseQuality) + " -q " + str(aMinMapQuality) + " -d " + str(aPileupMaxDepth) + " -r " + aChrom + ":" + str(aStartCoordinate) + "-" + str(aStopCoordinate) + " " + aBamFile
     
     # -ff (exclude flags):  unmapped reads, reads that fail quality checks, pcr duplicates
     # -rf (include flags):  everything else (including secondary alignments)
     if (anRnaIncludeSecondaryAlignmentsFlag):
         samtoolsSelectStatement += " --ff 1540 --rf 2555"
     
+    # only pile up the coordinates in the regions, the .bed file uses 0-based, half-open coordinates
+    regionsFilename = None
+    if (aRegionList != None and len(aRegionList) > 1):
+        (regionsFileDescriptor, regionsFilename) = tempfile.mkstemp(prefix="radia_", suffix=".bed")
+        regionsFileHandler = os.fdopen(regionsFileDescriptor, "w")
+        for (start, stop) in aRegionList:
+            regionsFileHandler.write(("chr" + aChrom if (aUseChrPrefix) else aChrom) + "\t" + str(start - 1) + "\t" + str(stop) + "\n")
+        regionsFileHandler.close()
+        samtoolsSelectStatement += " -l " + regionsFilename
+    
     # output the samtools command
     if (anIsDebug):
         logging.debug(samtoolsSelectStatement)
@@ -342,13 +687,28 @@ def execute_samtools_cmd(aBamFile, aFastaFile, aMinBaseQuality, aMinMapQuality,
     timeSamtoolsStart = time.time()
     samtoolsCall = subprocess.Popen(samtoolsSelectStatement, shell=True, bufsize=4096, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
     #samtoolsCall = subprocess.Popen(samtoolsSelectStatement, shell=True, bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+    
+    # read the stderr on its own thread while the stdout is being read
+    # otherwise samtools blocks (and never finishes) once it fills the stderr pipe
+    samtoolsStdErrList = []
+    stdErrThread = threading.Thread(target=drain_stream, args=(samtoolsCall.stderr, samtoolsStdErrList))
+    stdErrThread.daemon = True
+    stdErrThread.start()
    
-    for line in samtoolsCall.stdout:
-        yield line
+    # samtools reads the .bed file before it outputs any pileups, so it can be removed once the output is read
+    # (or when the generator is closed early)
+    try:
+        for line in samtoolsCall.stdout:
+            yield line
+    finally:
+        if (regionsFilename != None):
+            os.remove(regionsFilename)
 
     # communicate() waits for the process to finish
     #(pileups, samtoolsStdErr) = samtoolsCall.communicate()
-    samtoolsStdErr = samtoolsCall.wait()
+    samtoolsCall.wait()
+    stdErrThread.join()
+    samtoolsStdErr = "".join(samtoolsStdErrList)
 
     timeSamtoolsEnd = time.time()
     timeSpent = timeSamtoolsEnd-timeSamtoolsStart
@@ -368,7 +728,495 @@ def execute_samtools_cmd(aBamFile, aFastaFile, aMinBaseQuality, aMinMapQuality,
     return
 
 
-def convert_and_filter_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aReferenceBase, aMinBaseQuality, aMinMapQuality, anIsDebug):
+def drain_stream(aStream, aLineList):
+    '''
+    ' This function reads all of the lines from a stream until it is closed and keeps them in a list.
+    ' It is used to read the stderr of a subprocess on a separate thread.
+    '
+    ' aStream:     The stream to read from (e.g. the stderr of a subprocess)
+    ' aLineList:   The list where the lines are kept
+    '''
+    for line in aStream:
+        aLineList.append(line)
+    aStream.close()
+    return
+
+
+def get_queued_data(aGenerator, aQueueSize, aSourcePrefix, anIsDebug):
+    '''
+    ' This function starts a thread that fetches all of the pileups from a generator and puts them on a
+    ' bounded queue.  It returns a generator that yields the pileups from the queue, so it can be used in place
+    ' of the original generator.  This allows the pileups for each sample to be fetched (e.g. from a samtools
+    ' process) while the pileups from the other samples are being processed.  The pileups are put on the queue 
+    ' in chunks to reduce the overhead of the queue.  When the queue is full, the thread waits until the pileups
+    ' have been consumed.
+    '
+    ' aGenerator:      A generator that yields pileups
+    ' aQueueSize:      The maximum number of chunks of pileups that can be waiting on the queue
+    ' aSourcePrefix:   A label used when debugging to determine the input file
+    '''
+    
+    pileupsQueue = Queue.Queue(aQueueSize)
+    stopEvent = threading.Event()
+    
+    # start fetching the pileups right away
+    producerThread = threading.Thread(target=queue_pileups, args=(aGenerator, pileupsQueue, stopEvent, aSourcePrefix, anIsDebug))
+    producerThread.daemon = True
+    producerThread.start()
+    
+    return get_pileups_from_queue(pileupsQueue, stopEvent, aSourcePrefix, anIsDebug)
+
+
+def queue_pileups(aGenerator, aQueue, aStopEvent, aSourcePrefix, anIsDebug):
+    '''
+    ' This function runs on its own thread and puts the pileups from a generator on a queue.  Each item on
+    ' the queue is a tuple with a chunk of pileups and an error message.  When the generator is done, the chunk
+    ' is None.  If an error occurs, then the error message is set, so it can be reported on the main thread.
+    '
+    ' aGenerator:      A generator that yields pileups
+    ' aQueue:          The queue where the chunks of pileups are put
+    ' aStopEvent:      An event that is set when the pileups are no longer needed
+    ' aSourcePrefix:   A label used when debugging to determine the input file
+    '''
+    
+    try:
+        pileupsChunk = []
+        for pileup in aGenerator:
+            pileupsChunk.append(pileup)
+            if (len(pileupsChunk) >= i_pileupsChunkSize):
+                if (not put_on_queue(aQueue, (pileupsChunk, None), aStopEvent)):
+                    return
+                pileupsChunk = []
+        
+        # put the last chunk and then signal that we are done
+        if (len(pileupsChunk) > 0):
+            if (not put_on_queue(aQueue, (pileupsChunk, None), aStopEvent)):
+                return
+        put_on_queue(aQueue, (None, None), aStopEvent)
+    except Exception:
+        put_on_queue(aQueue, (None, traceback.format_exc()), aStopEvent)
+    
+    if (anIsDebug):
+        logging.debug("queue_pileups(): done fetching the pileups for %s", aSourcePrefix)
+    return
+
+
+def put_on_queue(aQueue, anItem, aStopEvent):
+    '''
+    ' This function puts an item on a bounded queue.  It waits while the queue is full, but it
+    ' gives up when the stop event is set, so that the thread doesn't wait forever when the
+    ' pileups are no longer needed.  It returns True if the item was put on the queue.
+    '
+    ' aQueue:          The queue
+    ' anItem:          The item to put on the queue
+    ' aStopEvent:      An event that is set when the items are no longer needed
+    '''
+    while (not aStopEvent.is_set()):
+        try:
+            aQueue.put(anItem, True, 1)
+            return True
+        except Queue.Full:
+            continue
+    return False
+
+
+def get_pileups_from_queue(aQueue, aStopEvent, aSourcePrefix, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the pileups that were put on the queue by queue_pileups().
+    ' If the thread that fetched the pileups had an error, then the error is reported and the program exits.
+    '
+    ' aQueue:          The queue with the chunks of pileups
+    ' aStopEvent:      An event that is set when the pileups are no longer needed
+    ' aSourcePrefix:   A label used when debugging to determine the input file
+    '''
+    try:
+        while (True):
+            (pileupsChunk, errorMessage) = aQueue.get()
+            if (errorMessage != None):
+                logging.critical("Error while fetching the pileups for %s:\n%s", aSourcePrefix, errorMessage)
+                sys.exit(1)
+            if (pileupsChunk == None):
+                break
+            for pileup in pileupsChunk:
+                yield pileup
+    finally:
+        # let the thread know that we don't need any more pileups
+        aStopEvent.set()
+    return
+
+
+def get_pysam_data(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the information for one coordinate at a time.
+    ' It is an alternative to the get_bam_data() function that doesn't start a "samtools mpileup" 
+    ' process for each batch.  Instead, the pileups are created in-process with the pysam API directly
+    ' from the alignment records.  The pysam pileup is configured to mirror the "samtools mpileup -E -s" 
+    ' command in execute_samtools_cmd() (BAQ recalculation, overlap detection, orphan and flag filtering), 
+    ' and the reads and quality scores are yielded in the samtools mpileup format, so this function 
+    ' can be used anywhere that get_bam_data() is used.  All of the regions are piled up from the same open .bam file.
+    '
+    ' This function yields the chromosome, coordinate, reference base, number of reads, raw reads, and the quality scores.
+    '
+    ' aBamFile:                              A .bam file to be read from
+    ' aFastaFile:                            The FASTA file which is needed for the reference base and the BAQ calculation
+    ' aMinBaseQual:                          The minimum base quality score
+    ' aMinMapQual:                           The minimum mapping quality score
+    ' aPileupMaxDepth:                       The max number of reads per .bam file that are piled up at a coordinate (the samtools mpileup -d argument)
+    ' aChrom:                                The chromosome that we are selecting from
+    ' aStartCoordinate:                      The initial start coordinate (typically zero)
+    ' aStopCoordinate:                       The initial stop coordinate (typically the size of the chromosome)
+    ' aRegionList:                           The sorted list of (start, stop) regions that should be piled up or None for all of the coordinates
+    ' aBatchSize:                            The number of reference bases to load into memory at one time
+    ' aUseChrPrefix:                         Whether the 'chr' prefix should be used for the chromosome name
+    ' aSourcePrefix:                         A label used when debugging to determine the input file
+    ' anRnaIncludeSecondayAlignmentsFlag:    If you align the RNA to transcript isoforms, then you may want to include RNA secondary alignments in the pileups
+    '''
+    
+    # some .bam files use the 'chr' prefix, some don't
+    if (aUseChrPrefix):
+        chrom = "chr" + aChrom
+    else:
+        chrom = aChrom
+    
+    # these are the same flags that are used in the samtools mpileup command
+    # the default excludes unmapped reads, secondary alignments, reads that fail quality checks, and pcr duplicates
+    # for the rna, the --ff 1540 and --rf 2555 flags are used to include secondary alignments
+    if (anRnaIncludeSecondaryAlignmentsFlag):
+        flagFilter = 1540
+        flagRequire = 2555
+    else:
+        flagFilter = 1796
+        flagRequire = 0
+    
+    bamFile = pysam.AlignmentFile(aBamFile, "rb")
+    # the reference bases come from the memory-mapped FASTA file that is shared by all of the samples,
+    # but pysam still needs its own handle on the FASTA file for the BAQ calculation
+    mappedFasta = fastaReader.get_mapped_fasta(aFastaFile)
+    fastaFile = pysam.FastaFile(aFastaFile)
+    
+    # the batches are made over the regions, the stop coordinate of a batch is calculated according to the "aBatchSize" param
+    if (aRegionList == None):
+        aRegionList = [(aStartCoordinate, aStopCoordinate)]
+    
+    # while we still have coordinates to select from the .bam file
+    for (currentStartCoordinate, currentStopCoordinate, batchRegionList) in regionPlan.get_batches(aRegionList, aBatchSize):
+        
+        # pysam uses 0-based, half-open coordinates
+        referenceSequence = mappedFasta.fetch(chrom, currentStartCoordinate, currentStopCoordinate)
+        pileupColumns = chain.from_iterable(bamFile.pileup(chrom, regionStart-1, regionStop, truncate=True, stepper="samtools", fastafile=fastaFile, min_base_quality=aMinBaseQual, min_mapping_quality=aMinMapQual, compute_baq=True, redo_baq=True, ignore_overlaps=True, ignore_orphans=True, flag_filter=flagFilter, flag_require=flagRequire, max_depth=aPileupMaxDepth) for (regionStart, regionStop) in batchRegionList)
+        
+        numPileups = 0
+        
+        # for each pileup column representing one coordinate
+        for pileupColumn in pileupColumns:
+            
+            coordinate = pileupColumn.reference_pos + 1
+            referenceIndex = coordinate - currentStartCoordinate
+            if (referenceIndex < len(referenceSequence)):
+                reference = referenceSequence[referenceIndex]
+            else:
+                reference = "N"
+            numOfReads = pileupColumn.get_num_aligned()
+            
+            # create the reads and quality scores in the samtools mpileup format
+            # samtools outputs a "*" when all of the reads have been filtered out
+            if (numOfReads > 0):
+                reads = "".join(pileupColumn.get_query_sequences(mark_matches=True, mark_ends=True, add_indels=True))
+                baseQualScores = "".join([chr(baseQual + 33) for baseQual in pileupColumn.get_query_qualities()])
+                mapQualScores = "".join([chr(min(mapQual, 93) + 33) for mapQual in pileupColumn.get_mapping_qualities()])
+            else:
+                reads = "*"
+                baseQualScores = "*"
+                mapQualScores = "*"
+            
+            if (anIsDebug):
+                logging.debug("Original pysam pileup for %s: %s %s %s %s %s %s %s", aSourcePrefix, chrom, coordinate, reference, numOfReads, reads, baseQualScores, mapQualScores)
+            
+            # yield all the information about the current coordinate
+            yield (chrom, coordinate, reference, numOfReads, reads, baseQualScores, mapQualScores)
+            numPileups += 1
+        
+        if (anIsDebug):
+            logging.debug("pysam number of pileups selected from %s to %s = %s", currentStartCoordinate, currentStopCoordinate, numPileups)
+    
+    bamFile.close()
+    fastaFile.close()
+    return
+
+
+def get_lanes_data(aLaneDataFunction, aLaneMergeFunction, aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the information for one coordinate at a time for a sample
+    ' that can have more than one .bam file (e.g. one per lane).  One .bam file is piled up with aLaneDataFunction
+    ' (get_bam_data() or get_pysam_data()) directly.  The lanes of a sample with more than one .bam file are merged
+    ' with get_merged_lanes_data(), so that the .bam files don't need to be merged with "samtools merge" first.  
+    ' It yields the same information as aLaneDataFunction.
+    '
+    ' aLaneDataFunction:                     The function that yields the pileups for one .bam file
+    ' aLaneMergeFunction:                    The function that merges the lanes of a region into one .bam file
+    ' aBamFile:                              A .bam file or a comma-separated list of .bam files to be read from
+    ' The rest of the params are passed on to aLaneDataFunction.
+    '''
+    
+    laneFilenames = aBamFile.split(",")
+    if (len(laneFilenames) == 1):
+        return aLaneDataFunction(aBamFile, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug)
+    
+    return get_merged_lanes_data(aLaneDataFunction, aLaneMergeFunction, laneFilenames, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug)
+
+
+def get_merged_lanes_data(aLaneDataFunction, aLaneMergeFunction, aLaneFilenameList, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, aStartCoordinate, aStopCoordinate, aRegionList, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the information for one coordinate at a time for a sample
+    ' with one .bam file per lane.  For each batch, the reads of the lanes that overlap the batch are merged into a 
+    ' temporary .bam file with aLaneMergeFunction, and the temporary .bam file is piled up with aLaneDataFunction.
+    ' The reads are merged before they are piled up, so the reads are in the same order as in one merged .bam file, 
+    ' the --pileupMaxDepth applies to all of the reads of the sample, and the pileups are the same as for one merged 
+    ' .bam file (including the reads that are kept at coordinates that are deeper than the --pileupMaxDepth or --maxDepth).
+    '
+    ' aLaneDataFunction:                     The function that yields the pileups for one .bam file
+    ' aLaneMergeFunction:                    The function that merges the lanes of a region into one .bam file
+    ' aLaneFilenameList:                     The list of .bam files of the lanes
+    ' The rest of the params are passed on to aLaneDataFunction.
+    '''
+    
+    # some .bam files use the 'chr' prefix, some don't
+    if (aUseChrPrefix):
+        chrom = "chr" + aChrom
+    else:
+        chrom = aChrom
+    
+    # the batches are made over the regions, the stop coordinate of a batch is calculated according to the "aBatchSize" param
+    if (aRegionList == None):
+        aRegionList = [(aStartCoordinate, aStopCoordinate)]
+    
+    for (currentStartCoordinate, currentStopCoordinate, batchRegionList) in regionPlan.get_batches(aRegionList, aBatchSize):
+        (mergedFileDescriptor, mergedFilename) = tempfile.mkstemp(prefix="radia_", suffix=".bam")
+        os.close(mergedFileDescriptor)
+        
+        # the merged .bam file and its index are removed once the pileups are read (or when the generator is closed early)
+        try:
+            aLaneMergeFunction(aLaneFilenameList, mergedFilename, chrom + ":" + str(currentStartCoordinate) + "-" + str(currentStopCoordinate), anIsDebug)
+            
+            # the merged .bam file only has the reads of this batch, so it is piled up in one batch
+            for pileup in aLaneDataFunction(mergedFilename, aFastaFile, aMinBaseQual, aMinMapQual, aPileupMaxDepth, aChrom, currentStartCoordinate, currentStopCoordinate, batchRegionList, aBatchSize, aUseChrPrefix, aSourcePrefix, anRnaIncludeSecondaryAlignmentsFlag, anIsDebug):
+                yield pileup
+        finally:
+            for filename in (mergedFilename, mergedFilename + ".bai"):
+                if (os.path.exists(filename)):
+                    os.remove(filename)
+    
+    return
+
+
+def execute_samtools_merge(aLaneFilenameList, aMergedFilename, aRegion, anIsDebug):
+    '''
+    ' This function merges the reads of the lanes that overlap a region into one .bam file and indexes it with the
+    ' "samtools merge" and "samtools index" commands.  Like one merged .bam file, the reads are sorted by their 
+    ' coordinate, and the reads with the same coordinate stay in the order of the lanes.
+    '
+    ' aLaneFilenameList:    The list of .bam files of the lanes
+    ' aMergedFilename:      The merged .bam file that is overwritten
+    ' aRegion:              The region in the samtools format (e.g. chr1:855155-1009900)
+    '''
+    
+    for samtoolsStatement in ("samtools merge -f -R " + aRegion + " " + aMergedFilename + " " + " ".join(aLaneFilenameList), "samtools index " + aMergedFilename):
+        if (anIsDebug):
+            logging.debug(samtoolsStatement)
+        
+        samtoolsCall = subprocess.Popen(samtoolsStatement, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+        (samtoolsStdOut, samtoolsStdErr) = samtoolsCall.communicate()
+        if (samtoolsCall.returncode != 0):
+            logging.critical("The return code of '%s' from '%s' indicates an error.", samtoolsCall.returncode, samtoolsStatement)
+            logging.critical("Warning/error from %s:\n%s", samtoolsStatement, samtoolsStdErr)
+            sys.exit(1)
+    return
+
+
+def execute_pysam_merge(aLaneFilenameList, aMergedFilename, aRegion, anIsDebug):
+    '''
+    ' This function does the same as execute_samtools_merge() with the samtools commands that are built into pysam,
+    ' so the pysam pileup engine doesn't need the samtools executable.  The commands that are built into pysam share 
+    ' global state, so only one thread runs them at a time.
+    '
+    ' aLaneFilenameList:    The list of .bam files of the lanes
+    ' aMergedFilename:      The merged .bam file that is overwritten
+    ' aRegion:              The region in the samtools format (e.g. chr1:855155-1009900)
+    '''
+    
+    if (anIsDebug):
+        logging.debug("pysam.merge -f -R %s %s %s", aRegion, aMergedFilename, " ".join(aLaneFilenameList))
+    
+    with i_pysamCommandLock:
+        pysam.merge("-f", "-R", aRegion, aMergedFilename, *aLaneFilenameList)
+        pysam.index(aMergedFilename)
+    return
+
+
+class AlleleAccumulator(object):
+    '''
+    ' This class accumulates the counts, quality sums, and strand counts per allele for one pileup.  Each allele in 
+    ' i_alleles has a fixed slot, and there is one extra slot for a reference base that is not one of the i_alleles.  
+    ' The slots are reset in place for each pileup instead of allocating new dicts and updating them for every base.
+    ' The alleles are kept in the order that they were found, so the dicts from get_dicts() have their keys inserted
+    ' in the same order as before.
+    '
+    ' pileupAlleleIndexes maps each pileup character that is a base to its slot:  "." and "," to the slot of the
+    ' reference base, "ACGTN" and "acgtn" to the slots of the upper case bases.  alleleNames has the allele of each slot.
+    '''
+    
+    __slots__ = ("numBases", "sumBaseQuals", "sumMapQuals", "mapQualZeroes", "maxMapQuals", "plusStrandCounts", "alleleOrder", "pileupAlleleIndexes", "alleleNames")
+    
+    def __init__(self):
+        numSlots = len(i_alleles) + 1
+        self.numBases = [0] * numSlots
+        self.sumBaseQuals = [0] * numSlots
+        self.sumMapQuals = [0] * numSlots
+        self.mapQualZeroes = [0] * numSlots
+        self.maxMapQuals = [0] * numSlots
+        self.plusStrandCounts = [0] * numSlots
+        self.alleleOrder = []
+        self.alleleNames = list(i_alleles) + [None]
+        self.pileupAlleleIndexes = {}
+        for (index, allele) in enumerate(i_alleles):
+            self.pileupAlleleIndexes[allele] = index
+            self.pileupAlleleIndexes[allele.lower()] = index
+    
+    def reset(self, aReferenceBase):
+        '''
+        ' This function only resets the slots of the alleles that were found in the last pileup, 
+        ' and it points "." and "," to the slot of the next reference base.
+        '
+        ' aReferenceBase:    The upper case reference base of the next pileup
+        '''
+        referenceIndex = i_alleleIndexes.get(aReferenceBase, len(i_alleles))
+        self.alleleNames[len(i_alleles)] = aReferenceBase
+        self.pileupAlleleIndexes["."] = referenceIndex
+        self.pileupAlleleIndexes[","] = referenceIndex
+        
+        for alleleIndex in self.alleleOrder:
+            self.numBases[alleleIndex] = 0
+            self.sumBaseQuals[alleleIndex] = 0
+            self.sumMapQuals[alleleIndex] = 0
+            self.mapQualZeroes[alleleIndex] = 0
+            self.maxMapQuals[alleleIndex] = 0
+            self.plusStrandCounts[alleleIndex] = 0
+        del self.alleleOrder[:]
+    
+    def get_dicts(self):
+        '''
+        ' This function returns the counts as the dicts that find_variants() and format_bam_output() use:  the base counts,
+        ' the sums of the base qualities, the sums of the mapping qualities, the mapping qualities of zero, the max mapping 
+        ' qualities, and the plus strand counts.  The dicts only have keys for the alleles that were found, the mapping
+        ' quality zeroes and plus strand counts only have keys for the alleles with a count.
+        '''
+        numBasesDict = collections.defaultdict(int)
+        sumBaseQualsDict = collections.defaultdict(int)
+        sumMapQualsDict = collections.defaultdict(int)
+        mapQualZeroesDict = collections.defaultdict(int)
+        maxMapQualsDict = collections.defaultdict(int)
+        plusStrandCountsDict = collections.defaultdict(int)
+        
+        for alleleIndex in self.alleleOrder:
+            allele = self.alleleNames[alleleIndex]
+            numBasesDict[allele] = self.numBases[alleleIndex]
+            sumBaseQualsDict[allele] = self.sumBaseQuals[alleleIndex]
+            sumMapQualsDict[allele] = self.sumMapQuals[alleleIndex]
+            maxMapQualsDict[allele] = self.maxMapQuals[alleleIndex]
+            if (self.mapQualZeroes[alleleIndex] > 0):
+                mapQualZeroesDict[allele] = self.mapQualZeroes[alleleIndex]
+            if (self.plusStrandCounts[alleleIndex] > 0):
+                plusStrandCountsDict[allele] = self.plusStrandCounts[alleleIndex]
+        
+        return (numBasesDict, sumBaseQualsDict, sumMapQualsDict, mapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict)
+
+
+# one accumulator is reused for all of the pileups that are decoded on a thread, and each thread has its own
+# accumulator, since the pileups can also be decoded on the threads that fetch them (see summarize_pileups())
+i_alleleAccumulators = threading.local()
+
+
+def get_allele_accumulator():
+    '''
+    ' This function returns the allele accumulator of the current thread.
+    '''
+    try:
+        return i_alleleAccumulators.accumulator
+    except AttributeError:
+        i_alleleAccumulators.accumulator = AlleleAccumulator()
+        return i_alleleAccumulators.accumulator
+
+
+def is_kept_read(aReadIndex, aNumReads, aMaxDepth):
+    '''
+    ' This function determines if a read is kept when a pileup with aNumReads reads is capped at aMaxDepth reads.
+    ' The reads are kept at evenly spaced indexes, so that exactly aMaxDepth reads are kept and the reads that are
+    ' kept don't depend on anything but the order of the reads in the pileup.  decode_pileup_block() keeps the same reads.
+    '
+    ' aReadIndex:    The index of the read in the pileup (the index of its base quality)
+    ' aNumReads:     The number of reads in the pileup
+    ' aMaxDepth:     The max number of reads that are kept
+    '''
+    return (((aReadIndex + 1) * aMaxDepth) // aNumReads > (aReadIndex * aMaxDepth) // aNumReads)
+
+
+def reduce_capped_pileup(aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aMaxDepth):
+    '''
+    ' This function reduces a pileup with more than aMaxDepth reads to the bases and quality scores of the reads
+    ' that are kept (see is_kept_read()), so that convert_and_filter_raw_reads() doesn't walk over all of the reads
+    ' that are not kept.  The marks between the bases are found with a regular expression, and the starts, stops, 
+    ' and indels are counted on all of the reads just like they are when the whole pileup is decoded.  It returns 
+    ' the kept bases, base quality scores, and mapping quality scores, and the number of starts, stops, insertions,
+    ' and deletions, or None if the number of bases doesn't match the number of quality scores.
+    '
+    ' aStringOfRawReads: A string representing the pile-up of read bases from a samtools mpileup command 
+    ' aStringOfRawBaseQuals: A string representing the raw base quality scores for the read bases from the mpileup command
+    ' aStringOfRawMapQuals: A string representing the raw mapping quality scores for the reads from the mpileup command
+    ' aMaxDepth: The max number of reads that are kept
+    '''
+    
+    starts = 0
+    stops = 0
+    insertions = 0
+    deletions = 0
+    basesList = []
+    baseStart = 0
+    for match in i_readMarksRegEx.finditer(aStringOfRawReads):
+        # skip the bases of an insertion or deletion
+        if (match.start() < baseStart):
+            continue
+        
+        basesList.append(aStringOfRawReads[baseStart:match.start()])
+        mark = match.group()
+        if (mark[0] == "^"):
+            starts += 1
+            baseStart = match.end()
+        elif (mark == "$"):
+            stops += 1
+            baseStart = match.end()
+        else:
+            if (mark[0] == "+"):
+                insertions += 1
+            else:
+                deletions += 1
+            baseStart = match.end() + int(match.group(1))
+    basesList.append(aStringOfRawReads[baseStart:])
+    bases = "".join(basesList)
+    
+    numReads = len(aStringOfRawBaseQuals)
+    if (len(bases) != numReads or len(aStringOfRawMapQuals) != numReads):
+        return None
+    
+    # these are the indexes where is_kept_read() is true
+    keptIndexes = [(((keptIndex + 1) * numReads) + aMaxDepth - 1) // aMaxDepth - 1 for keptIndex in xrange(aMaxDepth)]
+    keptBases = "".join([bases[index] for index in keptIndexes])
+    keptBaseQuals = "".join([aStringOfRawBaseQuals[index] for index in keptIndexes])
+    keptMapQuals = "".join([aStringOfRawMapQuals[index] for index in keptIndexes])
+    
+    return (keptBases, keptBaseQuals, keptMapQuals, starts, stops, insertions, deletions)
+
+
+def convert_and_filter_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aReferenceBase, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug):
     '''
     ' This function returns all of the valid RNA (cDNA) or DNA bases from the given pileup of read bases.
     ' It converts all of the samtools specific characters into human-readable bases and filters out any non 
@@ -400,10 +1248,15 @@ def convert_and_filter_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOf
     ' We are ignoring the following for now:
     ' 1) Reference skips (">" and "<")
     '
+    ' When there are more than aMaxDepth reads in the pileup, only aMaxDepth reads that are evenly spaced across 
+    ' the pileup are kept (see is_kept_read()), so the same reads are kept every time.  The pileup is reduced to 
+    ' those reads before it is decoded (see reduce_capped_pileup()).
+    '
     ' aStringOfRawReads: A string representing the pile-up of read bases from a samtools mpileup command 
     ' aStringOfRawBaseQuals: A string representing the raw base quality scores for the read bases from the mpileup command
     ' aStringOfRawMapQuals: A string representing the raw mapping quality scores for the reads from the mpileup command
     ' aReferenceBase: Used to convert "." and "," from the samtools mpileup command
+    ' aMaxDepth: The max number of reads that are kept, 0 keeps all of the reads
     '''
     # Note:  Reverse strand mismatches have been reverse-complemented by samtools
             
@@ -418,12 +1271,24 @@ def convert_and_filter_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOf
     currBaseIndex = 0
     currBaseQualIndex = 0
     currMapQualIndex = 0
-    numBasesDict = collections.defaultdict(int)
-    sumBaseQualsDict = collections.defaultdict(int)
-    sumMapQualsDict = collections.defaultdict(int)
-    numPlusStrandDict = collections.defaultdict(int)
-    maxMapQualsDict = collections.defaultdict(int)
-    sumMapQualZeroesDict = collections.defaultdict(int)
+    
+    # the reads are counted by their base qualities
+    numReads = len(aStringOfRawBaseQuals)
+    isCapped = (aMaxDepth > 0 and numReads > aMaxDepth)
+    
+    # a capped pileup is reduced to the reads that are kept, so only those reads are walked below
+    if (isCapped):
+        cappedPileup = reduce_capped_pileup(aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aMaxDepth)
+        if (cappedPileup != None):
+            (aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, starts, stops, insertions, deletions) = cappedPileup
+            isCapped = False
+    
+    # the counts per allele are accumulated in the slots of the accumulator, a reference that is not
+    # one of the i_alleles gets the extra slot at the end
+    alleleAccumulator = get_allele_accumulator()
+    alleleAccumulator.reset(aReferenceBase.upper())
+    (numBases, sumBaseQuals, sumMapQuals, mapQualZeroes, maxMapQuals, plusStrandCounts, alleleOrder) = (alleleAccumulator.numBases, alleleAccumulator.sumBaseQuals, alleleAccumulator.sumMapQuals, alleleAccumulator.mapQualZeroes, alleleAccumulator.maxMapQuals, alleleAccumulator.plusStrandCounts, alleleAccumulator.alleleOrder)
+    (pileupAlleleIndexes, alleleNames) = (alleleAccumulator.pileupAlleleIndexes, alleleAccumulator.alleleNames)
     
     # for testing:
     #aStringOfRawReads = 'T$TT+3AGG^".GT+2AG+2AG,-2AGGG..-1A<<>>'
@@ -509,98 +1374,34 @@ def convert_and_filter_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOf
             # skip over all end of read symbols "$"
             # there are no base or mapping quality scores for stop symbols that need to be skipped
             currBaseIndex += 1
-            stops += 1
-        elif base == ".":
-            # a period represents the reference base on the plus strand
-            if convertedBaseQual >= aMinBaseQuality and convertedMapQual >= aMinMapQuality:
-                base = aReferenceBase.upper()
-                finalBases += base
-                finalBaseQuals += rawBaseQual
-                finalMapQuals += rawMapQual
-                numPlusStrandDict[base] += 1
-                numBasesDict[base] += 1
-                sumBaseQualsDict[base] += convertedBaseQual
-                sumMapQualsDict[base] += convertedMapQual
-                
-                # count the number of mapping qualities that are zero per allele
-                if (convertedMapQual == 0):
-                    sumMapQualZeroesDict[base] += 1
-                
-                # keep track of the max mapping quality per allele
-                if (convertedMapQual > maxMapQualsDict[base]):
-                    maxMapQualsDict[base] = convertedMapQual
-                    
-            currBaseIndex += 1
-            currBaseQualIndex += 1
-            currMapQualIndex += 1
-        elif base == ",":
-            # a comma represents the reference base on the negative strand
-            if convertedBaseQual >= aMinBaseQuality and convertedMapQual >= aMinMapQuality:
-                base = aReferenceBase.upper()
-                finalBases += base
-                finalBaseQuals += rawBaseQual
-                finalMapQuals += rawMapQual
-                numBasesDict[base] += 1
-                sumBaseQualsDict[base] += convertedBaseQual
-                sumMapQualsDict[base] += convertedMapQual
-                
-                # count the number of mapping qualities that are zero per allele
-                if (convertedMapQual == 0):
-                    sumMapQualZeroesDict[base] += 1
-                
-                # keep track of the max mapping quality per allele
-                if (convertedMapQual > maxMapQualsDict[base]):
-                    maxMapQualsDict[base] = convertedMapQual
-                
-            currBaseIndex += 1
-            currBaseQualIndex += 1
-            currMapQualIndex += 1
-        elif base in "AGCTN":
-            #if (anIsDebug):
-            #    logging.debug("base=%s, rawBaseQual=%s, ord(rawBaseQual)=%s, convertedBaseQual=%s, aMinBaseQual=%s", base, rawBaseQual, ord(rawBaseQual), str(convertedBaseQual), str(aMinBaseQuality))
-            
-            # a non reference on the plus strand
-            if convertedBaseQual >= aMinBaseQuality and convertedMapQual >= aMinMapQuality:
-                finalBases += base
+            stops += 1
+        elif base in pileupAlleleIndexes:
+            # a period represents the reference base on the plus strand and a comma on the negative strand
+            # upper case bases are non references on the plus strand and lower case bases on the negative strand
+            if convertedBaseQual >= aMinBaseQuality and convertedMapQual >= aMinMapQuality and (not isCapped or is_kept_read(currBaseQualIndex, numReads, aMaxDepth)):
+                alleleIndex = pileupAlleleIndexes[base]
+                finalBases += alleleNames[alleleIndex]
                 finalBaseQuals += rawBaseQual
                 finalMapQuals += rawMapQual
-                numPlusStrandDict[base] += 1
-                numBasesDict[base] += 1
-                sumBaseQualsDict[base] += convertedBaseQual
-                sumMapQualsDict[base] += convertedMapQual
-                
-                # count the number of mapping qualities that are zero per allele
-                if (convertedMapQual == 0):
-                    sumMapQualZeroesDict[base] += 1
                 
-                # keep track of the max mapping quality per allele
-                if (convertedMapQual > maxMapQualsDict[base]):
-                    maxMapQualsDict[base] = convertedMapQual
+                # keep track of the order that the alleles are found in
+                if (numBases[alleleIndex] == 0):
+                    alleleOrder.append(alleleIndex)
+                numBases[alleleIndex] += 1
+                sumBaseQuals[alleleIndex] += convertedBaseQual
+                sumMapQuals[alleleIndex] += convertedMapQual
                 
-            currBaseIndex += 1
-            currBaseQualIndex += 1
-            currMapQualIndex += 1
-        elif base in "agctn":
-            #if (anIsDebug):
-            #    logging.debug("base=%s, rawBaseQual=%s, ord(rawBaseQual)=%s, convertedBaseQual=%s, aMinBaseQual=%s", base, rawBaseQual, ord(rawBaseQual), str(convertedBaseQual), str(aMinBaseQuality))
-            
-            # a non reference on the negative strand
-            if convertedBaseQual >= aMinBaseQuality and convertedMapQual >= aMinMapQuality:
-                base = base.upper()
-                finalBases += base
-                finalBaseQuals += rawBaseQual
-                finalMapQuals += rawMapQual
-                numBasesDict[base] += 1
-                sumBaseQualsDict[base] += convertedBaseQual
-                sumMapQualsDict[base] += convertedMapQual
+                # count the number of bases on the plus strand
+                if (base in ".ACGTN"):
+                    plusStrandCounts[alleleIndex] += 1
                 
                 # count the number of mapping qualities that are zero per allele
                 if (convertedMapQual == 0):
-                    sumMapQualZeroesDict[base] += 1
+                    mapQualZeroes[alleleIndex] += 1
                 
                 # keep track of the max mapping quality per allele
-                if (convertedMapQual > maxMapQualsDict[base]):
-                    maxMapQualsDict[base] = convertedMapQual
+                if (convertedMapQual > maxMapQuals[alleleIndex]):
+                    maxMapQuals[alleleIndex] = convertedMapQual
                 
             currBaseIndex += 1
             currBaseQualIndex += 1
@@ -624,9 +1425,384 @@ def convert_and_filter_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOf
     if (lenFinalBases != lenFinalMapQuals):
         logging.error("Traceback: convert_and_filter_raw_reads() Error at coordinate %s:%s.  The length %s of the final pileup of reads is != the length %s of the final mapping quality scores.  Original Pileup=%s, Final Pileup=%s, Original MapQualScores=%s, Final MapQualScores=%s", aChr, str(aCoordinate), lenFinalBases, lenFinalBaseQuals, aStringOfRawReads, finalBases, aStringOfRawMapQuals, finalMapQuals)
      
+    (numBasesDict, sumBaseQualsDict, sumMapQualsDict, sumMapQualZeroesDict, maxMapQualsDict, numPlusStrandDict) = alleleAccumulator.get_dicts()
+     
     return (finalBases, finalBaseQuals, finalMapQuals, lenFinalBases, starts, stops, (insertions + deletions), numBasesDict, sumBaseQualsDict, sumMapQualsDict, sumMapQualZeroesDict, maxMapQualsDict, numPlusStrandDict)
 
+
+
+def decode_pileup_block(aReadsList, aBaseQualsList, aMapQualsList, aReferenceBaseList, aMinBaseQuality, aMinMapQuality, aMaxDepth):
+    '''
+    ' This function decodes a block of pileups with vectorized numpy operations instead of looping over each 
+    ' character like convert_and_filter_raw_reads().  The pileups for all of the rows are concatenated into one 
+    ' array, the start of read symbols and their mapping qualities, the INDELs, and the end of read symbols are
+    ' masked out, and the remaining characters are lined up with their base and mapping qualities.  The bases that
+    ' pass the minimum base and mapping qualities are counted per allele in the order of i_alleles.  The reference
+    ' bases must be one of the i_alleles (upper or lower case).  The rows with more than aMaxDepth reads are capped
+    ' to the same reads as is_kept_read().
+    '
+    ' This function returns a tuple of numpy arrays:
+    ' numBases, starts, stops, indels - 1 value per row
+    ' baseCounts, sumBaseQuals, sumMapQuals, mapQualZeroes, maxMapQuals, plusStrandCounts - 1 row per pileup and 1 column per allele
+    ' finalBases, finalBaseQuals, finalMapQuals - the characters of the bases that passed for all of the rows, where
+    '     the bases for each row follow the bases of the previous row and the number of bases per row is in numBases
+    '
+    ' aReadsList:            A list of the read bases from the mpileups
+    ' aBaseQualsList:        A list of the raw base quality scores
+    ' aMapQualsList:         A list of the raw mapping quality scores
+    ' aReferenceBaseList:    A list of the reference bases used to convert "." and ","
+    ' aMinBaseQuality:       The minimum base quality
+    ' aMinMapQuality:        The minimum mapping quality
+    ' aMaxDepth:             The max number of reads that are kept per row, 0 keeps all of the reads
+    '''
+    
+    numRows = len(aReadsList)
+    numAlleles = len(i_alleles)
+    reads = numpy.frombuffer("".join(aReadsList), dtype=numpy.uint8)
+    numChars = len(reads)
+    rowIds = numpy.repeat(numpy.arange(numRows), [len(rawReads) for rawReads in aReadsList])
+    
+    # the allele index for each pileup character:  -2 for a match to the reference, -1 for everything else
+    alleleTable = numpy.empty(256, dtype=numpy.int64)
+    alleleTable.fill(-1)
+    plusStrandTable = numpy.zeros(256, dtype=numpy.bool_)
+    for (index, allele) in enumerate(i_alleles):
+        alleleTable[ord(allele)] = index
+        alleleTable[ord(allele.lower())] = index
+        plusStrandTable[ord(allele)] = True
+    alleleTable[ord(".")] = -2
+    alleleTable[ord(",")] = -2
+    plusStrandTable[ord(".")] = True
+    
+    # a start of read symbol "^" is followed by the mapping quality of the read, which can be any character, 
+    # even another "^", so in a run of "^" characters every other one is a start of read symbol
+    caretPositions = numpy.flatnonzero(reads == ord("^"))
+    newRun = numpy.ones(len(caretPositions), dtype=numpy.bool_)
+    newRun[1:] = (numpy.diff(caretPositions) != 1)
+    runStartPositions = numpy.maximum.accumulate(numpy.where(newRun, caretPositions, 0))
+    startPositions = caretPositions[(caretPositions - runStartPositions) % 2 == 0]
+    
+    # mask the start of read symbols and their mapping qualities
+    skipped = numpy.zeros(numChars + 1, dtype=numpy.bool_)
+    skipped[startPositions] = True
+    skipped[startPositions + 1] = True
+    skipped = skipped[:numChars]
+    
+    # an INDEL looks like "+3AGG" or "-12AGGGTTTCCCAA", so find the digits after the sign to get the number of bases to skip
+    signPositions = numpy.flatnonzero(((reads == ord("+")) | (reads == ord("-"))) & ~skipped)
+    indelLengths = numpy.zeros(len(signPositions), dtype=numpy.int64)
+    numDigits = numpy.zeros(len(signPositions), dtype=numpy.int64)
+    isDigit = numpy.ones(len(signPositions), dtype=numpy.bool_)
+    while (isDigit.any()):
+        digitPositions = signPositions + numDigits + 1
+        digits = reads[numpy.minimum(digitPositions, numChars - 1)].astype(numpy.int64) - ord("0")
+        isDigit &= (digitPositions < numChars) & (digits >= 0) & (digits <= 9)
+        indelLengths = numpy.where(isDigit, (indelLengths * 10) + digits, indelLengths)
+        numDigits += isDigit
+    
+    # mask the INDELs from the sign to the last base
+    indelEnds = numpy.minimum(signPositions + numDigits + indelLengths + 1, numChars)
+    indelDeltas = numpy.zeros(numChars + 1, dtype=numpy.int64)
+    numpy.add.at(indelDeltas, signPositions, 1)
+    numpy.add.at(indelDeltas, indelEnds, -1)
+    skipped |= (numpy.cumsum(indelDeltas)[:numChars] > 0)
+    
+    # mask the end of read symbols
+    isStop = (reads == ord("$")) & ~skipped
+    skipped |= isStop
+    
+    # all of the remaining characters have a base and mapping quality
+    qualPositions = numpy.flatnonzero(~skipped)
+    qualRowIds = rowIds[qualPositions]
+    qualsPerRow = numpy.bincount(qualRowIds, minlength=numRows)
+    qualRanks = numpy.arange(len(qualPositions)) - (numpy.cumsum(qualsPerRow) - qualsPerRow)[qualRowIds]
+    
+    # line up the raw qualities with the characters, there are no qualities for characters past the end of the qualities
+    rawQualsList = []
+    convertedQualsList = []
+    for qualsList in (aBaseQualsList, aMapQualsList):
+        quals = numpy.append(numpy.frombuffer("".join(qualsList), dtype=numpy.uint8), numpy.uint8(0))
+        qualLengths = numpy.array([len(rawQuals) for rawQuals in qualsList], dtype=numpy.int64)
+        hasQual = (qualRanks < qualLengths[qualRowIds])
+        qualIndexes = numpy.where(hasQual, (numpy.cumsum(qualLengths) - qualLengths)[qualRowIds] + qualRanks, len(quals) - 1)
+        rawQualsList.append(quals[qualIndexes])
+        convertedQualsList.append(numpy.where(hasQual, quals[qualIndexes].astype(numpy.int64) - 33, -1))
+    (rawBaseQuals, rawMapQuals) = rawQualsList
+    (convertedBaseQuals, convertedMapQuals) = convertedQualsList
+    
+    # convert "." and "," to the reference base and filter by the base and mapping qualities
+    referenceIndexes = numpy.array([i_alleleIndexes[referenceBase.upper()] for referenceBase in aReferenceBaseList], dtype=numpy.int64)
+    alleles = alleleTable[reads[qualPositions]]
+    alleles = numpy.where(alleles == -2, referenceIndexes[qualRowIds], alleles)
+    passed = (alleles >= 0) & (convertedBaseQuals >= aMinBaseQuality) & (convertedMapQuals >= aMinMapQuality)
+    
+    # the reads are counted by their base qualities, and only the evenly spaced reads are kept in the rows with too many reads
+    if (aMaxDepth > 0):
+        numReads = numpy.array([len(rawQuals) for rawQuals in aBaseQualsList], dtype=numpy.int64)[qualRowIds]
+        isKept = (((qualRanks + 1) * aMaxDepth) // numpy.maximum(numReads, 1)) > ((qualRanks * aMaxDepth) // numpy.maximum(numReads, 1))
+        passed &= (numReads <= aMaxDepth) | isKept
+    
+    # count everything per row and allele
+    passedMapQuals = convertedMapQuals[passed]
+    rowAlleles = (qualRowIds[passed] * numAlleles) + alleles[passed]
+    size = numRows * numAlleles
+    baseCounts = numpy.bincount(rowAlleles, minlength=size).reshape(numRows, numAlleles)
+    sumBaseQuals = numpy.bincount(rowAlleles, weights=convertedBaseQuals[passed], minlength=size).astype(numpy.int64).reshape(numRows, numAlleles)
+    sumMapQuals = numpy.bincount(rowAlleles, weights=passedMapQuals, minlength=size).astype(numpy.int64).reshape(numRows, numAlleles)
+    mapQualZeroes = numpy.bincount(rowAlleles[passedMapQuals == 0], minlength=size).reshape(numRows, numAlleles)
+    plusStrandCounts = numpy.bincount(rowAlleles[plusStrandTable[reads[qualPositions[passed]]]], minlength=size).reshape(numRows, numAlleles)
+    maxMapQuals = numpy.zeros(size, dtype=numpy.int64)
+    numpy.maximum.at(maxMapQuals, rowAlleles, passedMapQuals)
+    maxMapQuals = maxMapQuals.reshape(numRows, numAlleles)
+    
+    numBases = baseCounts.sum(axis=1)
+    starts = numpy.bincount(rowIds[startPositions], minlength=numRows)
+    stops = numpy.bincount(rowIds[isStop], minlength=numRows)
+    indels = numpy.bincount(rowIds[signPositions], minlength=numRows)
+    
+    finalBases = numpy.frombuffer(i_alleles, dtype=numpy.uint8)[alleles[passed]]
+    
+    return (numBases, starts, stops, indels, baseCounts, sumBaseQuals, sumMapQuals, mapQualZeroes, maxMapQuals, plusStrandCounts, finalBases, rawBaseQuals[passed], rawMapQuals[passed])
+
+
+def convert_and_filter_raw_reads_vectorized(aChr, aCoordinate, aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aReferenceBase, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug):
+    '''
+    ' This function returns the same output as convert_and_filter_raw_reads() for one pileup, but it uses
+    ' decode_pileup_block() to decode the pileup.  It is faster for deep pileups.  The dicts only have keys 
+    ' for the same alleles as the dicts from convert_and_filter_raw_reads().
+    '
+    ' aStringOfRawReads: A string representing the pile-up of read bases from a samtools mpileup command 
+    ' aStringOfRawBaseQuals: A string representing the raw base quality scores for the read bases from the mpileup command
+    ' aStringOfRawMapQuals: A string representing the raw mapping quality scores for the reads from the mpileup command
+    ' aReferenceBase: Used to convert "." and "," from the samtools mpileup command
+    ' aMaxDepth: The max number of reads that are kept, 0 keeps all of the reads
+    '''
+    
+    (numBases, starts, stops, indels, baseCounts, sumBaseQuals, sumMapQuals, mapQualZeroes, maxMapQuals, plusStrandCounts, finalBases, finalBaseQuals, finalMapQuals) = decode_pileup_block([aStringOfRawReads], [aStringOfRawBaseQuals], [aStringOfRawMapQuals], [aReferenceBase], aMinBaseQuality, aMinMapQuality, aMaxDepth)
+    
+    numBasesDict = collections.defaultdict(int)
+    sumBaseQualsDict = collections.defaultdict(int)
+    sumMapQualsDict = collections.defaultdict(int)
+    numPlusStrandDict = collections.defaultdict(int)
+    maxMapQualsDict = collections.defaultdict(int)
+    sumMapQualZeroesDict = collections.defaultdict(int)
+    
+    for (index, allele) in enumerate(i_alleles):
+        if (baseCounts[0, index] > 0):
+            numBasesDict[allele] = int(baseCounts[0, index])
+            sumBaseQualsDict[allele] = int(sumBaseQuals[0, index])
+            sumMapQualsDict[allele] = int(sumMapQuals[0, index])
+            maxMapQualsDict[allele] = int(maxMapQuals[0, index])
+            if (mapQualZeroes[0, index] > 0):
+                sumMapQualZeroesDict[allele] = int(mapQualZeroes[0, index])
+            if (plusStrandCounts[0, index] > 0):
+                numPlusStrandDict[allele] = int(plusStrandCounts[0, index])
+    
+    if (anIsDebug):
+        logging.debug("convert_and_filter_raw_reads_vectorized(): %s:%s numBases=%s, starts=%s, stops=%s, indels=%s", aChr, aCoordinate, numBases[0], starts[0], stops[0], indels[0])
+    
+    return (finalBases.tostring(), finalBaseQuals.tostring(), finalMapQuals.tostring(), int(numBases[0]), int(starts[0]), int(stops[0]), int(indels[0]), numBasesDict, sumBaseQualsDict, sumMapQualsDict, sumMapQualZeroesDict, maxMapQualsDict, numPlusStrandDict)
+
+    
+def decode_pileup(aChr, aCoordinate, aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aReferenceBase, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug):
+    '''
+    ' This function decodes one pileup with convert_and_filter_raw_reads() or convert_and_filter_raw_reads_vectorized()
+    ' and returns their output.  Deep pileups are decoded faster with numpy, as long as the reference base is one of the alleles.
+    '
+    ' aStringOfRawReads: A string representing the pile-up of read bases from a samtools mpileup command 
+    ' aStringOfRawBaseQuals: A string representing the raw base quality scores for the read bases from the mpileup command
+    ' aStringOfRawMapQuals: A string representing the raw mapping quality scores for the reads from the mpileup command
+    ' aReferenceBase: Used to convert "." and "," from the samtools mpileup command
+    ' aMaxDepth: The max number of reads that are kept, 0 keeps all of the reads
+    '''
+    
+    if (numpy != None and len(aStringOfRawReads) >= i_vectorizedDecoderMinLength and aReferenceBase.upper() in i_alleleIndexes):
+        return convert_and_filter_raw_reads_vectorized(aChr, aCoordinate, aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aReferenceBase, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug)
+    else:
+        return convert_and_filter_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOfRawBaseQuals, aStringOfRawMapQuals, aReferenceBase, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug)
+
+
+def summarize_pileup(aPileup, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug):
+    '''
+    ' This function decodes one pileup with decode_pileup() and returns it as a row of the site cache (see i_siteCacheDtypes).
+    ' The alleles are stored in the order that they were found in, so decode_cached_pileup() returns the same output.
+    '
+    ' aPileup:            A pileup (chrom, coordinate, ref, numReads, reads, baseQuals, mapQuals)
+    ' aMinBaseQuality:    The minimum base quality
+    ' aMinMapQuality:     The minimum mapping quality
+    ' aMaxDepth:          The max number of reads that are kept, 0 keeps all of the reads
+    '''
+    
+    (chrom, coordinate, refBase, numReads, reads, baseQuals, mapQuals) = aPileup
+    (starts, stops, indels, alleleOrder) = (0, 0, 0, 0)
+    stats = [0] * (6 * i_siteCacheNumSlots)
+    
+    # find_variants() only decodes the pileups with reads
+    if (numReads > 0):
+        (convertedReads, convertedBaseQuals, convertedMapQuals, numBases, starts, stops, indels, numBasesDict, sumBaseQualsDict, sumMapQualsDict, mapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict) = decode_pileup(chrom, coordinate, reads, baseQuals, mapQuals, refBase, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug)
+        
+        for (rank, allele) in enumerate(sorted(numBasesDict, key=convertedReads.find)):
+            slot = i_alleleIndexes.get(allele, len(i_alleles))
+            alleleOrder |= (slot + 1) << (3 * rank)
+            for (statIndex, statsDict) in enumerate((numBasesDict, sumBaseQualsDict, sumMapQualsDict, mapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict)):
+                stats[(statIndex * i_siteCacheNumSlots) + slot] = statsDict.get(allele, 0)
+    
+    return [coordinate, ord(refBase), numReads, len(baseQuals), starts, stops, indels, alleleOrder] + stats
+
+
+def decode_cached_pileup(aRow):
+    '''
+    ' This function returns the same output as convert_and_filter_raw_reads() for a row of the site cache, except that the
+    ' bases are only the unique bases in the order that they were found in and there are no qualities.  find_variants() only
+    ' needs the unique bases and the dicts.  The dicts have their keys inserted in the same order as convert_and_filter_raw_reads().
+    '
+    ' aRow:    A row of the site cache from summarize_pileup()
+    '''
+    
+    numBasesDict = collections.defaultdict(int)
+    sumBaseQualsDict = collections.defaultdict(int)
+    sumMapQualsDict = collections.defaultdict(int)
+    mapQualZeroesDict = collections.defaultdict(int)
+    maxMapQualsDict = collections.defaultdict(int)
+    plusStrandCountsDict = collections.defaultdict(int)
+    
+    uniqueBases = ""
+    numBases = 0
+    alleleOrder = aRow[7]
+    while (alleleOrder > 0):
+        slot = (alleleOrder & 7) - 1
+        alleleOrder >>= 3
+        allele = i_alleles[slot] if (slot < len(i_alleles)) else chr(aRow[1])
+        uniqueBases += allele
+        
+        column = i_siteCacheStatsColumn + slot
+        numBasesDict[allele] = aRow[column]
+        sumBaseQualsDict[allele] = aRow[column + i_siteCacheNumSlots]
+        sumMapQualsDict[allele] = aRow[column + (2 * i_siteCacheNumSlots)]
+        maxMapQualsDict[allele] = aRow[column + (4 * i_siteCacheNumSlots)]
+        if (aRow[column + (3 * i_siteCacheNumSlots)] > 0):
+            mapQualZeroesDict[allele] = aRow[column + (3 * i_siteCacheNumSlots)]
+        if (aRow[column + (5 * i_siteCacheNumSlots)] > 0):
+            plusStrandCountsDict[allele] = aRow[column + (5 * i_siteCacheNumSlots)]
+        numBases += aRow[column]
+    
+    return (uniqueBases, "", "", numBases, aRow[4], aRow[5], aRow[6], numBasesDict, sumBaseQualsDict, sumMapQualsDict, mapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict)
+
+
+def get_cached_pileups(aCacheFileList, aChrom, aStartCoordinate, aStopCoordinate, aSourcePrefix, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the pileups of a sample in a region from its site cache files.  The 
+    ' pileups have already been decoded, so the reads of each pileup are its row in the cache and the qualities are None 
+    ' (see find_variants()).  The cache files can overlap each other and the region, so only the coordinates in the region
+    ' that are after the last coordinate that was yielded are yielded from each file.
+    '
+    ' aCacheFileList:      A list of (cacheFilename, start, stop) tuples from siteCache.find_cache_files()
+    ' aChrom:              The chrom
+    ' aStartCoordinate:    The start coordinate of the region
+    ' aStopCoordinate:     The stop coordinate of the region
+    ' aSourcePrefix:       A label used when debugging to determine the input file
+    '''
+    
+    nextCoordinate = aStartCoordinate
+    for (cacheFilename, cacheStart, cacheStop) in aCacheFileList:
+        if (anIsDebug):
+            logging.debug("get_cached_pileups(): reading the decoded pileups for %s from %s", aSourcePrefix, cacheFilename)
+        
+        for columns in siteCache.read_site_cache(cacheFilename):
+            # the coordinates are sorted, so the rows outside of the region are cut off from each chunk
+            firstIndex = numpy.searchsorted(columns[0], nextCoordinate, side="left")
+            lastIndex = numpy.searchsorted(columns[0], aStopCoordinate, side="right")
+            if (firstIndex >= lastIndex):
+                continue
+            
+            for row in izip(*[column[firstIndex:lastIndex].tolist() for column in columns]):
+                yield (aChrom, row[0], chr(row[1]), row[2], row, None, None)
+        
+        nextCoordinate = cacheStop + 1
+        if (nextCoordinate > aStopCoordinate):
+            break
+    
+    return
+
+
+def cache_pileups(aPileupsGenerator, aCacheFilename, aMinBaseQuality, aMinMapQuality, aMaxDepth, aSourcePrefix, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the pileups of a sample the same way as get_cached_pileups(), while
+    ' it writes them to the site cache file.  The cache file is only kept if all of the pileups are read.
+    '
+    ' aPileupsGenerator:    A generator that yields the pileups of a sample
+    ' aCacheFilename:       The site cache file
+    ' aMinBaseQuality:      The minimum base quality
+    ' aMinMapQuality:       The minimum mapping quality
+    ' aMaxDepth:            The max number of reads that are kept, 0 keeps all of the reads
+    ' aSourcePrefix:        A label used when debugging to determine the input file
+    '''
+    
+    if (anIsDebug):
+        logging.debug("cache_pileups(): writing the decoded pileups for %s to %s", aSourcePrefix, aCacheFilename)
+    
+    cacheWriter = siteCache.SiteCacheWriter(aCacheFilename, i_siteCacheDtypes)
+    isComplete = False
+    try:
+        for pileup in aPileupsGenerator:
+            # the pileups can already be decoded by summarize_pileups()
+            if (pileup[5] == None):
+                row = pileup[4]
+            else:
+                row = summarize_pileup(pileup, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug)
+            cacheWriter.write(row)
+            yield (pileup[0], pileup[1], pileup[2], pileup[3], row, None, None)
+        isComplete = True
+    finally:
+        if (isComplete):
+            cacheWriter.close()
+        else:
+            cacheWriter.discard()
+    
+    return
+
+
+def summarize_pileups(aPileupsGenerator, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug):
+    '''
+    ' This function uses the python generator to decode the pileups of a sample with summarize_pileup() and yield them 
+    ' the same way as get_cached_pileups().  When the pileups are fetched on their own thread (see get_queued_data()), 
+    ' this generator is wrapped around the pileups before they are queued, so that they are decoded on that thread too.
+    '
+    ' aPileupsGenerator:    A generator that yields the pileups of a sample
+    ' aMinBaseQuality:      The minimum base quality
+    ' aMinMapQuality:       The minimum mapping quality
+    ' aMaxDepth:            The max number of reads that are kept, 0 keeps all of the reads
+    '''
+    
+    for pileup in aPileupsGenerator:
+        # the pileups from the site cache have already been decoded
+        if (pileup[5] == None):
+            yield pileup
+        else:
+            yield (pileup[0], pileup[1], pileup[2], pileup[3], summarize_pileup(pileup, aMinBaseQuality, aMinMapQuality, aMaxDepth, anIsDebug), None, None)
+    
+    return
+
+
+def summarize_joint_pileups(aPileupsGenerator, aMinBaseQualityList, aMinMapQualityList, aMaxDepthList, anIsDebug):
+    '''
+    ' This function does the same as summarize_pileups() for the pileups of all of the samples from get_joint_bam_data().
+    '
+    ' aPileupsGenerator:     A generator that yields the coordinate and a list with the pileup of each sample
+    ' aMinBaseQualityList:   The minimum base quality of each sample
+    ' aMinMapQualityList:    The minimum mapping quality of each sample
+    ' aMaxDepthList:         The max number of reads that are kept for each sample, 0 keeps all of the reads
+    '''
     
+    for (coordinate, pileupList) in aPileupsGenerator:
+        for (index, pileup) in enumerate(pileupList):
+            if (pileup != None):
+                pileupList[index] = (pileup[0], pileup[1], pileup[2], pileup[3], summarize_pileup(pileup, aMinBaseQualityList[index], aMinMapQualityList[index], aMaxDepthList[index], anIsDebug), None, None)
+        yield (coordinate, pileupList)
+    
+    return
+
+
 def convert_raw_reads(aChr, aCoordinate, aStringOfRawReads, aStringOfQualScores, aReferenceBase, anIsDebug):
     '''
     ' This function returns all of the valid RNA (cDNA) or DNA bases from the given pileup of read bases.
@@ -959,73 +2135,407 @@ def format_bam_output(aChrom, aRefList, anAltList, anAltCountsDict, anAltPerDict
             # get the total depth
             totalDepth = sum(aBaseCountsDict.itervalues())
     
-            # make a copy of the dict to manipulate
-            baseCountsTmpDict = dict(aBaseCountsDict)
-            
-            # get the max depth
-            (max1Base, max1Depth) = max(baseCountsTmpDict.iteritems(), key=lambda x:x[1])
-            
-            # find the index for the max depth on the original list
-            max1DepthIndex = refAltList.index(max1Base)
+            # make a copy of the dict to manipulate
+            baseCountsTmpDict = dict(aBaseCountsDict)
+            
+            # get the max depth
+            (max1Base, max1Depth) = max(baseCountsTmpDict.iteritems(), key=lambda x:x[1])
+            
+            # find the index for the max depth on the original list
+            max1DepthIndex = refAltList.index(max1Base)
+        
+            # remove the max from the tmp list
+            del baseCountsTmpDict[max1Base]
+            
+            # if we still have some depths, find the 2nd max
+            if baseCountsTmpDict:
+            
+                # get the max depth
+                (max2Base, max2Depth) = max(baseCountsTmpDict.iteritems(), key=lambda x:x[1])
+                max2Pct = round(max2Depth/float(totalDepth), 2)
+                
+                # if the max depth is large enough
+                if (max2Depth >= aGTMinDepth and max2Pct >= aGTMinPct):
+                    # find the index for the max depth base on the original list
+                    # note: here we are using the dictionary of base=count, so we
+                    # can specifically ask for the base.  In subsequence genotypes()
+                    # methods, we only have the depths without the corresponding base
+                    # so we have to pay extra attention when the depths are equal
+                    max2DepthIndex = refAltList.index(max2Base)
+                else:
+                    # it wasn't large enough, so just use previous max
+                    max2DepthIndex = max1DepthIndex
+                
+            else:
+                # otherwise it's the same as the first
+                max2DepthIndex = max1DepthIndex
+            
+            genotypes = sorted([max1DepthIndex, max2DepthIndex])
+        
+        # create a list of each of the elements, then join them by colon
+        outputList = ("/".join(map(str, genotypes)), str(aNumBases), str(anIndelCount), str(aStartsCount), str(aStopsCount), ",".join(map(str, mapQualZeroes)), ",".join(map(str, mapQualMaxes)), ",".join(map(str, mapQuals)), ",".join(map(str, depths)), ",".join(map(str, readSupports)), ",".join(map(str, baseQuals)), ",".join(map(str, strandBias)))
+        aBamOutputString = ":".join(outputList)
+        
+    # return the string representation and overall calculations       
+    return (aBamOutputString, anAltCountsDict, anAltPerDict, sumAltReadSupport)
+
+
+def get_next_pileup(aGenerator):
+    '''
+    ' This function returns the next pileup from a generator that yields pileups.  If the user doesn't
+    ' specify all four BAM files, then the generator will be "None", so just return some default values.
+    ' If we reach the end of a file, the generator will throw a StopIteration, so just catch it and 
+    ' return some default values.  Otherwise, return the appropriate pileup information.
+    '
+    ' aGenerator:  A .bam mpileup generator that yields the next pileup
+    '''
+    
+    if (aGenerator == None):
+        return False, "", -1, "", 0, "", "", ""
+    else:
+        try:
+            # get the next line
+            (chrom, coordinate, refBase, numReads, reads, baseQuals, mapQuals) = aGenerator.next()
+            return True, chrom, int(coordinate), refBase, int(numReads), reads, baseQuals, mapQuals
+        except StopIteration:
+            return False, "", -1, "", 0, "", "", ""
+
+
+def merge_pileups(aGeneratorList, aStartCoordinate, aStopCoordinate, anIsDebug):
+    '''
+    ' This function merges the pileups from multiple generators and yields one coordinate at a time.  Only
+    ' the coordinates where at least one of the generators has data are yielded.  The generators yield the 
+    ' coordinates in sorted order, so a heap that is ordered on the next coordinate of each generator is
+    ' used to do a k-way merge.  For each coordinate, this function yields the coordinate and a list with 
+    ' one element per generator.  The element is the pileup from the generator if it has data at the 
+    ' coordinate, otherwise it is None.  If a generator is None (e.g. the user didn't specify all four
+    ' BAM files), then the element is always None.
+    '
+    ' aGeneratorList:      A list of generators that yield pileups (chrom, coordinate, ref, numReads, reads, baseQuals, mapQuals)
+    ' aStartCoordinate:    The start coordinate, any pileups before it are skipped
+    ' aStopCoordinate:     The stop coordinate, any pileups after it are ignored
+    '''
+    
+    # the heap holds the next pileup for each generator that still has data
+    # the generator index breaks ties, so the pileups themselves are never compared
+    pileupHeap = []
+    for (index, generator) in enumerate(aGeneratorList):
+        if (generator != None):
+            pileup = next(generator, None)
+            if (pileup != None):
+                pileupHeap.append((pileup[1], index, pileup))
+    heapq.heapify(pileupHeap)
+    
+    while (pileupHeap):
+        coordinate = pileupHeap[0][0]
+        
+        # if we are past the stop coordinate, then we are done
+        if (coordinate > aStopCoordinate):
+            break
+        
+        # get all of the pileups for this coordinate and the next pileup from each of those generators
+        pileupList = [None] * len(aGeneratorList)
+        while (pileupHeap and pileupHeap[0][0] == coordinate):
+            (coordinate, index, pileup) = heapq.heappop(pileupHeap)
+            pileupList[index] = pileup
+            nextPileup = next(aGeneratorList[index], None)
+            if (nextPileup != None):
+                heapq.heappush(pileupHeap, (nextPileup[1], index, nextPileup))
+        
+        # skip any pileups before the start coordinate
+        if (coordinate < aStartCoordinate):
+            continue
+        
+        if (anIsDebug):
+            logging.debug("merge_pileups(): coordinate=%s, number of samples with data=%s", coordinate, len(pileupList) - pileupList.count(None))
+        
+        yield (coordinate, pileupList)
+    
+    return
+
+
+def get_interval_pileups(aPileupsGenerator, anIntervalList, anIsDebug):
+    '''
+    ' This function yields only the coordinates that fall within the intervals.  When the regions from a
+    ' coordinates file are close to each other, they are piled up at once (see regionPlan.plan_regions()),
+    ' and the coordinates in the gaps between the regions are skipped here.  The generator and the intervals
+    ' are both sorted, so the intervals are walked through once.
+    '
+    ' aPileupsGenerator:    A generator that yields (coordinate, pileupList) tuples in sorted order
+    ' anIntervalList:       A sorted list of (start, stop) tuples that don't overlap
+    '''
+    
+    intervalIndex = 0
+    numIntervals = len(anIntervalList)
+    for (coordinate, pileupList) in aPileupsGenerator:
+        # move on to the first interval that doesn't end before this coordinate
+        while (intervalIndex < numIntervals and anIntervalList[intervalIndex][1] < coordinate):
+            intervalIndex += 1
+        
+        # if we are past the last interval, then we are done
+        if (intervalIndex == numIntervals):
+            break
+        
+        # skip the coordinates in the gap before the next interval
+        if (coordinate < anIntervalList[intervalIndex][0]):
+            continue
+        
+        if (anIsDebug):
+            logging.debug("get_interval_pileups(): coordinate=%s, interval=%s-%s", coordinate, anIntervalList[intervalIndex][0], anIntervalList[intervalIndex][1])
+        
+        yield (coordinate, pileupList)
+    
+    return
+
+
+def screen_pileup_block(aPileupBlock, aBlockState, aMinBaseQualList, aMinMapQualList, aMaxDepthList, aMinTotalNumBasesList, aMinAltNumBasesList, aPreviousMinAltNumBasesList):
+    '''
+    ' This function screens a block of coordinates with vectorized numpy operations.  The pileups of each sample 
+    ' are decoded with decode_pileup_block(), and a coordinate is a candidate if at least one sample has enough total 
+    ' bases and an allele other than the reference with enough ALT bases.  The coordinates that are not candidates 
+    ' can never be output by the main loop, so they don't need to be called one at a time.
+    '
+    ' The main loop passes the base counts of one sample on to the next sample and from one coordinate to the next
+    ' (previousBaseCounts and dnaNormalPreviousBaseCounts).  find_variants() changes them in place and the main loop
+    ' replaces them with the counts of a sample.  These changes are replayed as a sequence of events per coordinate, 
+    ' and the counts before each coordinate are taken from the last event that changed each allele.
+    '
+    ' This function returns a tuple with the candidate flag for each coordinate and the previousBaseCounts and the
+    ' dnaNormalPreviousBaseCounts before each coordinate (1 row per coordinate and 1 column per allele).  The counts
+    ' after the block and the number of coordinates with data that are not candidates are stored in aBlockState.
+    '
+    ' aPileupBlock:                    A list of (coordinate, pileupList) tuples from the pileups generator
+    ' aBlockState:                     A dict that holds the counts and the coordinates with data from one block to the next
+    ' aMinBaseQualList:                The minimum base quality for each sample
+    ' aMinMapQualList:                 The minimum mapping quality for each sample
+    ' aMaxDepthList:                   The max number of reads that are kept for each sample
+    ' aMinTotalNumBasesList:           The minimum number of total bases for each sample
+    ' aMinAltNumBasesList:             The minimum number of ALT bases for each sample
+    ' aPreviousMinAltNumBasesList:     The minimum number of ALT bases for the previous sample of each sample
+    '''
+    
+    numRows = len(aPileupBlock)
+    numAlleles = len(i_alleles)
+    numSamples = len(aPileupBlock[0][1])
+    
+    presentList = []
+    refIndexesList = []
+    baseCountsList = []
+    filteredList = []
+    candidates = numpy.zeros(numRows, dtype=numpy.bool_)
+    for sampleIndex in xrange(numSamples):
+        pileups = [pileupList[sampleIndex] for (coordinate, pileupList) in aPileupBlock]
+        present = numpy.array([(pileup != None) for pileup in pileups], dtype=numpy.bool_)
+        
+        # the samples without reads at a coordinate are not decoded
+        hasReads = [(pileup != None and pileup[3] > 0) for pileup in pileups]
+        readsList = [pileup[4] if (reads) else "" for (pileup, reads) in izip(pileups, hasReads)]
+        baseQualsList = [pileup[5] if (reads) else "" for (pileup, reads) in izip(pileups, hasReads)]
+        mapQualsList = [pileup[6] if (reads) else "" for (pileup, reads) in izip(pileups, hasReads)]
+        refList = [pileup[2] if (pileup != None) else "A" for pileup in pileups]
+        
+        decodedPileups = decode_pileup_block(readsList, baseQualsList, mapQualsList, refList, aMinBaseQualList[sampleIndex], aMinMapQualList[sampleIndex], aMaxDepthList[sampleIndex])
+        numBases = decodedPileups[0]
+        baseCounts = decodedPileups[4]
+        refIndexes = numpy.array([i_alleleIndexes[ref] for ref in refList], dtype=numpy.int64)
+        
+        # look for an allele other than the reference with enough ALT bases
+        altCounts = baseCounts.copy()
+        altCounts[numpy.arange(numRows), refIndexes] = 0
+        hasAlt = (altCounts >= max(aMinAltNumBasesList[sampleIndex], 1)).any(axis=1)
+        candidates |= present & (numBases > 0) & (numBases >= aMinTotalNumBasesList[sampleIndex]) & hasAlt
+        
+        presentList.append(present)
+        refIndexesList.append(refIndexes)
+        baseCountsList.append(baseCounts)
+        filteredList.append(present & (numBases > 0))
+    
+    # the main loop skips the coordinates with an "N" in the ref or more than one ref
+    nIndex = i_alleleIndexes["N"]
+    skipped = numpy.zeros(numRows, dtype=numpy.bool_)
+    refIndexes = numpy.full(numRows, -1, dtype=numpy.int64)
+    for (present, sampleRefIndexes) in izip(presentList, refIndexesList):
+        skipped |= present & ((sampleRefIndexes == nIndex) | ((refIndexes != -1) & (refIndexes != sampleRefIndexes)))
+        refIndexes = numpy.where(present & (refIndexes == -1), sampleRefIndexes, refIndexes)
+    
+    candidates &= ~skipped
+    calledList = [present & ~skipped for present in presentList]
+    filteredList = [filtered & ~skipped for filtered in filteredList]
+    (dnaNormalCalled, rnaNormalCalled, dnaTumorCalled, rnaTumorCalled) = calledList
+    (dnaNormalFiltered, rnaNormalFiltered, dnaTumorFiltered, rnaTumorFiltered) = filteredList
+    (dnaNormalCounts, rnaNormalCounts, dnaTumorCounts, rnaTumorCounts) = baseCountsList
+    (dnaNormalPreviousMinAlt, rnaNormalPreviousMinAlt, dnaTumorPreviousMinAlt, rnaTumorPreviousMinAlt) = aPreviousMinAltNumBasesList
+    
+    # when a sample has bases, find_variants() sets the previous counts of all 4 bases to the previous minimum 
+    # if none of the earlier samples had bases at this coordinate, otherwise just the reference base
+    acgtFlags = numpy.zeros(numAlleles, dtype=numpy.bool_)
+    acgtFlags[[i_alleleIndexes[base] for base in "ACGT"]] = True
+    refFlags = (numpy.arange(numAlleles) == refIndexes[:, numpy.newaxis])
+    def set_previous_min(aChangedFlags, aDnaSetIsEmptyFlags, aPreviousMinAltNumBases):
+        changes = numpy.where(aDnaSetIsEmptyFlags[:, numpy.newaxis], acgtFlags, refFlags) & aChangedFlags[:, numpy.newaxis]
+        return (changes, numpy.full((numRows, numAlleles), aPreviousMinAltNumBases, dtype=numpy.int64))
+    def set_counts(aChangedFlags, aBaseCounts):
+        return (numpy.repeat(aChangedFlags[:, numpy.newaxis], numAlleles, axis=1), aBaseCounts)
+    
+    # the events for each coordinate in the order of the main loop
+    noneFiltered = numpy.ones(numRows, dtype=numpy.bool_)
+    previousEvents = [set_previous_min(dnaNormalFiltered, noneFiltered, dnaNormalPreviousMinAlt),
+                      set_previous_min(rnaNormalFiltered, ~dnaNormalFiltered, rnaNormalPreviousMinAlt),
+                      set_counts(rnaNormalCalled, rnaNormalCounts),
+                      set_counts(dnaTumorCalled, dnaTumorCounts),
+                      set_previous_min(rnaTumorFiltered, ~(dnaNormalFiltered | rnaNormalFiltered | dnaTumorFiltered), rnaTumorPreviousMinAlt),
+                      set_counts(rnaTumorCalled, rnaTumorCounts)]
+    dnaNormalPreviousEvents = [set_counts(dnaNormalCalled, dnaNormalCounts),
+                               set_previous_min(dnaTumorFiltered, ~(dnaNormalFiltered | rnaNormalFiltered), dnaTumorPreviousMinAlt)]
+    
+    statesList = []
+    for (events, stateKey) in ((previousEvents, "previousCounts"), (dnaNormalPreviousEvents, "dnaNormalPreviousCounts")):
+        numEvents = len(events)
+        
+        # the first event is the state from the previous block, then the events are interleaved by coordinate
+        changes = numpy.empty((1 + (numRows * numEvents), numAlleles), dtype=numpy.bool_)
+        values = numpy.empty((1 + (numRows * numEvents), numAlleles), dtype=numpy.int64)
+        changes[0] = True
+        values[0] = aBlockState[stateKey]
+        for (eventIndex, (eventChanges, eventValues)) in enumerate(events):
+            changes[1 + eventIndex::numEvents] = eventChanges
+            values[1 + eventIndex::numEvents] = eventValues
+        
+        # find the last event that changed each allele
+        lastEvents = numpy.maximum.accumulate(numpy.where(changes, numpy.arange(len(changes))[:, numpy.newaxis], 0), axis=0)
+        states = values[lastEvents, numpy.arange(numAlleles)]
+        
+        aBlockState[stateKey] = states[-1]
+        statesList.append(states[0:-1:numEvents])
+    
+    # the coordinates with data that are called by the main loop are counted there
+    for (sampleIndex, filtered) in enumerate(filteredList):
+        aBlockState["coordinatesWithData"][sampleIndex] += int(numpy.count_nonzero(filtered & ~candidates))
+    
+    return (candidates, statesList[0], statesList[1])
+
+
+def get_block_candidates(aPileupsGenerator, aBlockSize, aBlockState, aMinBaseQualList, aMinMapQualList, aMaxDepthList, aMinTotalNumBasesList, aMinAltNumBasesList, aPreviousMinAltNumBasesList, anIsDebug):
+    '''
+    ' This function uses the python generator to yield the coordinates that could have a variant.  It reads
+    ' the pileups in blocks of aBlockSize coordinates and screens them with screen_pileup_block().  Before each 
+    ' coordinate is yielded, the previousBaseCounts and dnaNormalPreviousBaseCounts that the main loop should use 
+    ' for it are stored in aBlockState.  If a ref is not one of the i_alleles (e.g. an IUPAC code), then that 
+    ' coordinate is yielded to be called on its own, and the rest of the block is screened with the counts that 
+    ' the main loop has after calling it (from aBlockState["getPreviousBaseCounts"]).
+    '
+    ' aPileupsGenerator:               A generator that yields (coordinate, pileupList) tuples
+    ' aBlockSize:                      The number of coordinates in a block
+    ' aBlockState:                     A dict that holds the counts and the coordinates with data from one block to the next
+    ' aMinBaseQualList:                The minimum base quality for each sample
+    ' aMinMapQualList:                 The minimum mapping quality for each sample
+    ' aMaxDepthList:                   The max number of reads that are kept for each sample
+    ' aMinTotalNumBasesList:           The minimum number of total bases for each sample
+    ' aMinAltNumBasesList:             The minimum number of ALT bases for each sample
+    ' aPreviousMinAltNumBasesList:     The minimum number of ALT bases for the previous sample of each sample
+    '''
+    
+    while (True):
+        pileupBlock = list(islice(aPileupsGenerator, aBlockSize))
+        if (len(pileupBlock) == 0):
+            break
         
-            # remove the max from the tmp list
-            del baseCountsTmpDict[max1Base]
-            
-            # if we still have some depths, find the 2nd max
-            if baseCountsTmpDict:
+        # screen the coordinates between the refs that the decoder can't handle
+        screenStart = 0
+        while (screenStart < len(pileupBlock)):
+            screenStop = screenStart
+            while (screenStop < len(pileupBlock) and not any(pileup != None and pileup[2] not in i_alleleIndexes for pileup in pileupBlock[screenStop][1])):
+                screenStop += 1
             
-                # get the max depth
-                (max2Base, max2Depth) = max(baseCountsTmpDict.iteritems(), key=lambda x:x[1])
-                max2Pct = round(max2Depth/float(totalDepth), 2)
+            if (screenStop > screenStart):
+                (candidates, previousStates, dnaNormalPreviousStates) = screen_pileup_block(pileupBlock[screenStart:screenStop], aBlockState, aMinBaseQualList, aMinMapQualList, aMaxDepthList, aMinTotalNumBasesList, aMinAltNumBasesList, aPreviousMinAltNumBasesList)
                 
-                # if the max depth is large enough
-                if (max2Depth >= aGTMinDepth and max2Pct >= aGTMinPct):
-                    # find the index for the max depth base on the original list
-                    # note: here we are using the dictionary of base=count, so we
-                    # can specifically ask for the base.  In subsequence genotypes()
-                    # methods, we only have the depths without the corresponding base
-                    # so we have to pay extra attention when the depths are equal
-                    max2DepthIndex = refAltList.index(max2Base)
-                else:
-                    # it wasn't large enough, so just use previous max
-                    max2DepthIndex = max1DepthIndex
+                if (anIsDebug):
+                    logging.debug("get_block_candidates(): coordinates %s-%s, candidates=%s", pileupBlock[screenStart][0], pileupBlock[screenStop-1][0], numpy.count_nonzero(candidates))
                 
-            else:
-                # otherwise it's the same as the first
-                max2DepthIndex = max1DepthIndex
+                for rowIndex in numpy.flatnonzero(candidates):
+                    aBlockState["previousBaseCounts"] = collections.defaultdict(int, izip(i_alleles, previousStates[rowIndex].tolist()))
+                    aBlockState["dnaNormalPreviousBaseCounts"] = collections.defaultdict(int, izip(i_alleles, dnaNormalPreviousStates[rowIndex].tolist()))
+                    yield pileupBlock[screenStart + rowIndex]
             
-            genotypes = sorted([max1DepthIndex, max2DepthIndex])
-        
-        # create a list of each of the elements, then join them by colon
-        outputList = ("/".join(map(str, genotypes)), str(aNumBases), str(anIndelCount), str(aStartsCount), str(aStopsCount), ",".join(map(str, mapQualZeroes)), ",".join(map(str, mapQualMaxes)), ",".join(map(str, mapQuals)), ",".join(map(str, depths)), ",".join(map(str, readSupports)), ",".join(map(str, baseQuals)), ",".join(map(str, strandBias)))
-        aBamOutputString = ":".join(outputList)
-        
-    # return the string representation and overall calculations       
-    return (aBamOutputString, anAltCountsDict, anAltPerDict, sumAltReadSupport)
+            if (screenStop < len(pileupBlock)):
+                logging.warning("The ref at coordinate %s is not one of %s, so the coordinate is called on its own.", pileupBlock[screenStop][0], i_alleles)
+                aBlockState["previousBaseCounts"] = collections.defaultdict(int, izip(i_alleles, aBlockState["previousCounts"].tolist()))
+                aBlockState["dnaNormalPreviousBaseCounts"] = collections.defaultdict(int, izip(i_alleles, aBlockState["dnaNormalPreviousCounts"].tolist()))
+                aBlockState["unscreened"] = True
+                yield pileupBlock[screenStop]
+                aBlockState["unscreened"] = False
+                
+                # the main loop has called the coordinate, so the screening goes on from its counts
+                # the counts of a ref that is not one of the i_alleles are set again before they are used, so they are not kept
+                (previousBaseCounts, dnaNormalPreviousBaseCounts) = aBlockState["getPreviousBaseCounts"]()
+                aBlockState["previousCounts"] = numpy.array([previousBaseCounts.get(allele, 0) for allele in i_alleles], dtype=numpy.int64)
+                aBlockState["dnaNormalPreviousCounts"] = numpy.array([dnaNormalPreviousBaseCounts.get(allele, 0) for allele in i_alleles], dtype=numpy.int64)
+                screenStop += 1
+            
+            screenStart = screenStop
+    
+    return
 
 
-def get_next_pileup(aGenerator):
+def get_candidate_pileups(aCandidateGenerator, aBlockState, aFetchFunction, aBatchSize, aGapSize, anIsDebug):
     '''
-    ' This function returns the next pileup from a generator that yields pileups.  If the user doesn't
-    ' specify all four BAM files, then the generator will be "None", so just return some default values.
-    ' If we reach the end of a file, the generator will throw a StopIteration, so just catch it and 
-    ' return some default values.  Otherwise, return the appropriate pileup information.
+    ' This function uses the python generator to yield the candidates from get_block_candidates() with the pileups
+    ' of the normal DNA filled in.  In somatic-only mode, the normal DNA is not piled up across the whole region.
+    ' Instead, the candidates are found on the tumor samples, and the normal DNA is only piled up around them.  Up
+    ' to aBatchSize candidates are read at once, the candidates that are at most aGapSize coordinates apart are
+    ' piled up at once, and the pileup of the normal DNA at each candidate is put in the first slot of its pileupList.
+    ' The previous base counts that get_block_candidates() stored in aBlockState for each candidate are restored
+    ' before it is yielded.  A batch ends at a coordinate that is not screened, because get_block_candidates() needs
+    ' the counts of the main loop after the coordinate has been called before it can screen the next coordinates.
     '
-    ' aGenerator:  A .bam mpileup generator that yields the next pileup
+    ' aCandidateGenerator:    A generator from get_block_candidates() that yields (coordinate, pileupList) tuples
+    ' aBlockState:            A dict that holds the counts and the coordinates with data from one block to the next
+    ' aFetchFunction:         A function that takes a start and stop coordinate and returns a generator with the normal DNA pileups
+    ' aBatchSize:             The max number of candidates that are read at once
+    ' aGapSize:               The max number of coordinates between two candidates that are piled up at once
     '''
     
-    if (aGenerator == None):
-        return False, "", -1, "", 0, "", "", ""
-    else:
-        try:
-            # get the next line
-            (chrom, coordinate, refBase, numReads, reads, baseQuals, mapQuals) = aGenerator.next()
-            return True, chrom, int(coordinate), refBase, int(numReads), reads, baseQuals, mapQuals
-        except StopIteration:
-            return False, "", -1, "", 0, "", "", ""
+    while (True):
+        # keep the previous base counts that were stored for each candidate
+        candidateBatch = []
+        for (coordinate, pileupList) in aCandidateGenerator:
+            candidateBatch.append((coordinate, pileupList, aBlockState["previousBaseCounts"], aBlockState["dnaNormalPreviousBaseCounts"]))
+            if (len(candidateBatch) >= aBatchSize or aBlockState["unscreened"]):
+                break
+        if (len(candidateBatch) == 0):
+            break
+        
+        candidateIndex = 0
+        for (start, stop) in regionPlan.merge_intervals([(coordinate, coordinate) for (coordinate, pileupList, previousCounts, dnaNormalPreviousCounts) in candidateBatch], aGapSize):
+            if (anIsDebug):
+                logging.debug("get_candidate_pileups(): piling up the normal DNA in %s-%s", start, stop)
+            
+            # the pileups and the candidates are both sorted, so they are walked through together
+            pileup = None
+            pileups = aFetchFunction(start, stop)
+            while (candidateIndex < len(candidateBatch) and candidateBatch[candidateIndex][0] <= stop):
+                (coordinate, pileupList, previousCounts, dnaNormalPreviousCounts) = candidateBatch[candidateIndex]
+                while (pileup == None or pileup[1] < coordinate):
+                    pileup = next(pileups, None)
+                    if (pileup == None):
+                        break
+                if (pileup != None and pileup[1] == coordinate):
+                    pileupList[0] = pileup
+                
+                aBlockState["previousBaseCounts"] = previousCounts
+                aBlockState["dnaNormalPreviousBaseCounts"] = dnaNormalPreviousCounts
+                yield (coordinate, pileupList)
+                candidateIndex += 1
+            
+            # read the rest of the pileups, so that the files are closed
+            for pileup in pileups:
+                pass
+    
+    return
 
 
-def find_variants(aChr, aCoordinate, aRefBase, aNumBases, aReads, aBaseQuals, aMapQuals, aPreviousUniqueBases, aPreviousBaseCounts, aReadDepthDict, anAltPerDict, aCoordinateWithData, aDnaSet, aRefList, anAltList, anAltCountsDict, aHasValidData, aShouldOutput, aGainModCount, aLossModCount, aGainModType, aLossModType, anInfoDict, aMinTotalNumBases, aMinAltNumBases, aPreviousMinAltNumBases, aMinBaseQual, aMinMapQual, aBaseQualsList, aSourcePrefix, aGTMinDepth, aGTMinPct, aBamOutputString, anIsDebug):
+def find_variants(aChr, aCoordinate, aRefBase, aNumBases, aReads, aBaseQuals, aMapQuals, aPreviousUniqueBases, aPreviousBaseCounts, aReadDepthDict, anAltPerDict, aCoordinateWithData, aDnaSet, aRefList, anAltList, anAltCountsDict, aHasValidData, aShouldOutput, aGainModCount, aLossModCount, aGainModType, aLossModType, anInfoDict, aMinTotalNumBases, aMinAltNumBases, aPreviousMinAltNumBases, aMinBaseQual, aMinMapQual, aMaxDepth, aBaseQualsList, aSourcePrefix, aGTMinDepth, aGTMinPct, aBamOutputString, anIsDebug):
     '''
     ' This function finds variants in BAM pileups.  This function first converts the samtools pileup of reads into 
     ' human-readable reads and then records some characteristics of the pileups.  It counts the number of bases on the 
@@ -1084,7 +2594,17 @@ def find_variants(aChr, aCoordinate, aRefBase, aNumBases, aReads, aBaseQuals, aM
         (convertedReads, convertedBaseQuals, aNumBases, baseCountsDict, qualitySumsOfBasesDict, plusStrandCountsDict) = filter_by_base_quality(convertedReads, convertedBaseQuals, aBaseQual, anIsDebug)  
         '''
         
-        (convertedReads, convertedBaseQuals, convertedMapQuals, aNumBases, starts, stops, indels, baseCountsDict, sumBaseQualsDict, sumMapQualsDict, sumMapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict) = convert_and_filter_raw_reads(aChr, aCoordinate, aReads, aBaseQuals, aMapQuals, aRefBase, aMinBaseQual, aMinMapQual, anIsDebug)
+        # the pileups from the site cache have already been decoded
+        if (aBaseQuals == None):
+            numQuals = aReads[i_siteCacheNumQualsColumn]
+            (convertedReads, convertedBaseQuals, convertedMapQuals, aNumBases, starts, stops, indels, baseCountsDict, sumBaseQualsDict, sumMapQualsDict, sumMapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict) = decode_cached_pileup(aReads)
+        else:
+            numQuals = len(aBaseQuals)
+            (convertedReads, convertedBaseQuals, convertedMapQuals, aNumBases, starts, stops, indels, baseCountsDict, sumBaseQualsDict, sumMapQualsDict, sumMapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict) = decode_pileup(aChr, aCoordinate, aReads, aBaseQuals, aMapQuals, aRefBase, aMinBaseQual, aMinMapQual, aMaxDepth, anIsDebug)
+        
+        # keep track of the samples that were capped at the max depth, their DP and AD are from the reads that were kept
+        if (aMaxDepth > 0 and numQuals > aMaxDepth):
+            anInfoDict["CAP"].append(aSourcePrefix)
         
         if (anIsDebug):
             logging.debug("After convert_and_filter_raw_reads() on %s: %s %s %s %s %s %s %s %s %s %s %s %s %s %s %s %s", aSourcePrefix, aChr, aCoordinate, aRefBase, aNumBases, convertedReads, convertedBaseQuals, convertedMapQuals, starts, stops, indels, baseCountsDict, sumBaseQualsDict, sumMapQualsDict, sumMapQualZeroesDict, maxMapQualsDict, plusStrandCountsDict)
@@ -1233,6 +2753,12 @@ def get_vcf_header(aVCFFormat, aRefId, aRefURL, aRefFilename, aFastaFilename, aR
         vcfHeader += "##assembly=file:" + aFastaFilename + "\n"
         
     vcfHeader += "##phasing=none\n"
+    
+    # the coordinates outside of the include regions and in the exclude regions were never called
+    for (paramName, maskType) in (("includeBed", "include"), ("excludeBed", "exclude")):
+        if (aParamDict.get(paramName) != None):
+            for bedPath in aParamDict[paramName].split(","):
+                vcfHeader += "##regionMask=<Type=" + maskType + ",Source=file:" + bedPath + ">\n"
         
     # add RADIA param info
     aParamDict["algorithm"] = "RADIA"
@@ -1303,6 +2829,8 @@ def get_vcf_header(aVCFFormat, aRefId, aRefURL, aRefFilename, aFastaFilename, aR
     vcfHeader += "##INFO=<ID=SS,Number=1,Type=Integer,Description=\"Variant status relative to non-adjacent Normal,0=wildtype,1=germline,2=somatic,3=LOH,4=post-transcriptional modification,5=unknown\">\n"
     vcfHeader += "##INFO=<ID=SST,Number=1,Type=String,Description=\"Somatic status of variant\">\n"
     vcfHeader += "##INFO=<ID=VT,Number=1,Type=String,Description=\"Variant type, can be SNP, INS or DEL\">\n"
+    if (max(aParamDict.get(paramName) or 0 for paramName in ("dnaNormalMaxDepth", "rnaNormalMaxDepth", "dnaTumorMaxDepth", "rnaTumorMaxDepth")) > 0):
+        vcfHeader += "##INFO=<ID=CAP,Number=.,Type=String,Description=\"Samples with more reads than the max depth, the DP and AD of these samples are from the reads that were kept\">\n"
     #vcfHeader += "##INFO=<ID=DEL,Number=1,Type=Integer,Description=\"Number of small deletions at this location in all samples\">\n"
     #vcfHeader += "##INFO=<ID=INS,Number=1,Type=Integer,Description=\"Number of small insertions at this location in all samples\">\n"
     
@@ -1383,8 +2911,101 @@ def pad_output(anOutput, anEmptyOutput, anAlleleLength):
     else:
     # no padding necessary
         return anOutput
-                    
-               
+
+
+def get_radia_command(aCmdLineParser, aParamDict, anId, aChrom, anOverrideDict):
+    '''
+    ' This function re-creates the radia.py command for one shard of a region or for one chrom.  All of
+    ' the params that the user specified are passed on, except for the ones in the anOverrideDict.
+    '
+    ' aCmdLineParser:     The command line parser with all of the options
+    ' aParamDict:         A dictionary with the values of all of the options
+    ' anId:               The unique Id
+    ' aChrom:             The chrom
+    ' anOverrideDict:     A dictionary with the values that should be used for some of the options
+    '''
+
+    command = [sys.executable, os.path.abspath(sys.argv[0]), anId, aChrom]
+    for option in aCmdLineParser.option_list:
+        # skip the --help and --version options
+        if (option.dest == None):
+            continue
+
+        if (option.dest in anOverrideDict):
+            value = anOverrideDict[option.dest]
+        else:
+            value = aParamDict.get(option.dest, option.default)
+
+        # only the params that change the default values are needed
+        if (value == option.default or value == None):
+            continue
+        elif (option.action in ("store_true", "store_false")):
+            command.append(option.get_opt_string())
+        else:
+            command.append(option.get_opt_string() + "=" + str(value))
+
+    return command
+
+
+def run_radia_command(aCommand):
+    '''
+    ' This function runs one radia.py command and returns the exit status.  The command
+    ' writes its log messages to the same stderr as this process.
+    '
+    ' aCommand:    The command as a list of arguments
+    '''
+    return subprocess.call(aCommand, close_fds=True)
+
+
+def run_radia_commands(aCommandList, aNumThreads, anIsDebug):
+    '''
+    ' This function runs the radia.py commands in parallel with at most aNumThreads commands
+    ' running at one time.  The commands are started in the order of the list, so the longest
+    ' running commands should be first.  If any of the commands fail, then the program exits.
+    '
+    ' aCommandList:    A list of commands
+    ' aNumThreads:     The number of commands that can run at one time
+    '''
+
+    if (anIsDebug):
+        for command in aCommandList:
+            logging.debug("radia command: %s", " ".join(command))
+
+    # each thread just waits on its own radia.py process
+    # a chunk size of 1 hands out the commands one at a time in the order of the list
+    pool = ThreadPool(min(aNumThreads, len(aCommandList)))
+    try:
+        returnCodes = pool.map(run_radia_command, aCommandList, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    for (command, returnCode) in izip(aCommandList, returnCodes):
+        if (returnCode != 0):
+            logging.critical("Error running the following radia command with exit status %s: %s", returnCode, " ".join(command))
+            sys.exit(1)
+    return
+
+
+def sum_stats_files(aStatsDirList, aStatsFilename):
+    '''
+    ' This function adds up the counts in the stats files from the shards or chroms.  Each line
+    ' in a stats file has the id and chrom followed by the counts.
+    '
+    ' aStatsDirList:      A list of the stats directories
+    ' aStatsFilename:     The name of the stats file in each directory
+    '''
+
+    totals = []
+    for statsDir in aStatsDirList:
+        statsFileHandler = open(statsDir + aStatsFilename, "r")
+        for line in statsFileHandler:
+            counts = [int(count) for count in line.rstrip("\r\n").split("\t")[2:]]
+            totals = [total + count for (total, count) in izip(totals, counts)] if (totals) else counts
+        statsFileHandler.close()
+    return totals
+
+
 def main():
     
     # command for running this on a small test case: 
@@ -1397,13 +3018,17 @@ def main():
     i_vcfFormat = "VCFv4.1"
     
     # create the usage statement
-    usage = "usage: python %prog id chrom [Options]"
+    usage = "usage: python %prog id chrom [Options]\n\nThe chrom can also be a comma-separated list of chroms or 'all' for all of the chroms in the FASTA index file."
     i_cmdLineParser = OptionParser(usage=usage, version=i_radiaVersion)
     
     # add the optional parameters
     i_cmdLineParser.add_option("-b", "--batchSize", type="int", dest="batchSize", default=int(250000000), metavar="BATCH_SIZE", help="the size of the samtool selections that are loaded into memory at one time, %default by default")
-    i_cmdLineParser.add_option("-o", "--outputFilename", dest="outputFilename", metavar="OUTPUT_FILE", help="the name of the output file, append .gz if the file should be gzipped, STDOUT by default")
+    i_cmdLineParser.add_option("-o", "--outputFilename", dest="outputFilename", metavar="OUTPUT_FILE", help="the name of the output file, append .gz if the file should be gzipped or use .vcfr for a record file that the filters can read faster, STDOUT by default")
     i_cmdLineParser.add_option("-c", "--coordinatesFilename", dest="coordinatesFilename", metavar="COORDINATES_FILE", help="a tab-delimited file with 3 columns: (chr, startCoordinate, stopCoordinate) specifying coordinates or coordinate ranges to query")
+    i_cmdLineParser.add_option("", "--regionGap", type="int", default=int(1000), dest="regionGap", metavar="REGION_GAP", help="the regions in the coordinates file are sorted and merged, and the regions that are at most this many coordinates apart are piled up at once (the coordinates in between are not called), %default by default")
+    i_cmdLineParser.add_option("", "--includeBed", dest="includeBed", metavar="INCLUDE_BED", help="a .bed or .bed.gz file, or a directory with one .bed file per chrom (e.g. ../data/hg19/gencode/basic/), only the coordinates in these regions are piled up and called, separate multiple files with commas to use the regions that are in all of them")
+    i_cmdLineParser.add_option("", "--excludeBed", dest="excludeBed", metavar="EXCLUDE_BED", help="a .bed or .bed.gz file, or a directory with one .bed file per chrom, the coordinates in these regions are not piled up or called, separate multiple files with commas")
+    i_cmdLineParser.add_option("", "--coverageMask", action="store_true", default=False, dest="coverageMask", help="use the .bai index files to skip the parts of the chroms without any reads in all of the .bam files, the masks are cached next to the .bam files, %default by default")
     i_cmdLineParser.add_option("-f", "--fastaFilename", dest="fastaFilename", metavar="FASTA_FILE", help="the name of the fasta file that can be used on all .bams, see below for specifying individual fasta files for each .bam file")
     i_cmdLineParser.add_option("-p", "--useChrPrefix", action="store_true", default=False, dest="useChrPrefix", help="include this argument if the 'chr' prefix should be used in the samtools command for all .bams, see below for specifying the prefix for individual .bam files")
     i_cmdLineParser.add_option("-l", "--log", dest="logLevel", default="WARNING", metavar="LOG", help="the logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL), %default by default")
@@ -1417,21 +3042,35 @@ def main():
     i_cmdLineParser.add_option("-q", "--sequencingPlatform", dest="sequencingPlatform", metavar="SEQ_PLATFORM", help="the sequencing platform - used in the sample VCF meta tag")
     i_cmdLineParser.add_option("-s", "--statsDir", dest="statsDir", metavar="STATS_DIR", help="a stats directory where some basic stats can be output")
     i_cmdLineParser.add_option("", "--disease", dest="disease", metavar="DISEASE", help="a disease abbreviation (i.e. BRCA) for the header")
+    i_cmdLineParser.add_option("", "--pileupEngine", type="choice", choices=["samtools", "pysam"], default="samtools", dest="pileupEngine", metavar="PILEUP_ENGINE", help="the engine used to create the pileups from the .bam files: 'samtools' runs the samtools mpileup command, 'pysam' creates the pileups in-process with the pysam API, %default by default")
+    i_cmdLineParser.add_option("", "--pileupMaxDepth", type="int", default=int(250), dest="pileupMaxDepth", metavar="PILEUP_MAX_DEPTH", help="the max number of reads per .bam file that are piled up at a coordinate by both pileup engines (the samtools mpileup -d argument), %default by default")
+    i_cmdLineParser.add_option("", "--jointPileup", action="store_true", default=False, dest="jointPileup", help="include this argument if one joint samtools mpileup command should be run on all of the .bam files instead of one command per .bam file, all .bam files must use the same FASTA file, base quality, mapping quality, and 'chr' prefix")
+    i_cmdLineParser.add_option("", "--concurrentPileups", action="store_true", default=False, dest="concurrentPileups", help="include this argument if the pileups for each sample should be fetched on their own thread while the variants are being called")
+    i_cmdLineParser.add_option("", "--pileupQueueSize", type="int", default=int(64), dest="pileupQueueSize", metavar="PILEUP_QUEUE_SIZE", help="the maximum number of chunks of " + str(i_pileupsChunkSize) + " pileups that can be queued for each sample when the pileups are fetched concurrently, %default by default")
+    i_cmdLineParser.add_option("", "--threads", type="int", default=int(1), dest="threads", metavar="THREADS", help="the number of radia.py processes that call the variants in parallel, the region is split into shards with about the same coverage according to the .bam index files or, when more than one chrom is specified, the chroms are run in parallel starting with the largest ones, %default by default")
+    i_cmdLineParser.add_option("", "--callingBlockSize", type="int", default=int(0), dest="callingBlockSize", metavar="CALLING_BLOCK_SIZE", help="the number of coordinates that are screened at once with numpy before only the coordinates that could have a variant are called, 0 calls every coordinate one at a time, %default by default")
+    i_cmdLineParser.add_option("", "--somaticOnly", action="store_true", default=False, dest="somaticOnly", help="include this argument if only the somatic mutations and tumor RNA variants/edits should be called, the candidates are found on the tumor samples and the normal DNA is only piled up at the candidates")
+    i_cmdLineParser.add_option("", "--siteCacheDir", dest="siteCacheDir", metavar="SITE_CACHE_DIR", help="the directory where the decoded pileups of each sample are cached in a binary file per region, so that a later run with the same .bam or pileups file and the same params reads them from the cache instead of piling up the sample again")
+    i_cmdLineParser.add_option("", "--tumorsFilename", dest="tumorsFilename", metavar="TUMORS_FILE", help="the name of a tab-delimited file with one line per tumor (e.g. for multi-region or longitudinal samples) that has the tumor id, the tumor DNA .bam file, and the tumor RNA .bam file ('.' if there isn't one), all of the tumors are called against the same normal samples, which are only piled up once, use this instead of the tumor .bam files")
+    i_cmdLineParser.add_option("", "--tumorOutputDir", dest="tumorOutputDir", metavar="TUMOR_OUTPUT_DIR", help="when a tumors file is specified, the directory where one VCF file per tumor should be output with the name id_tumorId.vcf.gz")
+    i_cmdLineParser.add_option("", "--chromOutputDir", dest="chromOutputDir", metavar="CHROM_OUTPUT_DIR", help="when more than one chrom is specified, the directory where one VCF file per chrom should be output with the name id_chrN.vcf.gz instead of one VCF file for all of the chroms")
     i_cmdLineParser.add_option("", "--rnaIncludeSecondaryAlignments", action="store_true", default=False, dest="rnaIncludeSecondaryAlignments", help="if you align the RNA to transcript isoforms, then you may want to include RNA secondary alignments in the samtools mpileups")
     i_cmdLineParser.add_option("", "--noHeader", action="store_false", default=True, dest="outputHeader", help="include this argument if the header should not be output")
     i_cmdLineParser.add_option("", "--outputAllData", action="store_true", default=False, dest="outputAllData", help="include this argument if all data should be output regardless of the existence of a variant")
     #e,j,k,v,w,y
     
     i_cmdLineParser.add_option("", "--genotypeMinDepth", type="int", default=int(2), dest="genotypeMinDepth", metavar="GT_MIN_DP", help="the minimum number of bases required for the genotype, %default by default")
+    i_cmdLineParser.add_option("", "--maxDepth", type="int", default=int(0), dest="maxDepth", metavar="MAX_DEPTH", help="the max number of reads per sample that are used at a coordinate, the reads of deeper pileups are evenly downsampled to this depth and the samples are listed in the CAP INFO field, see below for specifying the max depth for each sample, 0 uses all of the reads, %default by default")
     i_cmdLineParser.add_option("", "--genotypeMinPct", type="float", default=float(.10), dest="genotypeMinPct", metavar="GT_MIN_PCT", help="the minimum percentage of reads required for the genotype, %default by default")
     
     # params for normal DNA
-    i_cmdLineParser.add_option("-n", "--dnaNormalFilename", dest="dnaNormalFilename", metavar="DNA_NORMAL_FILE", help="the name of the normal DNA .bam file")
+    i_cmdLineParser.add_option("-n", "--dnaNormalFilename", dest="dnaNormalFilename", metavar="DNA_NORMAL_FILE", help="the name of the normal DNA .bam file or a comma-separated list of .bam files (e.g. one per lane) that are merged on the fly")
     i_cmdLineParser.add_option("--np", "--dnaNormalPileupsFilename", dest="dnaNormalPileupsFilename", metavar="DNA_NORMAL_PILEUPS", help="the name of the normal DNA mpileup file")
     i_cmdLineParser.add_option("", "--dnaNormalMinTotalBases", type="int", default=int(4), dest="dnaNormalMinTotalNumBases", metavar="DNA_NORM_MIN_TOTAL_BASES", help="the minimum number of overall normal DNA reads covering a position, %default by default")
     i_cmdLineParser.add_option("", "--dnaNormalMinAltBases", type="int", default=int(2), dest="dnaNormalMinAltNumBases", metavar="DNA_NORM_MIN_ALT_BASES", help="the minimum number of alternative normal DNA reads supporting a variant at a position, %default by default")
     i_cmdLineParser.add_option("", "--dnaNormalBaseQual", type="int", default=int(10), dest="dnaNormalMinBaseQuality", metavar="DNA_NORM_BASE_QUAL", help="the minimum normal DNA base quality, %default by default")
     i_cmdLineParser.add_option("", "--dnaNormalMapQual", type="int", default=int(10), dest="dnaNormalMinMappingQuality", metavar="DNA_NORM_MAP_QUAL", help="the minimum normal DNA mapping quality, %default by default")
+    i_cmdLineParser.add_option("", "--dnaNormalMaxDepth", type="int", dest="dnaNormalMaxDepth", metavar="DNA_NORM_MAX_DEPTH", help="the max number of normal DNA reads that are used at a coordinate, the --maxDepth by default")
     i_cmdLineParser.add_option("", "--dnaNormalUseChr", action="store_true", default=False, dest="dnaNormalUseChrPrefix", help="include this argument if the 'chr' prefix should be used in the samtools command for the normal DNA .bam file")
     i_cmdLineParser.add_option("", "--dnaNormalFasta", dest="dnaNormalFastaFilename", metavar="DNA_NORM_FASTA_FILE", help="the name of the fasta file for the normal DNA .bam file")
     i_cmdLineParser.add_option("", "--dnaNormalMitochon", default = "M", dest="dnaNormalMitochon", metavar="DNA_NORM_MITOCHON", help="the short name for the mitochondrial DNA (e.g 'M' or 'MT'), %default by default")
@@ -1439,12 +3078,13 @@ def main():
     #i_cmdLineParser.add_option("", "--dnaNormalLabel", default = "DNA_NORMAL", dest="dnaNormalLabel", metavar="DNA_NOR_LABEL", help="the column header for the sample in the VCF file, %default by default")
     
     # params for normal RNA
-    i_cmdLineParser.add_option("-x", "--rnaNormalFilename", dest="rnaNormalFilename", metavar="RNA_NORMAL_FILE", help="the name of the normal RNA-Seq .bam file")
+    i_cmdLineParser.add_option("-x", "--rnaNormalFilename", dest="rnaNormalFilename", metavar="RNA_NORMAL_FILE", help="the name of the normal RNA-Seq .bam file or a comma-separated list of .bam files (e.g. one per lane) that are merged on the fly")
     i_cmdLineParser.add_option("--xp", "--rnaNormalPileupsFilename", dest="rnaNormalPileupsFilename", metavar="RNA_NORMAL_PILEUPS", help="the name of the normal RNA-Seq mpileup file")
     i_cmdLineParser.add_option("", "--rnaNormalMinTotalBases", type="int", default=int(4), dest="rnaNormalMinTotalNumBases", metavar="RNA_NORM_MIN_TOTAL_BASES", help="the minimum number of overall normal RNA-Seq reads covering a position, %default by default")
     i_cmdLineParser.add_option("", "--rnaNormalMinAltBases", type="int", default=int(2), dest="rnaNormalMinAltNumBases", metavar="RNA_NORM_MIN_ALT_BASES", help="the minimum number of alternative normal RNA-Seq reads supporting a variant at a position, %default by default")
     i_cmdLineParser.add_option("", "--rnaNormalBaseQual", type="int", default=int(10), dest="rnaNormalMinBaseQuality", metavar="RNA_NORM_BASE_QUAL", help="the minimum normal RNA-Seq base quality, %default by default")
     i_cmdLineParser.add_option("", "--rnaNormalMapQual", type="int", default=int(10), dest="rnaNormalMinMappingQuality", metavar="RNA_NORM_MAP_QUAL", help="the minimum normal RNA-Seq mapping quality, %default by default")
+    i_cmdLineParser.add_option("", "--rnaNormalMaxDepth", type="int", dest="rnaNormalMaxDepth", metavar="RNA_NORM_MAX_DEPTH", help="the max number of normal RNA-Seq reads that are used at a coordinate, the --maxDepth by default")
     i_cmdLineParser.add_option("", "--rnaNormalUseChr", action="store_true", default=False, dest="rnaNormalUseChrPrefix", help="include this argument if the 'chr' prefix should be used in the samtools command for the normal RNA .bam file")
     i_cmdLineParser.add_option("", "--rnaNormalFasta", dest="rnaNormalFastaFilename", metavar="RNA_NORM_FASTA_FILE", help="the name of the fasta file for the normal RNA .bam file")    
     i_cmdLineParser.add_option("", "--rnaNormalMitochon", default = "M", dest="rnaNormalMitochon", metavar="RNA_NORM_MITOCHON", help="the short name for the mitochondrial RNA (e.g 'M' or 'MT'), %default by default")
@@ -1452,12 +3092,13 @@ def main():
     #i_cmdLineParser.add_option("", "--rnaNormalLabel", default = "RNA_NORMAL", dest="rnaNormalLabel", metavar="RNA_NOR_LABEL", help="the column header for the sample in the VCF file, %default by default")
     
     # params for tumor DNA
-    i_cmdLineParser.add_option("-t", "--dnaTumorFilename", dest="dnaTumorFilename", metavar="DNA_TUMOR_FILE", help="the name of the tumor DNA .bam file")
+    i_cmdLineParser.add_option("-t", "--dnaTumorFilename", dest="dnaTumorFilename", metavar="DNA_TUMOR_FILE", help="the name of the tumor DNA .bam file or a comma-separated list of .bam files (e.g. one per lane) that are merged on the fly")
     i_cmdLineParser.add_option("--tp", "--dnaTumorPileupsFilename", dest="dnaTumorPileupsFilename", metavar="DNA_TUMOR_PILEUPS", help="the name of the tumor DNA mpileup file")
     i_cmdLineParser.add_option("", "--dnaTumorMinTotalBases", type="int", default=int(4), dest="dnaTumorMinTotalNumBases", metavar="DNA_TUM_MIN_TOTAL_BASES", help="the minimum number of overall tumor DNA reads covering a position, %default by default")
     i_cmdLineParser.add_option("", "--dnaTumorMinAltBases", type="int", default=int(2), dest="dnaTumorMinAltNumBases", metavar="DNA_TUM_MIN_ALT_BASES", help="the minimum number of alternative tumor DNA reads supporting a variant at a position, %default by default")
     i_cmdLineParser.add_option("", "--dnaTumorBaseQual", type="int", default=int(10), dest="dnaTumorMinBaseQuality", metavar="DNA_TUM_BASE_QUAL", help="the minimum tumor DNA base quality, %default by default")
     i_cmdLineParser.add_option("", "--dnaTumorMapQual", type="int", default=int(10), dest="dnaTumorMinMappingQuality", metavar="DNA_TUM_MAP_QUAL", help="the minimum tumor DNA mapping quality, %default by default")
+    i_cmdLineParser.add_option("", "--dnaTumorMaxDepth", type="int", dest="dnaTumorMaxDepth", metavar="DNA_TUM_MAX_DEPTH", help="the max number of tumor DNA reads that are used at a coordinate, the --maxDepth by default")
     i_cmdLineParser.add_option("", "--dnaTumorUseChr", action="store_true", default=False, dest="dnaTumorUseChrPrefix", help="include this argument if the 'chr' prefix should be used in the samtools command for the tumor DNA .bam file")
     i_cmdLineParser.add_option("", "--dnaTumorFasta", dest="dnaTumorFastaFilename", metavar="DNA_TUM_FASTA_FILE", help="the name of the fasta file for the tumor DNA .bam file")
     i_cmdLineParser.add_option("", "--dnaTumorMitochon", default = "M", dest="dnaTumorMitochon", metavar="DNA_TUM_MITOCHON", help="the short name for the mitochondrial DNA (e.g 'M' or 'MT'), %default by default")
@@ -1465,12 +3106,13 @@ def main():
     #i_cmdLineParser.add_option("", "--dnaTumorLabel", default = "DNA_TUMOR", dest="dnaTumorLabel", metavar="DNA_TUM_LABEL", help="the column header for the sample in the VCF file, %default by default")
     
     # params for tumor RNA
-    i_cmdLineParser.add_option("-r", "--rnaTumorFilename", dest="rnaTumorFilename", metavar="RNA_TUMOR_FILE", help="the name of the tumor RNA-Seq .bam file")
+    i_cmdLineParser.add_option("-r", "--rnaTumorFilename", dest="rnaTumorFilename", metavar="RNA_TUMOR_FILE", help="the name of the tumor RNA-Seq .bam file or a comma-separated list of .bam files (e.g. one per lane) that are merged on the fly")
     i_cmdLineParser.add_option("--rp", "--rnaTumorPileupsFilename", dest="rnaTumorPileupsFilename", metavar="RNA_TUMOR_PILEUPS", help="the name of the tumor RNA-Seq mpileup file")
     i_cmdLineParser.add_option("", "--rnaTumorMinTotalBases", type="int", default=int(4), dest="rnaTumorMinTotalNumBases", metavar="RNA_TUM_MIN_TOTAL_BASES", help="the minimum number of overall tumor RNA-Seq reads covering a position, %default by default")
     i_cmdLineParser.add_option("", "--rnaTumorMinAltBases", type="int", default=int(2), dest="rnaTumorMinAltNumBases", metavar="RNA_TUM_MIN_ALT_BASES", help="the minimum number of alternative tumor RNA-Seq reads supporting a variant at a position, %default by default")
     i_cmdLineParser.add_option("", "--rnaTumorBaseQual", type="int", default=int(10), dest="rnaTumorMinBaseQuality", metavar="RNA_TUM_BASE_QUAL", help="the minimum tumor RNA-Seq base quality, %default by default")
     i_cmdLineParser.add_option("", "--rnaTumorMapQual", type="int", default=int(10), dest="rnaTumorMinMappingQuality", metavar="RNA_TUM_MAP_QUAL", help="the minimum tumor RNA-Seq mapping quality, %default by default")
+    i_cmdLineParser.add_option("", "--rnaTumorMaxDepth", type="int", dest="rnaTumorMaxDepth", metavar="RNA_TUM_MAX_DEPTH", help="the max number of tumor RNA-Seq reads that are used at a coordinate, the --maxDepth by default")
     i_cmdLineParser.add_option("", "--rnaTumorUseChr", action="store_true", default=False, dest="rnaTumorUseChrPrefix", help="include this argument if the 'chr' prefix should be used in the samtools command for the tumor RNA .bam file")
     i_cmdLineParser.add_option("", "--rnaTumorFasta", dest="rnaTumorFastaFilename", metavar="RNA_TUM_FASTA_FILE", help="the name of the fasta file for the tumor RNA .bam file")    
     i_cmdLineParser.add_option("", "--rnaTumorMitochon", default = "M", dest="rnaTumorMitochon", metavar="RNA_TUM_MITOCHON", help="the short name for the mitochondrial RNA (e.g 'M' or 'MT'), %default by default")
@@ -1498,6 +3140,23 @@ def main():
     i_batchSize = i_cmdLineOptions.batchSize
     i_useChrPrefix = i_cmdLineOptions.useChrPrefix
     i_rnaIncludeSecondaryAlignments = i_cmdLineOptions.rnaIncludeSecondaryAlignments
+    i_pileupEngine = i_cmdLineOptions.pileupEngine
+    i_pileupMaxDepth = i_cmdLineOptions.pileupMaxDepth
+    i_jointPileup = i_cmdLineOptions.jointPileup
+    i_concurrentPileups = i_cmdLineOptions.concurrentPileups
+    i_pileupQueueSize = i_cmdLineOptions.pileupQueueSize
+    i_threads = i_cmdLineOptions.threads
+    i_callingBlockSize = i_cmdLineOptions.callingBlockSize
+    i_somaticOnly = i_cmdLineOptions.somaticOnly
+    i_siteCacheDir = i_cmdLineOptions.siteCacheDir
+    i_regionGap = i_cmdLineOptions.regionGap
+    i_coverageMask = i_cmdLineOptions.coverageMask
+    i_includeBeds = []
+    if (i_cmdLineOptions.includeBed != None):
+        i_includeBeds = i_cmdLineOptions.includeBed.split(",")
+    i_excludeBeds = []
+    if (i_cmdLineOptions.excludeBed != None):
+        i_excludeBeds = i_cmdLineOptions.excludeBed.split(",")
     i_logLevel = i_cmdLineOptions.logLevel 
     i_startCoordinate = i_cmdLineOptions.startCoordinate
     i_stopCoordinate = i_cmdLineOptions.stopCoordinate
@@ -1508,11 +3167,13 @@ def main():
     
     i_genotypeMinDepth = i_cmdLineOptions.genotypeMinDepth
     i_genotypeMinPct = i_cmdLineOptions.genotypeMinPct
+    i_maxDepth = i_cmdLineOptions.maxDepth
         
     i_dnaNormMinTotalNumBases = i_cmdLineOptions.dnaNormalMinTotalNumBases
     i_dnaNormMinAltNumBases = i_cmdLineOptions.dnaNormalMinAltNumBases
     i_dnaNormMinBaseQual = i_cmdLineOptions.dnaNormalMinBaseQuality
     i_dnaNormMinMapQual = i_cmdLineOptions.dnaNormalMinMappingQuality
+    i_dnaNormMaxDepth = i_cmdLineOptions.dnaNormalMaxDepth if (i_cmdLineOptions.dnaNormalMaxDepth != None) else i_maxDepth
     i_dnaNormUseChr = i_cmdLineOptions.dnaNormalUseChrPrefix
     i_dnaNormMitochon = i_cmdLineOptions.dnaNormalMitochon
     i_dnaNormDesc = i_cmdLineOptions.dnaNormalDesc
@@ -1523,6 +3184,7 @@ def main():
     i_rnaNormMinAltNumBases = i_cmdLineOptions.rnaNormalMinAltNumBases
     i_rnaNormMinBaseQual = i_cmdLineOptions.rnaNormalMinBaseQuality
     i_rnaNormMinMapQual = i_cmdLineOptions.rnaNormalMinMappingQuality
+    i_rnaNormMaxDepth = i_cmdLineOptions.rnaNormalMaxDepth if (i_cmdLineOptions.rnaNormalMaxDepth != None) else i_maxDepth
     i_rnaNormUseChr = i_cmdLineOptions.rnaNormalUseChrPrefix
     i_rnaNormMitochon = i_cmdLineOptions.rnaNormalMitochon
     i_rnaNormDesc = i_cmdLineOptions.rnaNormalDesc
@@ -1533,6 +3195,7 @@ def main():
     i_dnaTumMinAltNumBases = i_cmdLineOptions.dnaTumorMinAltNumBases
     i_dnaTumMinBaseQual = i_cmdLineOptions.dnaTumorMinBaseQuality
     i_dnaTumMinMapQual = i_cmdLineOptions.dnaTumorMinMappingQuality
+    i_dnaTumMaxDepth = i_cmdLineOptions.dnaTumorMaxDepth if (i_cmdLineOptions.dnaTumorMaxDepth != None) else i_maxDepth
     i_dnaTumUseChr = i_cmdLineOptions.dnaTumorUseChrPrefix
     i_dnaTumMitochon = i_cmdLineOptions.dnaTumorMitochon
     i_dnaTumDesc = i_cmdLineOptions.dnaTumorDesc
@@ -1543,6 +3206,7 @@ def main():
     i_rnaTumMinAltNumBases = i_cmdLineOptions.rnaTumorMinAltNumBases
     i_rnaTumMinBaseQual = i_cmdLineOptions.rnaTumorMinBaseQuality
     i_rnaTumMinMapQual = i_cmdLineOptions.rnaTumorMinMappingQuality
+    i_rnaTumMaxDepth = i_cmdLineOptions.rnaTumorMaxDepth if (i_cmdLineOptions.rnaTumorMaxDepth != None) else i_maxDepth
     i_rnaTumUseChr = i_cmdLineOptions.rnaTumorUseChrPrefix
     i_rnaTumMitochon = i_cmdLineOptions.rnaTumorMitochon
     i_rnaTumDesc = i_cmdLineOptions.rnaTumorDesc
@@ -1587,6 +3251,9 @@ def main():
     i_universalFastaFilename = None
     i_refFilename = None
     i_statsDir = None
+    i_chromOutputDir = None
+    i_tumorsFilename = None
+    i_tumorOutputDir = None
     i_dataSource = None
     i_sequencingPlatform = None
     i_disease = None
@@ -1606,28 +3273,28 @@ def main():
         
     if (i_cmdLineOptions.dnaNormalFilename != None):
         i_dnaNormalFilename = str(i_cmdLineOptions.dnaNormalFilename)
-        i_readFilenameList += [i_dnaNormalFilename]   
+        i_readFilenameList += i_dnaNormalFilename.split(",")   
         filenames += [i_dnaNormalFilename]
         labels += [i_dnaNormLabel]
         descriptions += [i_dnaNormDesc]
         analytes += ["DNA"]
     if (i_cmdLineOptions.rnaNormalFilename != None):
         i_rnaNormalFilename = str(i_cmdLineOptions.rnaNormalFilename)
-        i_readFilenameList += [i_rnaNormalFilename] 
+        i_readFilenameList += i_rnaNormalFilename.split(",") 
         filenames += [i_rnaNormalFilename] 
         labels += [i_rnaNormLabel]
         descriptions += [i_rnaNormDesc]
         analytes += ["RNA"]
     if (i_cmdLineOptions.dnaTumorFilename != None):
         i_dnaTumorFilename = str(i_cmdLineOptions.dnaTumorFilename)
-        i_readFilenameList += [i_dnaTumorFilename] 
+        i_readFilenameList += i_dnaTumorFilename.split(",") 
         filenames += [i_dnaTumorFilename]  
         labels += [i_dnaTumLabel]
         descriptions += [i_dnaTumDesc]
         analytes += ["DNA"]
     if (i_cmdLineOptions.rnaTumorFilename != None):
         i_rnaTumorFilename = str(i_cmdLineOptions.rnaTumorFilename)
-        i_readFilenameList += [i_rnaTumorFilename]  
+        i_readFilenameList += i_rnaTumorFilename.split(",")  
         filenames += [i_rnaTumorFilename]
         labels += [i_rnaTumLabel]
         descriptions += [i_rnaTumDesc]
@@ -1646,6 +3313,15 @@ def main():
     if (i_cmdLineOptions.statsDir != None):
         i_statsDir = str(i_cmdLineOptions.statsDir)
         i_dirList += [i_statsDir]
+    if (i_cmdLineOptions.chromOutputDir != None):
+        i_chromOutputDir = str(i_cmdLineOptions.chromOutputDir)
+        i_dirList += [i_chromOutputDir]
+    if (i_cmdLineOptions.tumorsFilename != None):
+        i_tumorsFilename = str(i_cmdLineOptions.tumorsFilename)
+        i_readFilenameList += [i_tumorsFilename]
+    if (i_cmdLineOptions.tumorOutputDir != None):
+        i_tumorOutputDir = str(i_cmdLineOptions.tumorOutputDir)
+        i_dirList += [i_tumorOutputDir]
     if (i_cmdLineOptions.dataSource != None):
         i_dataSource = str(i_cmdLineOptions.dataSource)
     if (i_cmdLineOptions.sequencingPlatform != None):
@@ -1685,6 +3361,12 @@ def main():
     if (i_universalFastaFilename != None):
         i_readFilenameList += [i_universalFastaFilename]
         
+    # need to set these for the vcf header, especially when only a universal max depth is specified
+    i_cmdLineOptionsDict["dnaNormalMaxDepth"] = i_dnaNormMaxDepth
+    i_cmdLineOptionsDict["rnaNormalMaxDepth"] = i_rnaNormMaxDepth
+    i_cmdLineOptionsDict["dnaTumorMaxDepth"] = i_dnaTumMaxDepth
+    i_cmdLineOptionsDict["rnaTumorMaxDepth"] = i_rnaTumMaxDepth
+    
     # need to set these for the vcf header, especially when only a universal fasta file is specified
     i_cmdLineOptionsDict["dnaNormalFastaFilename"] = i_dnaNormalFastaFilename
     i_cmdLineOptionsDict["dnaTumorFastaFilename"] = i_dnaTumorFastaFilename
@@ -1716,6 +3398,10 @@ def main():
         logging.debug("logFilename=%s" % i_logFilename)
         logging.debug("batchSize=%s" % i_batchSize)
         logging.debug("coordinatesFile=%s" % i_coordinatesFilename)
+        logging.debug("regionGap=%s" % i_regionGap)
+        logging.debug("coverageMask=%s" % i_coverageMask)
+        logging.debug("includeBeds=%s" % i_includeBeds)
+        logging.debug("excludeBeds=%s" % i_excludeBeds)
         logging.debug("vcfFormat=%s" % i_vcfFormat)
         logging.debug("startCoordinate=%s" % i_startCoordinate)
         logging.debug("stopCoordinate=%s" % i_stopCoordinate)
@@ -1724,12 +3410,25 @@ def main():
         logging.debug("disease=%s" % i_disease)
         logging.debug("refFilename=%s" % i_refFilename)
         logging.debug("statsDir=%s" % i_statsDir)
+        logging.debug("chromOutputDir=%s" % i_chromOutputDir)
+        logging.debug("tumorsFilename=%s" % i_tumorsFilename)
+        logging.debug("tumorOutputDir=%s" % i_tumorOutputDir)
         logging.debug("rnaIncludeSecondaryAlignments=%s" % i_rnaIncludeSecondaryAlignments)
+        logging.debug("pileupEngine=%s" % i_pileupEngine)
+        logging.debug("pileupMaxDepth=%s" % i_pileupMaxDepth)
+        logging.debug("jointPileup=%s" % i_jointPileup)
+        logging.debug("concurrentPileups=%s" % i_concurrentPileups)
+        logging.debug("pileupQueueSize=%s" % i_pileupQueueSize)
+        logging.debug("threads=%s" % i_threads)
+        logging.debug("callingBlockSize=%s" % i_callingBlockSize)
+        logging.debug("somaticOnly=%s" % i_somaticOnly)
+        logging.debug("siteCacheDir=%s" % i_siteCacheDir)
         logging.debug("outputHeader=%s" % i_outputHeader)
         logging.debug("outputAllData=%s" % i_outputAllData)
         
         logging.debug("genotypeMinDepth=%s" % i_genotypeMinDepth)
         logging.debug("genotypeMinPct=%s" % i_genotypeMinPct)
+        logging.debug("maxDepth=%s" % i_maxDepth)
         
         if (i_dnaNormalFilename != None):
             logging.debug("dnaNormal=%s" % i_dnaNormalFilename)
@@ -1738,6 +3437,7 @@ def main():
         logging.debug("dna normal fasta File: %s" % i_dnaNormalFastaFilename)
         logging.debug("dna normal minBaseQual: %s" % i_dnaNormMinBaseQual)
         logging.debug("dna normal minMappingQual: %s" % i_dnaNormMinMapQual)
+        logging.debug("dna normal maxDepth: %s" % i_dnaNormMaxDepth)
         logging.debug("dna normal minTotalBases: %s" % i_dnaNormMinTotalNumBases)
         logging.debug("dna normal minAltBases: %s" % i_dnaNormMinAltNumBases)
         logging.debug("dna normal usePrefix? %s" % i_dnaNormUseChr)
@@ -1750,6 +3450,7 @@ def main():
         logging.debug("dna tumor fasta File: %s" % i_dnaTumorFastaFilename)
         logging.debug("dna tumor minBaseQual: %s" % i_dnaTumMinBaseQual)
         logging.debug("dna tumor minMappingQual: %s" % i_dnaTumMinMapQual)
+        logging.debug("dna tumor maxDepth: %s" % i_dnaTumMaxDepth)
         logging.debug("dna tumor minTotalBases: %s" % i_dnaTumMinTotalNumBases)
         logging.debug("dna tumor minAltBases: %s" % i_dnaTumMinAltNumBases)
         logging.debug("dna tumor usePrefix? %s" % i_dnaTumUseChr)
@@ -1762,6 +3463,7 @@ def main():
         logging.debug("rna normal fasta File: %s" % i_rnaNormalFastaFilename)
         logging.debug("rna normal minBaseQual: %s" % i_rnaNormMinBaseQual)
         logging.debug("rna normal minMappingQual: %s" % i_rnaNormMinMapQual)
+        logging.debug("rna normal maxDepth: %s" % i_rnaNormMaxDepth)
         logging.debug("rna normal minTotalBases: %s" % i_rnaNormMinTotalNumBases)
         logging.debug("rna normal minAltBases: %s" % i_rnaNormMinAltNumBases)
         logging.debug("rna normal usePrefix? %s" % i_rnaNormUseChr)
@@ -1774,6 +3476,7 @@ def main():
         logging.debug("rna tumor fasta File: %s" % i_rnaTumorFastaFilename)
         logging.debug("rna tumor minBaseQual: %s" % i_rnaTumMinBaseQual)
         logging.debug("rna tumor minMappingQual: %s" % i_rnaTumMinMapQual)
+        logging.debug("rna tumor maxDepth: %s" % i_rnaTumMaxDepth)
         logging.debug("rna tumor minTotalBases: %s" % i_rnaTumMinTotalNumBases)
         logging.debug("rna tumor minAltBases: %s" % i_rnaTumMinAltNumBases)
         logging.debug("rna tumor usePrefix? %s" % i_rnaTumUseChr)
@@ -1800,25 +3503,24 @@ def main():
     if (i_rnaTumorFilename == None and i_rnaTumorPileupsFilename != None):
         logging.critical("You have specified a pileups file for the RNA tumor sample, but the original .bam file is needed for filtering. Please specify both a .bam and a pileups file for the RNA tumor sample.")
         sys.exit(1)
-    if (i_dnaNormalFilename != None and not os.path.isfile(i_dnaNormalFilename + ".bai")):
-        logging.critical("The index file for the BAM file " + i_dnaNormalFilename + " doesn't exist.  Please use the 'samtools index' command to create one.")
-        sys.exit(1)
-    if (i_rnaNormalFilename != None and not os.path.isfile(i_rnaNormalFilename + ".bai")):
-        logging.critical("The index file for the BAM file " + i_rnaNormalFilename + " doesn't exist.  Please use the 'samtools index' command to create one.")
-        sys.exit(1)
-    if (i_dnaTumorFilename != None and not os.path.isfile(i_dnaTumorFilename + ".bai")):
-        logging.critical("The index file for the BAM file " + i_dnaTumorFilename + " doesn't exist.  Please use the 'samtools index' command to create one.")
-        sys.exit(1)
-    if (i_rnaTumorFilename != None and not os.path.isfile(i_rnaTumorFilename + ".bai")):
-        logging.critical("The index file for the BAM file " + i_rnaTumorFilename + " doesn't exist.  Please use the 'samtools index' command to create one.")
-        sys.exit(1)
         
-    # the user cannot specify both a coordinates file and a pileups file
-    if ((i_coordinatesFilename != None and i_dnaNormalPileupsFilename != None) or
-        (i_coordinatesFilename != None and i_rnaNormalPileupsFilename != None) or
-        (i_coordinatesFilename != None and i_dnaTumorPileupsFilename != None) or
-        (i_coordinatesFilename != None and i_rnaTumorPileupsFilename != None)):
-        logging.critical("You cannot specify a coordinates file with coordinate ranges to query and a pileups file with coordinates already queried.  Please remove one or the other.")
+    # each sample can have a comma-separated list of .bam files (e.g. one per lane) that are merged for each batch
+    for bamFilenames in (i_dnaNormalFilename, i_rnaNormalFilename, i_dnaTumorFilename, i_rnaTumorFilename):
+        if (bamFilenames == None):
+            continue
+        for bamFilename in bamFilenames.split(","):
+            if (not os.path.isfile(bamFilename + ".bai")):
+                logging.critical("The index file for the BAM file " + bamFilename + " doesn't exist.  Please use the 'samtools index' command to create one.")
+                sys.exit(1)
+        
+    # the indexed pileups files are read with the pysam API
+    i_pileupsFilenames = [filename for filename in (i_dnaNormalPileupsFilename, i_rnaNormalPileupsFilename, i_dnaTumorPileupsFilename, i_rnaTumorPileupsFilename) if (filename != None)]
+    if (pysam == None and any(is_indexed_pileups_file(filename) for filename in i_pileupsFilenames)):
+        logging.warning("The pileups files have been indexed, but the pysam module could not be imported, so the pileups files will be read from the top.  Please install pysam to read the indexed pileups files.")
+    
+    # the user cannot specify both a coordinates file and a pileups file, unless all of the pileups files can seek straight to each coordinate range
+    if (i_coordinatesFilename != None and len(i_pileupsFilenames) > 0 and (pysam == None or not all(is_indexed_pileups_file(filename) for filename in i_pileupsFilenames))):
+        logging.critical("You cannot specify a coordinates file with coordinate ranges to query and a pileups file with coordinates already queried, unless the pileups files have been compressed with bgzip and indexed with tabix.  Please remove one or the other.")
         sys.exit(1)
             
     # make sure the user specified the necessary files
@@ -1841,8 +3543,238 @@ def main():
         logging.critical("The index file for the FASTA file " + i_rnaTumorFastaFilename + " doesn't exist.  Please use the 'samtools faidx' command to create one.")
         sys.exit(1)
    
+    # the pysam pileup engine needs the pysam API
+    if (i_pileupEngine == "pysam" and pysam == None):
+        logging.critical("The pysam pileup engine was specified, but the pysam module could not be imported.  Please install pysam or use the samtools pileup engine.")
+        sys.exit(1)
+    
+    # choose the function that creates the pileups from the .bam files
+    if (i_pileupEngine == "pysam"):
+        i_laneDataFunction = get_pysam_data
+        i_laneMergeFunction = execute_pysam_merge
+    else:
+        i_laneDataFunction = get_bam_data
+        i_laneMergeFunction = execute_samtools_merge
+    
+    # the lanes of a sample are merged into one .bam file per batch before they are piled up
+    i_bamDataFunction = lambda *aParams: get_lanes_data(i_laneDataFunction, i_laneMergeFunction, *aParams)
+    
+    # the queue needs room for at least one chunk of pileups
+    if (i_concurrentPileups and i_pileupQueueSize < 1):
+        logging.critical("The pileup queue size must be at least 1 when the pileups are fetched concurrently.")
+        sys.exit(1)
+    
+    # the region is split into shards that are run in parallel
+    if (i_threads < 1):
+        logging.critical("The number of threads must be at least 1.")
+        sys.exit(1)
+    if (i_threads > 1 and i_coordinatesFilename != None):
+        logging.critical("The coordinates in a coordinates file cannot be split into shards.  Please remove the coordinates file or the --threads param.")
+        sys.exit(1)
+    if (i_regionGap < 0):
+        logging.critical("The region gap must be at least 0.")
+        sys.exit(1)
+    if (min(i_dnaNormMaxDepth, i_rnaNormMaxDepth, i_dnaTumMaxDepth, i_rnaTumMaxDepth) < 0):
+        logging.critical("The max depth must be at least 0.")
+        sys.exit(1)
+    for bedPath in i_includeBeds + i_excludeBeds:
+        if (not os.path.exists(bedPath)):
+            logging.critical("The .bed file or directory " + bedPath + " doesn't exist.")
+            sys.exit(1)
+    
+    # in somatic-only mode, the candidates are screened on the tumor samples, and the normal DNA is only piled up at the candidates
+    if (i_somaticOnly):
+        if ((i_dnaNormalFilename == None and i_dnaNormalPileupsFilename == None) or (i_dnaTumorFilename == None and i_dnaTumorPileupsFilename == None)):
+            logging.critical("The somatic-only mode requires the normal DNA and the tumor DNA.")
+            sys.exit(1)
+        if (i_rnaNormalFilename != None or i_rnaNormalPileupsFilename != None):
+            logging.critical("The somatic-only mode cannot be used with the normal RNA.  Please remove the normal RNA or the --somaticOnly param.")
+            sys.exit(1)
+        if (numpy == None):
+            logging.critical("The somatic-only mode requires numpy.  Please install numpy or remove the --somaticOnly param.")
+            sys.exit(1)
+        if (i_jointPileup):
+            logging.critical("The somatic-only mode cannot be used with the --jointPileup param, because the normal DNA is piled up on its own.  Please remove the --jointPileup or the --somaticOnly param.")
+            sys.exit(1)
+        if (i_outputAllData or i_debug):
+            logging.critical("The somatic-only mode cannot be used with the --outputAllData param or the DEBUG log level, because every coordinate needs to be called.  Please remove the --somaticOnly param.")
+            sys.exit(1)
+        if (i_dnaNormalPileupsFilename != None and (pysam == None or not is_indexed_pileups_file(i_dnaNormalPileupsFilename))):
+            logging.critical("The somatic-only mode requires a normal DNA pileups file that has been compressed with bgzip and indexed with tabix, and it requires pysam.")
+            sys.exit(1)
+        # the candidates are always screened in blocks
+        if (i_callingBlockSize == 0):
+            i_callingBlockSize = 10000
+    
+    # the coordinates are screened in blocks with numpy, and only the coordinates that could have a variant are called
+    if (i_callingBlockSize < 0):
+        logging.critical("The calling block size must be at least 0.")
+        sys.exit(1)
+    if (i_callingBlockSize > 0):
+        if (numpy == None):
+            logging.critical("The calling block size requires numpy.  Please install numpy or remove the --callingBlockSize param.")
+            sys.exit(1)
+        if (i_outputAllData or i_debug):
+            logging.critical("The calling block size cannot be used with the --outputAllData param or the DEBUG log level, because every coordinate needs to be called.  Please remove the --callingBlockSize param.")
+            sys.exit(1)
+    
+    # the decoded pileups of each sample are cached in the site cache directory
+    if (i_siteCacheDir != None):
+        if (numpy == None):
+            logging.critical("The site cache requires numpy.  Please install numpy or remove the --siteCacheDir param.")
+            sys.exit(1)
+        if (not os.path.isdir(i_siteCacheDir)):
+            logging.critical("The site cache directory " + i_siteCacheDir + " doesn't exist.")
+            sys.exit(1)
+        if (i_callingBlockSize > 0 or i_somaticOnly or i_jointPileup):
+            logging.critical("The site cache cannot be used with the --callingBlockSize, --somaticOnly, or --jointPileup params, because they decode the pileups on their own.  Please remove the --siteCacheDir param.")
+            sys.exit(1)
+    
+    # all of the tumors in the tumors file are called against the same normal samples
+    if (i_tumorsFilename != None):
+        if (i_dnaTumorFilename != None or i_rnaTumorFilename != None or i_dnaTumorPileupsFilename != None or i_rnaTumorPileupsFilename != None):
+            logging.critical("The tumors file cannot be used with the tumor .bam or pileups files.  Please list all of the tumors in the tumors file.")
+            sys.exit(1)
+        if (i_dnaNormalFilename == None and i_rnaNormalFilename == None):
+            logging.critical("The tumors file requires the normal DNA or the normal RNA.")
+            sys.exit(1)
+        if (i_tumorOutputDir == None or i_outputFilename != None or i_chromOutputDir != None):
+            logging.critical("The tumors file requires a tumor output directory, and it cannot be used with an output file or a chrom output directory.")
+            sys.exit(1)
+        # the normal samples are shared through the site cache
+        if (numpy == None):
+            logging.critical("The tumors file requires numpy.  Please install numpy or call each tumor on its own.")
+            sys.exit(1)
+        if (i_callingBlockSize > 0 or i_somaticOnly or i_jointPileup):
+            logging.critical("The tumors file cannot be used with the --callingBlockSize, --somaticOnly, or --jointPileup params, because the normal samples are shared through the site cache.")
+            sys.exit(1)
+        
+        i_tumorsFileHandler = open(i_tumorsFilename, "r")
+        i_tumors = get_tumors(i_tumorsFileHandler, i_debug)
+        i_tumorsFileHandler.close()
+        
+        if (len(i_tumors) == 0):
+            logging.critical("The tumors file " + i_tumorsFilename + " doesn't have any tumors.")
+            sys.exit(1)
+        if (len(set([tumorId for (tumorId, dnaTumorFilename, rnaTumorFilename) in i_tumors])) != len(i_tumors)):
+            logging.critical("The tumor ids in the tumors file " + i_tumorsFilename + " must be unique.")
+            sys.exit(1)
+        for (tumorId, dnaTumorFilename, rnaTumorFilename) in i_tumors:
+            if (dnaTumorFilename == None and rnaTumorFilename == None):
+                logging.critical("The tumor " + tumorId + " in the tumors file doesn't have a tumor DNA or a tumor RNA .bam file.")
+                sys.exit(1)
+            if (not radiaUtil.check_for_argv_errors(None, [laneFilename for filename in (dnaTumorFilename, rnaTumorFilename) if (filename != None) for laneFilename in filename.split(",")], None)):
+                sys.exit(1)
+    elif (i_tumorOutputDir != None):
+        logging.critical("The tumor output directory can only be used with a tumors file.  Please remove the tumor output directory or specify a tumors file.")
+        sys.exit(1)
+    
+    # the joint pileup runs one samtools command on all of the .bam files, so all of the samples need to share the same parameters
+    if (i_jointPileup):
+        if (i_pileupEngine != "samtools"):
+            logging.critical("The joint pileup can only be used with the samtools pileup engine.")
+            sys.exit(1)
+        if (i_dnaNormalPileupsFilename != None or i_rnaNormalPileupsFilename != None or i_dnaTumorPileupsFilename != None or i_rnaTumorPileupsFilename != None):
+            logging.critical("The joint pileup cannot be used with pileups files.  Please remove the pileups files or the --jointPileup param.")
+            sys.exit(1)
+        if (any("," in bamFilename for bamFilename in (i_dnaNormalFilename, i_rnaNormalFilename, i_dnaTumorFilename, i_rnaTumorFilename) if (bamFilename != None))):
+            logging.critical("The joint pileup cannot be used with more than one .bam file per sample.  Please remove the --jointPileup param.")
+            sys.exit(1)
+        if (i_rnaIncludeSecondaryAlignments and (i_rnaNormalFilename != None or i_rnaTumorFilename != None) and (i_dnaNormalFilename != None or i_dnaTumorFilename != None)):
+            logging.critical("The joint pileup cannot include the RNA secondary alignments without including them for the DNA as well.  Please remove the --rnaIncludeSecondaryAlignments or the --jointPileup param.")
+            sys.exit(1)
+        
+        i_jointSampleParams = set()
+        if (i_dnaNormalFilename != None):
+            i_jointSampleParams.add((i_dnaNormalFastaFilename, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_dnaNormUseChr, i_dnaNormMitochon))
+        if (i_rnaNormalFilename != None):
+            i_jointSampleParams.add((i_rnaNormalFastaFilename, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_rnaNormUseChr, i_rnaNormMitochon))
+        if (i_dnaTumorFilename != None):
+            i_jointSampleParams.add((i_dnaTumorFastaFilename, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_dnaTumUseChr, i_dnaTumMitochon))
+        if (i_rnaTumorFilename != None):
+            i_jointSampleParams.add((i_rnaTumorFastaFilename, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_rnaTumUseChr, i_rnaTumMitochon))
+        if (len(i_jointSampleParams) > 1):
+            logging.critical("The joint pileup requires all of the .bam files to use the same FASTA file, base quality, mapping quality, 'chr' prefix, and mitochondrial name.  Please use the same params for all samples or remove the --jointPileup param.")
+            sys.exit(1)
+        (i_jointFastaFilename, i_jointMinBaseQual, i_jointMinMapQual, i_jointUseChr, i_jointMitochon) = i_jointSampleParams.pop()
+        
+        # the secondary alignments are only included when all of the .bam files are RNA
+        i_jointIncludeSecondaryAlignments = (i_rnaIncludeSecondaryAlignments and i_dnaNormalFilename == None and i_dnaTumorFilename == None)
+    
+    # each tumor in the tumors file is run by its own radia.py process, and the normal samples are shared through the site cache
+    if (i_tumorsFilename != None):
+        startTime = time.time()
+        i_tumorDir = tempfile.mkdtemp(prefix="radia_" + i_id + "_", dir=i_tumorOutputDir)
+        tumorCommands = []
+        tumorStatsDirs = []
+        for (index, (tumorId, dnaTumorFilename, rnaTumorFilename)) in enumerate(i_tumors):
+            tumorStatsDir = os.path.join(i_tumorDir, "stats_" + tumorId) + os.sep
+            os.mkdir(tumorStatsDir)
+            
+            # the first tumor piles up the normal samples with all of the threads, the rest of the tumors read them from the cache in parallel
+            overrides = {"dnaTumorFilename": dnaTumorFilename, "rnaTumorFilename": rnaTumorFilename, "tumorsFilename": None, "tumorOutputDir": None, 
+                         "outputFilename": os.path.join(i_tumorOutputDir, i_id + "_" + tumorId + ".vcf.gz"), "statsDir": tumorStatsDir, 
+                         "siteCacheDir": (i_siteCacheDir if (i_siteCacheDir != None) else i_tumorDir), "threads": (i_threads if (index == 0) else 1), "logFilename": None}
+            tumorCommands.append(get_radia_command(i_cmdLineParser, i_cmdLineOptionsDict, i_id + "_" + tumorId, i_chrom, overrides))
+            tumorStatsDirs.append(tumorStatsDir)
+        
+        run_radia_commands(tumorCommands[:1], 1, i_debug)
+        if (len(tumorCommands) > 1):
+            run_radia_commands(tumorCommands[1:], i_threads, i_debug)
+        
+        # the stats have the lines from each tumor
+        if (i_statsDir != None):
+            for statsFilename in ("variantCounts.tab", "genStats.tab"):
+                statsFileHandler = open(i_statsDir + statsFilename, "a")
+                for tumorStatsDir in tumorStatsDirs:
+                    if (os.path.isfile(tumorStatsDir + statsFilename)):
+                        tumorStatsFileHandler = open(tumorStatsDir + statsFilename, "r")
+                        shutil.copyfileobj(tumorStatsFileHandler, statsFileHandler)
+                        tumorStatsFileHandler.close()
+                statsFileHandler.close()
+        shutil.rmtree(i_tumorDir)
+        
+        stopTime = time.time()
+        logging.info("radia.py Chrom %s and Id %s: Called %s tumors, Total time=%s hrs, %s mins, %s secs", i_chrom, i_id, len(i_tumors), ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime))
+        return
+    
+    # the user can specify a comma-separated list of chroms or "all" for all of the chroms in the FASTA index file
+    i_multiChrom = (i_chrom == "all" or "," in i_chrom)
+    if (i_multiChrom):
+        if (i_coordinatesFilename != None):
+            logging.critical("A coordinates file cannot be used with more than one chrom.  Please remove the coordinates file or specify only one chrom.")
+            sys.exit(1)
+        if (i_startCoordinate != 1 or i_stopCoordinate != 0):
+            logging.critical("The start and stop coordinates cannot be used with more than one chrom.  Please remove the coordinates or specify only one chrom.")
+            sys.exit(1)
+        if (i_chromOutputDir != None and i_outputFilename != None):
+            logging.critical("You cannot specify both an output file and a chrom output directory.  Please remove one or the other.")
+            sys.exit(1)
+        if (i_universalFastaFilename == None):
+            logging.critical("You must specify the appropriate FASTA files when running RADIA.")
+            sys.exit(1)
+        elif (not os.path.isfile(i_universalFastaFilename + ".fai")):
+            logging.critical("The index file for the FASTA file " + i_universalFastaFilename + " doesn't exist.  Please use the 'samtools faidx' command to create one.")
+            sys.exit(1)
+        
+        # get the sizes of the chroms in the order of the FASTA index file
+        i_chromSizeFileHandler = open(i_universalFastaFilename + ".fai", "r")
+        i_chromSizes = get_chrom_sizes(i_chromSizeFileHandler, i_debug)
+        i_chromSizeFileHandler.close()
+        
+        if (i_chrom != "all"):
+            requestedChroms = [chrom[3:] if (chrom.startswith("chr")) else chrom for chrom in i_chrom.split(",")]
+            for chrom in requestedChroms:
+                if (chrom not in dict(i_chromSizes)):
+                    logging.critical("Couldn't find chromosome '%s' in the FASTA file that was specified.", chrom)
+                    sys.exit(1)
+            i_chromSizes = [(chrom, size) for (chrom, size) in i_chromSizes if (chrom in requestedChroms)]
+    elif (i_chromOutputDir != None):
+        logging.critical("The chrom output directory can only be used with more than one chrom.  Please remove the chrom output directory or specify more chroms.")
+        sys.exit(1)
+    
     # get the stop coordinate if it hasn't been specified
-    if (i_stopCoordinate == 0):
+    if (i_stopCoordinate == 0 and not i_multiChrom):
         if (i_universalFastaFilename == None):
             logging.critical("You must specify the appropriate FASTA files when running RADIA.")
             sys.exit(1)
@@ -1867,7 +3799,7 @@ def main():
     # when a coordinates file is provided: 
     #     - get all of the chroms, starts, stops 
     if (i_coordinatesFilename != None):
-        coordinatesFileHandler = get_read_fileHandler(i_coordinatesFilename)  
+        coordinatesFileHandler = lineReader.get_read_fileHandler(i_coordinatesFilename)  
         for line in coordinatesFileHandler:
             # if it is an empty line, then just continue
             if (line.isspace() or line.startswith("#")):
@@ -1884,10 +3816,69 @@ def main():
     # otherwise, we have just one chrom, start, stop
     #    - the user either specified a start and stop with the -a and -z params
     #    - or they want the whole chromosome by specifying the chrom param
-    else:
+    # when more than one chrom is specified, the chroms are run by separate radia.py processes below
+    elif (not i_multiChrom):
         i_chroms.append(i_chrom)
         i_starts.append(i_startCoordinate)
         i_stops.append(i_stopCoordinate)
+    
+    # error checking
+    for (currentChrom, currentStart, currentStop) in izip(i_chroms, i_starts, i_stops):
+        if (currentStart > currentStop):
+            logging.critical("The start coordinate must be less than or equal to the stop coordinate %s:%s-%s", currentChrom, currentStart, currentStop)
+            sys.exit(1)
+    
+    # sort and merge the regions, so that no coordinate is called twice, 
+    # and pile up the regions that are close to each other at once
+    i_regions = regionPlan.plan_regions(zip(i_chroms, i_starts, i_stops), i_regionGap)
+    
+    # only pile up the coordinates that are in all of the include regions and not in any of the exclude regions
+    # the shards restrict their own regions
+    if (i_threads == 1):
+        for bedPath in i_includeBeds:
+            i_regions = regionPlan.restrict_regions(i_regions, get_bed_intervals(bedPath, set([chrom for (chrom, start, stop, intervals) in i_regions]), i_debug), i_regionGap)
+        for bedPath in i_excludeBeds:
+            i_regions = regionPlan.exclude_regions(i_regions, get_bed_intervals(bedPath, set([chrom for (chrom, start, stop, intervals) in i_regions]), i_debug), i_regionGap)
+    
+    # skip the parts of the chroms without any reads in all of the .bam files
+    if (i_coverageMask):
+        # the masks are cached before the chroms or shards are run in parallel, so that they are only built once
+        i_coverageMaskSamples = [(laneFilename, mitochon, useChr) for (bamFilename, mitochon, useChr) in ((i_dnaNormalFilename, i_dnaNormMitochon, i_dnaNormUseChr), (i_rnaNormalFilename, i_rnaNormMitochon, i_rnaNormUseChr), (i_dnaTumorFilename, i_dnaTumMitochon, i_dnaTumUseChr), (i_rnaTumorFilename, i_rnaTumMitochon, i_rnaTumUseChr)) if (bamFilename != None) for laneFilename in bamFilename.split(",")]
+        i_coverageMasks = [bamIndex.get_coverage_mask(laneFilename) for (laneFilename, mitochon, useChr) in i_coverageMaskSamples]
+        
+        # the shards restrict their own regions
+        if (i_threads == 1):
+            i_coveredIntervalsDict = {}
+            for chrom in set(i_chroms):
+                coveredIntervals = bamIndex.get_covered_intervals(i_coverageMasks, [get_bam_chrom(chrom, mitochon, useChr) for (laneFilename, mitochon, useChr) in i_coverageMaskSamples])
+                # a chrom that isn't in any of the masks is named differently in the .bam files, so none of it is skipped
+                if (coveredIntervals == None):
+                    logging.warning("The chrom %s isn't in the coverage masks of any of the .bam files, so all of its coordinates are piled up.  Please check the 'chr' prefix and mitochondrial DNA params.", chrom)
+                    coveredIntervals = [(1, sys.maxint)]
+                i_coveredIntervalsDict[chrom] = coveredIntervals
+            i_regions = regionPlan.restrict_regions(i_regions, i_coveredIntervalsDict, i_regionGap)
+    
+    # the coordinates with an "N" in the reference are ignored by the main loop, so the runs of N's are skipped up front
+    # when debugging, these coordinates are output, and the shards skip their own runs of N's
+    if (not i_debug and i_threads == 1):
+        i_fastaFilenames = set([fastaFilename for (bamFilename, fastaFilename) in ((i_dnaNormalFilename, i_dnaNormalFastaFilename), (i_rnaNormalFilename, i_rnaNormalFastaFilename), (i_dnaTumorFilename, i_dnaTumorFastaFilename), (i_rnaTumorFilename, i_rnaTumorFastaFilename)) if (bamFilename != None)])
+        i_regions = regionPlan.exclude_regions(i_regions, get_n_runs(i_fastaFilenames, i_regions), i_regionGap)
+    
+    if (i_debug):
+        logging.debug("planned %s regions with %s coordinates", len(i_regions), sum(stop - start + 1 for (chrom, regionStart, regionStop, intervals) in i_regions for (start, stop) in intervals))
+    
+    # pile up all of the planned regions on a chrom with one pileup generator per sample
+    # the shards plan their own regions, and a site cache file must have all of the coordinates from its start to its stop, so they are run per region
+    if (i_threads == 1 and i_siteCacheDir == None):
+        i_regions = regionPlan.group_regions(i_regions)
+    else:
+        i_regions = [(chrom, start, stop, intervals, [(start, stop)]) for (chrom, start, stop, intervals) in i_regions]
+    
+    i_chroms = [chrom for (chrom, start, stop, intervals, regions) in i_regions]
+    i_starts = [start for (chrom, start, stop, intervals, regions) in i_regions]
+    i_stops = [stop for (chrom, start, stop, intervals, regions) in i_regions]
+    i_intervals = [intervals for (chrom, start, stop, intervals, regions) in i_regions]
+    i_regionLists = [regions for (chrom, start, stop, intervals, regions) in i_regions]
         
     # EGFR chr7:55,248,979-55,259,567
     #i_startCoordinate = 55248979
@@ -1899,8 +3890,8 @@ def main():
     if (i_outputFilename != None):
         i_outputFileHandler = get_write_fileHandler(i_outputFilename)
             
-    # if we should output the header
-    if (i_outputHeader):
+    # if we should output the header (each chrom output file gets its own header)
+    if (i_outputHeader and i_chromOutputDir == None):
         
         # create the VCF header 
         platforms = [i_sequencingPlatform] * len(filenames)
@@ -1922,6 +3913,12 @@ def main():
     
     # initialize some variables
     formatString = "GT:DP:INDEL:START:STOP:MQ0:MMQ:MQA:AD:AF:BQ:SB"
+    
+    # create some default output in case there are no reads for one dataset but there are for others
+    formatItemCount = len(formatString.split(":"))
+    diploidEmptyFormatString = ":".join(["./."] + ["."] * (formatItemCount - 1))
+    haploidEmptyFormatString = ":".join(["."] * formatItemCount)
+    
     countRnaDnaCoordinateOverlap = 0
     totalGerms = 0
     totalSoms = 0
@@ -1937,6 +3934,7 @@ def main():
     refList = list()
     filterList = list()
     coordinateBaseQualsList = list()
+    vcfOutputList = list()
     altCountsDict = collections.defaultdict(int)
     infoDict = collections.defaultdict(list)
     
@@ -1963,8 +3961,73 @@ def main():
     previousBaseCounts = collections.defaultdict(int)
     dnaNormalPreviousBaseCounts = collections.defaultdict(int)
     
+    # in block mode, the previous base counts and the coordinates with data are kept here for the coordinates that are screened out
+    if (i_callingBlockSize > 0):
+        i_blockState = {"unscreened": False, "previousCounts": numpy.zeros(len(i_alleles), dtype=numpy.int64), "dnaNormalPreviousCounts": numpy.zeros(len(i_alleles), dtype=numpy.int64),
+                        "previousBaseCounts": None, "dnaNormalPreviousBaseCounts": None, "coordinatesWithData": [0, 0, 0, 0]}
+        # the coordinates that are not screened are called by the main loop, and the screening goes on from the counts of the main loop
+        i_blockState["getPreviousBaseCounts"] = lambda: (previousBaseCounts, dnaNormalPreviousBaseCounts)
+    
+    # when more than one chrom is specified, each chrom is run by its own radia.py process
+    if (i_multiChrom):
+        i_chromDir = tempfile.mkdtemp(prefix="radia_" + i_id + "_", dir=(os.path.dirname(os.path.abspath(i_outputFilename)) if (i_outputFilename != None) else None))
+        chromCommands = []
+        chromOutputFilenames = []
+        chromStatsDirs = []
+        for (chrom, size) in i_chromSizes:
+            # the chroms either go to their own output files or are stitched together into one output file
+            if (i_chromOutputDir != None):
+                chromOutputFilename = os.path.join(i_chromOutputDir, i_id + "_chr" + chrom + ".vcf.gz")
+            else:
+                chromOutputFilename = os.path.join(i_chromDir, "chr" + chrom + ".vcf")
+            chromStatsDir = os.path.join(i_chromDir, "stats_chr" + chrom) + os.sep
+            os.mkdir(chromStatsDir)
+            
+            overrides = {"stopCoordinate": size, "outputFilename": chromOutputFilename, "statsDir": chromStatsDir, "chromOutputDir": None,
+                         "outputHeader": (i_outputHeader and i_chromOutputDir != None), "threads": 1, "logFilename": None}
+            chromCommands.append(get_radia_command(i_cmdLineParser, i_cmdLineOptionsDict, i_id, chrom, overrides))
+            chromOutputFilenames.append(chromOutputFilename)
+            chromStatsDirs.append(chromStatsDir)
+        
+        # start the largest chroms first, so that the small ones can keep the threads busy at the end
+        largestFirst = sorted(xrange(len(i_chromSizes)), key=lambda index: i_chromSizes[index][1], reverse=True)
+        run_radia_commands([chromCommands[index] for index in largestFirst], i_threads, i_debug)
+        
+        # the output is sorted in the order of the chroms in the FASTA index file
+        if (i_chromOutputDir == None):
+            for chromOutputFilename in chromOutputFilenames:
+                chromFileHandler = open(chromOutputFilename, "r")
+                if (i_outputFileHandler != None):
+                    shutil.copyfileobj(chromFileHandler, i_outputFileHandler)
+                else:
+                    shutil.copyfileobj(chromFileHandler, sys.stdout)
+                chromFileHandler.close()
+        
+        # the stats have one line per chrom
+        if (i_statsDir != None):
+            for statsFilename in ("variantCounts.tab", "genStats.tab"):
+                statsFileHandler = open(i_statsDir + statsFilename, "a")
+                for chromStatsDir in chromStatsDirs:
+                    chromStatsFileHandler = open(chromStatsDir + statsFilename, "r")
+                    shutil.copyfileobj(chromStatsFileHandler, statsFileHandler)
+                    chromStatsFileHandler.close()
+                statsFileHandler.close()
+        
+        (totalGerms, totalSoms, totalNormEdits, totalTumEdits) = sum_stats_files(chromStatsDirs, "variantCounts.tab")
+        shutil.rmtree(i_chromDir)
+    
+    # when the region is split into shards, the shards write their output and stats to a temp dir next to the output file
+    if (i_threads > 1 and not i_multiChrom):
+        i_shardDir = tempfile.mkdtemp(prefix="radia_" + i_id + "_" + i_chrom + "_", dir=(os.path.dirname(os.path.abspath(i_outputFilename)) if (i_outputFilename != None) else None))
+        # the shards are balanced by the coverage in the .bam index files
+        i_shardBamSamples = []
+        for (bamFilename, pileupsFilename, mitochon, useChr) in ((i_dnaNormalFilename, i_dnaNormalPileupsFilename, i_dnaNormMitochon, i_dnaNormUseChr), (i_rnaNormalFilename, i_rnaNormalPileupsFilename, i_rnaNormMitochon, i_rnaNormUseChr), 
+                                                                 (i_dnaTumorFilename, i_dnaTumorPileupsFilename, i_dnaTumMitochon, i_dnaTumUseChr), (i_rnaTumorFilename, i_rnaTumorPileupsFilename, i_rnaTumMitochon, i_rnaTumUseChr)):
+            if (bamFilename != None and pileupsFilename == None):
+                i_shardBamSamples += [(laneFilename, mitochon, useChr) for laneFilename in bamFilename.split(",")]
+    
     # for each chrom, start, and stop
-    for (currentChrom, currentStart, currentStop) in izip(i_chroms, i_starts, i_stops):
+    for (currentChrom, currentStart, currentStop, currentIntervals, currentRegions) in izip(i_chroms, i_starts, i_stops, i_intervals, i_regionLists):
         
         # error checking
         if (currentStart > currentStop):
@@ -1974,64 +4037,222 @@ def main():
         if (i_debug):
             logging.debug("processing currentChrom=%s, currentStart=%s, currentStop=%s, i_batchSize=%s", currentChrom, currentStart, currentStop, i_batchSize)    
     
+        # run the shards in parallel and stitch their output back together in coordinate order
+        if (i_threads > 1):
+            coverageWeights = bamIndex.get_coverage_weights([laneFilename for (laneFilename, mitochon, useChr) in i_shardBamSamples], [get_bam_chrom(currentChrom, mitochon, useChr) for (laneFilename, mitochon, useChr) in i_shardBamSamples])
+            # without any weights, the shards have the same length
+            if (coverageWeights == None):
+                logging.warning("The chrom %s isn't in any of the .bam index files, so the shards have the same length.  Please check the 'chr' prefix and mitochondrial DNA params.", currentChrom)
+                coverageWeights = []
+            shards = bamIndex.get_balanced_shards(currentStart, currentStop, i_threads, coverageWeights)
+            shardCommands = []
+            shardOutputFilenames = []
+            shardStatsDirs = []
+            for (shardIndex, (shardStart, shardStop)) in enumerate(shards):
+                shardOutputFilename = os.path.join(i_shardDir, "shard" + str(shardIndex) + ".vcf")
+                shardStatsDir = os.path.join(i_shardDir, "stats" + str(shardIndex)) + os.sep
+                os.mkdir(shardStatsDir)
+                
+                # the header is only output once by this process
+                overrides = {"startCoordinate": shardStart, "stopCoordinate": shardStop, "outputFilename": shardOutputFilename, "statsDir": shardStatsDir, 
+                             "outputHeader": False, "threads": 1, "logFilename": None}
+                shardCommands.append(get_radia_command(i_cmdLineParser, i_cmdLineOptionsDict, i_id, currentChrom, overrides))
+                shardOutputFilenames.append(shardOutputFilename)
+                shardStatsDirs.append(shardStatsDir)
+            
+            run_radia_commands(shardCommands, i_threads, i_debug)
+            
+            for shardOutputFilename in shardOutputFilenames:
+                shardFileHandler = open(shardOutputFilename, "r")
+                if (i_outputFileHandler != None):
+                    shutil.copyfileobj(shardFileHandler, i_outputFileHandler)
+                else:
+                    shutil.copyfileobj(shardFileHandler, sys.stdout)
+                shardFileHandler.close()
+            
+            (germs, soms, normEdits, tumEdits) = sum_stats_files(shardStatsDirs, "variantCounts.tab")
+            totalGerms += germs
+            totalSoms += soms
+            totalNormEdits += normEdits
+            totalTumEdits += tumEdits
+            
+            (dnaNormalCount, rnaNormalCount, dnaTumorCount, rnaTumorCount) = sum_stats_files(shardStatsDirs, "genStats.tab")
+            dnaNormalCoordinateWithData += dnaNormalCount
+            rnaNormalCoordinateWithData += rnaNormalCount
+            dnaTumorCoordinateWithData += dnaTumorCount
+            rnaTumorCoordinateWithData += rnaTumorCount
+            continue
+        
         # get the generators that will yield the pileups
         # the order matters:  first check for pileups, then bams
         # Note:  Use the get_sam_data() method when testing locally on a .sam file or using the pileups files
         #        Use the get_bam_data() method when querying the entire chromosome, coordinate ranges from the coordinates file, or one coordinate range via the -a to -z params 
+        #        The get_pysam_data() method is used instead of get_bam_data() when the pysam pileup engine is specified
         
         # Use the get_sam_data() method when testing locally on a .sam file or using the pileups files
         if (i_dnaNormalPileupsFilename != None):
-            i_dnaNormalGenerator = get_sam_data(i_dnaNormalPileupsFilename, currentChrom, currentStart, currentStop, i_dnaNormLabel, i_debug)  
+            i_dnaNormalGenerator = get_sam_data(i_dnaNormalPileupsFilename, currentChrom, currentStart, currentStop, currentRegions, i_dnaNormLabel, i_debug)  
         # Use the get_bam_data() method when querying the entire chromosome, coordinate ranges from the coordinates file, or one coordinate range via the -a to -z params
         elif (i_dnaNormalFilename != None):
             # some bams/references use "M", some use "MT"
             if (i_chrom == "M" or i_chrom == "MT" and i_dnaNormMitochon != None):
-                i_dnaNormalGenerator = get_bam_data(i_dnaNormalFilename, i_dnaNormalFastaFilename, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_dnaNormMitochon, currentStart, currentStop, i_batchSize, i_dnaNormUseChr, i_dnaNormLabel, False, i_debug)
+                i_dnaNormalGenerator = i_bamDataFunction(i_dnaNormalFilename, i_dnaNormalFastaFilename, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_pileupMaxDepth, i_dnaNormMitochon, currentStart, currentStop, currentRegions, i_batchSize, i_dnaNormUseChr, i_dnaNormLabel, False, i_debug)
             else:
-                i_dnaNormalGenerator = get_bam_data(i_dnaNormalFilename, i_dnaNormalFastaFilename, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, currentChrom, currentStart, currentStop, i_batchSize, i_dnaNormUseChr, i_dnaNormLabel, False, i_debug)
+                i_dnaNormalGenerator = i_bamDataFunction(i_dnaNormalFilename, i_dnaNormalFastaFilename, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_pileupMaxDepth, currentChrom, currentStart, currentStop, currentRegions, i_batchSize, i_dnaNormUseChr, i_dnaNormLabel, False, i_debug)
       
         # Use the get_sam_data() method when testing locally on a .sam file or using the pileups files
         if (i_rnaNormalPileupsFilename != None):
-            i_rnaNormalGenerator = get_sam_data(i_rnaNormalPileupsFilename, currentChrom, currentStart, currentStop, i_rnaNormLabel, i_debug)                      
+            i_rnaNormalGenerator = get_sam_data(i_rnaNormalPileupsFilename, currentChrom, currentStart, currentStop, currentRegions, i_rnaNormLabel, i_debug)                      
         # Use the get_bam_data() method when querying the entire chromosome, coordinate ranges from the coordinates file, or one coordinate range via the -a to -z params
         elif (i_rnaNormalFilename != None):
             # some bams/reference use "M", some use "MT"
             if (i_chrom == "M" or i_chrom == "MT" and i_rnaNormMitochon != None):
-                i_rnaNormalGenerator = get_bam_data(i_rnaNormalFilename, i_rnaNormalFastaFilename, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_rnaNormMitochon, currentStart, currentStop, i_batchSize, i_rnaNormUseChr, i_rnaNormLabel, i_rnaIncludeSecondaryAlignments, i_debug)
+                i_rnaNormalGenerator = i_bamDataFunction(i_rnaNormalFilename, i_rnaNormalFastaFilename, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_pileupMaxDepth, i_rnaNormMitochon, currentStart, currentStop, currentRegions, i_batchSize, i_rnaNormUseChr, i_rnaNormLabel, i_rnaIncludeSecondaryAlignments, i_debug)
             else:
-                i_rnaNormalGenerator = get_bam_data(i_rnaNormalFilename, i_rnaNormalFastaFilename, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, currentChrom, currentStart, currentStop, i_batchSize, i_rnaNormUseChr, i_rnaNormLabel, i_rnaIncludeSecondaryAlignments, i_debug)
+                i_rnaNormalGenerator = i_bamDataFunction(i_rnaNormalFilename, i_rnaNormalFastaFilename, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_pileupMaxDepth, currentChrom, currentStart, currentStop, currentRegions, i_batchSize, i_rnaNormUseChr, i_rnaNormLabel, i_rnaIncludeSecondaryAlignments, i_debug)
             
         # Use the get_sam_data() method when testing locally on a .sam file or using the pileups files
         if (i_dnaTumorPileupsFilename != None):
-            i_dnaTumorGenerator = get_sam_data(i_dnaTumorPileupsFilename, currentChrom, currentStart, currentStop, i_dnaTumLabel, i_debug)                      
+            i_dnaTumorGenerator = get_sam_data(i_dnaTumorPileupsFilename, currentChrom, currentStart, currentStop, currentRegions, i_dnaTumLabel, i_debug)                      
         # Use the get_bam_data() method when querying the entire chromosome, coordinate ranges from the coordinates file, or one coordinate range via the -a to -z params
         elif (i_dnaTumorFilename != None):
             # some bams/reference use "M", some use "MT"
             if (i_chrom == "M" or i_chrom == "MT" and i_dnaTumMitochon != None):
-                i_dnaTumorGenerator = get_bam_data(i_dnaTumorFilename, i_dnaTumorFastaFilename, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_dnaTumMitochon, currentStart, currentStop, i_batchSize, i_dnaTumUseChr, i_dnaTumLabel, False, i_debug)
+                i_dnaTumorGenerator = i_bamDataFunction(i_dnaTumorFilename, i_dnaTumorFastaFilename, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_pileupMaxDepth, i_dnaTumMitochon, currentStart, currentStop, currentRegions, i_batchSize, i_dnaTumUseChr, i_dnaTumLabel, False, i_debug)
             else:
-                i_dnaTumorGenerator = get_bam_data(i_dnaTumorFilename, i_dnaTumorFastaFilename, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, currentChrom, currentStart, currentStop, i_batchSize, i_dnaTumUseChr, i_dnaTumLabel, False, i_debug)
+                i_dnaTumorGenerator = i_bamDataFunction(i_dnaTumorFilename, i_dnaTumorFastaFilename, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_pileupMaxDepth, currentChrom, currentStart, currentStop, currentRegions, i_batchSize, i_dnaTumUseChr, i_dnaTumLabel, False, i_debug)
         
         # Use the get_sam_data() method when testing locally on a .sam file or using the pileups files
         if (i_rnaTumorPileupsFilename != None):
-            i_rnaTumorGenerator = get_sam_data(i_rnaTumorPileupsFilename, currentChrom, currentStart, currentStop, i_rnaTumLabel, i_debug)                      
+            i_rnaTumorGenerator = get_sam_data(i_rnaTumorPileupsFilename, currentChrom, currentStart, currentStop, currentRegions, i_rnaTumLabel, i_debug)                      
         # Use the get_bam_data() method when querying the entire chromosome, coordinate ranges from the coordinates file, or one coordinate range via the -a to -z params
         elif (i_rnaTumorFilename != None):
             # some bams/reference use "M", some use "MT"
             if (i_chrom == "M" or i_chrom == "MT" and i_rnaTumMitochon != None):
-                i_rnaTumorGenerator = get_bam_data(i_rnaTumorFilename, i_rnaTumorFastaFilename, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_rnaTumMitochon, currentStart, currentStop, i_batchSize, i_rnaTumUseChr, i_rnaTumLabel, i_rnaIncludeSecondaryAlignments, i_debug)
+                i_rnaTumorGenerator = i_bamDataFunction(i_rnaTumorFilename, i_rnaTumorFastaFilename, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_pileupMaxDepth, i_rnaTumMitochon, currentStart, currentStop, currentRegions, i_batchSize, i_rnaTumUseChr, i_rnaTumLabel, i_rnaIncludeSecondaryAlignments, i_debug)
             else:
-                i_rnaTumorGenerator = get_bam_data(i_rnaTumorFilename, i_rnaTumorFastaFilename, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, currentChrom, currentStart, currentStop, i_batchSize, i_rnaTumUseChr, i_rnaTumLabel, i_rnaIncludeSecondaryAlignments, i_debug)
+                i_rnaTumorGenerator = i_bamDataFunction(i_rnaTumorFilename, i_rnaTumorFastaFilename, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_pileupMaxDepth, currentChrom, currentStart, currentStop, currentRegions, i_batchSize, i_rnaTumUseChr, i_rnaTumLabel, i_rnaIncludeSecondaryAlignments, i_debug)
         
-        # get the first pileup from each file
-        # if a file is not specified, then the "moreLines" flags will be set to false and initial values will be returned
-        (moreDnaNormalLines, dnaNormalChr, dnaNormalCoordinate, dnaNormalRefBase, dnaNormalNumBases, dnaNormalReads, dnaNormalBaseQuals, dnaNormalMapQuals) = get_next_pileup(i_dnaNormalGenerator)
-        (moreRnaNormalLines, rnaNormalChr, rnaNormalCoordinate, rnaNormalRefBase, rnaNormalNumBases, rnaNormalReads, rnaNormalBaseQuals, rnaNormalMapQuals) = get_next_pileup(i_rnaNormalGenerator)
-        (moreDnaTumorLines, dnaTumorChr, dnaTumorCoordinate, dnaTumorRefBase, dnaTumorNumBases, dnaTumorReads, dnaTumorBaseQuals, dnaTumorMapQuals) = get_next_pileup(i_dnaTumorGenerator)
-        (moreRnaTumorLines, rnaTumorChr, rnaTumorCoordinate, rnaTumorRefBase, rnaTumorNumBases, rnaTumorReads, rnaTumorBaseQuals, rnaTumorMapQuals) = get_next_pileup(i_rnaTumorGenerator)
-    
-        # for each coordinate that we'd like to investigate
-        for currentCoordinate in xrange(currentStart, currentStop+1):
+        # in somatic-only mode, the normal DNA is only piled up at the candidates that are found on the tumor samples
+        if (i_somaticOnly):
+            i_dnaNormalGenerator = None
+            if (i_dnaNormalPileupsFilename != None):
+                i_dnaNormalFetchFunction = lambda aStart, aStop: get_sam_data(i_dnaNormalPileupsFilename, currentChrom, aStart, aStop, None, i_dnaNormLabel, i_debug)
+            else:
+                # some bams/references use "M", some use "MT"
+                dnaNormalChrom = i_dnaNormMitochon if (i_chrom == "M" or i_chrom == "MT" and i_dnaNormMitochon != None) else currentChrom
+                i_dnaNormalFetchFunction = lambda aStart, aStop: i_bamDataFunction(i_dnaNormalFilename, i_dnaNormalFastaFilename, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_pileupMaxDepth, dnaNormalChrom, aStart, aStop, None, i_batchSize, i_dnaNormUseChr, i_dnaNormLabel, False, i_debug)
+        
+        # the decoded pileups of each sample are read from the site cache when they were cached by a previous run, 
+        # otherwise they are cached below while they are decoded.  the cache files are keyed on the input file and
+        # all of the params that change the decoded pileups
+        i_siteCacheFilenames = [None, None, None, None]
+        if (i_siteCacheDir != None):
+            i_generators = [i_dnaNormalGenerator, i_rnaNormalGenerator, i_dnaTumorGenerator, i_rnaTumorGenerator]
+            for (index, (pileupsFilename, bamFilename, fastaFilename, minBaseQual, minMapQual, maxDepth, mitochon, useChr, includeSecondary, label)) in enumerate([
+                    (i_dnaNormalPileupsFilename, i_dnaNormalFilename, i_dnaNormalFastaFilename, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_dnaNormMaxDepth, i_dnaNormMitochon, i_dnaNormUseChr, False, i_dnaNormLabel),
+                    (i_rnaNormalPileupsFilename, i_rnaNormalFilename, i_rnaNormalFastaFilename, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_rnaNormMaxDepth, i_rnaNormMitochon, i_rnaNormUseChr, i_rnaIncludeSecondaryAlignments, i_rnaNormLabel),
+                    (i_dnaTumorPileupsFilename, i_dnaTumorFilename, i_dnaTumorFastaFilename, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_dnaTumMaxDepth, i_dnaTumMitochon, i_dnaTumUseChr, False, i_dnaTumLabel),
+                    (i_rnaTumorPileupsFilename, i_rnaTumorFilename, i_rnaTumorFastaFilename, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_rnaTumMaxDepth, i_rnaTumMitochon, i_rnaTumUseChr, i_rnaIncludeSecondaryAlignments, i_rnaTumLabel)]):
+                if (i_generators[index] == None):
+                    continue
+                
+                # the pileups files are used instead of the bams when they are specified
+                if (pileupsFilename != None):
+                    paramList = [minBaseQual, minMapQual, maxDepth]
+                    inputFilename = pileupsFilename
+                else:
+                    fastaStat = os.stat(fastaFilename)
+                    paramList = [fastaFilename, fastaStat.st_size, int(fastaStat.st_mtime), i_pileupEngine, i_pileupMaxDepth, minBaseQual, minMapQual, maxDepth, mitochon, useChr, includeSecondary]
+                    inputFilename = bamFilename
+                
+                # the region can be read from the cache files of other regions (e.g. from a run without the RNA or with other shards)
+                cacheFiles = siteCache.find_cache_files(i_siteCacheDir, inputFilename, currentChrom, currentStart, currentStop, paramList)
+                if (cacheFiles != None):
+                    i_generators[index] = get_cached_pileups(cacheFiles, currentChrom, currentStart, currentStop, label, i_debug)
+                else:
+                    i_siteCacheFilenames[index] = siteCache.get_cache_filename(i_siteCacheDir, inputFilename, currentChrom, currentStart, currentStop, paramList)
+            (i_dnaNormalGenerator, i_rnaNormalGenerator, i_dnaTumorGenerator, i_rnaTumorGenerator) = i_generators
+        
+        # the default genotype should be '.' for haploid calls (e.g. chrom Y) and './.' for diploid calls
+        if (currentChrom != "Y"):
+            emptyFormatString = diploidEmptyFormatString
+        else:
+            emptyFormatString = haploidEmptyFormatString
+        
+        # get the generator that yields the pileups for all samples one coordinate at a time
+        # the joint pileup gets all samples from one samtools command, otherwise the generators for each sample are merged
+        # the generators for each sample are only started when they are merged, so they don't need to be skipped here
+        if (i_jointPileup):
+            # some bams/reference use "M", some use "MT"
+            if (i_chrom == "M" or i_chrom == "MT" and i_jointMitochon != None):
+                i_pileupsGenerator = get_joint_bam_data([i_dnaNormalFilename, i_rnaNormalFilename, i_dnaTumorFilename, i_rnaTumorFilename], i_jointFastaFilename, i_jointMinBaseQual, i_jointMinMapQual, i_pileupMaxDepth, i_jointMitochon, currentStart, currentStop, currentRegions, i_batchSize, i_jointUseChr, i_jointIncludeSecondaryAlignments, i_debug)
+            else:
+                i_pileupsGenerator = get_joint_bam_data([i_dnaNormalFilename, i_rnaNormalFilename, i_dnaTumorFilename, i_rnaTumorFilename], i_jointFastaFilename, i_jointMinBaseQual, i_jointMinMapQual, i_pileupMaxDepth, currentChrom, currentStart, currentStop, currentRegions, i_batchSize, i_jointUseChr, i_jointIncludeSecondaryAlignments, i_debug)
+            
+            # fetch and decode the joint pileups on their own thread
+            # the blocks are screened on the raw pileups, so the pileups are only decoded on their own thread when the blocks are not screened
+            if (i_concurrentPileups):
+                if (i_callingBlockSize == 0):
+                    i_pileupsGenerator = summarize_joint_pileups(i_pileupsGenerator, [i_dnaNormMinBaseQual, i_rnaNormMinBaseQual, i_dnaTumMinBaseQual, i_rnaTumMinBaseQual], 
+                                                                 [i_dnaNormMinMapQual, i_rnaNormMinMapQual, i_dnaTumMinMapQual, i_rnaTumMinMapQual], 
+                                                                 [i_dnaNormMaxDepth, i_rnaNormMaxDepth, i_dnaTumMaxDepth, i_rnaTumMaxDepth], i_debug)
+                i_pileupsGenerator = get_queued_data(i_pileupsGenerator, i_pileupQueueSize, "JOINT", i_debug)
+        else:
+            # fetch and decode the pileups for each sample on their own thread
+            # the blocks are screened on the raw pileups, so the pileups are only decoded on their own thread when the blocks are not screened
+            if (i_concurrentPileups):
+                if (i_callingBlockSize == 0):
+                    if (i_dnaNormalGenerator != None):
+                        i_dnaNormalGenerator = summarize_pileups(i_dnaNormalGenerator, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_dnaNormMaxDepth, i_debug)
+                    if (i_rnaNormalGenerator != None):
+                        i_rnaNormalGenerator = summarize_pileups(i_rnaNormalGenerator, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_rnaNormMaxDepth, i_debug)
+                    if (i_dnaTumorGenerator != None):
+                        i_dnaTumorGenerator = summarize_pileups(i_dnaTumorGenerator, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_dnaTumMaxDepth, i_debug)
+                    if (i_rnaTumorGenerator != None):
+                        i_rnaTumorGenerator = summarize_pileups(i_rnaTumorGenerator, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_rnaTumMaxDepth, i_debug)
+                if (i_dnaNormalGenerator != None):
+                    i_dnaNormalGenerator = get_queued_data(i_dnaNormalGenerator, i_pileupQueueSize, i_dnaNormLabel, i_debug)
+                if (i_rnaNormalGenerator != None):
+                    i_rnaNormalGenerator = get_queued_data(i_rnaNormalGenerator, i_pileupQueueSize, i_rnaNormLabel, i_debug)
+                if (i_dnaTumorGenerator != None):
+                    i_dnaTumorGenerator = get_queued_data(i_dnaTumorGenerator, i_pileupQueueSize, i_dnaTumLabel, i_debug)
+                if (i_rnaTumorGenerator != None):
+                    i_rnaTumorGenerator = get_queued_data(i_rnaTumorGenerator, i_pileupQueueSize, i_rnaTumLabel, i_debug)
+            
+            # the pileups are cached on this thread, and they are decoded here unless they were decoded on their own thread
+            if (i_siteCacheFilenames[0] != None):
+                i_dnaNormalGenerator = cache_pileups(i_dnaNormalGenerator, i_siteCacheFilenames[0], i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_dnaNormMaxDepth, i_dnaNormLabel, i_debug)
+            if (i_siteCacheFilenames[1] != None):
+                i_rnaNormalGenerator = cache_pileups(i_rnaNormalGenerator, i_siteCacheFilenames[1], i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_rnaNormMaxDepth, i_rnaNormLabel, i_debug)
+            if (i_siteCacheFilenames[2] != None):
+                i_dnaTumorGenerator = cache_pileups(i_dnaTumorGenerator, i_siteCacheFilenames[2], i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_dnaTumMaxDepth, i_dnaTumLabel, i_debug)
+            if (i_siteCacheFilenames[3] != None):
+                i_rnaTumorGenerator = cache_pileups(i_rnaTumorGenerator, i_siteCacheFilenames[3], i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_rnaTumMaxDepth, i_rnaTumLabel, i_debug)
+            
+            i_pileupsGenerator = merge_pileups([i_dnaNormalGenerator, i_rnaNormalGenerator, i_dnaTumorGenerator, i_rnaTumorGenerator], currentStart, currentStop, i_debug)
+        
+        # skip the coordinates between the regions that were piled up at once
+        if (len(currentIntervals) > 1):
+            i_pileupsGenerator = get_interval_pileups(i_pileupsGenerator, currentIntervals, i_debug)
+        
+        # only yield the coordinates that could have a variant
+        if (i_callingBlockSize > 0):
+            i_pileupsGenerator = get_block_candidates(i_pileupsGenerator, i_callingBlockSize, i_blockState, 
+                                                      [i_dnaNormMinBaseQual, i_rnaNormMinBaseQual, i_dnaTumMinBaseQual, i_rnaTumMinBaseQual], 
+                                                      [i_dnaNormMinMapQual, i_rnaNormMinMapQual, i_dnaTumMinMapQual, i_rnaTumMinMapQual], 
+                                                      [i_dnaNormMaxDepth, i_rnaNormMaxDepth, i_dnaTumMaxDepth, i_rnaTumMaxDepth], 
+                                                      [i_dnaNormMinTotalNumBases, i_rnaNormMinTotalNumBases, i_dnaTumMinTotalNumBases, i_rnaTumMinTotalNumBases], 
+                                                      [i_dnaNormMinAltNumBases, i_rnaNormMinAltNumBases, i_dnaTumMinAltNumBases, i_rnaTumMinAltNumBases], 
+                                                      [i_dnaNormMinAltNumBases, i_dnaNormMinAltNumBases, i_dnaNormMinAltNumBases, i_dnaTumMinAltNumBases], i_debug)
+        
+        # fill in the normal DNA at the candidates
+        if (i_somaticOnly):
+            i_pileupsGenerator = get_candidate_pileups(i_pileupsGenerator, i_blockState, i_dnaNormalFetchFunction, i_callingBlockSize, i_regionGap, i_debug)
+        
+        # for each coordinate where at least one of the samples has data
+        # the pileups are merged, so the coordinates without any data are skipped
+        for (currentCoordinate, pileupList) in i_pileupsGenerator:
             # for each coordinate
                 # if we have normal dna
                     # compare to reference -> germline mutations
@@ -2047,17 +4268,28 @@ def main():
                     # characterize somatic mutations
                     # identify tumor rna-editing
         
+            # get the pileup for each sample, a sample without data at this coordinate has a pileup of None
+            (dnaNormalPileup, rnaNormalPileup, dnaTumorPileup, rnaTumorPileup) = pileupList
+            if (dnaNormalPileup != None):
+                (dnaNormalChr, dnaNormalCoordinate, dnaNormalRefBase, dnaNormalNumBases, dnaNormalReads, dnaNormalBaseQuals, dnaNormalMapQuals) = dnaNormalPileup
+            if (rnaNormalPileup != None):
+                (rnaNormalChr, rnaNormalCoordinate, rnaNormalRefBase, rnaNormalNumBases, rnaNormalReads, rnaNormalBaseQuals, rnaNormalMapQuals) = rnaNormalPileup
+            if (dnaTumorPileup != None):
+                (dnaTumorChr, dnaTumorCoordinate, dnaTumorRefBase, dnaTumorNumBases, dnaTumorReads, dnaTumorBaseQuals, dnaTumorMapQuals) = dnaTumorPileup
+            if (rnaTumorPileup != None):
+                (rnaTumorChr, rnaTumorCoordinate, rnaTumorRefBase, rnaTumorNumBases, rnaTumorReads, rnaTumorBaseQuals, rnaTumorMapQuals) = rnaTumorPileup
+            
             if (i_debug):
                 logging.debug("currentCoordinate: %s", currentCoordinate)
-                logging.debug("Initial NormalDNAData: %s %s %s %s %s %s %s", dnaNormalChr, dnaNormalCoordinate, dnaNormalRefBase, dnaNormalNumBases, dnaNormalReads, dnaNormalBaseQuals, dnaNormalMapQuals)
-                logging.debug("Initial NormalRNAData: %s %s %s %s %s %s %s", rnaNormalChr, rnaNormalCoordinate, rnaNormalRefBase, rnaNormalNumBases, rnaNormalReads, rnaNormalBaseQuals, rnaNormalMapQuals)
-                logging.debug("Initial TumorDNAData: %s %s %s %s %s %s %s", dnaTumorChr, dnaTumorCoordinate, dnaTumorRefBase, dnaTumorNumBases, dnaTumorReads, dnaTumorBaseQuals, dnaTumorMapQuals)
-                logging.debug("Initial TumorRNAData: %s %s %s %s %s %s %s", rnaTumorChr, rnaTumorCoordinate, rnaTumorRefBase, rnaTumorNumBases, rnaTumorReads, rnaTumorBaseQuals, rnaTumorMapQuals)
-                
-            # if we don't have any more data, then break out of the loop
-            # this can happen when testing or when we've reached the end of all the data in the .mpileups files
-            if (dnaNormalCoordinate == -1 and rnaNormalCoordinate == -1 and dnaTumorCoordinate == -1 and rnaTumorCoordinate == -1):
-                break
+                logging.debug("Initial NormalDNAData: %s", dnaNormalPileup)
+                logging.debug("Initial NormalRNAData: %s", rnaNormalPileup)
+                logging.debug("Initial TumorDNAData: %s", dnaTumorPileup)
+                logging.debug("Initial TumorRNAData: %s", rnaTumorPileup)
+            
+            # in block mode, the previous base counts come from the screened coordinates
+            if (i_callingBlockSize > 0 and i_blockState["previousBaseCounts"] != None):
+                previousBaseCounts = i_blockState["previousBaseCounts"]
+                dnaNormalPreviousBaseCounts = i_blockState["dnaNormalPreviousBaseCounts"]
                 
             # empty the set of DNA for each new coordinate
             dnaSet.clear()
@@ -2086,14 +4318,8 @@ def main():
             
             # create some default output in case there are no reads for one dataset but there are for others
             #columnHeaders = ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT"]
-            vcfOutputList = [currentChrom, str(currentCoordinate), "."]
-            formatItemCount = len(formatString.split(":"))
-            # the default genotype should be '.' for haploid calls (e.g. chrom Y) and './.' for diploid calls
-            if (currentChrom != "Y"):
-                emptyFormatList = ["./."] + ["."] * (formatItemCount - 1)
-            else:
-                emptyFormatList = ["."] * formatItemCount   
-            emptyFormatString = ":".join(emptyFormatList)
+            del vcfOutputList[:]
+            vcfOutputList.extend((currentChrom, str(currentCoordinate), "."))
             dnaNormalOutputString = emptyFormatString
             dnaTumorOutputString = emptyFormatString
             rnaNormalOutputString = emptyFormatString
@@ -2109,45 +4335,32 @@ def main():
             dnaNormalPreviousBases = ""
         
             # create the ref list for this coordinate
-            if (dnaNormalCoordinate == currentCoordinate and dnaNormalRefBase not in refList):
+            if (dnaNormalPileup != None and dnaNormalRefBase not in refList):
                 refList.append(dnaNormalRefBase)
             
-            if (rnaNormalCoordinate == currentCoordinate and rnaNormalRefBase not in refList):
+            if (rnaNormalPileup != None and rnaNormalRefBase not in refList):
                 refList.append(rnaNormalRefBase)
             
-            if (dnaTumorCoordinate == currentCoordinate and dnaTumorRefBase not in refList):
+            if (dnaTumorPileup != None and dnaTumorRefBase not in refList):
                 refList.append(dnaTumorRefBase)
             
-            if (rnaTumorCoordinate == currentCoordinate and rnaTumorRefBase not in refList):
+            if (rnaTumorPileup != None and rnaTumorRefBase not in refList):
                 refList.append(rnaTumorRefBase)
             
             # if we aren't debugging and we have an "N" in the ref or more than one ref, then just ignore this coordinate and move on to the next
             if (not i_debug and ("N" in refList or len(refList) > 1)):
-                # if there are more lines, and the coordinate is <= the current coordinate, then get the next pileup
-                if (moreDnaNormalLines and dnaNormalCoordinate <= currentCoordinate):
-                    (moreDnaNormalLines, dnaNormalChr, dnaNormalCoordinate, dnaNormalRefBase, dnaNormalNumBases, dnaNormalReads, dnaNormalBaseQuals, dnaNormalMapQuals) = get_next_pileup(i_dnaNormalGenerator)
-                
-                if (moreRnaNormalLines and rnaNormalCoordinate <= currentCoordinate):
-                    (moreRnaNormalLines, rnaNormalChr, rnaNormalCoordinate, rnaNormalRefBase, rnaNormalNumBases, rnaNormalReads, rnaNormalBaseQuals, rnaNormalMapQuals) = get_next_pileup(i_rnaNormalGenerator)
-                
-                if (moreDnaTumorLines and dnaTumorCoordinate <= currentCoordinate):
-                    (moreDnaTumorLines, dnaTumorChr, dnaTumorCoordinate, dnaTumorRefBase, dnaTumorNumBases, dnaTumorReads, dnaTumorBaseQuals, dnaTumorMapQuals) = get_next_pileup(i_dnaTumorGenerator)
-                       
-                if (moreRnaTumorLines and rnaTumorCoordinate <= currentCoordinate):
-                    (moreRnaTumorLines, rnaTumorChr, rnaTumorCoordinate, rnaTumorRefBase, rnaTumorNumBases, rnaTumorReads, rnaTumorBaseQuals, rnaTumorMapQuals) = get_next_pileup(i_rnaTumorGenerator)
-                
                 # continue to the next coordinate
                 continue;
                             
             # if we have normal reads at the current position
-            if (dnaNormalCoordinate == currentCoordinate):
+            if (dnaNormalPileup != None):
                 
                 # specify the normal constants
                 gainModType = "GERM"
                 lossModType = "NOREF"
             
                 # process the normal DNA
-                (dnaNormalOutputString, dnaNormalPreviousBases, dnaNormalPreviousBaseCounts, dnaNormalReadDPDict, dnaNormalAltPercentDict, dnaNormalCoordinateWithData, dnaSet, altList, altCountsDict, hasDNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalGerms, totalNoRef, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(dnaNormalChr, dnaNormalCoordinate, dnaNormalRefBase, dnaNormalNumBases, dnaNormalReads, dnaNormalBaseQuals, dnaNormalMapQuals, previousUniqueBases, previousBaseCounts, dnaNormalReadDPDict, dnaNormalAltPercentDict, dnaNormalCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasDNA, shouldOutput, totalGerms, totalNoRef, gainModType, lossModType, infoDict, i_dnaNormMinTotalNumBases, i_dnaNormMinAltNumBases, i_dnaNormMinAltNumBases, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, coordinateBaseQualsList, "DNA_NORMAL", i_genotypeMinDepth, i_genotypeMinPct, dnaNormalOutputString, i_debug)
+                (dnaNormalOutputString, dnaNormalPreviousBases, dnaNormalPreviousBaseCounts, dnaNormalReadDPDict, dnaNormalAltPercentDict, dnaNormalCoordinateWithData, dnaSet, altList, altCountsDict, hasDNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalGerms, totalNoRef, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(dnaNormalChr, dnaNormalCoordinate, dnaNormalRefBase, dnaNormalNumBases, dnaNormalReads, dnaNormalBaseQuals, dnaNormalMapQuals, previousUniqueBases, previousBaseCounts, dnaNormalReadDPDict, dnaNormalAltPercentDict, dnaNormalCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasDNA, shouldOutput, totalGerms, totalNoRef, gainModType, lossModType, infoDict, i_dnaNormMinTotalNumBases, i_dnaNormMinAltNumBases, i_dnaNormMinAltNumBases, i_dnaNormMinBaseQual, i_dnaNormMinMapQual, i_dnaNormMaxDepth, coordinateBaseQualsList, "DNA_NORMAL", i_genotypeMinDepth, i_genotypeMinPct, dnaNormalOutputString, i_debug)
                 
                 if (numBases > 0):
                     totalSamples += 1
@@ -2164,7 +4377,7 @@ def main():
                     setMinAltBasesFlag = (setMinAltBasesFlag and numAltBasesFilter)
                     
             # if we have normal rna-seq reads at the current position
-            if (rnaNormalCoordinate == currentCoordinate):
+            if (rnaNormalPileup != None):
                 
                 # if either a normal or tumor file is specified, we will label them as edits
                 # if neither a normal file nor a tumor file is specified, we will label them as variants
@@ -2178,7 +4391,7 @@ def main():
                 # need to think about this in more detail
                 previousUniqueBases = ""
                 
-                (rnaNormalOutputString, previousUniqueBases, previousBaseCounts, rnaNormalReadDPDict, rnaNormalAltPercentDict, rnaNormalCoordinateWithData, dnaSet, altList, altCountsDict, hasRNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalNormEdits, totalNormNotExp, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(rnaNormalChr, rnaNormalCoordinate, rnaNormalRefBase, rnaNormalNumBases, rnaNormalReads, rnaNormalBaseQuals, rnaNormalMapQuals, previousUniqueBases, previousBaseCounts, rnaNormalReadDPDict, rnaNormalAltPercentDict, rnaNormalCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasRNA, shouldOutput, totalNormEdits, totalNormNotExp, gainModType, lossModType, infoDict, i_rnaNormMinTotalNumBases, i_rnaNormMinAltNumBases, i_dnaNormMinAltNumBases, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, coordinateBaseQualsList, "RNA_NORMAL", i_genotypeMinDepth, i_genotypeMinPct, rnaNormalOutputString, i_debug)
+                (rnaNormalOutputString, previousUniqueBases, previousBaseCounts, rnaNormalReadDPDict, rnaNormalAltPercentDict, rnaNormalCoordinateWithData, dnaSet, altList, altCountsDict, hasRNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalNormEdits, totalNormNotExp, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(rnaNormalChr, rnaNormalCoordinate, rnaNormalRefBase, rnaNormalNumBases, rnaNormalReads, rnaNormalBaseQuals, rnaNormalMapQuals, previousUniqueBases, previousBaseCounts, rnaNormalReadDPDict, rnaNormalAltPercentDict, rnaNormalCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasRNA, shouldOutput, totalNormEdits, totalNormNotExp, gainModType, lossModType, infoDict, i_rnaNormMinTotalNumBases, i_rnaNormMinAltNumBases, i_dnaNormMinAltNumBases, i_rnaNormMinBaseQual, i_rnaNormMinMapQual, i_rnaNormMaxDepth, coordinateBaseQualsList, "RNA_NORMAL", i_genotypeMinDepth, i_genotypeMinPct, rnaNormalOutputString, i_debug)
                 
                 if (numBases > 0):
                     totalSamples += 1
@@ -2195,7 +4408,7 @@ def main():
                     setMinAltBasesFlag = (setMinAltBasesFlag and numAltBasesFilter)
                     
             # if we have tumor reads at the current position
-            if (dnaTumorCoordinate == currentCoordinate):
+            if (dnaTumorPileup != None):
                     
                 # if a normal file is specified, we will label them as somatic mutations
                 # otherwise, we will just call them variants
@@ -2206,7 +4419,7 @@ def main():
                 lossModType = "LOH"
                 
                 # process the tumor DNA
-                (dnaTumorOutputString, previousUniqueBases, previousBaseCounts, dnaTumorReadDPDict, dnaTumorAltPercentDict, dnaTumorCoordinateWithData, dnaSet, altList, altCountsDict, hasDNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalSoms, totalLohs, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(dnaTumorChr, dnaTumorCoordinate, dnaTumorRefBase, dnaTumorNumBases, dnaTumorReads, dnaTumorBaseQuals, dnaTumorMapQuals, dnaNormalPreviousBases, dnaNormalPreviousBaseCounts, dnaTumorReadDPDict, dnaTumorAltPercentDict, dnaTumorCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasDNA, shouldOutput, totalSoms, totalLohs, gainModType, lossModType, infoDict, i_dnaTumMinTotalNumBases, i_dnaTumMinAltNumBases, i_dnaNormMinAltNumBases, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, coordinateBaseQualsList, "DNA_TUMOR", i_genotypeMinDepth, i_genotypeMinPct, dnaTumorOutputString, i_debug)
+                (dnaTumorOutputString, previousUniqueBases, previousBaseCounts, dnaTumorReadDPDict, dnaTumorAltPercentDict, dnaTumorCoordinateWithData, dnaSet, altList, altCountsDict, hasDNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalSoms, totalLohs, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(dnaTumorChr, dnaTumorCoordinate, dnaTumorRefBase, dnaTumorNumBases, dnaTumorReads, dnaTumorBaseQuals, dnaTumorMapQuals, dnaNormalPreviousBases, dnaNormalPreviousBaseCounts, dnaTumorReadDPDict, dnaTumorAltPercentDict, dnaTumorCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasDNA, shouldOutput, totalSoms, totalLohs, gainModType, lossModType, infoDict, i_dnaTumMinTotalNumBases, i_dnaTumMinAltNumBases, i_dnaNormMinAltNumBases, i_dnaTumMinBaseQual, i_dnaTumMinMapQual, i_dnaTumMaxDepth, coordinateBaseQualsList, "DNA_TUMOR", i_genotypeMinDepth, i_genotypeMinPct, dnaTumorOutputString, i_debug)
                 
                 if (numBases > 0):
                     totalSamples += 1
@@ -2223,7 +4436,7 @@ def main():
                     setMinAltBasesFlag = (setMinAltBasesFlag and numAltBasesFilter)
                 
             # if we have tumor rna-seq reads at the current position
-            if (rnaTumorCoordinate == currentCoordinate):
+            if (rnaTumorPileup != None):
                 
                 # if either a normal or tumor file is specified, we will label them as edits
                 # if neither a normal file nor a tumor file is specified, we will label them as variants
@@ -2237,7 +4450,7 @@ def main():
                 # need to think about this in more detail
                 previousUniqueBases = ""
                 
-                (rnaTumorOutputString, previousUniqueBases, previousBaseCounts, rnaTumorReadDPDict, rnaTumorAltPercentDict, rnaTumorCoordinateWithData, dnaSet, altList, altCountsDict, hasRNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalTumEdits, totalTumNotExp, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(rnaTumorChr, rnaTumorCoordinate, rnaTumorRefBase, rnaTumorNumBases, rnaTumorReads, rnaTumorBaseQuals, rnaTumorMapQuals, previousUniqueBases, previousBaseCounts, rnaTumorReadDPDict, rnaTumorAltPercentDict, rnaTumorCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasRNA, shouldOutput, totalTumEdits, totalTumNotExp, gainModType, lossModType, infoDict, i_rnaTumMinTotalNumBases, i_rnaTumMinAltNumBases, i_dnaTumMinAltNumBases, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, coordinateBaseQualsList, "RNA_TUMOR", i_genotypeMinDepth, i_genotypeMinPct, rnaTumorOutputString, i_debug)
+                (rnaTumorOutputString, previousUniqueBases, previousBaseCounts, rnaTumorReadDPDict, rnaTumorAltPercentDict, rnaTumorCoordinateWithData, dnaSet, altList, altCountsDict, hasRNA, shouldOutput, numTotalBasesFilter, numAltBasesFilter, totalTumEdits, totalTumNotExp, infoDict, numBases, indels, starts, stops, totalBaseQual, totalMapQual, totalMapQualZero, totalStrandBias, totalAltReadSupport, coordinateBaseQualsList) = find_variants(rnaTumorChr, rnaTumorCoordinate, rnaTumorRefBase, rnaTumorNumBases, rnaTumorReads, rnaTumorBaseQuals, rnaTumorMapQuals, previousUniqueBases, previousBaseCounts, rnaTumorReadDPDict, rnaTumorAltPercentDict, rnaTumorCoordinateWithData, dnaSet, refList, altList, altCountsDict, hasRNA, shouldOutput, totalTumEdits, totalTumNotExp, gainModType, lossModType, infoDict, i_rnaTumMinTotalNumBases, i_rnaTumMinAltNumBases, i_dnaTumMinAltNumBases, i_rnaTumMinBaseQual, i_rnaTumMinMapQual, i_rnaTumMaxDepth, coordinateBaseQualsList, "RNA_TUMOR", i_genotypeMinDepth, i_genotypeMinPct, rnaTumorOutputString, i_debug)
                 
                 if (numBases > 0):
                     totalSamples += 1
@@ -2257,6 +4470,10 @@ def main():
             if (len(refList) > 1):
                 countRefMismatches += 1
                 
+            # in somatic-only mode, only the somatic mutations and tumor RNA variants/edits are output
+            if (i_somaticOnly and "SOM" not in infoDict["MT"] and "TUM_EDIT" not in infoDict["MT"]):
+                shouldOutput = False
+            
             # if we are outputting all data, or
             # if we should output, or
             # if we are debugging and we have data
@@ -2381,18 +4598,20 @@ def main():
             # count coordinates when we have both DNA and RNA
             if (hasDNA and hasRNA):
                 countRnaDnaCoordinateOverlap += 1
-            
-            # if there are more lines, and the coordinate is <= the current coordinate, then get the next pileup
-            if (moreDnaNormalLines and dnaNormalCoordinate <= currentCoordinate):
-                (moreDnaNormalLines, dnaNormalChr, dnaNormalCoordinate, dnaNormalRefBase, dnaNormalNumBases, dnaNormalReads, dnaNormalBaseQuals, dnaNormalMapQuals) = get_next_pileup(i_dnaNormalGenerator)
-            if (moreRnaNormalLines and rnaNormalCoordinate <= currentCoordinate):
-                (moreRnaNormalLines, rnaNormalChr, rnaNormalCoordinate, rnaNormalRefBase, rnaNormalNumBases, rnaNormalReads, rnaNormalBaseQuals, rnaNormalMapQuals) = get_next_pileup(i_rnaNormalGenerator)
-            if (moreDnaTumorLines and dnaTumorCoordinate <= currentCoordinate):
-                (moreDnaTumorLines, dnaTumorChr, dnaTumorCoordinate, dnaTumorRefBase, dnaTumorNumBases, dnaTumorReads, dnaTumorBaseQuals, dnaTumorMapQuals) = get_next_pileup(i_dnaTumorGenerator)
-            if (moreRnaTumorLines and rnaTumorCoordinate <= currentCoordinate):
-                (moreRnaTumorLines, rnaTumorChr, rnaTumorCoordinate, rnaTumorRefBase, rnaTumorNumBases, rnaTumorReads, rnaTumorBaseQuals, rnaTumorMapQuals) = get_next_pileup(i_rnaTumorGenerator)
-    
-    if (i_statsDir != None):
+    
+    # add the coordinates with data that were screened out in block mode
+    if (i_callingBlockSize > 0):
+        (dnaNormalCount, rnaNormalCount, dnaTumorCount, rnaTumorCount) = i_blockState["coordinatesWithData"]
+        dnaNormalCoordinateWithData += dnaNormalCount
+        rnaNormalCoordinateWithData += rnaNormalCount
+        dnaTumorCoordinateWithData += dnaTumorCount
+        rnaTumorCoordinateWithData += rnaTumorCount
+    
+    if (i_threads > 1 and not i_multiChrom):
+        shutil.rmtree(i_shardDir)
+    
+    # the stats for each chrom have already been output when more than one chrom is specified
+    if (i_statsDir != None and not i_multiChrom):
         # output the variant counts
         i_variantCountsFileHandler = open(i_statsDir + "variantCounts.tab", "a")
         #i_variantCountsFileHandler.write(i_id + "\t" + currentChrom + "\t" + str(totalGerms) + "\t" + str(totalSoms) + "\t" + str(totalNormEdits) + "\t" + str(totalTumEdits) + "\t" + str(totalLohs) + "\n")
@@ -2423,7 +4642,7 @@ def main():
     if (i_outputFilename != None):
         logging.info("radia.py %s: Total time=%s hrs, %s mins, %s secs", os.path.basename(i_outputFilename), ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime))
     else:
-        logging.info("radia.py Chrom %s and Id %s: Total time=%s hrs, %s mins, %s secs", currentChrom, i_id, ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime))
+        logging.info("radia.py Chrom %s and Id %s: Total time=%s hrs, %s mins, %s secs", i_chrom, i_id, ((stopTime-startTime)/(3600)), ((stopTime-startTime)/60), (stopTime-startTime))
            
     # close the files 
     if (i_outputFilename != None):
@@ -7,6 +7,9 @@ import logging
 import time
 import collections
 import gzip
+import bgzfWriter
+import lineReader
+import recordStream
 
 
 '''
@@ -28,26 +31,19 @@ import gzip
 '''
 
 
-def get_read_fileHandler(aFilename):
-    '''
-    ' Open aFilename for reading and return
-    ' the file handler.  The file can be 
-    ' gzipped or not.
-    '''
-    if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'rb')
-    else:
-        return open(aFilename,'r')
-
-
 def get_write_fileHandler(aFilename):
     '''
     ' Open aFilename for writing and return
     ' the file handler.  The file can be 
-    ' gzipped or not.
+    ' gzipped or not.  The gzipped files are
+    ' written in the BGZF format by bgzfWriter,
+    ' and the .vcfr files are written as record
+    ' files by recordStream.
     '''
     if aFilename.endswith('.gz'):
-        return gzip.open(aFilename,'wb')
+        return bgzfWriter.get_write_fileHandler(aFilename)
+    elif aFilename.endswith(recordStream.i_recordSuffix):
+        return recordStream.RecordWriter(aFilename)
     else:
         return open(aFilename,'w')
     
@@ -77,7 +73,7 @@ def get_vcf_data(anInputFilename, aStatsDict, aCompareDict, aPrefix, anIsDebug):
     ' anIsDebug: A flag for outputting debug messages to STDERR
     '''
     
-    inputFileHandler = get_read_fileHandler(anInputFilename)
+    inputFileHandler = lineReader.get_read_fileHandler(anInputFilename)
     outputDict = {}
      
     for line in inputFileHandler:
@@ -204,7 +200,7 @@ def get_maf_data(anInputFilename, aStatsDict, aCompareDict, aPrefix, anIsDebug):
     ' anIsDebug: A flag for outputting debug messages to STDERR
     '''
     
-    inputFileHandler = get_read_fileHandler(anInputFilename)
+    inputFileHandler = lineReader.get_read_fileHandler(anInputFilename)
     outputDict = {}
      
     for line in inputFileHandler:
@@ -309,7 +305,7 @@ def get_validation_data(anInputFilename, aStatsDict, aCompareDict, aPrefix, anIs
     ' anIsDebug: A flag for outputting debug messages to STDERR
     '''
     
-    inputFileHandler = get_read_fileHandler(anInputFilename)
+    inputFileHandler = lineReader.get_read_fileHandler(anInputFilename)
     outputDict = {}
      
     for line in inputFileHandler:
@@ -393,7 +389,7 @@ def get_simulation_data(anInputFilename, aStatsDict, aCompareDict, aPrefix, anIs
     ' anIsDebug: A flag for outputting debug messages to STDERR
     '''
     
-    inputFileHandler = get_read_fileHandler(anInputFilename)
+    inputFileHandler = lineReader.get_read_fileHandler(anInputFilename)
     outputDict = {}
      
     for line in inputFileHandler:
@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+
+import gc
+import itertools
+import marshal
+import re
+import struct
+
+# numpy is needed to encode and decode the columns of the record files
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module reads and writes the record files (.vcfr) that can be passed between radia.py and the
+'    filter scripts instead of VCF text.  The VCF lines are stored in chunks of records, and each chunk
+'    is stored column by column:
+'
+'        - a column of numbers (e.g. POS, or the DP of the DNA normal sample) is stored as a fixed-width
+'          numpy array of ints or floats, along with the rows that have a "." instead of a number
+'        - any other column is stored as a table of its distinct strings and the index of each row in
+'          the table, so a string that repeats (e.g. the chrom, a genotype, or the FORMAT) is only stored
+'          once per chunk
+'        - the INFO column is split into a template with the keys and the values, e.g. "DP=%s;DB;MQ=%s",
+'          so the keys are only stored once per chunk in the table of templates
+'        - the samples are split into one column per sample and FORMAT key
+'
+'    A column is only stored as numbers if every number is formatted back to the exact same text, so a
+'    file is always read back exactly as it was written.  The other lines (e.g. the header lines) are
+'    kept as text in the chunks, in the same order as in the VCF file.
+'
+'    The scripts that loop through the lines of a file read a record file through the RecordReader and
+'    write one through the RecordWriter, which turn the records into VCF lines and back.  The filters
+'    that only look at the first 8 columns can work on the chunks directly (RecordReader.get_chunks()
+'    and RecordWriter.write_chunk()), so the samples are passed on without being decoded at all.
+'''
+
+# the first bytes of a record file, the number changes when the format changes
+i_magic = "RADIAVR1"
+
+# the record files end with this suffix
+i_recordSuffix = ".vcfr"
+
+# the max number of records in a chunk
+i_chunkSize = 8192
+
+# the version of the marshal format that the chunks are written with
+i_marshalVersion = 2
+
+# the number of VCF columns before the FORMAT column
+i_numFixedColumns = 8
+
+# the index of the INFO column
+i_infoColumn = 7
+
+# the values of the INFO column
+i_infoValueRegex = re.compile(r"=([^;\n]*)")
+
+
+def encode_column(aValueList):
+    '''
+    ' This function encodes a column of strings.  If every string other than "." is a number that is formatted back
+    ' to the same text by numpy, then the column is stored as a fixed-width array of numbers with the indexes of
+    ' the "." values.  Otherwise the column is stored as a table of the distinct strings and the index of each
+    ' string in the table.
+    '
+    ' aValueList:    The list of strings
+    '''
+
+    # the distinct strings are numbered in the order that they are first seen
+    table = {}
+    indexes = [table.setdefault(value, len(table)) for value in aValueList]
+    distinctValues = [None] * len(table)
+    for (value, index) in table.iteritems():
+        distinctValues[index] = value
+
+    # only the distinct strings are parsed, so a column with few distinct strings is cheap to check
+    missingIndex = table.get(".")
+    if (len(table) > (0 if (missingIndex == None) else 1)):
+        numberTable = numpy.array(distinctValues, dtype=str)
+        if (missingIndex != None):
+            numberTable[missingIndex] = "0"
+        for dtype in (numpy.int64, numpy.float64):
+            try:
+                numbers = numberTable.astype(dtype)
+            except (ValueError, OverflowError):
+                continue
+            if (not (numbers.astype(str) == numberTable).all()):
+                break
+            if (dtype == numpy.int64):
+                numbers = numbers.astype(numpy.promote_types(numpy.min_scalar_type(numbers.min()), numpy.min_scalar_type(numbers.max())))
+            indexes = numpy.array(indexes, dtype=numpy.int32)
+            missing = numpy.empty(0, dtype=numpy.int32)
+            if (missingIndex != None):
+                missing = numpy.flatnonzero(indexes == missingIndex)
+            return ("n", numbers.dtype.str, numbers[indexes].tostring(), missing.astype(numpy.int32).tostring())
+
+    indexType = numpy.min_scalar_type(max(len(table) - 1, 0))
+    return ("s", distinctValues, indexType.str, numpy.array(indexes, dtype=indexType).tostring())
+
+
+def decode_column(anEncodedColumn):
+    '''
+    ' This function decodes a column that was encoded by encode_column() and returns the list of strings.
+    '
+    ' anEncodedColumn:    The encoded column
+    '''
+
+    if (anEncodedColumn[0] == "n"):
+        (columnType, dtype, data, missing) = anEncodedColumn
+        # only the distinct numbers are formatted
+        (numbers, indexes) = numpy.unique(numpy.frombuffer(data, dtype=dtype), return_inverse=True)
+        values = numpy.array(numbers.astype(str).tolist(), dtype=object)[indexes].tolist()
+        for index in numpy.frombuffer(missing, dtype=numpy.int32):
+            values[index] = "."
+        return values
+
+    (columnType, table, indexType, indexes) = anEncodedColumn
+    return numpy.array(table, dtype=object)[numpy.frombuffer(indexes, dtype=indexType)].tolist()
+
+
+def encode_info(anInfoList):
+    '''
+    ' This function encodes the INFO column.  Each INFO is split into a template with its keys and the list of its
+    ' values, e.g. "DP=7;DB;MQ=60" is split into "DP=%s;DB;MQ=%s" and ["7", "60"].  The templates and the values
+    ' of all of the rows are encoded as two columns.
+    '
+    ' anInfoList:    The list of INFO columns
+    '''
+
+    # the rows are joined, so that the regular expression only runs once per chunk, and the parts between the values
+    # are joined back together with the placeholders
+    parts = i_infoValueRegex.split("\n".join(anInfoList))
+    keyParts = parts[0::2]
+    if ("%" in "".join(keyParts)):
+        keyParts = [part.replace("%", "%%") for part in keyParts]
+    templates = "=%s".join(keyParts).split("\n")
+    return (encode_column(templates), encode_column(parts[1::2]))
+
+
+def decode_info(anEncodedInfo):
+    '''
+    ' This function decodes an INFO column that was encoded by encode_info() and returns the list of strings.
+    '
+    ' anEncodedInfo:    The encoded INFO column
+    '''
+
+    (templates, values) = (decode_column(anEncodedInfo[0]), decode_column(anEncodedInfo[1]))
+    infos = []
+    offset = 0
+    for template in templates:
+        # a key can't have an "=", so each value is after an "=%s"
+        numValues = template.count("=%s")
+        infos.append(template % tuple(values[offset:offset + numValues]))
+        offset += numValues
+    return infos
+
+
+def encode_samples(aFormat, aSampleTextList):
+    '''
+    ' This function encodes the samples of the records that have the same FORMAT and number of samples.  If each
+    ' sample has a value for every key of the FORMAT, then the samples are split into one column per sample and
+    ' key.  Otherwise the text of the samples of each record is stored as one column.
+    '
+    ' aFormat:            The FORMAT column
+    ' aSampleTextList:    The list of the sample columns of each record joined by tabs
+    '''
+
+    samples = "\t".join(aSampleTextList).split("\t")
+    numSamples = len(samples) // len(aSampleTextList)
+    numKeys = aFormat.count(":") + 1
+    numColons = map(str.count, samples, itertools.repeat(":", len(samples)))
+    if (min(numColons) == max(numColons) == numKeys - 1):
+        values = ":".join(samples).split(":")
+        numColumns = numSamples * numKeys
+        return ("c", numSamples, numKeys, [encode_column(values[column::numColumns]) for column in xrange(numColumns)])
+    return ("t", encode_column(aSampleTextList))
+
+
+def decode_samples(anEncodedSamples):
+    '''
+    ' This function decodes the samples that were encoded by encode_samples() and returns the list of the sample
+    ' columns of each record joined by tabs.
+    '
+    ' anEncodedSamples:    The encoded samples
+    '''
+
+    if (anEncodedSamples[0] == "t"):
+        return decode_column(anEncodedSamples[1])
+
+    (samplesType, numSamples, numKeys, columns) = anEncodedSamples
+    template = "\t".join([":".join(["%s"] * numKeys)] * numSamples)
+    return [template % row for row in itertools.izip(*[decode_column(column) for column in columns])]
+
+
+class RecordChunk(object):
+    '''
+    ' This class holds a chunk of a record file:  the text lines (e.g. the header lines) and the records that come
+    ' after them.  The first 8 columns of the records can be read with get_column() and changed with set_column(),
+    ' and each column is only decoded when it is needed.  The FORMAT and sample columns are only decoded when the
+    ' chunk is turned into VCF lines, so a filter that doesn't change them passes them on as they were read.
+    '''
+
+    def __init__(self, aLineList, aNumRecords, anEncodedColumnList, anEncodedSamples):
+        '''
+        ' aLineList:              The text lines without the newlines
+        ' aNumRecords:            The number of records
+        ' anEncodedColumnList:    The list of the encoded first 8 columns
+        ' anEncodedSamples:       The encoded index of the sample group of each record and the list of the sample
+        '                         groups (FORMAT, number of sample columns, encoded samples)
+        '''
+        self.lines = aLineList
+        self.numRecords = aNumRecords
+        self.encodedColumns = anEncodedColumnList
+        self.encodedSamples = anEncodedSamples
+        self.columns = [None] * i_numFixedColumns
+
+    def get_column(self, anIndex):
+        '''
+        ' This function returns the list of the strings in one of the first 8 columns (e.g. 6 for the FILTER).
+        '''
+        if (self.columns[anIndex] == None):
+            if (self.numRecords == 0):
+                self.columns[anIndex] = []
+            elif (anIndex == i_infoColumn):
+                self.columns[anIndex] = decode_info(self.encodedColumns[anIndex])
+            else:
+                self.columns[anIndex] = decode_column(self.encodedColumns[anIndex])
+        return self.columns[anIndex]
+
+    def set_column(self, anIndex, aValueList):
+        '''
+        ' This function replaces one of the first 8 columns with a list of strings.
+        '''
+        self.columns[anIndex] = aValueList
+        self.encodedColumns[anIndex] = None
+
+    def get_rest(self):
+        '''
+        ' This function returns the FORMAT and sample columns of each record joined by tabs, or None for the records
+        ' that only have the first 8 columns.
+        '''
+        rest = [None] * self.numRecords
+        (groupIndexes, groups) = self.encodedSamples
+        groupIndexes = numpy.frombuffer(groupIndexes, dtype=numpy.int32)
+        for (groupIndex, (format, numSampleColumns, encodedSamples)) in enumerate(groups):
+            if (format == None):
+                continue
+            rows = numpy.flatnonzero(groupIndexes == groupIndex).tolist()
+            if (numSampleColumns == 0):
+                for row in rows:
+                    rest[row] = format
+            else:
+                for (row, samples) in itertools.izip(rows, decode_samples(encodedSamples)):
+                    rest[row] = format + "\t" + samples
+        return rest
+
+    def get_lines(self):
+        '''
+        ' This function returns the text lines and the VCF lines of the records without the newlines.
+        '''
+        lines = list(self.lines)
+        if (self.numRecords == 0):
+            return lines
+        records = itertools.izip(*[self.get_column(index) for index in xrange(i_numFixedColumns)])
+        for (record, rest) in itertools.izip(records, self.get_rest()):
+            if (rest == None):
+                lines.append("\t".join(record))
+            else:
+                lines.append("\t".join(record) + "\t" + rest)
+        return lines
+
+    def encode(self):
+        '''
+        ' This function returns the chunk as it is stored in a record file.  Only the columns that were changed are
+        ' encoded again.
+        '''
+        if (self.numRecords > 0):
+            for index in xrange(i_numFixedColumns):
+                if (self.encodedColumns[index] == None):
+                    if (index == i_infoColumn):
+                        self.encodedColumns[index] = encode_info(self.columns[index])
+                    else:
+                        self.encodedColumns[index] = encode_column(self.columns[index])
+        return (self.lines, self.numRecords, self.encodedColumns, self.encodedSamples)
+
+
+def encode_chunk(aLineList, aRecordLineList):
+    '''
+    ' This function encodes the text lines and the VCF lines of the records of a chunk and returns the RecordChunk.
+    '
+    ' aLineList:          The text lines without the newlines
+    ' aRecordLineList:    The VCF lines of the records without the newlines
+    '''
+
+    if (len(aRecordLineList) == 0):
+        return RecordChunk(aLineList, 0, [None] * i_numFixedColumns, ("", []))
+
+    # the FORMAT and samples are split off as one column, so they can be grouped by the FORMAT
+    records = [line.split("\t", i_numFixedColumns + 1) for line in aRecordLineList]
+    encodedColumns = []
+    for (index, column) in enumerate(itertools.izip(*[record[0:i_numFixedColumns] for record in records])):
+        if (index == i_infoColumn):
+            encodedColumns.append(encode_info(column))
+        else:
+            encodedColumns.append(encode_column(column))
+
+    # the records with the same FORMAT and number of sample columns are encoded together
+    groupKeys = {}
+    groupIndexes = []
+    groupSamples = []
+    for record in records:
+        if (len(record) == i_numFixedColumns):
+            groupKey = (None, 0)
+        elif (len(record) == i_numFixedColumns + 1):
+            groupKey = (record[i_numFixedColumns], 0)
+        else:
+            groupKey = (record[i_numFixedColumns], record[i_numFixedColumns + 1].count("\t") + 1)
+        groupIndex = groupKeys.get(groupKey)
+        if (groupIndex == None):
+            groupIndex = len(groupKeys)
+            groupKeys[groupKey] = groupIndex
+            groupSamples.append([])
+        groupIndexes.append(groupIndex)
+        if (groupKey[1] > 0):
+            groupSamples[groupIndex].append(record[i_numFixedColumns + 1])
+
+    groups = [None] * len(groupKeys)
+    for ((format, numSampleColumns), groupIndex) in groupKeys.iteritems():
+        if (numSampleColumns > 0):
+            groups[groupIndex] = (format, numSampleColumns, encode_samples(format, groupSamples[groupIndex]))
+        else:
+            groups[groupIndex] = (format, numSampleColumns, None)
+    encodedSamples = (numpy.array(groupIndexes, dtype=numpy.int32).tostring(), groups)
+    return RecordChunk(aLineList, len(records), encodedColumns, encodedSamples)
+
+
+def is_record_line(aLine):
+    '''
+    ' This function returns True if a line is a VCF line with at least the first 8 columns, so that it can be stored
+    ' as a record.
+    '
+    ' aLine:    A line without the newline
+    '''
+
+    return (not aLine.startswith("#") and aLine.count("\t") >= i_numFixedColumns - 1)
+
+
+class RecordWriter(object):
+    '''
+    ' This class writes a record file.  It has the same write(), flush(), and close() methods as the file handlers
+    ' from open(), so the scripts that write VCF lines can write a record file (e.g. with print >>).  The lines are
+    ' encoded a chunk at a time.  The chunks from a RecordReader can also be written directly with write_chunk().
+    '''
+
+    def __init__(self, aFilename):
+        '''
+        ' aFilename:    The name of the record file
+        '''
+        if (numpy == None):
+            raise ImportError("numpy is needed to write the record file " + aFilename)
+        self.name = aFilename
+        self.fileHandler = open(aFilename, "wb")
+        self.fileHandler.write(i_magic)
+        self.softspace = 0
+        self.partialLine = ""
+        # the text lines of the next chunk come before its records
+        self.lines = []
+        self.recordLines = []
+
+    def write(self, aString):
+        lines = (self.partialLine + aString).split("\n")
+        self.partialLine = lines.pop()
+        for line in lines:
+            if (is_record_line(line)):
+                self.recordLines.append(line)
+                if (len(self.recordLines) >= i_chunkSize):
+                    self.write_lines()
+            else:
+                if (len(self.recordLines) > 0):
+                    self.write_lines()
+                self.lines.append(line)
+
+    def write_lines(self):
+        if (len(self.lines) == 0 and len(self.recordLines) == 0):
+            return
+        self.write_encoded_chunk(encode_chunk(self.lines, self.recordLines).encode())
+        self.lines = []
+        self.recordLines = []
+
+    def write_chunk(self, aChunk):
+        '''
+        ' This function writes a RecordChunk after the lines that have already been written.
+        '''
+        self.write_lines()
+        self.write_encoded_chunk(aChunk.encode())
+
+    def write_encoded_chunk(self, anEncodedChunk):
+        data = marshal.dumps(anEncodedChunk, i_marshalVersion)
+        self.fileHandler.write(struct.pack("<I", len(data)))
+        self.fileHandler.write(data)
+
+    def flush(self):
+        self.fileHandler.flush()
+
+    def close(self):
+        # the last line doesn't need a newline
+        if (len(self.partialLine) > 0):
+            self.write("\n")
+        self.write_lines()
+        self.fileHandler.close()
+
+
+class RecordReader(object):
+    '''
+    ' This class reads a record file.  The chunks can be read with get_chunks(), or the file can be read like the
+    ' file handlers from open() by the scripts that loop through the lines of a file, in which case the records are
+    ' turned back into VCF lines.  The lines keep their newlines.
+    '''
+
+    def __init__(self, aFilename):
+        '''
+        ' aFilename:    The name of the record file
+        '''
+        if (numpy == None):
+            raise ImportError("numpy is needed to read the record file " + aFilename)
+        self.name = aFilename
+        self.fileHandler = open(aFilename, "rb")
+        if (self.fileHandler.read(len(i_magic)) != i_magic):
+            raise IOError("The file " + aFilename + " is not a record file")
+        # the same iterators are used by every loop, so a loop can stop and a later loop will continue from there
+        self.chunks = self.read_chunks()
+        self.lines = itertools.chain.from_iterable(itertools.imap(self.get_chunk_lines, self.chunks))
+
+    def read_chunks(self):
+        while (True):
+            size = self.fileHandler.read(4)
+            if (len(size) == 0):
+                break
+            (dataSize,) = struct.unpack("<I", size)
+            data = self.fileHandler.read(dataSize)
+            if (len(data) != dataSize):
+                raise IOError("The file " + self.name + " ends with a truncated chunk")
+
+            # the garbage collector would look at every new tuple while the chunk is loaded
+            isEnabled = gc.isenabled()
+            gc.disable()
+            try:
+                (lines, numRecords, encodedColumns, encodedSamples) = marshal.loads(data)
+            finally:
+                if (isEnabled):
+                    gc.enable()
+            yield RecordChunk(lines, numRecords, list(encodedColumns), encodedSamples)
+        return
+
+    def get_chunk_lines(self, aChunk):
+        return [line + "\n" for line in aChunk.get_lines()]
+
+    def get_chunks(self):
+        '''
+        ' This function returns the generator of the RecordChunks of the file.
+        '''
+        return self.chunks
+
+    def __iter__(self):
+        return self.lines
+
+    def next(self):
+        return self.lines.next()
+
+    def readline(self):
+        return next(self.lines, "")
+
+    def readlines(self):
+        return list(self.lines)
+
+    def read(self):
+        return "".join(self.lines)
+
+    def close(self):
+        self.chunks.close()
+        self.fileHandler.close()
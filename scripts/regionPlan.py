@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+import os
+import lineReader
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module plans the regions that are piled up by radia.py.  All of the coordinates
+'    are 1-based and the intervals are (start, stop) tuples where the stop is inclusive.
+'''
+
+
+def merge_intervals(anIntervalList, aGapSize):
+    '''
+    ' This function sorts the intervals and merges the ones that overlap, are adjacent, or are
+    ' at most aGapSize coordinates apart.  It returns a new list of (start, stop) tuples.
+    '
+    ' anIntervalList:    A list of (start, stop) tuples
+    ' aGapSize:          The max number of coordinates between two intervals that are merged
+    '''
+    mergedIntervals = []
+    for (start, stop) in sorted(anIntervalList):
+        if (len(mergedIntervals) > 0 and start <= mergedIntervals[-1][1] + aGapSize + 1):
+            if (stop > mergedIntervals[-1][1]):
+                mergedIntervals[-1] = (mergedIntervals[-1][0], stop)
+        else:
+            mergedIntervals.append((start, stop))
+    return mergedIntervals
+
+
+def plan_regions(aRegionList, aGapSize):
+    '''
+    ' This function plans the pileups for a list of regions (e.g. from a coordinates file).  The regions
+    ' on each chrom are sorted, and the regions that overlap or are adjacent are merged, so that no coordinate
+    ' is called twice.  Then the merged regions that are at most aGapSize coordinates apart are coalesced into
+    ' one region that is piled up at once.  The chroms are kept in the order that they first appear in.
+    '
+    ' This function returns a list of (chrom, start, stop, intervals) tuples, where intervals is the list of
+    ' merged regions within the start and stop.  Only the coordinates in the intervals should be called.
+    '
+    ' aRegionList:    A list of (chrom, start, stop) tuples
+    ' aGapSize:       The max number of coordinates between two regions that are piled up at once
+    '''
+    chroms = []
+    intervalsDict = {}
+    for (chrom, start, stop) in aRegionList:
+        if (chrom not in intervalsDict):
+            chroms.append(chrom)
+            intervalsDict[chrom] = []
+        intervalsDict[chrom].append((start, stop))
+
+    plannedRegions = []
+    for chrom in chroms:
+        chromRegions = []
+        for (start, stop) in merge_intervals(intervalsDict[chrom], 0):
+            # the merged regions are sorted and don't overlap, so a nearby region extends the previous one
+            if (len(chromRegions) > 0 and start <= chromRegions[-1][2] + aGapSize + 1):
+                chromRegions[-1][2] = stop
+                chromRegions[-1][3].append((start, stop))
+            else:
+                chromRegions.append([chrom, start, stop, [(start, stop)]])
+        plannedRegions += [tuple(region) for region in chromRegions]
+    return plannedRegions
+
+
+def group_regions(aPlannedRegionList):
+    '''
+    ' This function groups the planned regions (from plan_regions()) by chrom, so that all of the regions on a chrom
+    ' are piled up by one pileup iterator per sample instead of one per region.  It returns a list of 
+    ' (chrom, start, stop, intervals, regions) tuples, where the start and stop span all of the regions on the chrom,
+    ' intervals are the intervals of all of the regions, and regions is the list of (start, stop) tuples of the regions.
+    '
+    ' aPlannedRegionList:    A list of (chrom, start, stop, intervals) tuples
+    '''
+    groupedRegions = []
+    for (chrom, start, stop, intervals) in aPlannedRegionList:
+        if (len(groupedRegions) > 0 and groupedRegions[-1][0] == chrom):
+            groupedRegions[-1][2] = stop
+            groupedRegions[-1][3] += intervals
+            groupedRegions[-1][4].append((start, stop))
+        else:
+            groupedRegions.append([chrom, start, stop, list(intervals), [(start, stop)]])
+    return [tuple(region) for region in groupedRegions]
+
+
+def get_batches(aRegionList, aBatchSize):
+    '''
+    ' This function uses the python generator to split a sorted list of regions that don't overlap into batches 
+    ' of at most aBatchSize coordinates.  A batch starts at the start of a region or right after the previous batch,
+    ' and it can span more than one region, so the coordinates between the regions don't start new batches.  It 
+    ' yields (start, stop, regions) tuples, where regions is the list of the parts of the regions in the batch.
+    '
+    ' aRegionList:    A sorted list of (start, stop) tuples
+    ' aBatchSize:     The max number of coordinates in a batch
+    '''
+    batch = None
+    for (start, stop) in aRegionList:
+        while (start <= stop):
+            if (batch != None and start > batch[0] + aBatchSize - 1):
+                yield tuple(batch)
+                batch = None
+            if (batch == None):
+                batch = [start, start, []]
+
+            batchStop = min(stop, batch[0] + aBatchSize - 1)
+            batch[1] = batchStop
+            batch[2].append((start, batchStop))
+            start = batchStop + 1
+
+    if (batch != None):
+        yield tuple(batch)
+    return
+
+
+def intersect_intervals(anIntervalList, aCoveredIntervalList):
+    '''
+    ' This function returns the parts of the intervals that overlap the covered intervals.  Both lists
+    ' must be sorted and the intervals within each list can't overlap.  It returns a new list of (start, stop) tuples.
+    '
+    ' anIntervalList:           A sorted list of (start, stop) tuples
+    ' aCoveredIntervalList:     A sorted list of (start, stop) tuples
+    '''
+    intersectedIntervals = []
+    coveredIndex = 0
+    for (start, stop) in anIntervalList:
+        # skip the covered intervals that end before this interval
+        while (coveredIndex < len(aCoveredIntervalList) and aCoveredIntervalList[coveredIndex][1] < start):
+            coveredIndex += 1
+
+        # a covered interval can overlap more than one interval, so the index isn't moved past it here
+        index = coveredIndex
+        while (index < len(aCoveredIntervalList) and aCoveredIntervalList[index][0] <= stop):
+            intersectedIntervals.append((max(start, aCoveredIntervalList[index][0]), min(stop, aCoveredIntervalList[index][1])))
+            index += 1
+    return intersectedIntervals
+
+
+def restrict_regions(aPlannedRegionList, aCoveredIntervalsDict, aGapSize):
+    '''
+    ' This function restricts the planned regions (from plan_regions()) to the covered intervals of each chrom
+    ' (e.g. the windows with reads from bamIndex.get_covered_intervals()).  The parts of the regions that aren't
+    ' covered are dropped, and the rest is planned again with plan_regions().  The chroms without any covered
+    ' intervals are dropped completely.
+    '
+    ' aPlannedRegionList:       A list of (chrom, start, stop, intervals) tuples
+    ' aCoveredIntervalsDict:    A dictionary with the chroms as the keys and sorted lists of (start, stop) tuples as the values
+    ' aGapSize:                 The max number of coordinates between two regions that are piled up at once
+    '''
+    regions = []
+    for (chrom, start, stop, intervals) in aPlannedRegionList:
+        for (intervalStart, intervalStop) in intersect_intervals(intervals, aCoveredIntervalsDict.get(chrom, [])):
+            regions.append((chrom, intervalStart, intervalStop))
+    return plan_regions(regions, aGapSize)
+
+
+def subtract_intervals(anIntervalList, aRemovedIntervalList):
+    '''
+    ' This function returns the parts of the intervals that don't overlap the removed intervals.  Both lists
+    ' must be sorted and the intervals within each list can't overlap.  It returns a new list of (start, stop) tuples.
+    '
+    ' anIntervalList:           A sorted list of (start, stop) tuples
+    ' aRemovedIntervalList:     A sorted list of (start, stop) tuples
+    '''
+    subtractedIntervals = []
+    removedIndex = 0
+    for (start, stop) in anIntervalList:
+        # skip the removed intervals that end before this interval
+        while (removedIndex < len(aRemovedIntervalList) and aRemovedIntervalList[removedIndex][1] < start):
+            removedIndex += 1
+
+        # cut the removed intervals out of this interval
+        index = removedIndex
+        while (index < len(aRemovedIntervalList) and aRemovedIntervalList[index][0] <= stop):
+            if (aRemovedIntervalList[index][0] > start):
+                subtractedIntervals.append((start, aRemovedIntervalList[index][0] - 1))
+            start = max(start, aRemovedIntervalList[index][1] + 1)
+            index += 1
+
+        if (start <= stop):
+            subtractedIntervals.append((start, stop))
+    return subtractedIntervals
+
+
+def exclude_regions(aPlannedRegionList, anExcludedIntervalsDict, aGapSize):
+    '''
+    ' This function removes the excluded intervals of each chrom (e.g. the runs of N's in the reference) from the
+    ' planned regions (from plan_regions()), and the rest is planned again with plan_regions().
+    '
+    ' aPlannedRegionList:         A list of (chrom, start, stop, intervals) tuples
+    ' anExcludedIntervalsDict:    A dictionary with the chroms as the keys and sorted lists of (start, stop) tuples as the values
+    ' aGapSize:                   The max number of coordinates between two regions that are piled up at once
+    '''
+    regions = []
+    for (chrom, start, stop, intervals) in aPlannedRegionList:
+        for (intervalStart, intervalStop) in subtract_intervals(intervals, anExcludedIntervalsDict.get(chrom, [])):
+            regions.append((chrom, intervalStart, intervalStop))
+    return plan_regions(regions, aGapSize)
+
+
+def get_bed_filename(aBedPath, aChrom):
+    '''
+    ' This function returns the .bed file for a chrom.  The path can be a .bed or .bed.gz file, or a directory with one
+    ' file per chrom like the ones in the data/<build>/ directories (e.g. chr1.bed.gz).  If the directory doesn't have a
+    ' file for the chrom, then None is returned.
+    '
+    ' aBedPath:    A .bed file or a directory of .bed files
+    ' aChrom:      The chrom
+    '''
+    if (not os.path.isdir(aBedPath)):
+        return aBedPath
+
+    chrom = aChrom[3:] if (aChrom.startswith("chr")) else aChrom
+    for filename in ("chr" + chrom + ".bed.gz", "chr" + chrom + ".bed", chrom + ".bed.gz", chrom + ".bed"):
+        if (os.path.isfile(os.path.join(aBedPath, filename))):
+            return os.path.join(aBedPath, filename)
+    return None
+
+
+def read_bed_intervals(aBedFilename, aChrom):
+    '''
+    ' This function reads the regions of a chrom from a .bed or .bed.gz file.  The .bed files are 0-based and the stop
+    ' is exclusive, so the regions are converted to 1-based intervals where the stop is inclusive.  Sometimes the chroms
+    ' have the "chr" prefix, sometimes they don't, so both are checked.  It returns a sorted list of (start, stop) tuples
+    ' that don't overlap.
+    '
+    ' aBedFilename:    A .bed or .bed.gz file
+    ' aChrom:          The chrom
+    '''
+    chrom = aChrom[3:] if (aChrom.startswith("chr")) else aChrom
+
+    bedFileHandler = lineReader.get_read_fileHandler(aBedFilename)
+
+    intervals = []
+    for line in bedFileHandler:
+        # skip the empty lines and the header lines
+        if (line.isspace() or line.startswith("#") or line.startswith("track") or line.startswith("browser")):
+            continue
+
+        splitLine = line.rstrip("\r\n").split("\t")
+        if (splitLine[0] == chrom or splitLine[0] == "chr" + chrom):
+            intervals.append((int(splitLine[1]) + 1, int(splitLine[2])))
+    bedFileHandler.close()
+
+    return merge_intervals([(start, stop) for (start, stop) in intervals if (start <= stop)], 0)
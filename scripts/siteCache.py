@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+import hashlib
+import mmap
+import os
+import struct
+import bamIndex
+
+# numpy is needed to read and write the columns of the cache
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+'''
+'    RNA and DNA Integrated Analysis (RADIA) identifies RNA and DNA variants in NGS data.
+'    Copyright (C) 2010-2018  Amie Radenbaugh
+'
+'    This program is free software: you can redistribute it and/or modify
+'    it under the terms of the GNU Affero General Public License as
+'    published by the Free Software Foundation, either version 3 of the
+'    License, or (at your option) any later version.
+'
+'    This program is distributed in the hope that it will be useful,
+'    but WITHOUT ANY WARRANTY; without even the implied warranty of
+'    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+'    GNU Affero General Public License for more details.
+'
+'    You should have received a copy of the GNU Affero General Public License
+'    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'
+'    This module reads and writes the site cache files of radia.py.  A site cache file holds the
+'    decoded pileups of one sample in one region as rows of integers.  The rows are written in chunks,
+'    and each chunk is stored column by column, so that a chunk can be read straight from the
+'    memory-mapped file with numpy.  The file starts with a magic string and the numpy type of each
+'    column, and each chunk starts with its number of rows.  The cache files are named after a key
+'    that changes whenever the input file or any of the params that change the decoded pileups change,
+'    followed by the region.  The decoded pileup at a coordinate doesn't depend on the region that was
+'    piled up, so a region can be read from the cache files of any regions that cover it.
+'''
+
+# the first bytes of a site cache file, the number changes when the format changes
+i_magic = "RADIASC1"
+
+# the number of rows that are written at once
+i_chunkSize = 65536
+
+# the site cache files end with this suffix
+i_siteCacheSuffix = ".sites"
+
+
+def get_cache_key(anInputFilename, aParamList):
+    '''
+    ' This function returns the key of the site cache for an input file and the params that were used to pile it up and
+    ' decode it.  The input file is identified by its size, its modification time, and the text of its header if it is a
+    ' .bam file, so the key changes when the file is re-written.  The key is an md5 hex digest.
+    '
+    ' anInputFilename:    A .bam file, a comma-separated list of .bam files, or a pileups file
+    ' aParamList:         A list of the params that change the decoded pileups (e.g. the chrom, the quality cutoffs)
+    '''
+
+    md5 = hashlib.md5()
+    for filename in anInputFilename.split(","):
+        stat = os.stat(filename)
+        md5.update(str(stat.st_size) + "\t" + str(int(stat.st_mtime)) + "\n")
+        if (filename.endswith(".bam")):
+            md5.update(hashlib.md5(bamIndex.get_bam_header_text(filename)).hexdigest() + "\n")
+    for param in aParamList:
+        md5.update(str(param) + "\n")
+    return md5.hexdigest()
+
+
+def get_cache_prefix(anInputFilename, aChrom, aParamList):
+    '''
+    ' This function returns the start of the names of the site cache files for a sample on a chrom.
+    '
+    ' anInputFilename:     A .bam file or a pileups file
+    ' aChrom:              The chrom
+    ' aParamList:          A list of the params that change the decoded pileups
+    '''
+
+    return os.path.basename(anInputFilename.split(",")[0]) + "." + aChrom + "." + get_cache_key(anInputFilename, [aChrom] + list(aParamList)) + "."
+
+
+def get_cache_filename(aCacheDir, anInputFilename, aChrom, aStartCoordinate, aStopCoordinate, aParamList):
+    '''
+    ' This function returns the name of the site cache file for a sample in a region.
+    '
+    ' aCacheDir:           The directory of the site cache files
+    ' anInputFilename:     A .bam file or a pileups file
+    ' aChrom:              The chrom
+    ' aStartCoordinate:    The start coordinate of the region
+    ' aStopCoordinate:     The stop coordinate of the region
+    ' aParamList:          A list of the params that change the decoded pileups
+    '''
+
+    return os.path.join(aCacheDir, get_cache_prefix(anInputFilename, aChrom, aParamList) + str(aStartCoordinate) + "_" + str(aStopCoordinate) + i_siteCacheSuffix)
+
+
+def find_cache_files(aCacheDir, anInputFilename, aChrom, aStartCoordinate, aStopCoordinate, aParamList):
+    '''
+    ' This function looks for the site cache files of a sample that cover a region.  The files could have been written
+    ' for other regions (e.g. by a run with other shards or without some of the samples).  It returns a list of
+    ' (cacheFilename, start, stop) tuples sorted by the start that covers every coordinate of the region with as few
+    ' files as possible, or None if the region isn't completely covered.
+    '
+    ' aCacheDir:           The directory of the site cache files
+    ' anInputFilename:     A .bam file or a pileups file
+    ' aChrom:              The chrom
+    ' aStartCoordinate:    The start coordinate of the region
+    ' aStopCoordinate:     The stop coordinate of the region
+    ' aParamList:          A list of the params that change the decoded pileups
+    '''
+
+    prefix = get_cache_prefix(anInputFilename, aChrom, aParamList)
+    cachedRegions = []
+    for filename in os.listdir(aCacheDir):
+        if (filename.startswith(prefix) and filename.endswith(i_siteCacheSuffix)):
+            (start, stop) = filename[len(prefix):-len(i_siteCacheSuffix)].split("_")
+            cachedRegions.append((int(start), int(stop), os.path.join(aCacheDir, filename)))
+    cachedRegions.sort()
+
+    # take the file that reaches the furthest among the ones that start at or before the first uncovered coordinate
+    cacheFiles = []
+    coveredStop = aStartCoordinate - 1
+    index = 0
+    while (coveredStop < aStopCoordinate):
+        bestRegion = None
+        while (index < len(cachedRegions) and cachedRegions[index][0] <= coveredStop + 1):
+            if (bestRegion == None or cachedRegions[index][1] > bestRegion[1]):
+                bestRegion = cachedRegions[index]
+            index += 1
+        if (bestRegion == None or bestRegion[1] <= coveredStop):
+            return None
+        cacheFiles.append((bestRegion[2], bestRegion[0], bestRegion[1]))
+        coveredStop = bestRegion[1]
+    return cacheFiles
+
+
+class SiteCacheWriter(object):
+    '''
+    ' This class writes the rows of a site cache file.  The rows are written to a temp file, and the temp file is only
+    ' renamed to the cache file when it is closed, so that other processes never read a partial cache.  If the rows are
+    ' never all written (e.g. the run fails), then the temp file is removed with discard().
+    '''
+
+    __slots__ = ("cacheFilename", "tempFilename", "fileHandler", "dtypes", "rows")
+
+    def __init__(self, aCacheFilename, aDtypeList):
+        '''
+        ' aCacheFilename:    The site cache file
+        ' aDtypeList:        The numpy type of each column (e.g. "<i4", "<u1")
+        '''
+        self.cacheFilename = aCacheFilename
+        self.tempFilename = aCacheFilename + "." + str(os.getpid())
+        self.dtypes = [numpy.dtype(dtype) for dtype in aDtypeList]
+        self.rows = []
+        self.fileHandler = open(self.tempFilename, "wb")
+        self.fileHandler.write(i_magic + struct.pack("<i", len(self.dtypes)))
+        for dtype in self.dtypes:
+            self.fileHandler.write(dtype.str.ljust(4))
+
+    def write(self, aRow):
+        self.rows.append(aRow)
+        if (len(self.rows) >= i_chunkSize):
+            self.flush()
+
+    def flush(self):
+        if (len(self.rows) == 0):
+            return
+        self.fileHandler.write(struct.pack("<i", len(self.rows)))
+        for (column, dtype) in zip(zip(*self.rows), self.dtypes):
+            self.fileHandler.write(numpy.array(column, dtype=dtype).tostring())
+        del self.rows[:]
+
+    def close(self):
+        self.flush()
+        self.fileHandler.close()
+        os.rename(self.tempFilename, self.cacheFilename)
+
+    def discard(self):
+        self.fileHandler.close()
+        if (os.path.isfile(self.tempFilename)):
+            os.remove(self.tempFilename)
+
+
+def read_site_cache(aCacheFilename):
+    '''
+    ' This function uses the python generator to yield the chunks of a site cache file.  The file is memory-mapped,
+    ' and each chunk is yielded as a list with one numpy array per column that points straight into the map.
+    '
+    ' aCacheFilename:    The site cache file
+    '''
+
+    cacheFileHandler = open(aCacheFilename, "rb")
+    cacheMap = mmap.mmap(cacheFileHandler.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if (cacheMap[0:len(i_magic)] != i_magic):
+            raise ValueError("The file " + aCacheFilename + " is not a site cache file.")
+        offset = len(i_magic)
+        (numColumns,) = struct.unpack("<i", cacheMap[offset:offset + 4])
+        offset += 4
+        dtypes = [numpy.dtype(cacheMap[offset + (index * 4):offset + (index * 4) + 4].strip()) for index in xrange(numColumns)]
+        offset += numColumns * 4
+
+        while (offset < len(cacheMap)):
+            (numRows,) = struct.unpack("<i", cacheMap[offset:offset + 4])
+            offset += 4
+            columns = []
+            for dtype in dtypes:
+                columns.append(numpy.frombuffer(cacheMap, dtype=dtype, count=numRows, offset=offset))
+                offset += numRows * dtype.itemsize
+            yield columns
+    finally:
+        # the arrays of the last chunk may still point into the map, so it is closed by the garbage collector
+        cacheFileHandler.close()
+    return